@@ -1,9 +1,18 @@
-from .model_base import ModelBase
+from .model_base import ModelBase, TFLiteModelBase
 from .recording import Recording
 from .preprocessor_base import PreprocessorBase
 from .species_predictor import SpeciesList
 from .species_predictor import SpeciesPredictorBase
 from .watcher import Watcher
 
-__all__ = ["ModelBase", "Recording", "PreprocessorBase", "SpeciesList", "SpeciesPredictorBase", "Watcher", "__version__"]
+__all__ = [
+    "ModelBase",
+    "TFLiteModelBase",
+    "Recording",
+    "PreprocessorBase",
+    "SpeciesList",
+    "SpeciesPredictorBase",
+    "Watcher",
+    "__version__",
+]
 __version__ = "0.0.9"
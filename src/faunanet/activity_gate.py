@@ -0,0 +1,150 @@
+import numpy as np
+
+
+class ActivityGate:
+    """
+    ActivityGate Decide for chunks of audio whether they contain enough activity to be worth running through a model.
+    A chunk passes the gate if its energy, optionally restricted to a frequency band, is at least 'min_energy_db' dBFS and
+    its spectral flatness in that band is at most 'max_flatness'. Silence fails the first test, broadband noise such as rain
+    or wind the second. Restricting the band to the frequencies of the target species keeps low frequency wind rumble out of the energy.
+    All chunks of a file are evaluated at once with numpy.
+
+    Methods:
+    --------
+    evaluate: Get a mask of the chunks that pass the gate.
+    reset: Reset the counters.
+    """
+
+    def __init__(
+        self,
+        min_energy_db: float = None,
+        max_flatness: float = None,
+        band: list = None,
+        block_size: int = 32,
+    ):
+        """
+        __init__ Create a new ActivityGate.
+
+        Args:
+            min_energy_db (float, optional): Minimum RMS level of a chunk in dB relative to full scale, e.g., -60. Defaults to None (no energy test).
+            max_flatness (float, optional): Maximum spectral flatness of a chunk in [0, 1], where 1 is white noise and values close to 0 are tonal sounds. Defaults to None (no flatness test).
+            band (list, optional): [low, high] frequency band in Hz to compute energy and flatness in. Defaults to None (whole spectrum).
+            block_size (int, optional): Number of chunks whose spectra are computed at once, which bounds the memory used. Defaults to 32.
+
+        Raises:
+            ValueError: When no test is given, 'max_flatness' is not in [0, 1] or 'band' is not a valid frequency band.
+        """
+        if min_energy_db is None and max_flatness is None:
+            raise ValueError(
+                "At least one of 'min_energy_db' and 'max_flatness' must be given"
+            )
+
+        if max_flatness is not None and not 0.0 <= max_flatness <= 1.0:
+            raise ValueError("'max_flatness' must be in [0, 1]")
+
+        if band is not None and (len(band) != 2 or not 0 <= band[0] < band[1]):
+            raise ValueError("'band' must be [low, high] with 0 <= low < high")
+
+        if block_size < 1:
+            raise ValueError("'block_size' must be >= 1")
+
+        self.min_energy_db = min_energy_db
+        self.max_flatness = max_flatness
+        self.band = None if band is None else list(band)
+        self.block_size = block_size
+        self.num_chunks = 0
+        self.num_skipped = 0
+
+    @property
+    def needs_spectrum(self) -> bool:
+        return self.max_flatness is not None or self.band is not None
+
+    @property
+    def stats(self) -> dict:
+        """
+        stats How often the gate has fired.
+
+        Returns:
+            dict: {"chunks": number of evaluated chunks, "skipped": number of chunks that failed the gate, "skip_ratio": fraction of skipped chunks}
+        """
+        return {
+            "chunks": self.num_chunks,
+            "skipped": self.num_skipped,
+            "skip_ratio": (
+                self.num_skipped / self.num_chunks if self.num_chunks > 0 else 0.0
+            ),
+        }
+
+    def _spectral_features(self, chunks: np.ndarray, sample_rate: int) -> tuple:
+        """
+        _spectral_features Compute energy and spectral flatness of chunks within the gate's band.
+
+        Args:
+            chunks (np.ndarray): 2D array of shape (number of chunks, samples per chunk)
+            sample_rate (int): Sample rate of the audio
+
+        Returns:
+            tuple: (mean square amplitude in the band, spectral flatness in the band), one entry per chunk each.
+        """
+        length = chunks.shape[1]
+        frequencies = np.fft.rfftfreq(length, d=1.0 / sample_rate)
+        low, high = (0.0, sample_rate / 2.0) if self.band is None else self.band
+        in_band = (frequencies >= low) & (frequencies <= high)
+
+        energy = np.empty(len(chunks))
+        flatness = np.empty(len(chunks))
+
+        for start in range(0, len(chunks), self.block_size):
+            block = chunks[start : start + self.block_size]
+            power = np.abs(np.fft.rfft(block, axis=1)[:, in_band]) ** 2
+
+            # Parseval: all bins but DC and Nyquist stand for two frequencies of the full spectrum
+            energy[start : start + len(block)] = 2.0 * power.sum(axis=1) / length**2
+
+            power += 1e-12
+            flatness[start : start + len(block)] = np.exp(
+                np.mean(np.log(power), axis=1)
+            ) / np.mean(power, axis=1)
+
+        return energy, flatness
+
+    def evaluate(self, chunks: np.ndarray, sample_rate: int) -> np.ndarray:
+        """
+        evaluate Determine which chunks pass the gate and count the ones that do not.
+
+        Args:
+            chunks (np.ndarray): 2D array of shape (number of chunks, samples per chunk) of raw audio
+            sample_rate (int): Sample rate of the audio
+
+        Returns:
+            np.ndarray: Boolean mask, True for chunks that should be analyzed.
+        """
+        active = np.ones(len(chunks), dtype=bool)
+
+        if len(chunks) == 0:
+            return active
+
+        if self.needs_spectrum:
+            energy, flatness = self._spectral_features(chunks, sample_rate)
+        else:
+            energy = np.mean(np.square(chunks, dtype=np.float64), axis=1)
+            flatness = None
+
+        if self.min_energy_db is not None:
+            level_db = 10.0 * np.log10(energy + 1e-20)
+            active &= level_db >= self.min_energy_db
+
+        if self.max_flatness is not None:
+            active &= flatness <= self.max_flatness
+
+        self.num_chunks += len(chunks)
+        self.num_skipped += int(len(chunks) - np.count_nonzero(active))
+
+        return active
+
+    def reset(self):
+        """
+        reset Reset the counters of evaluated and skipped chunks.
+        """
+        self.num_chunks = 0
+        self.num_skipped = 0
@@ -0,0 +1,133 @@
+from pathlib import Path
+import shutil
+import time
+import numpy as np
+
+
+def time_inference(model, chunks: list, repeats: int = 1) -> dict:
+    """
+    time_inference Measure the inference time of a model on a set of preprocessed chunks.
+
+    Args:
+        model (ModelBase): Model to benchmark. Must implement 'predict'.
+        chunks (list): Preprocessed chunks as produced by the model's preprocessor.
+        repeats (int, optional): How often to run over all chunks. Defaults to 1.
+
+    Returns:
+        dict: total time, time per chunk and chunks per second, plus the scores of the last repetition as a 2D array.
+    """
+    if len(chunks) == 0:
+        raise ValueError("Need at least one chunk to benchmark")
+
+    scores = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        scores = [np.asarray(model.predict(c)[0], dtype=np.float32) for c in chunks]
+    total = time.perf_counter() - start
+
+    num_chunks = len(chunks) * repeats
+
+    return {
+        "total_time": total,
+        "time_per_chunk": total / num_chunks,
+        "chunks_per_second": num_chunks / total if total > 0 else float("inf"),
+        "scores": np.stack(scores),
+    }
+
+
+def compare_models(
+    reference, candidate, chunks: list, min_conf: float = 0.25, repeats: int = 1
+) -> dict:
+    """
+    compare_models Compare speed and accuracy of a candidate model, e.g., a quantized one, against a reference model, e.g., its float version.
+    Both models must produce scores for the same labels in the same order.
+
+    Args:
+        reference (ModelBase): Reference model.
+        candidate (ModelBase): Model to compare against the reference.
+        chunks (list): Preprocessed chunks to run both models on.
+        min_conf (float, optional): Confidence threshold above which a score counts as detection. Defaults to 0.25.
+        repeats (int, optional): How often to run over all chunks for timing. Defaults to 1.
+
+    Returns:
+        dict: Timings of both models, speedup of the candidate, maximum and mean absolute score difference,
+              agreement of the top label per chunk and the Jaccard index of the detections above 'min_conf'.
+    """
+    ref = time_inference(reference, chunks, repeats=repeats)
+    cand = time_inference(candidate, chunks, repeats=repeats)
+
+    if ref["scores"].shape != cand["scores"].shape:
+        raise ValueError(
+            f"Models produce scores of different shape: {ref['scores'].shape} and {cand['scores'].shape}"
+        )
+
+    difference = np.abs(ref["scores"] - cand["scores"])
+
+    ref_detections = ref["scores"] >= min_conf
+    cand_detections = cand["scores"] >= min_conf
+    union = np.count_nonzero(ref_detections | cand_detections)
+
+    return {
+        "reference_time_per_chunk": ref["time_per_chunk"],
+        "candidate_time_per_chunk": cand["time_per_chunk"],
+        "speedup": (
+            ref["time_per_chunk"] / cand["time_per_chunk"]
+            if cand["time_per_chunk"] > 0
+            else float("inf")
+        ),
+        "max_abs_difference": float(difference.max()),
+        "mean_abs_difference": float(difference.mean()),
+        "top1_agreement": float(
+            np.mean(
+                np.argmax(ref["scores"], axis=1) == np.argmax(cand["scores"], axis=1)
+            )
+        ),
+        "detection_jaccard": (
+            np.count_nonzero(ref_detections & cand_detections) / union
+            if union > 0
+            else 1.0
+        ),
+    }
+
+
+def time_to_first_result(
+    watcher, recording: str, timeout: float = 120.0, poll_interval: float = 0.01
+) -> dict:
+    """
+    time_to_first_result Measure how long a watcher takes from being started, or restarted if it is running, until it has written the results
+    of the first recording. This includes starting the watcher process, importing everything and loading the models.
+
+    Args:
+        watcher (Watcher): Watcher to measure
+        recording (str): Recording to copy into the input directory of the watcher once it is ready
+        timeout (float, optional): Maximum time in seconds to wait for the watcher to get ready and for the results. Defaults to 120.
+        poll_interval (float, optional): Time in seconds between checks for the results. Defaults to 0.01.
+
+    Raises:
+        RuntimeError: When the watcher fails to start or there are no results within 'timeout'.
+
+    Returns:
+        dict: Time until the watcher was ready to analyze files ('ready_time') and until the results were written ('first_result_time'), in seconds.
+    """
+    start = time.perf_counter()
+
+    if watcher.is_running:
+        watcher.restart()
+    else:
+        watcher.start()
+
+    watcher.wait_for_state(["ready", "failed"], timeout=timeout)
+    ready = time.perf_counter() - start
+
+    if watcher.state != "ready":
+        raise RuntimeError(f"Watcher did not get ready, its state is {watcher.state}")
+
+    results = Path(watcher.output) / f"results_{Path(recording).stem}.csv"
+    shutil.copy(recording, Path(watcher.input) / Path(recording).name)
+
+    while results.is_file() is False:
+        if time.perf_counter() - start > timeout:
+            raise RuntimeError(f"No results for {recording} within {timeout} seconds")
+        time.sleep(poll_interval)
+
+    return {"ready_time": ready, "first_result_time": time.perf_counter() - start}
@@ -0,0 +1,108 @@
+import numpy as np
+
+
+class BufferPool:
+    """
+    BufferPool Named, grow-only numpy buffers that are reused across analyzed files.
+    A buffer is only reallocated when a request does not fit into its current capacity,
+    so processing recordings of the same length repeatedly allocates no new arrays.
+    The returned arrays are views into the pooled memory and are overwritten by the next request for the same name.
+
+    Methods:
+    --------
+    get: Get a view of a named buffer with a given shape and dtype.
+    audio: Get the buffer for decoded audio samples.
+    chunks: Get the buffer for audio chunks as a 2D array.
+    scores: Get the buffer for model scores as a 2D array.
+    clear: Release all buffers.
+    """
+
+    def __init__(self, growth_factor: float = 1.25):
+        """
+        __init__ Create a new, empty BufferPool.
+
+        Args:
+            growth_factor (float, optional): Factor by which the capacity of a buffer exceeds the requested size when it has to grow. Defaults to 1.25.
+        """
+        if growth_factor < 1.0:
+            raise ValueError("'growth_factor' must be >= 1.0")
+
+        self.growth_factor = growth_factor
+        self.buffers = {}
+        self.num_allocations = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+    def get(self, name: str, shape: tuple, dtype=np.float32) -> np.ndarray:
+        """
+        get Get a view of the buffer 'name' with the given shape and dtype. The content is undefined.
+
+        Args:
+            name (str): Name of the buffer.
+            shape (tuple): Desired shape.
+            dtype (optional): Desired dtype. Defaults to np.float32.
+
+        Returns:
+            np.ndarray: Array of the desired shape that lives in pooled memory.
+        """
+        dtype = np.dtype(dtype)
+        key = (name, dtype)
+        size = int(np.prod(shape))
+
+        if key not in self.buffers or self.buffers[key].size < size:
+            capacity = max(size, int(size * self.growth_factor))
+            self.buffers[key] = np.empty(capacity, dtype=dtype)
+            self.num_allocations += 1
+
+        return self.buffers[key][:size].reshape(shape)
+
+    def audio(self, num_samples: int, dtype=np.float32) -> np.ndarray:
+        """
+        audio Get the buffer for decoded audio.
+
+        Args:
+            num_samples (int): Number of samples.
+            dtype (optional): dtype of the samples. Defaults to np.float32.
+
+        Returns:
+            np.ndarray: 1D array with 'num_samples' elements.
+        """
+        return self.get("audio", (num_samples,), dtype)
+
+    def chunks(
+        self, num_chunks: int, chunk_length: int, dtype=np.float32
+    ) -> np.ndarray:
+        """
+        chunks Get the buffer for chunks of audio.
+
+        Args:
+            num_chunks (int): Number of chunks.
+            chunk_length (int): Number of samples per chunk.
+            dtype (optional): dtype of the samples. Defaults to np.float32.
+
+        Returns:
+            np.ndarray: 2D array of shape (num_chunks, chunk_length)
+        """
+        return self.get("chunks", (num_chunks, chunk_length), dtype)
+
+    def scores(self, num_chunks: int, num_labels: int, dtype=np.float32) -> np.ndarray:
+        """
+        scores Get the buffer for the model output of all chunks of a recording.
+
+        Args:
+            num_chunks (int): Number of chunks.
+            num_labels (int): Number of labels of the model.
+            dtype (optional): dtype of the scores. Defaults to np.float32.
+
+        Returns:
+            np.ndarray: 2D array of shape (num_chunks, num_labels)
+        """
+        return self.get("scores", (num_chunks, num_labels), dtype)
+
+    def clear(self):
+        """
+        clear Release all pooled buffers.
+        """
+        self.buffers = {}
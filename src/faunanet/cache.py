@@ -0,0 +1,259 @@
+from pathlib import Path
+from datetime import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+# nodes of the 'Analysis' section of a config that influence the detections produced for a file
+CACHE_RELEVANT_NODES = [
+    "model_name",
+    "Preprocessor",
+    "Model",
+    "Recording",
+    "SpeciesPredictor",
+    "Ensemble",
+]
+
+
+def _to_json(obj):
+    """
+    _to_json Convert numpy scalars in detections to python types. Going through 'str' keeps the shortest representation
+    of the original value, such that results read from the cache are written to csv exactly as freshly computed ones.
+
+    Args:
+        obj: Object json cannot serialize by itself
+
+    Returns:
+        float | int | str: Serializable representation of 'obj'
+    """
+    if hasattr(obj, "item"):
+        value = obj.item()
+        if isinstance(value, float):
+            return float(str(obj))
+        return value
+    return str(obj)
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    hash_file Compute a hash of the content of a file without loading it into memory at once.
+
+    Args:
+        path (str): Path of the file to hash
+        chunk_size (int, optional): Number of bytes to read at once. Defaults to 1 MiB.
+
+    Returns:
+        str: Hex digest of the file content
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_config(analysis_config: dict) -> str:
+    """
+    hash_config Compute a hash of the parts of an 'Analysis' config that determine the detections of a file,
+    i.e., the model name and the configs of model, preprocessor, recording, species predictor and ensemble.
+    A recording date of 'today' is replaced by the current date, because it changes the species that are allowed.
+
+    Args:
+        analysis_config (dict): 'Analysis' section of a config as written to 'config.yml'
+
+    Returns:
+        str: Hex digest of the relevant config entries
+    """
+    relevant = {node: analysis_config.get(node, None) for node in CACHE_RELEVANT_NODES}
+
+    recording = relevant["Recording"]
+    if recording is not None and recording.get("date", None) == "today":
+        relevant["Recording"] = dict(
+            recording, date=datetime.now().strftime("%d/%m/%Y")
+        )
+
+    serialized = json.dumps(relevant, sort_keys=True, default=str)
+    return hashlib.blake2b(serialized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def hash_shedding(config_hash: str, shedding: dict) -> str:
+    """
+    hash_shedding Derive the config hash of an analysis the load shedding has degraded, such that its detections are never served to
+    an analysis at full quality and vice versa.
+
+    Args:
+        config_hash (str): Result of 'hash_config' for the analysis config
+        shedding (dict): Active shedding step -> its entry in the shedding config
+
+    Returns:
+        str: Hex digest of the config hash and the active steps
+    """
+    serialized = json.dumps(
+        {"config": config_hash, "shedding": shedding}, sort_keys=True, default=str
+    )
+    return hashlib.blake2b(serialized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResultsCache:
+    """
+    ResultsCache Content-addressed cache for the detections of analyzed files. Entries are keyed by the hash of the audio data,
+    the model name and the hash of the analysis config, so the same audio analyzed with the same settings is only run through
+    the model once, regardless of its file name. Entries are stored as json files in a directory, which can be shared between processes.
+    When the cache grows beyond its maximum size, the least recently used entries are removed.
+
+    Methods:
+    --------
+    key: Build the cache key for a file and an analysis config.
+    get: Get cached detections or None.
+    put: Store detections.
+    clear: Remove all entries.
+    """
+
+    def __init__(self, directory: str, max_size_mb: float = 256):
+        """
+        __init__ Create a new ResultsCache.
+
+        Args:
+            directory (str): Directory to store the cache entries in. Is created if it does not exist.
+            max_size_mb (float, optional): Maximum size of all entries in megabytes. Defaults to 256.
+
+        Raises:
+            ValueError: When 'max_size_mb' is not positive.
+        """
+        if max_size_mb <= 0:
+            raise ValueError("'max_size_mb' must be > 0")
+
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._scan()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def num_entries(self) -> int:
+        return len(self.entries)
+
+    def _scan(self):
+        """
+        _scan Rebuild the index of entries from the cache directory, which may have been changed by another process.
+        """
+        self.entries = {}
+        self._size = 0  # total size of 'entries', kept up to date by every change
+        for entry in self.directory.glob("*.json"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # removed by another process in between
+                continue
+            self._set_entry(entry.stem, stat)
+
+    def _set_entry(self, key: str, stat: os.stat_result):
+        """
+        _set_entry Add or update the index entry of 'key'.
+
+        Args:
+            key (str): Cache key
+            stat (os.stat_result): Status of the entry file
+        """
+        self._drop_entry(key)
+        self.entries[key] = (stat.st_mtime, stat.st_size)
+        self._size += stat.st_size
+
+    def _drop_entry(self, key: str):
+        """
+        _drop_entry Remove the index entry of 'key', if there is one.
+
+        Args:
+            key (str): Cache key
+        """
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+    def key(self, path: str, model_name: str, config_hash: str) -> str:
+        """
+        key Build the cache key for the audio file at 'path' analyzed by 'model_name' with a config that hashes to 'config_hash'.
+        The file must be completely written.
+
+        Args:
+            path (str): Path to the audio file
+            model_name (str): Name of the model
+            config_hash (str): Result of 'hash_config' for the analysis config
+
+        Returns:
+            str: Cache key
+        """
+        return f"{model_name}_{config_hash}_{hash_file(path)}"
+
+    def get(self, key: str):
+        """
+        get Get the detections stored for 'key'.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            list | None: Detections stored for the key, None if there are none.
+        """
+        path = self.directory / f"{key}.json"
+
+        try:
+            with open(path, "r") as entry:
+                results = json.load(entry)
+            os.utime(path)  # mark as recently used
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._drop_entry(key)
+            self.misses += 1
+            return None
+
+        self._set_entry(key, path.stat())
+        self.hits += 1
+        return results
+
+    def put(self, key: str, results: list):
+        """
+        put Store the detections for 'key' and evict the least recently used entries if the cache grows too large.
+
+        Args:
+            key (str): Cache key
+            results (list): Detections to store
+        """
+        path = self.directory / f"{key}.json"
+
+        # write to a temporary file first such that readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as entry:
+            json.dump(results, entry, default=_to_json)
+        os.replace(tmp, path)
+
+        self._set_entry(key, path.stat())
+
+        if self.size > self.max_size:
+            self._evict()
+
+    def _evict(self):
+        """
+        _evict Remove the least recently used entries until the cache is within its size limit again.
+        """
+        self._scan()
+
+        for key, _ in sorted(self.entries.items(), key=lambda item: item[1][0]):
+            if self.size <= self.max_size:
+                break
+
+            (self.directory / f"{key}.json").unlink(missing_ok=True)
+            self._drop_entry(key)
+
+    def clear(self):
+        """
+        clear Remove all entries from the cache.
+        """
+        for key in list(self.entries.keys()):
+            (self.directory / f"{key}.json").unlink(missing_ok=True)
+        self.entries = {}
+        self._size = 0
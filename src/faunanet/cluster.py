@@ -0,0 +1,378 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+
+class LeaseManager:
+    """
+    LeaseManager Coordinates several watchers, possibly on different hosts, that analyze files from one shared input directory.
+    Before a file is analyzed, a lease file is created for it in a shared lease directory with O_CREAT | O_EXCL, which only one
+    watcher can succeed in. Held leases are renewed by a heartbeat. Leases that have not been renewed for longer than the lease
+    timeout belong to a dead watcher and can be reclaimed by others. Completed files are marked such that nobody analyzes them again.
+
+    Methods:
+    --------
+    name_of: Get the name of a file relative to the shared input directory.
+    claim: Try to take the lease for a file.
+    complete: Mark a file as done and give up its lease.
+    release: Give up the lease for a file without marking it done.
+    is_done: Check if a file has been completed by any watcher.
+    prune: Remove the done markers of files that no longer exist.
+    heartbeat: Renew all held leases.
+    start: Start renewing leases in a background thread.
+    stop: Stop the heartbeat thread and release all held leases.
+    """
+
+    def __init__(
+        self,
+        lease_dir: str,
+        input_dir: str,
+        host_id: str = None,
+        lease_timeout: float = 60.0,
+        heartbeat_interval: float = None,
+        on_error: callable = None,
+    ):
+        """
+        __init__ Create a new LeaseManager.
+
+        Args:
+            lease_dir (str): Directory on the shared file system to keep leases in. Is created if it does not exist.
+            input_dir (str): Shared input directory. Files are identified by their path relative to it, so it may be mounted at different locations on each host.
+            host_id (str, optional): Name of this host in the lease files. Defaults to the hostname.
+            lease_timeout (float, optional): Time in seconds after which a lease that has not been renewed can be reclaimed. Defaults to 60.
+            heartbeat_interval (float, optional): Time in seconds between renewals of held leases. Defaults to a third of 'lease_timeout'.
+            on_error (callable, optional): Called with the exception and its traceback when a lease cannot be renewed, e.g., because the shared
+                                           file system is briefly unavailable. Defaults to None (print the traceback).
+
+        Raises:
+            ValueError: When 'lease_timeout' is not positive or 'heartbeat_interval' is not smaller than 'lease_timeout'.
+        """
+        if lease_timeout <= 0:
+            raise ValueError("'lease_timeout' must be > 0")
+
+        if heartbeat_interval is None:
+            heartbeat_interval = lease_timeout / 3.0
+
+        if not 0 < heartbeat_interval < lease_timeout:
+            raise ValueError("'heartbeat_interval' must be > 0 and < 'lease_timeout'")
+
+        self.lease_dir = Path(lease_dir).expanduser()
+        self.lease_dir.mkdir(parents=True, exist_ok=True)
+        self.input_dir = Path(input_dir)
+        self.host_id = socket.gethostname() if host_id is None else host_id
+        self.owner = f"{self.host_id}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.on_error = on_error
+        self.held = set()
+        # files known to be done, saves looking at the file system again
+        self.completed = set()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.heartbeat_thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.heartbeat_thread is not None and self.heartbeat_thread.is_alive()
+
+    def name_of(self, path: str) -> str:
+        """
+        name_of Get the name a file is identified by on all hosts.
+
+        Args:
+            path (str): Path of a file in the input directory
+
+        Returns:
+            str: Path relative to the input directory in posix form
+        """
+        path = Path(path)
+        if path.is_absolute() and path.is_relative_to(self.input_dir):
+            path = path.relative_to(self.input_dir)
+        return path.as_posix()
+
+    def _file_of(self, name: str, suffix: str) -> Path:
+        """
+        _file_of Get the path of the lease or done marker of a file.
+
+        Args:
+            name (str): Name of the file as returned by 'name_of'
+            suffix (str): '.lease' or '.done'
+
+        Returns:
+            Path: File in the lease directory
+        """
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+        return self.lease_dir / f"{Path(name).stem}-{digest}{suffix}"
+
+    def _owner_of(self, lease: Path) -> str:
+        """
+        _owner_of Read the owner of a lease.
+
+        Args:
+            lease (Path): Lease file
+
+        Returns:
+            str: Owner of the lease, None if the lease does not exist or cannot be read.
+        """
+        try:
+            with open(lease, "r") as f:
+                return json.load(f)["owner"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    def _is_expired(self, lease: Path) -> bool:
+        """
+        _is_expired Check if a lease has not been renewed for longer than the lease timeout.
+
+        Args:
+            lease (Path): Lease file
+
+        Returns:
+            bool: True if the lease has expired, False if it is valid or does not exist anymore.
+        """
+        try:
+            return time.time() - lease.stat().st_mtime > self.lease_timeout
+        except FileNotFoundError:
+            return False
+
+    def is_done(self, path: str) -> bool:
+        """
+        is_done Check if a file has been completed by any watcher.
+
+        Args:
+            path (str): Path or name of the file
+
+        Returns:
+            bool: True if the file has been completed.
+        """
+        name = self.name_of(path)
+
+        if name in self.completed:
+            return True
+
+        if self._file_of(name, ".done").exists():
+            self.completed.add(name)
+            return True
+
+        return False
+
+    def claim(self, path: str) -> bool:
+        """
+        claim Try to take the lease for a file. Expired leases of other watchers are reclaimed.
+
+        Args:
+            path (str): Path or name of the file
+
+        Returns:
+            bool: True if the caller now holds the lease and should analyze the file, False otherwise.
+        """
+        name = self.name_of(path)
+
+        if self.is_done(name):
+            return False
+
+        lease = self._file_of(name, ".lease")
+
+        with self.lock:
+            if name in self.held:
+                return True
+
+        if self._is_expired(lease):
+            # only one watcher can move the stale lease away, all others get FileNotFoundError
+            stale = lease.with_suffix(f".stale-{uuid.uuid4().hex[:8]}")
+            try:
+                os.rename(lease, stale)
+            except FileNotFoundError:
+                return False
+
+            if self._is_expired(stale) is False:
+                # another watcher reclaimed the lease in between and we moved its fresh lease, put it back
+                try:
+                    os.link(stale, lease)
+                except FileExistsError:
+                    pass
+                stale.unlink(missing_ok=True)
+                return False
+
+            stale.unlink(missing_ok=True)
+
+        try:
+            fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+
+        with os.fdopen(fd, "w") as f:
+            json.dump({"owner": self.owner, "file": name, "time": time.time()}, f)
+
+        # the file may have been completed between the check above and taking the lease
+        if self.is_done(name):
+            lease.unlink(missing_ok=True)
+            return False
+
+        with self.lock:
+            self.held.add(name)
+
+        return True
+
+    def complete(self, path: str) -> bool:
+        """
+        complete Mark a file as done and give up its lease.
+
+        Args:
+            path (str): Path or name of the file
+
+        Returns:
+            bool: True if the caller still held the lease, False if it had been reclaimed by another watcher in the meantime.
+        """
+        name = self.name_of(path)
+        lease = self._file_of(name, ".lease")
+
+        with self.lock:
+            self.held.discard(name)
+
+        if self._owner_of(lease) != self.owner:
+            return False
+
+        # names the file, such that the marker can be pruned once the file is gone
+        with open(self._file_of(name, ".done"), "w") as f:
+            json.dump({"owner": self.owner, "file": name, "time": time.time()}, f)
+        self.completed.add(name)
+        lease.unlink(missing_ok=True)
+        return True
+
+    def release(self, path: str):
+        """
+        release Give up the lease for a file without marking it done, such that other watchers can pick it up.
+
+        Args:
+            path (str): Path or name of the file
+        """
+        name = self.name_of(path)
+        lease = self._file_of(name, ".lease")
+
+        with self.lock:
+            self.held.discard(name)
+
+        if self._owner_of(lease) == self.owner:
+            lease.unlink(missing_ok=True)
+
+    def prune(self) -> int:
+        """
+        prune Remove the done markers of files that no longer exist in the input directory, e.g., because they have been deleted
+        after their analysis, such that the lease directory does not grow forever. Markers that do not name their file are kept.
+        Nothing is removed while the input directory itself is missing, e.g., because the share is not mounted.
+
+        Returns:
+            int: Number of removed markers
+        """
+        if self.input_dir.is_dir() is False:
+            return 0
+
+        removed = 0
+        for marker in self.lease_dir.glob("*.done"):
+            try:
+                with open(marker, "r") as f:
+                    name = json.load(f)["file"]
+            except (OSError, json.JSONDecodeError, KeyError, TypeError):
+                continue
+
+            if (self.input_dir / name).exists():
+                continue
+
+            marker.unlink(missing_ok=True)
+            self.completed.discard(name)
+            removed += 1
+
+        return removed
+
+    def heartbeat(self) -> list:
+        """
+        heartbeat Renew all held leases. A lease that cannot be renewed for another reason than having been lost is reported and
+        tried again at the next heartbeat.
+
+        Returns:
+            list: Names of files whose leases have been lost to other watchers. These are no longer held.
+        """
+        with self.lock:
+            held = list(self.held)
+
+        lost = []
+        for name in held:
+            lease = self._file_of(name, ".lease")
+            try:
+                if self._owner_of(lease) != self.owner:
+                    lost.append(name)
+                    continue
+
+                # another watcher may have moved the lease away after it expired in the meantime
+                os.utime(lease)
+            except FileNotFoundError:
+                lost.append(name)
+            except OSError as e:
+                self._report(e)
+
+        with self.lock:
+            self.held.difference_update(lost)
+
+        return lost
+
+    def _report(self, e: Exception):
+        """
+        _report Report an error of the heartbeat.
+
+        Args:
+            e (Exception): Exception the heartbeat failed with
+        """
+        tb = traceback.format_exc()
+        if self.on_error is None:
+            print(tb)
+        else:
+            self.on_error(e, tb)
+
+    def _heartbeat_loop(self):
+        """
+        _heartbeat_loop Renew held leases every 'heartbeat_interval' seconds until stopped. Errors are reported and do not stop the next heartbeats.
+        """
+        while not self.stop_event.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                self._report(e)
+
+    def start(self):
+        """
+        start Start renewing held leases in a background thread.
+
+        Raises:
+            RuntimeError: When the heartbeat is already running.
+        """
+        if self.is_running:
+            raise RuntimeError("Lease heartbeat is already running")
+
+        self.stop_event.clear()
+        self.heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, name="lease_heartbeat", daemon=True
+        )
+        self.heartbeat_thread.start()
+
+    def stop(self):
+        """
+        stop Stop the heartbeat thread and release all held leases.
+        """
+        self.stop_event.set()
+
+        if self.heartbeat_thread is not None:
+            self.heartbeat_thread.join()
+            self.heartbeat_thread = None
+
+        with self.lock:
+            held = list(self.held)
+
+        for name in held:
+            self.release(name)
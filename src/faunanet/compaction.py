@@ -0,0 +1,345 @@
+from pathlib import Path
+from datetime import datetime
+import csv
+import json
+import os
+import threading
+import time
+import traceback
+import numpy as np
+
+COMPACTED_DIR = "compacted"
+MANIFEST_NAME = "manifest.json"
+
+
+def results_files(output: str) -> list:
+    """
+    results_files Get the final results files of a run, without the partial ones of files that are still being analyzed.
+
+    Args:
+        output (str): Output folder of the run
+
+    Returns:
+        list: Paths of the 'results_*.csv' files
+    """
+    return [
+        f
+        for f in Path(output).glob("results_*.csv")
+        if f.name.endswith(".part.csv") is False
+    ]
+
+
+def recording_of(results_file: str) -> str:
+    """
+    recording_of Get the name of the recording a results file belongs to.
+
+    Args:
+        results_file (str): Path of a 'results_<recording>.csv' file
+
+    Returns:
+        str: Stem of the recording
+    """
+    return Path(results_file).name[len("results_") : -len(".csv")]
+
+
+def _column_array(values: list) -> np.ndarray:
+    """
+    _column_array Turn the values of one column into a numpy array. Columns in which all values are numbers are stored as float64, others as strings.
+
+    Args:
+        values (list): Values of the column. Empty strings are missing values.
+
+    Returns:
+        np.ndarray: Column with NaN for missing numbers
+    """
+    try:
+        return np.array(
+            [np.nan if v == "" else float(v) for v in values], dtype=np.float64
+        )
+    except (TypeError, ValueError):
+        return np.array([str(v) for v in values], dtype=str)
+
+
+def read_manifest(output: str) -> dict:
+    """
+    read_manifest Read the manifest of the compacted results of a run.
+
+    Args:
+        output (str): Output folder of the run
+
+    Returns:
+        dict: day -> {"file": name of the partition, "rows": number of detections, "recordings": names of the recordings in it}. Empty if nothing has been compacted.
+    """
+    manifest = Path(output) / COMPACTED_DIR / MANIFEST_NAME
+
+    if manifest.is_file() is False:
+        return {}
+
+    with open(manifest, "r") as f:
+        return json.load(f)["partitions"]
+
+
+def processed_recordings(output: str) -> set:
+    """
+    processed_recordings Get the names of all recordings a run has written results for, whether they have been compacted or not.
+
+    Args:
+        output (str): Output folder of the run
+
+    Returns:
+        set: Stems of the recordings
+    """
+    processed = {recording_of(f) for f in results_files(output)}
+
+    for partition in read_manifest(output).values():
+        processed.update(partition["recordings"])
+
+    return processed
+
+
+def read_partition(output: str, day: str) -> dict:
+    """
+    read_partition Read the compacted detections of one day of a run.
+
+    Args:
+        output (str): Output folder of the run
+        day (str): Day in ISO format, e.g., '2024-05-01'
+
+    Raises:
+        KeyError: When the run has no partition for this day.
+
+    Returns:
+        dict: column name -> np.ndarray. The 'recording' column holds the recording each detection belongs to.
+    """
+    partition = read_manifest(output)[day]
+
+    with np.load(Path(output) / COMPACTED_DIR / partition["file"]) as data:
+        return {name: data[name] for name in data.files}
+
+
+def compact_run(output: str, min_age: float = 0.0, remove_csv: bool = True) -> int:
+    """
+    compact_run Merge the results files of a run into one compressed file per day, with one array per column. The day is the one the results
+                file was written on. Recordings without detections have no rows, but are listed in the manifest like all others. The partitions
+                and the manifest are replaced atomically, and merging is idempotent, so an interrupted compaction can simply be repeated.
+
+    Args:
+        output (str): Output folder of the run
+        min_age (float, optional): Minimum time in seconds since a results file was last written for it to be compacted. Defaults to 0.0.
+        remove_csv (bool, optional): Whether to remove the results files once they have been compacted. Defaults to True.
+
+    Returns:
+        int: Number of compacted results files
+    """
+    output = Path(output)
+    now = time.time()
+
+    days = {}
+    for results_file in results_files(output):
+        try:
+            modified = results_file.stat().st_mtime
+        except FileNotFoundError:  # removed in the meantime
+            continue
+
+        if now - modified < min_age:
+            continue
+
+        day = datetime.fromtimestamp(modified).date().isoformat()
+        days.setdefault(day, []).append(results_file)
+
+    if len(days) == 0:
+        return 0
+
+    folder = output / COMPACTED_DIR
+    folder.mkdir(exist_ok=True)
+    manifest = read_manifest(output)
+
+    for day, files in sorted(days.items()):
+        fieldnames = ["recording"]
+        rows = []
+        recordings = set()
+
+        for results_file in files:
+            recording = recording_of(results_file)
+            recordings.add(recording)
+
+            with open(results_file, "r") as csvfile:
+                reader = csv.DictReader(csvfile)
+                for row in reader:
+                    row["recording"] = recording
+                    rows.append(row)
+                fieldnames.extend(
+                    name for name in reader.fieldnames or [] if name not in fieldnames
+                )
+
+        # rows of recordings compacted before are replaced, such that repeating a compaction does not duplicate them
+        if day in manifest:
+            old = read_partition(output, day)
+            fieldnames.extend(name for name in old if name not in fieldnames)
+            for i in range(len(old["recording"])):
+                if old["recording"][i] not in recordings:
+                    rows.append({name: old[name][i].item() for name in old})
+            recordings.update(manifest[day]["recordings"])
+
+        columns = {
+            name: _column_array([row.get(name, "") for row in rows])
+            for name in fieldnames
+        }
+
+        partition = f"{day}.npz"
+        np.savez_compressed(folder / f"{day}.tmp.npz", **columns)
+        os.replace(folder / f"{day}.tmp.npz", folder / partition)
+
+        manifest[day] = {
+            "file": partition,
+            "rows": len(rows),
+            "recordings": sorted(recordings),
+        }
+
+    with open(folder / f"{MANIFEST_NAME}.tmp", "w") as f:
+        json.dump({"partitions": manifest}, f)
+    os.replace(folder / f"{MANIFEST_NAME}.tmp", folder / MANIFEST_NAME)
+
+    compacted = [f for files in days.values() for f in files]
+
+    if remove_csv:
+        for results_file in compacted:
+            results_file.unlink(missing_ok=True)
+
+    return len(compacted)
+
+
+class ResultsCompactor:
+    """
+    ResultsCompactor Compact the results files of finished runs in an output base directory in a background thread, such that runs
+    with many thousands of recordings end up as a handful of files that are fast to list and copy. See 'compact_run'.
+
+    Methods:
+    --------
+    compact: Compact all runs but the excluded one once.
+    start: Compact periodically in a background thread.
+    stop: Stop the background thread.
+    """
+
+    def __init__(
+        self,
+        outdir: str,
+        exclude: str = None,
+        interval: float = 3600.0,
+        min_age: float = 3600.0,
+        remove_csv: bool = True,
+        on_error: callable = None,
+    ):
+        """
+        __init__ Create a new ResultsCompactor.
+
+        Args:
+            outdir (str): Output base directory that holds the folders of the runs
+            exclude (str, optional): Folder of the run that is currently being written, which is left alone. Defaults to None.
+            interval (float, optional): Time in seconds between two compactions. Defaults to 3600.
+            min_age (float, optional): Minimum time in seconds since a results file was last written for it to be compacted. Defaults to 3600.
+            remove_csv (bool, optional): Whether to remove the results files once they have been compacted. Defaults to True.
+            on_error (callable, optional): Called with the exception and its traceback when a run cannot be compacted, e.g., because of a corrupt
+                                           results file or a full disk. Defaults to None (print the traceback).
+
+        Raises:
+            ValueError: When 'interval' is not positive or 'min_age' is negative.
+        """
+        if interval <= 0:
+            raise ValueError("'interval' must be > 0")
+
+        if min_age < 0:
+            raise ValueError("'min_age' must be >= 0")
+
+        self.outdir = Path(outdir)
+        self.exclude = None if exclude is None else Path(exclude)
+        self.interval = interval
+        self.min_age = min_age
+        self.remove_csv = remove_csv
+        self.on_error = on_error
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def compact(self) -> dict:
+        """
+        compact Compact the results files of all runs in the output base directory but the excluded one. A run that cannot be compacted
+        is reported and skipped, such that the others are still compacted.
+
+        Returns:
+            dict: run folder -> number of compacted results files, for runs in which something has been compacted.
+        """
+        compacted = {}
+
+        for folder in sorted(self.outdir.iterdir()):
+            if (
+                folder.is_dir() is False
+                or folder == self.exclude
+                or (folder / "config.yml").is_file() is False
+            ):
+                continue
+
+            try:
+                num_files = compact_run(
+                    folder, min_age=self.min_age, remove_csv=self.remove_csv
+                )
+            except Exception as e:
+                self._report(e)
+                continue
+
+            if num_files > 0:
+                compacted[str(folder)] = num_files
+
+        return compacted
+
+    def _report(self, e: Exception):
+        """
+        _report Report an error of a compaction.
+
+        Args:
+            e (Exception): Exception the compaction failed with
+        """
+        tb = traceback.format_exc()
+        if self.on_error is None:
+            print(tb)
+        else:
+            self.on_error(e, tb)
+
+    def _compact_loop(self):
+        """
+        _compact_loop Compact every 'interval' seconds until stopped. Errors are reported and do not stop the next compactions.
+        """
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.compact()
+            except Exception as e:
+                self._report(e)
+
+    def start(self):
+        """
+        start Compact periodically in a background thread.
+
+        Raises:
+            RuntimeError: When the compactor is already running.
+        """
+        if self.is_running:
+            raise RuntimeError("Results compactor is already running")
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._compact_loop, name="results_compactor", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """
+        stop Stop the background thread. A compaction that is running is finished first.
+        """
+        self.stop_event.set()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
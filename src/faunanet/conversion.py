@@ -0,0 +1,92 @@
+from pathlib import Path
+import importlib.util
+import subprocess
+import sys
+
+from faunanet.benchmark import compare_models
+
+
+def convert_to_onnx(model_path: str, output_path: str = None, opset: int = 13) -> Path:
+    """
+    convert_to_onnx Convert a 'model.tflite' or 'saved_model.pb' file to a 'model.onnx' file with tf2onnx, such that the model can be
+    run with the 'onnx' backend. Check the converted model with 'validate_conversion' before using it.
+
+    Args:
+        model_path (str): Path to the 'model.tflite' or 'saved_model.pb' file
+        output_path (str, optional): Path of the converted model. Defaults to None ('model.onnx' next to the original model).
+        opset (int, optional): ONNX opset to convert to. Defaults to 13.
+
+    Raises:
+        ImportError: When tf2onnx is not installed.
+        ValueError: When the model file is neither a 'model.tflite' nor a 'saved_model.pb' file.
+        RuntimeError: When the conversion fails.
+
+    Returns:
+        Path: Path of the converted model
+    """
+    if importlib.util.find_spec("tf2onnx") is None:
+        raise ImportError(
+            "tf2onnx is needed to convert models to ONNX, install it with 'pip install tf2onnx'"
+        )
+
+    model_path = Path(model_path).expanduser()
+
+    if model_path.name == "model.tflite":
+        source = ["--tflite", str(model_path)]
+    elif model_path.name == "saved_model.pb":
+        source = ["--saved-model", str(model_path.parent)]
+    else:
+        raise ValueError(f"Model filename unknown: {model_path.name}")
+
+    output_path = (
+        model_path.parent / "model.onnx"
+        if output_path is None
+        else Path(output_path).expanduser()
+    )
+
+    # tf2onnx's command line interface is the same for all its versions
+    process = subprocess.run(
+        [sys.executable, "-m", "tf2onnx.convert"]
+        + source
+        + ["--output", str(output_path), "--opset", str(opset)],
+        capture_output=True,
+        text=True,
+    )
+
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"Conversion of {model_path} to ONNX failed: {process.stderr.strip()}"
+        )
+
+    return output_path
+
+
+def validate_conversion(
+    original,
+    converted,
+    chunks: list,
+    atol: float = 1e-3,
+    min_conf: float = 0.25,
+) -> dict:
+    """
+    validate_conversion Check that a converted model, e.g., one loaded with the 'onnx' backend, produces the same scores as the original
+    model on some preprocessed data.
+
+    Args:
+        original (ModelBase): Model loaded from the original model file
+        converted (ModelBase): Model loaded from the converted model file
+        chunks (list): Preprocessed chunks to run both models on
+        atol (float, optional): Maximum absolute difference of any score for the models to agree. Defaults to 1e-3.
+        min_conf (float, optional): Confidence threshold above which a score counts as detection. Defaults to 0.25.
+
+    Returns:
+        dict: Report of 'benchmark.compare_models' with an additional 'agrees' entry, which is True when no score differs by more than 'atol'
+              and both models detect the same labels.
+    """
+    report = compare_models(original, converted, chunks, min_conf=min_conf)
+
+    report["agrees"] = bool(
+        report["max_abs_difference"] <= atol and report["detection_jaccard"] == 1.0
+    )
+
+    return report
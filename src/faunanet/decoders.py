@@ -0,0 +1,239 @@
+from pathlib import Path
+import time
+import numpy as np
+import librosa
+import soundfile as sf
+
+
+def decode_soundfile(path: str, buffers=None, block_frames: int = 65536) -> tuple:
+    """
+    decode_soundfile Decode a file in process with libsndfile. Mono files are read directly into the target array,
+    files with more channels are read in blocks and mixed down to mono block by block. The array grows if the file holds
+    more frames than its header announces, which happens for some compressed formats.
+
+    Args:
+        path (str): Path to the audio file
+        buffers (BufferPool, optional): Pool to take the output array from. Defaults to None (allocate a new array).
+        block_frames (int, optional): Number of frames per block for files with more than one channel. Defaults to 65536.
+
+    Returns:
+        tuple: (mono audio data as float32, native sample rate)
+    """
+    with sf.SoundFile(str(path)) as f:
+        capacity = max(f.frames, 0) + 1
+        data = (
+            np.empty(capacity, dtype=np.float32)
+            if buffers is None
+            else buffers.audio(capacity)
+        )
+
+        num_frames = 0
+        block = (
+            None
+            if f.channels == 1
+            else np.empty((block_frames, f.channels), dtype=np.float32)
+        )
+
+        while True:
+            if num_frames == len(data):
+                grown = np.empty(2 * len(data), dtype=np.float32)
+                grown[:num_frames] = data[:num_frames]
+                data = grown
+
+            if block is None:
+                read = len(
+                    f.read(
+                        frames=len(data) - num_frames,
+                        dtype="float32",
+                        out=data[num_frames:, None],
+                    )
+                )
+            else:
+                read = min(block_frames, len(data) - num_frames)
+                read = len(f.read(frames=read, dtype="float32", out=block[:read]))
+                np.mean(block[:read], axis=1, out=data[num_frames : num_frames + read])
+
+            if read == 0:
+                break
+
+            num_frames += read
+
+        return data[:num_frames], f.samplerate
+
+
+def decode_librosa(path: str, buffers=None) -> tuple:
+    """
+    decode_librosa Decode a file with librosa, which falls back to audioread, and thereby to a decoder subprocess, for formats libsndfile does not support.
+
+    Args:
+        path (str): Path to the audio file
+        buffers (BufferPool, optional): Unused, the data is always allocated by librosa. Defaults to None.
+
+    Returns:
+        tuple: (mono audio data as float32, native sample rate)
+    """
+    return librosa.load(path, sr=None, mono=True)
+
+
+# name -> decode function(path, buffers) -> (data, rate)
+BACKENDS = {
+    "soundfile": decode_soundfile,
+    "librosa": decode_librosa,
+}
+
+# file suffix -> backends to try in order. Suffixes not listed here only use librosa.
+FORMAT_BACKENDS = {
+    f".{fmt.lower()}": ["soundfile", "librosa"]
+    for fmt in sf.available_formats()
+    if fmt not in ["RAW", "WAVEX"]
+}
+
+
+def register_backend(name: str, decode: callable, suffixes: list, first: bool = True):
+    """
+    register_backend Make a new decoder backend available for the given file suffixes.
+
+    Args:
+        name (str): Name of the backend
+        decode (callable): Function (path, buffers) -> (mono float32 data, sample rate)
+        suffixes (list): File suffixes like '.mp3' the backend can decode
+        first (bool, optional): Whether to try the new backend before the existing ones. Defaults to True.
+    """
+    BACKENDS[name] = decode
+
+    for suffix in suffixes:
+        backends = [
+            b for b in FORMAT_BACKENDS.get(suffix.lower(), ["librosa"]) if b != name
+        ]
+        FORMAT_BACKENDS[suffix.lower()] = (
+            [name] + backends if first else backends + [name]
+        )
+
+
+class AudioDecoder:
+    """
+    AudioDecoder Decode audio files with the fastest available backend for their format and keep track of the
+    decode throughput per format. If a backend fails for a file, the next one registered for the format is tried.
+
+    Methods:
+    --------
+    backends_for: Get the backends that are tried for a file.
+    decode: Decode a file to mono float32 data at its native sample rate.
+    """
+
+    def __init__(self, backends: dict = None):
+        """
+        __init__ Create a new AudioDecoder.
+
+        Args:
+            backends (dict, optional): suffix -> list of backend names, overriding the defaults in FORMAT_BACKENDS. Defaults to None.
+
+        Raises:
+            ValueError: When an unknown backend is given.
+        """
+        backends = {} if backends is None else backends
+
+        for names in backends.values():
+            for name in names:
+                if name not in BACKENDS:
+                    raise ValueError(
+                        f"Unknown decoder backend {name}, must be in {list(BACKENDS.keys())}"
+                    )
+
+        self.backends = {suffix.lower(): names for suffix, names in backends.items()}
+        self.format_stats = {}
+
+    @property
+    def stats(self) -> dict:
+        """
+        stats Decode statistics per file suffix.
+
+        Returns:
+            dict: suffix -> {"backend", "files", "audio_seconds", "megabytes", "decode_seconds", "realtime_factor", "megabytes_per_second"}
+        """
+        stats = {}
+        for suffix, s in self.format_stats.items():
+            stats[suffix] = dict(s)
+            elapsed = max(s["decode_seconds"], 1e-9)
+            stats[suffix]["realtime_factor"] = s["audio_seconds"] / elapsed
+            stats[suffix]["megabytes_per_second"] = s["megabytes"] / elapsed
+        return stats
+
+    def backends_for(self, path: str) -> list:
+        """
+        backends_for Get the names of the backends that are tried for a file, in order.
+
+        Args:
+            path (str): Path to the audio file
+
+        Returns:
+            list: Backend names
+        """
+        suffix = Path(path).suffix.lower()
+        return self.backends.get(suffix, FORMAT_BACKENDS.get(suffix, ["librosa"]))
+
+    def decode(self, path: str, buffers=None) -> tuple:
+        """
+        decode Decode a file to mono float32 data at its native sample rate.
+
+        Args:
+            path (str): Path to the audio file
+            buffers (BufferPool, optional): Pool to take the output array from, for backends that support it. Defaults to None.
+
+        Raises:
+            FileNotFoundError: When the file does not exist.
+            Exception: The error of the last backend if none of them could decode the file.
+
+        Returns:
+            tuple: (data, sample rate)
+        """
+        if Path(path).is_file() is False:
+            raise FileNotFoundError(f"No such file: {path}")
+
+        error = None
+
+        for name in self.backends_for(path):
+            start = time.perf_counter()
+            try:
+                data, rate = BACKENDS[name](path, buffers=buffers)
+            except Exception as e:
+                error = e
+                continue
+
+            self._update_stats(
+                path, name, len(data) / rate, time.perf_counter() - start
+            )
+            return data, rate
+
+        raise error
+
+    def _update_stats(
+        self, path: str, backend: str, audio_seconds: float, decode_seconds: float
+    ):
+        """
+        _update_stats Add a decoded file to the statistics of its format.
+
+        Args:
+            path (str): Path to the decoded file
+            backend (str): Backend that decoded it
+            audio_seconds (float): Duration of the audio
+            decode_seconds (float): Time it took to decode
+        """
+        suffix = Path(path).suffix.lower()
+
+        s = self.format_stats.setdefault(
+            suffix,
+            {
+                "backend": backend,
+                "files": 0,
+                "audio_seconds": 0.0,
+                "megabytes": 0.0,
+                "decode_seconds": 0.0,
+            },
+        )
+
+        s["backend"] = backend
+        s["files"] += 1
+        s["audio_seconds"] += audio_seconds
+        s["megabytes"] += Path(path).stat().st_size / 1024**2
+        s["decode_seconds"] += decode_seconds
@@ -0,0 +1,142 @@
+from pathlib import Path
+import os
+import librosa
+import audioread
+
+from faunanet.preprocessor_base import PreprocessorBase, AudioFormatError
+from faunanet.decoders import AudioDecoder
+
+
+class SharedDecoder:
+    """
+    SharedDecoder Decode an audio file once and resample it once per distinct (sample rate, resample type) combination,
+    such that multiple models analyzing the same file share the decoding work.
+    The decoded data of one file is kept until the next file is read or 'release' is called, or the file is modified.
+
+    Methods:
+    --------
+    has: Check if a file is the one currently held by the decoder.
+    read: Get the audio data of a file as needed by a given preprocessor.
+    release: Drop all data held for the current file.
+    """
+
+    def __init__(self):
+        """
+        __init__ Create a new SharedDecoder.
+        """
+        self.path = None
+        self.version = None  # (modification time, size) of the file when it was decoded
+        self.native_data = None
+        self.native_rate = None
+        self.resampled = {}
+        self.decoder = AudioDecoder()
+        self.num_decodes = 0
+        self.num_resamples = 0
+
+    def has(self, path: str) -> bool:
+        """
+        has Check if the data of 'path' is currently held by the decoder. A file that has been replaced or written to since it has
+        been decoded, e.g., a recording that is written again under the same name, does not count.
+
+        Args:
+            path (str): Path to an audio file
+
+        Returns:
+            bool: True if the file has been decoded already, not been released and not been modified since.
+        """
+        if self.path is None or Path(path) != self.path:
+            return False
+
+        return self._version_of(path) == self.version
+
+    @staticmethod
+    def _version_of(path: str) -> tuple:
+        """
+        _version_of Get the modification time and size of a file.
+
+        Args:
+            path (str): Path to the file
+
+        Returns:
+            tuple: (modification time in ns, size in bytes), None if the file does not exist
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _decode(self, path: str):
+        """
+        _decode Decode a file at its native sample rate, replacing the data held for the previous file.
+
+        Args:
+            path (str): Path to the audio file
+
+        Raises:
+            AudioFormatError: When the file cannot be decoded
+        """
+        self.release()
+
+        # taken before decoding, such that a file modified while it is decoded is decoded again
+        version = self._version_of(path)
+
+        try:
+            self.native_data, self.native_rate = self.decoder.decode(path)
+        except audioread.exceptions.NoBackendError as e:
+            raise AudioFormatError("Audio format could not be opened.") from e
+        except FileNotFoundError as e:
+            raise e
+        except Exception as e:
+            raise AudioFormatError(
+                "Generic audio read error occurred from librosa."
+            ) from e
+
+        self.path = Path(path)
+        self.version = version
+        self.num_decodes += 1
+
+    def read(self, path: str, processor: PreprocessorBase):
+        """
+        read Get the audio data of 'path' resampled for 'processor'. Sets 'duration' and 'actual_sampling_rate' of the processor like 'PreprocessorBase.read_audio_data' does.
+
+        Args:
+            path (str): Path to the audio file
+            processor (PreprocessorBase): Preprocessor the data is meant for.
+
+        Returns:
+            np.ndarray: Audio data at the sample rate of the processor.
+        """
+        if self.has(path) is False:
+            self._decode(path)
+
+        key = (processor.sample_rate, processor.resample_type)
+
+        if key not in self.resampled:
+            if self.native_rate == processor.sample_rate:
+                self.resampled[key] = self.native_data
+            else:
+                self.resampled[key] = librosa.resample(
+                    self.native_data,
+                    orig_sr=self.native_rate,
+                    target_sr=processor.sample_rate,
+                    res_type=processor.resample_type,
+                )
+                self.num_resamples += 1
+
+        data = self.resampled[key]
+
+        processor.actual_sampling_rate = processor.sample_rate
+        processor.duration = librosa.get_duration(y=data, sr=processor.sample_rate)
+
+        return data
+
+    def release(self):
+        """
+        release Drop all data held for the current file.
+        """
+        self.path = None
+        self.version = None
+        self.native_data = None
+        self.native_rate = None
+        self.resampled = {}
@@ -1,4 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
 import shutil
+import urllib.error
+import urllib.parse
+import urllib.request
 import pooch
 import yaml
 import os
@@ -15,8 +19,94 @@ FAUNANET_EXAMPLES = None
 FAUNANET_CONFIG = None
 FAUNANET_CACHE = None
 
+MODELS_URL = "https://huggingface.co/MaHaWo/faunanet_test_models/resolve/main"
+EXAMPLES_URL = "https://huggingface.co/datasets/MaHaWo/iSparrow_test_data/resolve/main"
+
+# have filenames and checksum hardcoded for now. "None" indicates unknown or changing files
+MODEL_REGISTRY = {
+    "birdnet_default_v2.4/model.tflite": "sha256:55f3e4055b1a13bfa9a2452731d0d34f6a02d6b775a334362665892794165e4c",
+    "birdnet_custom_v2.4/model.tflite": "sha256:5eee37652430c54490321e0d2096d55817b4ac4da2301b594f03fcb9d52af741",
+    "birdnet_default_v2.4/species_presence_model.tflite": "sha256:1226f23fc20362617deb09178f366111b70cf085c2c82893f2814e5acedce6c2",
+    "google_bird_classification/saved_model.pb": "sha256:c6bdf0c2659f6d4713c670b92cceb083f8c1b401aee79ef6912614a1d89b6f97",
+    "google_bird_classification/variables/variables.index": None,
+    "google_bird_classification/variables/variables.data-00000-of-00001": "sha256:d967ea7bfaccdcfe4ff59f8d9f3bdec69181e4e79fd7abebf692100efcdfcc56",
+    "birdnet_default_v2.4/labels.txt": None,
+    "birdnet_custom_v2.4/labels.txt": None,
+    "google_bird_classification/assets/family.csv": None,
+    "google_bird_classification/assets/genus.csv": None,
+    "google_bird_classification/assets/label.csv": None,
+    "google_bird_classification/assets/order.csv": None,
+    "google_bird_classification/labels.txt": None,
+    "google_bird_classification/train_metadata.csv": None,
+    "birdnet_default_v2.4/model.py": None,
+    "birdnet_custom_v2.4/model.py": None,
+    "google_bird_classification/model.py": None,
+    "birdnet_default_v2.4/preprocessor.py": None,
+    "birdnet_custom_v2.4/preprocessor.py": None,
+    "google_bird_classification/preprocessor.py": None,
+    "birdnet_default_v2.4/default.yml": None,
+    "birdnet_custom_v2.4/default.yml": None,
+    "google_bird_classification/default.yml": None,
+}
+
+# file in the registry -> where it is installed in the models folder.
+# assets and variables need to live in separate directories to load the perch model correctly
+MODEL_FILES = (
+    {
+        f"birdnet_default_v2.4/{name}": f"birdnet_default/{name}"
+        for name in [
+            "model.tflite",
+            "labels.txt",
+            "species_presence_model.tflite",
+            "model.py",
+            "preprocessor.py",
+            "default.yml",
+        ]
+    }
+    | {
+        f"birdnet_custom_v2.4/{name}": f"birdnet_custom/{name}"
+        for name in [
+            "model.tflite",
+            "labels.txt",
+            "model.py",
+            "preprocessor.py",
+            "default.yml",
+        ]
+    }
+    | {
+        f"google_bird_classification/{name}": f"google_perch/{name}"
+        for name in [
+            "saved_model.pb",
+            "labels.txt",
+            "train_metadata.csv",
+            "model.py",
+            "preprocessor.py",
+            "default.yml",
+            "variables/variables.index",
+            "variables/variables.data-00000-of-00001",
+            "assets/family.csv",
+            "assets/genus.csv",
+            "assets/label.csv",
+            "assets/order.csv",
+        ]
+    }
+)
+
+EXAMPLE_REGISTRY = {
+    "corrupted.wav": "sha256:68cbc7c63bed90c2ad4fb7d3b5cc608c82cebeaf5e91d5e8d6793d8645b30b95",
+    "soundscape.wav": "sha256:df312b45bc82ce4c638c3e9e09d748702ea14a91ec29e4e8e0676d3e3e015fd7",
+    "trimmed.wav": "sha256:a4b3c078d2c617264dc5e6a0d62deedba9232699580c9c73d237496726c194b3",
+    "species_list.txt": None,
+}
+
+# files of at least this size are linked from the download cache instead of copied
+LINK_MIN_SIZE = 1 << 20
 
-def make_directories(base_cfg_dirs: dict):
+# ioctl request of Linux to clone a file on copy-on-write file systems
+FICLONE = 0x40049409
+
+
+def make_directories(base_cfg_dirs: dict, exist_ok: bool = False):
     """
     make_directories Make all the directories for faunanet.
 
@@ -25,6 +115,7 @@ def make_directories(base_cfg_dirs: dict):
         base_cfg_dirs (dict): Dictionary containing paths for the main install ("home"),
         the directory where models are stored ("models"),
         and the "output" directory to store inference results and potentially other data in ("output")
+        exist_ok (bool, optional): Whether existing folders are accepted, e.g., when resuming an interrupted installation. Defaults to False.
     Raises:
         KeyError: A folder given in the config does not exist
 
@@ -56,7 +147,7 @@ def make_directories(base_cfg_dirs: dict):
         iscache = Path(user_cache_dir()) / "faunanet_tests"
 
     for p in [ish, ism, iso, ise]:
-        p.mkdir(parents=True, exist_ok=False)
+        p.mkdir(parents=True, exist_ok=exist_ok)
 
     for p in [iscfg, iscache]:
         p.mkdir(parents=True, exist_ok=True)
@@ -64,163 +155,305 @@ def make_directories(base_cfg_dirs: dict):
     return ish, ism, iso, ise, iscfg, iscache
 
 
-def download_model_files(model_dir: str = "models"):
+class ResumableDownloader:
+    """
+    ResumableDownloader Downloader for pooch that keeps the data it has received in a '<file>.part' file next to the cached file.
+    When a download is interrupted, e.g., because a slow link drops, the next download of the file continues where the last one stopped
+    with an HTTP range request instead of starting over. The range request carries the ETag or Last-Modified date the server sent for the
+    partial data, which is kept in a '<file>.part.validator' file, in an If-Range header, such that the server sends the whole file again
+    if it has changed since. Partial downloads without such a validator are started over. pooch checks the hash of the completed file
+    before it moves it into the cache.
     """
-    download_model_files Download default model files for faunanet. This is required to run before anything else is done with faunanet.
+
+    def __init__(
+        self, resume: bool = True, timeout: float = 60.0, chunk_size: int = 1 << 20
+    ):
+        """
+        __init__ Create a new downloader.
+
+        Args:
+            resume (bool, optional): Whether to continue partial downloads. If False, partial downloads are discarded. Defaults to True.
+            timeout (float, optional): Timeout in seconds for connecting to the server and for each read. Defaults to 60.
+            chunk_size (int, optional): Number of bytes to read at once. Defaults to 1 MiB.
+        """
+        self.resume = resume
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+    def __call__(
+        self, url: str, output_file: str, pooch_instance, check_only: bool = False
+    ):
+        """
+        __call__ Download the file at 'url' to 'output_file'. Called by pooch.
+
+        Args:
+            url (str): URL of the file
+            output_file (str): Temporary file pooch wants the data in. It lives in the folder of the cached file.
+            pooch_instance (pooch.Pooch): The calling pooch
+            check_only (bool, optional): Only check if the file is available on the server. Defaults to False.
+
+        Returns:
+            bool: Whether the file is available if 'check_only' is True, else None
+        """
+        if check_only:
+            request = urllib.request.Request(url, method="HEAD")
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    return True
+            except urllib.error.HTTPError:
+                return False
+
+        part = Path(output_file).parent / (
+            urllib.parse.unquote(url.rsplit("/", 1)[-1]) + ".part"
+        )
+
+        validator = part.with_name(part.name + ".validator")
+
+        # without a validator, data of an older version of the file could be continued with that of a newer one
+        if self.resume is False or validator.is_file() is False:
+            part.unlink(missing_ok=True)
+            validator.unlink(missing_ok=True)
+
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {}
+        if offset > 0:
+            headers = {"Range": f"bytes={offset}-", "If-Range": validator.read_text()}
+
+        try:
+            with urllib.request.urlopen(
+                urllib.request.Request(url, headers=headers), timeout=self.timeout
+            ) as response:
+                # servers that ignore the range, or whose file has changed, send the whole file again
+                if response.status == 206:
+                    mode = "ab"
+                else:
+                    mode = "wb"
+                    self._save_validator(response, validator)
+
+                with open(part, mode) as f:
+                    shutil.copyfileobj(response, f, self.chunk_size)
+        except urllib.error.HTTPError as e:
+            # the partial file is already complete, pooch checks its hash
+            if e.code != 416 or offset == 0:
+                raise
+
+        os.replace(part, output_file)
+        validator.unlink(missing_ok=True)
+
+    def _save_validator(self, response, validator: Path):
+        """
+        _save_validator Keep what identifies the version of a file that is being downloaded, such that an interrupted download is only
+        continued with data of the same version. Weak ETags cannot be used for range requests, the Last-Modified date is used instead.
+
+        Args:
+            response (http.client.HTTPResponse): Response with the whole file
+            validator (Path): File to keep the validator in
+        """
+        etag = response.headers.get("ETag")
+
+        if etag is not None and etag.startswith("W/") is False:
+            validator.write_text(etag)
+        elif response.headers.get("Last-Modified") is not None:
+            validator.write_text(response.headers["Last-Modified"])
+        else:
+            validator.unlink(missing_ok=True)
+
+
+def _reflink(source: Path, target: Path) -> bool:
+    """
+    _reflink Make 'target' a copy-on-write clone of 'source', which is supported by file systems like btrfs and xfs on Linux.
 
     Args:
-        model_dir (str, optional): Path to put the model files at. Defaults to "models".
+        source (Path): File to clone
+        target (Path): Path of the clone
 
-    Raises:
-        FileNotFoundError: When the model directory does not exist.
+    Returns:
+        bool: Whether the clone was made
     """
-    print("... Downloading model files...")
+    try:
+        import fcntl
 
-    ism = Path(model_dir)
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except (ImportError, OSError):
+        if target.exists():
+            target.unlink()
+        return False
 
-    if ism.exists() is False:
-        raise FileNotFoundError(f"The folder {model_dir} does not exist")
 
-    # have filenames and checksum hardcoded for now. "None" indicates unknown or changing filenames
-    model_file_names = {
-        "birdnet_default_v2.4/model.tflite": "sha256:55f3e4055b1a13bfa9a2452731d0d34f6a02d6b775a334362665892794165e4c",
-        "birdnet_custom_v2.4/model.tflite": "sha256:5eee37652430c54490321e0d2096d55817b4ac4da2301b594f03fcb9d52af741",
-        "birdnet_default_v2.4/species_presence_model.tflite": "sha256:1226f23fc20362617deb09178f366111b70cf085c2c82893f2814e5acedce6c2",
-        "google_bird_classification/saved_model.pb": "sha256:c6bdf0c2659f6d4713c670b92cceb083f8c1b401aee79ef6912614a1d89b6f97",
-        "google_bird_classification/variables/variables.index": None,
-        "google_bird_classification/variables/variables.data-00000-of-00001": "sha256:d967ea7bfaccdcfe4ff59f8d9f3bdec69181e4e79fd7abebf692100efcdfcc56",
-    }
+def install_file(source: str, target: str, link_min_size: int = LINK_MIN_SIZE) -> str:
+    """
+    install_file Install a downloaded file from the download cache. Files of at least 'link_min_size' bytes are hardlinked, or cloned
+    if the cache is on another file system that supports it, such that they are not stored twice. Everything else is copied, so
+    editing a small installed file like a config file does not change the cache. The target is replaced atomically, so it is never
+    left half written.
 
-    label_file_names = {
-        "birdnet_default_v2.4/labels.txt": None,
-        "birdnet_custom_v2.4/labels.txt": None,
-        "google_bird_classification/assets/family.csv": None,
-        "google_bird_classification/assets/genus.csv": None,
-        "google_bird_classification/assets/label.csv": None,
-        "google_bird_classification/assets/order.csv": None,
-        "google_bird_classification/labels.txt": None,
-        "google_bird_classification/train_metadata.csv": None,
-    }
+    Args:
+        source (str): Path of the cached file
+        target (str): Path to install the file at
+        link_min_size (int, optional): Minimum size in bytes of files that are linked. Defaults to LINK_MIN_SIZE.
 
-    model_code = {
-        "birdnet_default_v2.4/model.py": None,
-        "birdnet_custom_v2.4/model.py": None,
-        "google_bird_classification/model.py": None,
-    }
+    Returns:
+        str: How the file was installed: 'linked', 'reflinked' or 'copied'
+    """
+    source = Path(source)
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+
+    if tmp.exists():
+        tmp.unlink()
+
+    method = "copied"
+    if source.stat().st_size >= link_min_size:
+        try:
+            os.link(source, tmp)
+            method = "linked"
+        except OSError:
+            if _reflink(source, tmp):
+                method = "reflinked"
+
+    if method == "copied":
+        shutil.copy2(source, tmp)
+
+    os.replace(tmp, target)
+    return method
+
+
+def fetch_files(
+    base_url: str,
+    registry: dict,
+    files: dict,
+    target_dir: str,
+    cache: str = None,
+    max_workers: int = 4,
+    resume: bool = False,
+    link_min_size: int = LINK_MIN_SIZE,
+) -> dict:
+    """
+    fetch_files Download files through the pooch cache and install them into 'target_dir'. Up to 'max_workers' files are downloaded
+    at the same time and each file is downloaded only once, even if it is installed at several places. Files with a known hash are
+    verified. In resume mode, files that are already installed are kept, and interrupted downloads are continued.
 
-    preprocessor_code = {
-        "birdnet_default_v2.4/preprocessor.py": None,
-        "birdnet_custom_v2.4/preprocessor.py": None,
-        "google_bird_classification/preprocessor.py": None,
-    }
+    Args:
+        base_url (str): URL of the folder holding the files
+        registry (dict): file name -> hash as 'sha256:<hex>', or None if unknown, of all files that can be downloaded
+        files (dict): file name in the registry -> path relative to 'target_dir', or list of such paths
+        target_dir (str): Folder to install the files in
+        cache (str, optional): Cache folder of pooch. Defaults to None (os cache folder 'faunanet_downloads').
+        max_workers (int, optional): Maximum number of parallel downloads. Defaults to 4.
+        resume (bool, optional): Whether to resume an interrupted installation. Defaults to False.
+        link_min_size (int, optional): Minimum size in bytes of files that are linked instead of copied, see 'install_file'. Defaults to LINK_MIN_SIZE.
 
-    config_files = {
-        "birdnet_default_v2.4/default.yml": None,
-        "birdnet_custom_v2.4/default.yml": None,
-        "google_bird_classification/default.yml": None,
-    }
+    Raises:
+        ValueError: When 'max_workers' is smaller than 1, or a file is not in the registry or has a wrong hash.
 
-    models_data = pooch.create(
-        path=pooch.os_cache("faunanet_downloads"),
-        base_url="https://huggingface.co/MaHaWo/faunanet_test_models/resolve/main",
-        registry=(
-            model_file_names
-            | label_file_names
-            | model_code
-            | preprocessor_code
-            | config_files
-        ),
-    )
+    Returns:
+        dict: installed path -> how it was installed: 'present' (kept in resume mode), 'linked', 'reflinked' or 'copied'
+    """
+    if max_workers < 1:
+        raise ValueError("'max_workers' must be >= 1")
 
-    for name in [
-        "model.tflite",
-        "labels.txt",
-        "species_presence_model.tflite",
-        "model.py",
-        "preprocessor.py",
-        "default.yml",
-    ]:
-        (ism / Path("birdnet_default")).mkdir(parents=True, exist_ok=True)
-        shutil.copy(
-            Path(models_data.fetch(f"birdnet_default_v2.4/{name}", progressbar=False)),
-            ism / Path("birdnet_default"),
-        )
+    for name in files:
+        if name not in registry:
+            raise ValueError(f"File {name} is not in the registry")
 
-    for name in [
-        "model.tflite",
-        "labels.txt",
-        "model.py",
-        "preprocessor.py",
-        "default.yml",
-    ]:
-        (ism / Path("birdnet_custom")).mkdir(parents=True, exist_ok=True)
-
-        shutil.copy(
-            Path(models_data.fetch(f"birdnet_custom_v2.4/{name}", progressbar=False)),
-            ism / Path("birdnet_custom"),
+    data = pooch.create(
+        path=pooch.os_cache("faunanet_downloads") if cache is None else cache,
+        base_url=base_url,
+        registry=registry,
+    )
+    downloader = ResumableDownloader(resume=resume)
+
+    def is_installed(name: str, target: Path) -> bool:
+        if resume is False or target.is_file() is False:
+            return False
+        return (
+            registry[name] is None
+            or pooch.file_hash(str(target)) == registry[name].split(":")[-1]
         )
 
-    for name in [
-        "saved_model.pb",
-        "labels.txt",
-        "train_metadata.csv",
-        "model.py",
-        "preprocessor.py",
-        "default.yml",
-    ]:
-        (ism / Path("google_perch")).mkdir(parents=True, exist_ok=True)
-
-        shutil.copy(
-            Path(
-                models_data.fetch(
-                    f"google_bird_classification/{name}", progressbar=False
-                )
-            ),
-            ism / Path("google_perch"),
-        )
+    def fetch(name: str, targets: list) -> dict:
+        installed = {}
+        missing = []
+        for target in targets:
+            if is_installed(name, target):
+                installed[target] = "present"
+            else:
+                missing.append(target)
+
+        if len(missing) > 0:
+            source = data.fetch(name, downloader=downloader, progressbar=False)
+            for target in missing:
+                installed[target] = install_file(source, target, link_min_size)
+
+        return installed
+
+    target_dir = Path(target_dir)
+    installed = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                fetch,
+                name,
+                [
+                    target_dir / p
+                    for p in ([paths] if isinstance(paths, str) else paths)
+                ],
+            )
+            for name, paths in files.items()
+        ]
 
-    # assets and variables need to live in separate directories to load the model correctly
-    for name in [
-        "variables/variables.index",
-        "variables/variables.data-00000-of-00001",
-    ]:
-
-        (ism / Path("google_perch") / "variables").mkdir(parents=True, exist_ok=True)
-
-        shutil.copy(
-            Path(
-                models_data.fetch(
-                    f"google_bird_classification/{name}", progressbar=False
-                )
-            ),
-            ism / Path("google_perch") / "variables",
-        )
+        for future in futures:
+            installed.update(future.result())
 
-    for name in [
-        "assets/family.csv",
-        "assets/genus.csv",
-        "assets/label.csv",
-        "assets/order.csv",
-    ]:
-
-        (ism / Path("google_perch") / "assets").mkdir(parents=True, exist_ok=True)
-
-        shutil.copy(
-            Path(
-                models_data.fetch(
-                    f"google_bird_classification/{name}", progressbar=False
-                )
-            ),
-            ism / Path("google_perch") / "assets",
-        )
+    return installed
+
+
+def download_model_files(
+    model_dir: str = "models", max_workers: int = 4, resume: bool = False
+):
+    """
+    download_model_files Download default model files for faunanet. This is required to run before anything else is done with faunanet.
+    Files are downloaded in parallel and large ones are linked from the download cache, see 'fetch_files'.
+
+    Args:
+        model_dir (str, optional): Path to put the model files at. Defaults to "models".
+        max_workers (int, optional): Maximum number of parallel downloads. Defaults to 4.
+        resume (bool, optional): Whether to resume an interrupted download, keeping files that are already installed. Defaults to False.
+
+    Raises:
+        FileNotFoundError: When the model directory does not exist.
+    """
+    print("... Downloading model files...")
+
+    ism = Path(model_dir)
+
+    if ism.exists() is False:
+        raise FileNotFoundError(f"The folder {model_dir} does not exist")
+
+    fetch_files(
+        MODELS_URL,
+        MODEL_REGISTRY,
+        MODEL_FILES,
+        ism,
+        max_workers=max_workers,
+        resume=resume,
+    )
 
 
-def download_example_data(example_dir: str = "examples"):
+def download_example_data(
+    example_dir: str = "examples", max_workers: int = 4, resume: bool = False
+):
     """
     download_example_data Download the example audio files used by faunanet for its tests and examples.
 
     Args:
         example_dir (str, optional): Path to the faunanet example directory. Defaults to 'examples'.
+        max_workers (int, optional): Maximum number of parallel downloads. Defaults to 4.
+        resume (bool, optional): Whether to resume an interrupted download, keeping files that are already installed. Defaults to False.
     """
 
     print("... Downloading example files...")
@@ -230,34 +463,24 @@ def download_example_data(example_dir: str = "examples"):
     if ise.exists() is False:
         raise FileNotFoundError(f"The folder {example_dir} does not exist")
 
-    # create registries to pull files from. hardcode names and hashes for now
-    example_data_file_names = {
-        "corrupted.wav": "sha256:68cbc7c63bed90c2ad4fb7d3b5cc608c82cebeaf5e91d5e8d6793d8645b30b95",
-        "soundscape.wav": "sha256:df312b45bc82ce4c638c3e9e09d748702ea14a91ec29e4e8e0676d3e3e015fd7",
-        "trimmed.wav": "sha256:a4b3c078d2c617264dc5e6a0d62deedba9232699580c9c73d237496726c194b3",
-        "species_list.txt": None,
-    }
-
-    example_data = pooch.create(
-        path=pooch.os_cache("faunanet_downloads"),
-        base_url="https://huggingface.co/datasets/MaHaWo/iSparrow_test_data/resolve/main",
-        registry=example_data_file_names,
+    # don't leave them in the cached folder but put them where user can actually see them.
+    fetch_files(
+        EXAMPLES_URL,
+        EXAMPLE_REGISTRY,
+        {name: name for name in EXAMPLE_REGISTRY},
+        ise,
+        max_workers=max_workers,
+        resume=resume,
     )
 
-    # don't leave them in the cached folder but copy to where user can actually see them.
-    for name in example_data_file_names.keys():
-        shutil.copy(
-            Path(example_data.fetch(name, progressbar=False)),
-            ise,
-        )
-
 
-def set_up(custom_config: str = None):
+def set_up(custom_config: str = None, resume: bool = None):
     """
     set_up Set up the faunanet directories and download the necessary data. This is required to run before anything else is done with faunanet.
 
     Args:
         custom_config (str, optional): Path to a custom installation file. See the 'install.yml' file provided with this package for possible customization options. Defaults to None.
+        resume (bool, optional): Whether to resume an interrupted installation into the same folders. Files that are already installed are kept and partial downloads are continued. Defaults to None (the 'resume' entry of the 'Download' node of the installation file).
 
     Raises:
         FileExistsError: When there is an existing faunanet installation.
@@ -271,17 +494,26 @@ def set_up(custom_config: str = None):
         custom_install_config = utils.read_yaml(custom_config)
         utils.update_dict_leafs_recursive(install_cfg, custom_install_config)
 
+    download_cfg = install_cfg.get("Download", {})
+    max_workers = download_cfg.get("max_workers", 4)
+
+    if resume is None:
+        resume = download_cfg.get("resume", False)
+
     for key in ["home", "models", "output"]:
-        if Path(install_cfg["Directories"][key]).expanduser().resolve().exists():
+        if (
+            resume is False
+            and Path(install_cfg["Directories"][key]).expanduser().resolve().exists()
+        ):
             raise FileExistsError(
                 f"{key} directory already exists. Please remove it before running the installation."
             )
 
     home, models, output, examples, config, cache = make_directories(
-        install_cfg["Directories"]
+        install_cfg["Directories"], exist_ok=resume
     )
 
-    if Path(config, "install.yml").exists():
+    if Path(config, "install.yml").exists() and resume is False:
 
         with open(Path(config) / "install.yml", "r") as yfile:
             old_cfg = yaml.safe_load(yfile)["Directories"]
@@ -302,15 +534,19 @@ def set_up(custom_config: str = None):
         yaml.safe_dump(install_cfg, yfile)
     shutil.copy(packagebase / "default.yml", config)
 
-    # copy over docker files 
+    # copy over docker files
     Path(home, "docker").mkdir(parents=True, exist_ok=True)
     shutil.copy(packagebase / Path("faunanet.dockerfile"), home / "docker")
     shutil.copy(packagebase / Path("docker-compose.yml"), home / "docker")
     shutil.copy(packagebase / Path("startup_docker.py"), home / "docker")
 
-    download_model_files(model_dir=models.resolve())
+    download_model_files(
+        model_dir=models.resolve(), max_workers=max_workers, resume=resume
+    )
 
-    download_example_data(example_dir=examples.resolve())
+    download_example_data(
+        example_dir=examples.resolve(), max_workers=max_workers, resume=resume
+    )
 
     global FAUNANET_HOME, FAUNANET_MODELS, FAUNANET_OUTPUT, FAUNANET_EXAMPLES, FAUNANET_CACHE, FAUNANET_CONFIG
 
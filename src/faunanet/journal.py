@@ -0,0 +1,369 @@
+from pathlib import Path
+import json
+import os
+import threading
+import time
+
+# 'skipped' marks files that are handled by someone else, e.g., another watcher in cluster mode.
+# 'failed' marks files the watcher process died on, 'quarantined' files that have been set aside after failing too often.
+JOURNAL_EVENTS = [
+    "enqueued",
+    "started",
+    "completed",
+    "skipped",
+    "failed",
+    "quarantined",
+]
+
+# events after which nothing is left to do for a file
+FINISHED_EVENTS = ["completed", "skipped", "quarantined"]
+
+# name of the journal in the output folder of a run
+JOURNAL_NAME = "journal.log"
+
+# marks that all files earlier runs left unfinished have been enqueued in a journal, such that earlier journals need not be replayed
+CHECKPOINT_EVENT = "checkpoint"
+
+
+class ProcessingJournal:
+    """
+    ProcessingJournal Write-ahead journal of the files a watcher run processes. For each file, the events 'enqueued', 'started'
+    and 'completed' or 'skipped' are appended as one line of json each. Every record is handed to the operating system right away, so it
+    survives the watcher process being killed, while the expensive fsync that protects against a crash of the host is done in
+    batches, at the latest 'sync_interval' seconds after a record, even if no further records follow. After a crash, the last few records may be lost, which leads to a file being analyzed again, but never to one being skipped.
+    Records may be appended from several threads.
+
+    Methods:
+    --------
+    record: Append an event for a file.
+    enqueued: Record that a file has been found.
+    started: Record that the analysis of a file has started.
+    completed: Record that the results of a file have been written.
+    checkpoint: Record that all files left unfinished by earlier runs have been enqueued.
+    sync: Force all records to disk.
+    close: Sync and close the journal.
+    """
+
+    def __init__(self, path: str, sync_every: int = 16, sync_interval: float = 1.0):
+        """
+        __init__ Open a journal for appending. An existing journal is continued.
+
+        Args:
+            path (str): Path of the journal file.
+            sync_every (int, optional): Maximum number of records between two fsyncs. Defaults to 16.
+            sync_interval (float, optional): Maximum time in seconds a record stays unsynced. Defaults to 1.0.
+
+        Raises:
+            ValueError: When 'sync_every' is smaller than 1 or 'sync_interval' is not positive.
+        """
+        if sync_every < 1:
+            raise ValueError("'sync_every' must be >= 1")
+
+        if sync_interval <= 0:
+            raise ValueError("'sync_interval' must be > 0")
+
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.file = open(self.path, "a")
+
+        # terminate a record that a crash left incomplete, such that the next one is not appended to it
+        if self.file.tell() > 0:
+            with open(self.path, "rb") as journal:
+                journal.seek(-1, os.SEEK_END)
+                if journal.read(1) != b"\n":
+                    self.file.write("\n")
+
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.lock = threading.RLock()
+        self.timer = None  # syncs records that are not followed by others in time
+
+    @property
+    def is_open(self) -> bool:
+        return self.file is not None
+
+    def record(self, event: str, filename: str, resumed: bool = False):
+        """
+        record Append an event for a file to the journal.
+
+        Args:
+            event (str): One of JOURNAL_EVENTS
+            filename (str): File the event belongs to
+            resumed (bool, optional): Whether an enqueued file is left over from an earlier run. Defaults to False.
+
+        Raises:
+            ValueError: When the event is unknown.
+            RuntimeError: When the journal has been closed.
+        """
+        if event not in JOURNAL_EVENTS:
+            raise ValueError(
+                f"Unknown journal event {event}, must be in {JOURNAL_EVENTS}"
+            )
+
+        entry = {"event": event, "file": str(filename), "time": time.time()}
+
+        if event == "enqueued":
+            try:
+                entry["ctime"] = Path(filename).stat().st_ctime
+            except FileNotFoundError:
+                entry["ctime"] = None
+
+            if resumed:
+                entry["resumed"] = True
+
+        with self.lock:
+            if self.file is None:
+                raise RuntimeError("Journal has been closed")
+
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+            self.unsynced += 1
+
+            if (
+                self.unsynced >= self.sync_every
+                or time.monotonic() - self.last_sync >= self.sync_interval
+            ):
+                self.sync()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.sync_interval, self.sync)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def enqueued(self, filename: str, resumed: bool = False):
+        self.record("enqueued", filename, resumed=resumed)
+
+    def started(self, filename: str):
+        self.record("started", filename)
+
+    def completed(self, filename: str):
+        self.record("completed", filename)
+
+    def checkpoint(self):
+        """
+        checkpoint Record that all files earlier runs left unfinished have been enqueued in this journal, such that their journals
+        need not be replayed anymore to find them. The record is synced right away.
+
+        Raises:
+            RuntimeError: When the journal has been closed.
+        """
+        with self.lock:
+            if self.file is None:
+                raise RuntimeError("Journal has been closed")
+
+            self.file.write(
+                json.dumps({"event": CHECKPOINT_EVENT, "time": time.time()}) + "\n"
+            )
+            self.file.flush()
+            self.unsynced += 1
+            self.sync()
+
+    def sync(self):
+        """
+        sync Force all records written so far to disk.
+        """
+        with self.lock:
+            if self.file is not None and self.unsynced > 0:
+                os.fsync(self.file.fileno())
+            self.unsynced = 0
+            self.last_sync = time.monotonic()
+
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+    def close(self):
+        """
+        close Sync and close the journal.
+        """
+        with self.lock:
+            if self.file is not None:
+                self.sync()
+                self.file.close()
+                self.file = None
+
+
+def _entries_of(path: str):
+    """
+    _entries_of Read the records of a journal. Lines that are not complete records, like a partially written last line left behind
+    by a crash, are skipped.
+
+    Args:
+        path (str): Path of the journal file
+
+    Yields:
+        dict: Records in the order they were written
+    """
+    with open(path, "r") as journal:
+        for line in journal:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            if isinstance(entry, dict) and "event" in entry and "file" in entry:
+                yield entry
+
+
+def read_journal(path: str, offset: int = 0) -> tuple:
+    """
+    read_journal Read the records of a journal that have been appended after a byte offset, such that a journal that keeps
+    growing can be followed without reading it again from the start. A partially written last line is left for the next call.
+
+    Args:
+        path (str): Path of the journal file
+        offset (int, optional): Byte offset to start reading at, as returned by the previous call. Defaults to 0.
+
+    Returns:
+        tuple: (records in the order they were written, byte offset after the last complete line)
+    """
+    with open(path, "rb") as journal:
+        journal.seek(offset)
+        data = journal.read()
+
+    end = data.rfind(b"\n") + 1
+    entries = []
+
+    for line in data[:end].splitlines():
+        try:
+            entry = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+
+        if isinstance(entry, dict) and "event" in entry and "file" in entry:
+            entries.append(entry)
+
+    return entries, offset + end
+
+
+def replay_journal(path: str) -> dict:
+    """
+    replay_journal Read a journal and determine the last event of each file in it. Lines that are not complete records, like a
+    partially written last line left behind by a crash, are ignored.
+
+    Args:
+        path (str): Path of the journal file
+
+    Returns:
+        dict: filename -> {"event": last event, "ctime": creation time when enqueued, "resumed": whether the file was left over from an earlier run},
+              in the order the files were first seen.
+    """
+    files = {}
+
+    for entry in _entries_of(path):
+        state = files.setdefault(
+            entry["file"], {"event": None, "ctime": None, "resumed": False}
+        )
+        state["event"] = entry["event"]
+        state["resumed"] = state["resumed"] or entry.get("resumed", False)
+
+        if entry.get("ctime") is not None:
+            state["ctime"] = entry["ctime"]
+
+    return files
+
+
+def count_events(journals: list, event: str) -> dict:
+    """
+    count_events Count how often each file has been recorded with an event in any of the given journals. Lines that are not
+    complete records are ignored.
+
+    Args:
+        journals (list): Paths of journal files
+        event (str): One of JOURNAL_EVENTS
+
+    Returns:
+        dict: filename -> number of records of the event
+    """
+    counts = {}
+
+    for path in journals:
+        for entry in _entries_of(path):
+            if entry["event"] == event:
+                counts[entry["file"]] = counts.get(entry["file"], 0) + 1
+
+    return counts
+
+
+def journal_limits(path: str) -> dict:
+    """
+    journal_limits Get the creation times of the first and last file analyzed in a run, in the same form as written to 'batch_info.yml'.
+    Files left over from earlier runs are not taken into account, like for 'batch_info.yml'.
+
+    Args:
+        path (str): Path of the journal file
+
+    Returns:
+        dict: {"first": ctime of the first file that was started, "last": ctime of the last completed file}. Both are 0 if there are none.
+    """
+    files = [f for f in replay_journal(path).values() if f["resumed"] is False]
+
+    started = [
+        f["ctime"]
+        for f in files
+        if f["event"] in ["started", "failed", "completed"] and f["ctime"] is not None
+    ]
+
+    completed = [
+        f["ctime"]
+        for f in files
+        if f["event"] == "completed" and f["ctime"] is not None
+    ]
+
+    return {
+        "first": int(min(started)) if len(started) > 0 else 0,
+        "last": int(max(completed)) if len(completed) > 0 else 0,
+    }
+
+
+def has_checkpoint(path: str) -> bool:
+    """
+    has_checkpoint Check if a journal has a checkpoint, i.e., if the run it belongs to has enqueued all files earlier runs left unfinished.
+
+    Args:
+        path (str): Path of the journal file
+
+    Returns:
+        bool: True if the journal has a complete checkpoint record.
+    """
+    with open(path, "r") as journal:
+        for line in journal:
+            if CHECKPOINT_EVENT not in line:
+                continue
+
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            if isinstance(entry, dict) and entry.get("event") == CHECKPOINT_EVENT:
+                return True
+
+    return False
+
+
+def unfinished_files(journals: list) -> list:
+    """
+    unfinished_files Determine the files that have been enqueued or started in any of the given journals but have not been completed in any of them.
+    Journals older than the newest one with a checkpoint are not replayed, because the files they left unfinished have been enqueued in that one.
+
+    Args:
+        journals (list): Paths of journal files, oldest first
+
+    Returns:
+        list: Filenames of unfinished files in the order in which they were first seen.
+    """
+    first = 0
+    for i in range(len(journals) - 1, -1, -1):
+        if has_checkpoint(journals[i]):
+            first = i
+            break
+
+    files = {}
+
+    for journal in journals[first:]:
+        for filename, state in replay_journal(journal).items():
+            if files.get(filename) != "completed":
+                files[filename] = state["event"]
+
+    return [f for f, event in files.items() if event not in FINISHED_EVENTS]
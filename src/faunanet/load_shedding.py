@@ -0,0 +1,150 @@
+import time
+
+# ways to get through a backlog faster, from the mildest to the most drastic one
+SHEDDING_STEPS = ["overlap", "activity_gate", "fallback_model", "skip"]
+
+
+class LoadShedder:
+    """
+    LoadShedder Decide how far to degrade the analysis when files arrive faster than they can be analyzed. The shedder is fed with the
+    number of queued files and the real-time factor of the analysis, i.e., the seconds of audio analyzed per second. When the queue grows
+    beyond 'high_water', or the analysis runs slower than 'min_realtime_factor' while files are waiting, the next step is taken. Once the
+    queue has drained to 'low_water', the last step is reverted. After each change, the shedder waits 'hold' seconds before it changes again,
+    such that the effect of a step can show. Every change is kept as a decision.
+
+    Methods:
+    --------
+    update: Feed the current load and take or revert a step if due.
+    is_active: Whether a step is taken currently.
+    """
+
+    def __init__(
+        self,
+        high_water: int = 10,
+        low_water: int = 2,
+        min_realtime_factor: float = 1.0,
+        hold: float = 30.0,
+        smoothing: float = 0.3,
+        steps: list = None,
+    ):
+        """
+        __init__ Create a new LoadShedder.
+
+        Args:
+            high_water (int, optional): Number of queued files from which the next step is taken. Defaults to 10.
+            low_water (int, optional): Number of queued files down to which the queue must drain before the last step is reverted. Defaults to 2.
+            min_realtime_factor (float, optional): Seconds of audio that must be analyzed per second while more than 'low_water' files are queued.
+                                                   Defaults to 1 (real time). None disables this test.
+            hold (float, optional): Minimum time in seconds between two changes. Defaults to 30.
+            smoothing (float, optional): Weight of the newest value in the moving average of the real-time factor, in (0, 1]. Defaults to 0.3.
+            steps (list, optional): Steps in the order they are taken, out of SHEDDING_STEPS. Defaults to None (all of them).
+
+        Raises:
+            ValueError: When an argument is out of range or a step is unknown.
+        """
+        if not 0 <= low_water < high_water:
+            raise ValueError("'low_water' must be >= 0 and < 'high_water'")
+
+        if min_realtime_factor is not None and min_realtime_factor <= 0:
+            raise ValueError("'min_realtime_factor' must be > 0")
+
+        if hold < 0:
+            raise ValueError("'hold' must be >= 0")
+
+        if not 0 < smoothing <= 1:
+            raise ValueError("'smoothing' must be > 0 and <= 1")
+
+        steps = list(SHEDDING_STEPS) if steps is None else list(steps)
+
+        for step in steps:
+            if step not in SHEDDING_STEPS:
+                raise ValueError(
+                    f"Unknown shedding step {step}, must be in {SHEDDING_STEPS}"
+                )
+
+        if len(set(steps)) != len(steps):
+            raise ValueError("Shedding steps must not repeat")
+
+        self.high_water = high_water
+        self.low_water = low_water
+        self.min_realtime_factor = min_realtime_factor
+        self.hold = hold
+        self.smoothing = smoothing
+        self.steps = steps
+        self.level = 0  # number of steps taken
+        self.realtime_factor = None  # moving average
+        self.last_change = None
+        self.decisions = []
+
+    @property
+    def active_steps(self) -> list:
+        return self.steps[: self.level]
+
+    def is_active(self, step: str) -> bool:
+        """
+        is_active Whether a step is taken currently.
+
+        Args:
+            step (str): One of SHEDDING_STEPS
+
+        Returns:
+            bool: True if the step is taken
+        """
+        return step in self.active_steps
+
+    def update(self, queue_depth: int, realtime_factor: float = None) -> dict:
+        """
+        update Feed the current load. Takes the next step if the analysis falls behind, or reverts the last one if the queue has drained,
+        unless the last change is less than 'hold' seconds ago.
+
+        Args:
+            queue_depth (int): Number of files waiting for analysis
+            realtime_factor (float, optional): Real-time factor of the last analyzed file. Defaults to None (no new measurement).
+
+        Returns:
+            dict: The decision if a step was taken or reverted, else None. Decisions are dictionaries with "time", "action" ('degrade' or 'revert'),
+                  "step", "level" after the decision, "queue_depth" and "realtime_factor".
+        """
+        if realtime_factor is not None:
+            self.realtime_factor = (
+                realtime_factor
+                if self.realtime_factor is None
+                else self.smoothing * realtime_factor
+                + (1 - self.smoothing) * self.realtime_factor
+            )
+
+        if (
+            self.last_change is not None
+            and time.monotonic() - self.last_change < self.hold
+        ):
+            return None
+
+        is_slow = (
+            self.min_realtime_factor is not None
+            and self.realtime_factor is not None
+            and self.realtime_factor < self.min_realtime_factor
+        )
+
+        if self.level < len(self.steps) and (
+            queue_depth >= self.high_water or (is_slow and queue_depth > self.low_water)
+        ):
+            self.level += 1
+            action, step = "degrade", self.steps[self.level - 1]
+        elif self.level > 0 and queue_depth <= self.low_water:
+            self.level -= 1
+            action, step = "revert", self.steps[self.level]
+        else:
+            return None
+
+        self.last_change = time.monotonic()
+
+        decision = {
+            "time": time.time(),
+            "action": action,
+            "step": step,
+            "level": self.level,
+            "queue_depth": queue_depth,
+            "realtime_factor": self.realtime_factor,
+        }
+        self.decisions.append(decision)
+        return decision
@@ -1,7 +1,6 @@
 from abc import ABC, abstractmethod
 import numpy as np
 from pathlib import Path
-import operator
 from . import utils
 
 
@@ -14,6 +13,8 @@ class ModelBase(ABC):
         labels_path (str): path to the labels file read for having labels
         species_list_path (str|None): Path to a restricted list of species labels if used, else None
         sensitivity (float, defaults to 1.0): Parameter of the sigmoid activation function used to produce classification probabilities.
+        is_quantized (bool): Whether the loaded tflite model has quantized inputs or outputs. These are converted from and to float32 automatically.
+        backend (str): Name of the backend the model is loaded with, see 'utils.MODEL_BACKENDS'.
     """
 
     def __init__(
@@ -22,10 +23,24 @@ class ModelBase(ABC):
         model_path: str,
         labels_path: str,
         num_threads: int = 1,
+        backend: str = None,
         **kwargs,
     ):
         self.num_threads = num_threads
 
+        if backend is not None:
+            if backend not in utils.MODEL_BACKENDS:
+                raise ValueError(
+                    f"Unknown model backend {backend}, must be in {list(utils.MODEL_BACKENDS.keys())}"
+                )
+
+            # the model file of the backend next to the one the model was written for, e.g., a converted 'model.onnx'
+            filename = utils.MODEL_BACKENDS[backend][0]
+            if Path(model_path).name != filename:
+                model_path = str(Path(model_path).parent / filename)
+
+        self.backend = backend
+
         if Path(model_path).exists() is False:
             raise FileNotFoundError(f"No model file at {model_path}")
 
@@ -40,6 +55,14 @@ class ModelBase(ABC):
 
         self.results = None
 
+        self.skipped = (
+            []
+        )  # (start, end) of chunks the activity gate kept from the model
+
+        self.buffers = None  # BufferPool shared with preprocessor and recording, set by the Recording
+
+        self.is_quantized = False
+
         self.load_model()
 
         self.load_labels()
@@ -70,64 +93,305 @@ class ModelBase(ABC):
 
     def load_model(self):
         """
-        load_model Load the model to be used for classifying.
+        load_model Load the model to be used for classifying with the backend given by 'backend' or, if there is none, by the name of the model file.
 
         Raises:
-            ValueError: When the path to a local model file does not work
-            ValueError: When a given url does not refer to a huggingface hub model
+            ValueError: When no backend loads files with the name of the model file
         """
-        model_loaders = {
-            "model.tflite": utils.load_model_from_file_tflite,
-            "saved_model.pb": utils.load_model_from_file_pb,
-        }
-
-        # get the model file
-        model_filename = str(Path(self.model_path).name)
+        if self.backend is None:
+            self.backend = utils.model_backend_of(self.model_path)
 
-        # load model locally
+        self.model = utils.MODEL_BACKENDS[self.backend][1](
+            self.model_path, self.num_threads
+        )
 
-        if model_filename not in model_loaders:
-            raise ValueError(f"Model filename unknown: {model_filename}")
-
-        self.model = model_loaders[model_filename](self.model_path, self.num_threads)
+        # quantized models get float32 in- and output like their float counterparts
+        if self.backend == "tflite" and utils.QuantizedInterpreter.is_quantized(
+            self.model
+        ):
+            self.model = utils.QuantizedInterpreter(self.model)
+            self.is_quantized = True
 
     @abstractmethod
     def predict(self, data: np.array) -> list:
         pass
 
+    def _filter_predictions(self, predictions: np.ndarray, min_conf: float) -> list:
+        """
+        _filter_predictions Select the predictions of a chunk that are above a confidence threshold, sorted by descending confidence.
+
+        Args:
+            predictions (np.ndarray): Scores for each label
+            min_conf (float): Minimum confidence of a prediction to be kept
+
+        Returns:
+            list: List of (label, confidence) tuples
+        """
+        indices = np.flatnonzero(predictions >= min_conf)
+        indices = indices[np.argsort(-predictions[indices], kind="stable")]
+        return [(self.labels[i], predictions[i]) for i in indices]
+
+    def _predict_chunks(self, chunks, indices: list):
+        """
+        _predict_chunks Run the model on the chunks at 'indices', one chunk at a time. Derived classes that can run several chunks at once override this.
+
+        Args:
+            chunks: Chunks of the recording
+            indices (list): Ascending indices of the chunks to run the model on
+
+        Yields:
+            tuple: (index of the chunk, scores of the chunk for each label)
+        """
+        for i in indices:
+            yield i, np.asarray(self.predict(chunks[i])[0])
+
     def analyze_recording(self, recording):
         """
-        analyze_recording _summary_
+        analyze_recording Apply the model to all chunks of a recording and store the predictions above the recording's minimum confidence in 'results'.
+        Predictions are written into a score matrix of shape (number of chunks, number of labels) which is taken from the shared buffer pool if one has been set.
+        Chunks that did not pass the activity gate of the preprocessor are not run through the model, have no predictions and are listed in 'skipped'.
 
         Args:
-            recording (_type_): _description_
+            recording (Recording): Recording whose chunks to analyze
         """
         print("name of model: ", self.name)
+        chunks = recording.processor.chunks
+        num_chunks = len(chunks)
+        activity = getattr(recording.processor, "activity", None)
+
+        # (start, end) of each chunk
+        times = []
         start = 0
         end = recording.processor.sample_secs
-        results = {}
-        for c in recording.processor.chunks:
+        for _ in range(num_chunks):
+            times.append((start, end))
+            start += recording.processor.sample_secs - recording.processor.overlap
+            end = start + recording.processor.sample_secs
 
-            # make predictions and put together with labels
-            predictions = self.predict(c)[0]
+        active = [i for i in range(num_chunks) if activity is None or activity[i]]
+        results = {t: [] for t in times}
+        scores = None
 
-            labeled_predictions = list(zip(self.labels, predictions))
+        for i, predictions in self._predict_chunks(chunks, active):
 
-            # Sort by score and filter
-            sorted_predictions = sorted(
-                labeled_predictions, key=operator.itemgetter(1), reverse=True
-            )
+            if scores is None:
+                # labels without a score are ignored, like zipping labels and scores would
+                num_labels = min(len(self.labels), predictions.shape[-1])
+                scores = (
+                    self.buffers.scores(num_chunks, num_labels, predictions.dtype)
+                    if self.buffers is not None
+                    else np.empty((num_chunks, num_labels), predictions.dtype)
+                )
+
+            scores[i, :] = predictions[: scores.shape[1]]
 
             # Filter by recording.minimum_confidence so not to needlessly store full array for each chunk.
-            labeled_predictions_filtered = [
-                i for i in sorted_predictions if i[1] >= recording.minimum_confidence
-            ]
+            results[times[i]] = self._filter_predictions(
+                scores[i], recording.minimum_confidence
+            )
 
-            # Store results
-            results[(start, end)] = labeled_predictions_filtered
+        self.results = results
+        self.skipped = [times[i] for i in sorted(set(range(num_chunks)) - set(active))]
 
-            # Increment start and end
-            start += recording.processor.sample_secs - recording.processor.overlap
-            end = start + recording.processor.sample_secs
 
-            self.results = results
+class TFLiteModelBase(ModelBase):
+    """
+    TFLiteModelBase Base class for models in a 'model.tflite' file that implements 'predict' on the fast path of the tflite interpreter.
+    The indices, shape and quantization of the input and output tensors are looked up once when the model is loaded, chunks are
+    written directly into the input buffer of the interpreter without stacking them first, and 'analyze_recording' runs 'batch_size'
+    chunks at once with an input tensor that is resized only once. Derived classes usually only override 'postprocess', e.g., to apply
+    a sigmoid to the logits of the model. With the 'onnx' backend, which has the same interpreter interface, 'model.onnx' files run the same way.
+
+    Attributes:
+        input_layer_index (int): index of the input tensor
+        output_layer_index (int): index of the output tensor
+        input_shape (list): shape of the input tensor as stored in the model file
+        batch_size (int): number of chunks 'analyze_recording' runs through the model at once
+        use_xnnpack (bool): whether the interpreter applies the XNNPACK delegate
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model_path: str,
+        labels_path: str,
+        num_threads: int = 1,
+        batch_size: int = 1,
+        use_xnnpack: bool = True,
+        input_layer_index: int = None,
+        output_layer_index: int = None,
+        backend: str = "tflite",
+        **kwargs,
+    ):
+        """
+        __init__ Create a new TFLiteModelBase and load the model.
+
+        Args:
+            name (str): Name of the model
+            model_path (str): Path to the 'model.tflite' file
+            labels_path (str): Path to the labels file
+            num_threads (int, optional): Number of threads of the interpreter. Defaults to 1.
+            batch_size (int, optional): Number of chunks to run through the model at once. The model must accept inputs of this size
+                                        in its first dimension. Defaults to 1.
+            use_xnnpack (bool, optional): Whether to apply the XNNPACK delegate for float models. Defaults to True.
+            input_layer_index (int, optional): Index of the input tensor. Defaults to None (first input of the model).
+            output_layer_index (int, optional): Index of the output tensor. Defaults to None (first output of the model).
+            backend (str, optional): Backend to load the model with, 'tflite' or 'onnx'. Defaults to 'tflite'.
+
+        Raises:
+            ValueError: When 'batch_size' is smaller than 1.
+            ValueError: When the backend does not provide an interpreter.
+        """
+        if batch_size < 1:
+            raise ValueError("'batch_size' must be >= 1")
+
+        if backend not in ["tflite", "onnx"]:
+            raise ValueError(
+                "'backend' of a TFLiteModelBase must be in 'tflite', 'onnx'"
+            )
+
+        self.batch_size = batch_size
+
+        self.use_xnnpack = use_xnnpack
+
+        self.input_layer_index = input_layer_index
+
+        self.output_layer_index = output_layer_index
+
+        super().__init__(
+            name, model_path, labels_path, num_threads, backend=backend, **kwargs
+        )
+
+    def load_model(self):
+        """
+        load_model Load the model, allocate its tensors and look up its input and output.
+        """
+        if self.backend == "tflite":
+            self.model = utils.load_model_from_file_tflite(
+                self.model_path, self.num_threads, use_xnnpack=self.use_xnnpack
+            )
+        else:
+            self.model = utils.MODEL_BACKENDS[self.backend][1](
+                self.model_path, self.num_threads
+            )
+
+        if utils.QuantizedInterpreter.is_quantized(self.model):
+            self.model = utils.QuantizedInterpreter(self.model)
+            self.is_quantized = True
+
+        input_details = self.model.get_input_details()[0]
+
+        if self.input_layer_index is None:
+            self.input_layer_index = input_details["index"]
+
+        if self.output_layer_index is None:
+            self.output_layer_index = self.model.get_output_details()[0]["index"]
+
+        self.input_shape = [int(n) for n in input_details["shape"]]
+
+        self.input_quantization = (
+            self.model.input_quantization.get(self.input_layer_index)
+            if self.is_quantized
+            else None
+        )
+
+        self.model.allocate_tensors()
+
+        self.allocated_batch_size = self.input_shape[0]
+
+    def _resize(self, batch_size: int):
+        """
+        _resize Resize the input tensor to hold 'batch_size' chunks, unless it already does.
+
+        Args:
+            batch_size (int): Number of chunks
+        """
+        if batch_size == self.allocated_batch_size:
+            return
+
+        self.model.resize_tensor_input(
+            self.input_layer_index, [batch_size] + self.input_shape[1:]
+        )
+        self.model.allocate_tensors()
+        self.allocated_batch_size = batch_size
+
+    def _run(self, chunks: list) -> np.ndarray:
+        """
+        _run Write chunks into the input buffer of the interpreter, run it and get the output. Rows of the input that are not
+        covered by a chunk are set to zero and their output is dropped.
+
+        Args:
+            chunks (list): At most 'allocated_batch_size' chunks
+
+        Returns:
+            np.ndarray: Output of the model with one row per chunk
+        """
+        # a view of the buffer must not be held while the interpreter runs
+        buffer = self.model.tensor(self.input_layer_index)()
+
+        for i, chunk in enumerate(chunks):
+            chunk = np.reshape(chunk, buffer.shape[1:])
+
+            if self.input_quantization is not None:
+                scale, zero_point, dtype = self.input_quantization
+                chunk = (
+                    chunk.astype(dtype)
+                    if scale is None
+                    else utils.quantize(chunk, scale, zero_point, dtype)
+                )
+
+            buffer[i] = chunk
+
+        buffer[len(chunks) :] = 0
+        del buffer
+
+        self.model.invoke()
+
+        return self.model.get_tensor(self.output_layer_index)[: len(chunks)]
+
+    def postprocess(self, output: np.ndarray) -> np.ndarray:
+        """
+        postprocess Turn the output of the model into scores for each label. Returns the output unchanged, override this for models that output logits.
+
+        Args:
+            output (np.ndarray): Output of the model with one row per chunk
+
+        Returns:
+            np.ndarray: Scores with one row per chunk
+        """
+        return output
+
+    def predict(self, data) -> np.ndarray:
+        """
+        predict Run the model on one chunk or on a batch of chunks.
+
+        Args:
+            data (np.ndarray | list): A single chunk, or a list or array of chunks
+
+        Returns:
+            np.ndarray: Scores with one row per chunk
+        """
+        if isinstance(data, np.ndarray) and data.ndim == len(self.input_shape) - 1:
+            data = [data]
+
+        self._resize(len(data))
+
+        return self.postprocess(self._run(data))
+
+    def _predict_chunks(self, chunks, indices: list):
+        """
+        _predict_chunks Run the model on the chunks at 'indices' in batches of 'batch_size'. The last batch is padded, such that the input tensor keeps its size.
+
+        Args:
+            chunks: Chunks of the recording
+            indices (list): Ascending indices of the chunks to run the model on
+
+        Yields:
+            tuple: (index of the chunk, scores of the chunk for each label)
+        """
+        self._resize(self.batch_size)
+
+        for first in range(0, len(indices), self.batch_size):
+            batch = indices[first : first + self.batch_size]
+            scores = self.postprocess(self._run([chunks[i] for i in batch]))
+            yield from zip(batch, scores)
@@ -2,6 +2,9 @@ from abc import ABC, abstractmethod
 import numpy as np
 import librosa
 import audioread
+import warnings
+
+from faunanet.decoders import AudioDecoder
 
 
 class AudioFormatError(Exception):
@@ -30,10 +33,17 @@ class PreprocessorBase(ABC):
         self.duration = 0
         self.actual_sampling_rate = 0
         self.chunks = []
+        self.buffers = (
+            None  # BufferPool shared with model and recording, set by the Recording
+        )
+        self.decoder = AudioDecoder()
+        self.gate = None  # ActivityGate, set by the Recording if configured
+        self.activity = None  # mask of the chunks that passed the gate
+        self.gate_warned = False
 
     def read_audio_data(self, path: str) -> np.array:
         """
-        read_audio_data Read in audio data, resample and return the resampled raw data, adding members for actual sampling rate and duration of audio file.
+        read_audio_data Read in audio data with the fastest decoder backend for its format, resample and return the resampled raw data, adding members for actual sampling rate and duration of audio file.
         Args:
             path (str): Path to the audio file to be analyzed
 
@@ -45,9 +55,16 @@ class PreprocessorBase(ABC):
         """
 
         try:
-            data, rate = librosa.load(
-                path, sr=self.sample_rate, mono=True, res_type=self.resample_type
-            )
+            data, rate = self.decoder.decode(path, buffers=self.buffers)
+
+            if rate != self.sample_rate:
+                data = librosa.resample(
+                    data,
+                    orig_sr=rate,
+                    target_sr=self.sample_rate,
+                    res_type=self.resample_type,
+                )
+                rate = self.sample_rate
 
             self.duration = librosa.get_duration(y=data, sr=self.sample_rate)
             self.actual_sampling_rate = rate
@@ -72,6 +89,77 @@ class PreprocessorBase(ABC):
 
         return data
 
+    def chunk_audio(
+        self, rawdata: np.ndarray, min_secs: float = 1.5, pad: bool = True
+    ) -> np.ndarray:
+        """
+        chunk_audio Split audio data into overlapping chunks of 'sample_secs' length. Uses the pooled chunk buffer if a buffer pool has been set,
+                    such that implementations of 'process_audio_data' can use this to avoid allocating a new array for each chunk.
+                    If an activity gate has been set, the chunks that pass it are marked in 'activity', and models skip the others.
+
+        Args:
+            rawdata (np.ndarray): Audio data as returned by 'read_audio_data'
+            min_secs (float, optional): Trailing audio shorter than this is dropped. Defaults to 1.5.
+            pad (bool, optional): Whether to zero-pad the last chunk to full length. If False, a last chunk that is too short is dropped. Defaults to True.
+
+        Returns:
+            np.ndarray: 2D array of shape (number of chunks, samples per chunk).
+        """
+        chunk_length = int(self.sample_secs * self.sample_rate)
+        step = int((self.sample_secs - self.overlap) * self.sample_rate)
+        min_length = int(min_secs * self.sample_rate) if pad else chunk_length
+
+        if step <= 0:
+            raise ValueError("'overlap' must be smaller than 'sample_secs'")
+
+        starts = [
+            i for i in range(0, len(rawdata), step) if len(rawdata) - i >= min_length
+        ]
+
+        if self.buffers is not None:
+            chunks = self.buffers.chunks(len(starts), chunk_length, dtype=rawdata.dtype)
+        else:
+            chunks = np.empty((len(starts), chunk_length), dtype=rawdata.dtype)
+
+        for row, i in enumerate(starts):
+            split = rawdata[i : i + chunk_length]
+            chunks[row, : len(split)] = split
+            chunks[row, len(split) :] = 0.0
+
+        self.activity = (
+            None if self.gate is None else self.gate.evaluate(chunks, self.sample_rate)
+        )
+
+        return chunks
+
+    def apply_gate(self):
+        """
+        apply_gate Mark the chunks that pass the activity gate for implementations of 'process_audio_data' that chunk the audio themselves
+                   instead of via 'chunk_audio'. Does nothing without a gate or if 'chunk_audio' has evaluated it already. Chunks that are
+                   not raw audio of equal length, e.g., spectrograms, cannot be gated, which is warned about once, and all of them are analyzed.
+        """
+        if self.gate is None or self.activity is not None:
+            return
+
+        if len(self.chunks) == 0:
+            self.activity = np.ones(0, dtype=bool)
+            return
+
+        try:
+            chunks = np.asarray(self.chunks)
+        except ValueError:  # chunks of different lengths
+            chunks = None
+
+        if chunks is None or chunks.ndim != 2 or chunks.dtype.kind != "f":
+            if self.gate_warned is False:
+                warnings.warn(
+                    f"the activity gate cannot be applied to the chunks of preprocessor {self.name}, which are not raw audio, analyzing all chunks"
+                )
+                self.gate_warned = True
+            return
+
+        self.activity = self.gate.evaluate(chunks, self.sample_rate)
+
     @abstractmethod
     def process_audio_data(self, rawdata: np.ndarray) -> list:
         """
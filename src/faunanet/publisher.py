@@ -0,0 +1,258 @@
+from pathlib import Path
+from datetime import datetime
+import threading
+import socket
+import json
+
+
+def _matches(detection: dict, labels: set, min_confidence: float) -> bool:
+    """
+    _matches Check if a detection passes a label and confidence filter.
+
+    Args:
+        detection (dict): Detection as produced by `Recording.detections`
+        labels (set): Set of allowed labels. An empty set allows all labels.
+        min_confidence (float): Minimum confidence a detection must have.
+
+    Returns:
+        bool: True if the detection passes the filter, False otherwise.
+    """
+    if len(labels) > 0 and detection["label"] not in labels:
+        return False
+
+    return float(detection["confidence"]) >= min_confidence
+
+
+class DetectionPublisher:
+    """
+    DetectionPublisher Publish the detections of each analyzed file to local subscribers.
+    Subscribers connect to a unix domain socket and receive one line of JSON per analyzed file.
+    After connecting, a subscriber may send a single line of JSON with the keys 'labels' and
+    'min_confidence' to restrict what it is sent. This filter is applied on the publisher side
+    in addition to the filter the publisher has been created with.
+
+    Methods:
+    --------
+    start: Open the socket and start accepting subscribers.
+    publish: Send the detections of a file to all subscribers whose filter they pass.
+    stop: Disconnect all subscribers and remove the socket.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        labels: list = None,
+        min_confidence: float = 0.0,
+        max_subscribers: int = 16,
+        send_timeout: float = 0.5,
+    ):
+        """
+        __init__ Create a new DetectionPublisher.
+
+        Args:
+            socket_path (str): Path of the unix domain socket to create.
+            labels (list, optional): Labels to publish. If None, all labels are published. Defaults to None.
+            min_confidence (float, optional): Minimum confidence of published detections. Defaults to 0.0.
+            max_subscribers (int, optional): Maximum number of simultaneously connected subscribers. Defaults to 16.
+            send_timeout (float, optional): Time in seconds after which a subscriber that does not read is dropped. Defaults to 0.5.
+        """
+        self.socket_path = Path(socket_path).expanduser()
+        self.labels = set(labels) if labels is not None else set()
+        self.min_confidence = min_confidence
+        self.max_subscribers = max_subscribers
+        self.send_timeout = send_timeout
+        self.subscribers = []
+        self.server = None
+        self.accept_thread = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_running(self):
+        return self.server is not None
+
+    @property
+    def num_subscribers(self):
+        with self.lock:
+            return len(self.subscribers)
+
+    def start(self):
+        """
+        start Create the socket and accept subscribers in a background daemon thread.
+
+        Raises:
+            RuntimeError: When the publisher is already running.
+        """
+        if self.is_running:
+            raise RuntimeError("Publisher is already running")
+
+        # a socket left over from a previous, killed process would make bind fail
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(str(self.socket_path))
+        self.server.listen(self.max_subscribers)
+
+        self.accept_thread = threading.Thread(
+            target=self._accept_subscribers, daemon=True, name="publisher"
+        )
+        self.accept_thread.start()
+
+    def _read_filter(self, connection: socket.socket) -> tuple:
+        """
+        _read_filter Read the optional filter line a subscriber sends after connecting.
+
+        Args:
+            connection (socket.socket): Connection of the new subscriber
+
+        Returns:
+            tuple: (set of labels, minimum confidence) requested by the subscriber
+        """
+        labels = set()
+        min_confidence = 0.0
+        connection.settimeout(self.send_timeout)
+
+        try:
+            line = connection.makefile("r").readline()
+            if line.strip() != "":
+                requested = json.loads(line)
+                labels = set(requested.get("labels") or [])
+                min_confidence = float(requested.get("min_confidence") or 0.0)
+        except (socket.timeout, ValueError, OSError):
+            # subscribers are not required to send a filter
+            pass
+
+        return labels, min_confidence
+
+    def _accept_subscribers(self):
+        """
+        _accept_subscribers Accept new subscribers until the server socket is closed.
+        """
+        while self.server is not None:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                break
+
+            labels, min_confidence = self._read_filter(connection)
+
+            with self.lock:
+                if len(self.subscribers) >= self.max_subscribers:
+                    connection.close()
+                else:
+                    self.subscribers.append((connection, labels, min_confidence))
+
+    def publish(self, filename: str, detections: list):
+        """
+        publish Send the detections of an analyzed file to all subscribers as one line of JSON.
+        Subscribers that cannot be written to are dropped.
+
+        Args:
+            filename (str): The file the detections belong to.
+            detections (list): Detections as produced by `Recording.detections`.
+        """
+        if self.is_running is False:
+            return
+
+        selected = [
+            {
+                "start": float(d["start"]),
+                "end": float(d["end"]),
+                "label": d["label"],
+                "confidence": float(d["confidence"]),
+            }
+            for d in detections
+            if _matches(d, self.labels, self.min_confidence)
+        ]
+
+        if len(selected) == 0:
+            return
+
+        timestamp = datetime.now().isoformat()
+
+        with self.lock:
+            alive = []
+            for connection, labels, min_confidence in self.subscribers:
+                wanted = [d for d in selected if _matches(d, labels, min_confidence)]
+
+                if len(wanted) == 0:
+                    alive.append((connection, labels, min_confidence))
+                    continue
+
+                message = {
+                    "file": str(filename),
+                    "time": timestamp,
+                    "detections": wanted,
+                }
+
+                try:
+                    connection.sendall((json.dumps(message) + "\n").encode("utf-8"))
+                    alive.append((connection, labels, min_confidence))
+                except OSError:
+                    connection.close()
+
+            self.subscribers = alive
+
+    def stop(self):
+        """
+        stop Disconnect all subscribers, close the socket and remove the socket file.
+        """
+        if self.server is not None:
+            server = self.server
+            self.server = None
+            try:
+                server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            server.close()
+
+        with self.lock:
+            for connection, _, _ in self.subscribers:
+                connection.close()
+            self.subscribers = []
+
+        if self.accept_thread is not None:
+            self.accept_thread.join(timeout=self.send_timeout)
+            self.accept_thread = None
+
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+
+def subscribe(
+    socket_path: str,
+    labels: list = None,
+    min_confidence: float = 0.0,
+    timeout: float = None,
+):
+    """
+    subscribe Connect to a running DetectionPublisher and yield the messages it sends.
+
+    Args:
+        socket_path (str): Path to the publisher's unix domain socket.
+        labels (list, optional): Only receive detections with these labels. Defaults to None (all labels).
+        min_confidence (float, optional): Only receive detections with at least this confidence. Defaults to 0.0.
+        timeout (float, optional): Stop when no message arrives within this many seconds. Defaults to None (wait forever).
+
+    Yields:
+        dict: Message with keys 'file', 'time' and 'detections'.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(str(Path(socket_path).expanduser()))
+        request = {"labels": labels, "min_confidence": min_confidence}
+        connection.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        connection.settimeout(timeout)
+
+        reader = connection.makefile("r")
+        while True:
+            try:
+                line = reader.readline()
+            except socket.timeout:
+                return
+
+            if line == "":
+                return
+
+            yield json.loads(line)
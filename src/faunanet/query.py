@@ -0,0 +1,373 @@
+from pathlib import Path
+from datetime import datetime
+import sqlite3
+import threading
+
+INDEX_NAME = "detections.sqlite"
+
+# keys detections can be grouped by in 'DetectionIndex.aggregate' and the SQL expressions that compute them
+AGGREGATION_KEYS = {
+    "label": "d.label",
+    "model": "d.model",
+    "run": "d.run",
+    "recording": "d.recording",
+    "day": "strftime('%Y-%m-%d', d.time, 'unixepoch', 'localtime')",
+    "hour": "strftime('%Y-%m-%d %H:00', d.time, 'unixepoch', 'localtime')",
+    "hour_of_day": "strftime('%H', d.time, 'unixepoch', 'localtime')",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    run TEXT NOT NULL,
+    recording TEXT NOT NULL,
+    recorded REAL NOT NULL,
+    PRIMARY KEY (run, recording)
+);
+CREATE TABLE IF NOT EXISTS detections (
+    run TEXT NOT NULL,
+    recording TEXT NOT NULL,
+    model TEXT,
+    label TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    time REAL NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS detections_time ON detections (time);
+CREATE INDEX IF NOT EXISTS detections_label_time ON detections (label, time);
+CREATE INDEX IF NOT EXISTS detections_recording ON detections (run, recording);
+"""
+
+
+def _timestamp(value) -> float:
+    """
+    _timestamp Convert a point in time to a unix timestamp.
+
+    Args:
+        value (datetime | str | float): datetime, ISO format string like '2024-05-01' or '2024-05-01T05:00', or unix timestamp
+
+    Returns:
+        float: Unix timestamp
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+
+    if isinstance(value, datetime):
+        return value.timestamp()
+
+    return float(value)
+
+
+def _time_of_day(value: str) -> str:
+    """
+    _time_of_day Normalize a time of day to 'HH:MM:SS', such that it can be compared to the ones computed by sqlite.
+
+    Args:
+        value (str): Time of day like '05:00' or '5:00:30'
+
+    Raises:
+        ValueError: When the value is not a valid time of day.
+
+    Returns:
+        str: Time of day as 'HH:MM:SS'
+    """
+    parts = [int(p) for p in str(value).split(":")]
+
+    if not 1 <= len(parts) <= 3 or not 0 <= parts[0] <= 24:
+        raise ValueError(f"Invalid time of day {value}, must be 'HH:MM'")
+
+    parts += [0] * (3 - len(parts))
+    return "{:02d}:{:02d}:{:02d}".format(*parts)
+
+
+class DetectionIndex:
+    """
+    DetectionIndex SQLite index of the detections of all runs in an output directory, which is filled as results are written.
+    It answers questions like "which species were detected between 05:00 and 07:00 last week above 0.7" without reading any results file.
+    The time of a detection is the time its recording was created plus the start of the detection within the recording.
+    Several processes may write to the index at the same time, sqlite serializes the writes.
+
+    Methods:
+    --------
+    add: Add the detections of a recording, replacing earlier ones of the same recording.
+    recordings: Get the recordings in the index.
+    query: Get the detections that match filters.
+    aggregate: Count the detections that match filters per group.
+    close: Close the database.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        __init__ Open the index, creating it if it does not exist.
+
+        Args:
+            path (str): Path of the database file
+            timeout (float, optional): Time in seconds to wait for other processes that are writing to the index. Defaults to 30.
+        """
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(
+            str(self.path), timeout=timeout, check_same_thread=False
+        )
+        # lets readers, e.g., a query from the shell, work while the watcher writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        self.lock = threading.Lock()
+
+    def add(self, run: str, recording: str, recorded: float, detections: list):
+        """
+        add Add the detections of a recording. Detections that were added for the same recording before are replaced, so adding results again is safe.
+
+        Args:
+            run (str): Name of the run, i.e., its output folder
+            recording (str): Name of the recording
+            recorded (float): Unix timestamp of the creation of the recording
+            detections (list): Detections with 'label', 'confidence', 'start' and 'end', and 'model' for ensembles
+        """
+        rows = [
+            (
+                run,
+                recording,
+                d.get("model"),
+                d["label"],
+                float(d["confidence"]),
+                recorded + float(d["start"]),
+                float(d["start"]),
+                float(d["end"]),
+            )
+            for d in detections
+        ]
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM detections WHERE run = ? AND recording = ?",
+                (run, recording),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO recordings VALUES (?, ?, ?)",
+                (run, recording, recorded),
+            )
+            self.connection.executemany(
+                "INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def recordings(self, run: str = None) -> list:
+        """
+        recordings Get the recordings in the index, including those without detections.
+
+        Args:
+            run (str, optional): Only get the recordings of this run. Defaults to None (all runs).
+
+        Returns:
+            list: (run, recording) tuples
+        """
+        sql = "SELECT run, recording FROM recordings"
+        parameters = []
+
+        if run is not None:
+            sql += " WHERE run = ?"
+            parameters.append(run)
+
+        with self.lock:
+            return self.connection.execute(
+                sql + " ORDER BY run, recording", parameters
+            ).fetchall()
+
+    def _where(
+        self,
+        start=None,
+        end=None,
+        daily_from: str = None,
+        daily_to: str = None,
+        labels: list = None,
+        min_confidence: float = None,
+        runs: list = None,
+        models: list = None,
+    ) -> tuple:
+        """
+        _where Build the WHERE clause for the given filters. See 'query' for their meaning.
+
+        Returns:
+            tuple: (SQL clause, parameters)
+        """
+        conditions = []
+        parameters = []
+
+        if start is not None:
+            conditions.append("d.time >= ?")
+            parameters.append(_timestamp(start))
+
+        if end is not None:
+            conditions.append("d.time < ?")
+            parameters.append(_timestamp(end))
+
+        if daily_from is not None or daily_to is not None:
+            low = _time_of_day("00:00" if daily_from is None else daily_from)
+            high = _time_of_day("24:00" if daily_to is None else daily_to)
+            time_of_day = "strftime('%H:%M:%S', d.time, 'unixepoch', 'localtime')"
+            # a window like 22:00 - 02:00 spans midnight
+            combine = "AND" if low <= high else "OR"
+            conditions.append(f"({time_of_day} >= ? {combine} {time_of_day} < ?)")
+            parameters.extend([low, high])
+
+        if labels is not None and len(labels) > 0:
+            conditions.append(
+                "("
+                + " OR ".join("instr(lower(d.label), lower(?)) > 0" for _ in labels)
+                + ")"
+            )
+            parameters.extend(labels)
+
+        if min_confidence is not None:
+            conditions.append("d.confidence >= ?")
+            parameters.append(float(min_confidence))
+
+        if runs is not None and len(runs) > 0:
+            conditions.append(f"d.run IN ({', '.join('?' for _ in runs)})")
+            parameters.extend(runs)
+
+        if models is not None and len(models) > 0:
+            conditions.append(f"d.model IN ({', '.join('?' for _ in models)})")
+            parameters.extend(models)
+
+        if len(conditions) == 0:
+            return "", parameters
+
+        return " WHERE " + " AND ".join(conditions), parameters
+
+    def query(
+        self,
+        start=None,
+        end=None,
+        daily_from: str = None,
+        daily_to: str = None,
+        labels: list = None,
+        min_confidence: float = None,
+        runs: list = None,
+        models: list = None,
+        limit: int = None,
+    ) -> list:
+        """
+        query Get the detections that match all given filters, in the order in which they happened.
+
+        Args:
+            start (datetime | str | float, optional): Earliest time of a detection, as datetime, ISO string or unix timestamp. Defaults to None.
+            end (datetime | str | float, optional): Time before which detections must have happened. Defaults to None.
+            daily_from (str, optional): Earliest local time of day of a detection, e.g., '05:00'. Defaults to None.
+            daily_to (str, optional): Local time of day before which detections must have happened, e.g., '07:00'. Defaults to None.
+            labels (list, optional): Parts of labels to look for, case insensitive. A detection matches if its label contains any of them. Defaults to None.
+            min_confidence (float, optional): Minimum confidence of a detection. Defaults to None.
+            runs (list, optional): Names of the runs to look at. Defaults to None (all).
+            models (list, optional): Names of the ensemble models to look at. Defaults to None (all).
+            limit (int, optional): Maximum number of detections to return. Defaults to None (all).
+
+        Returns:
+            list: Detections as dictionaries with 'run', 'recording', 'model', 'label', 'confidence', 'time' as datetime, 'start' and 'end' within the recording.
+        """
+        where, parameters = self._where(
+            start, end, daily_from, daily_to, labels, min_confidence, runs, models
+        )
+
+        sql = (
+            "SELECT d.run, d.recording, d.model, d.label, d.confidence, d.time, d.start, d.end "
+            "FROM detections d" + where + " ORDER BY d.time"
+        )
+
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(int(limit))
+
+        with self.lock:
+            rows = self.connection.execute(sql, parameters).fetchall()
+
+        return [
+            {
+                "run": run,
+                "recording": recording,
+                "model": model,
+                "label": label,
+                "confidence": confidence,
+                "time": datetime.fromtimestamp(time),
+                "start": start,
+                "end": end,
+            }
+            for run, recording, model, label, confidence, time, start, end in rows
+        ]
+
+    def aggregate(self, by: list = None, **filters) -> list:
+        """
+        aggregate Count the detections that match the filters per group, e.g., per species and hour.
+
+        Args:
+            by (list, optional): Keys to group by, out of AGGREGATION_KEYS. Defaults to ["label"].
+            **filters: Filters as for 'query'.
+
+        Raises:
+            ValueError: When an unknown key is given to group by.
+
+        Returns:
+            list: One dictionary per group with the keys to group by, 'count' and 'max_confidence', sorted by the keys.
+        """
+        by = ["label"] if by is None else list(by)
+
+        for key in by:
+            if key not in AGGREGATION_KEYS:
+                raise ValueError(
+                    f"Unknown aggregation key {key}, must be in {list(AGGREGATION_KEYS.keys())}"
+                )
+
+        where, parameters = self._where(**filters)
+        keys = ", ".join(AGGREGATION_KEYS[key] for key in by)
+
+        sql = (
+            f"SELECT {keys}, COUNT(*), MAX(d.confidence) FROM detections d{where} "
+            f"GROUP BY {keys} ORDER BY {keys}"
+        )
+
+        with self.lock:
+            rows = self.connection.execute(sql, parameters).fetchall()
+
+        return [
+            dict(zip(by, row[: len(by)]), count=row[-2], max_confidence=row[-1])
+            for row in rows
+        ]
+
+    def close(self):
+        """
+        close Close the database.
+        """
+        with self.lock:
+            self.connection.close()
+
+
+def query_detections(outdir: str, by: list = None, **filters) -> list:
+    """
+    query_detections Query the detection index of an output directory.
+
+    Args:
+        outdir (str): Output base directory, which holds the index, or the path of the index itself
+        by (list, optional): Keys to group by. If given, the detections are aggregated per group, see 'DetectionIndex.aggregate'. Defaults to None.
+        **filters: Filters as for 'DetectionIndex.query'.
+
+    Raises:
+        FileNotFoundError: When there is no index.
+
+    Returns:
+        list: Detections, or groups if 'by' is given.
+    """
+    path = Path(outdir).expanduser()
+
+    if path.is_dir():
+        path = path / INDEX_NAME
+
+    if path.is_file() is False:
+        raise FileNotFoundError(f"No detection index found at {path}")
+
+    index = DetectionIndex(path)
+    try:
+        if by is None:
+            return index.query(**filters)
+        return index.aggregate(by=by, **filters)
+    finally:
+        index.close()
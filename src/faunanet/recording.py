@@ -2,6 +2,7 @@ import os
 import numpy as np
 from pathlib import Path
 import datetime
+import time
 import warnings
 
 from birdnetlib.main import RecordingBase
@@ -9,6 +10,8 @@ from faunanet.preprocessor_base import PreprocessorBase
 from faunanet.model_base import ModelBase
 import faunanet.utils as utils
 from faunanet.species_predictor import SpeciesPredictorBase
+from faunanet.buffers import BufferPool
+from faunanet.activity_gate import ActivityGate
 
 
 class Recording(RecordingBase):
@@ -42,6 +45,7 @@ class Recording(RecordingBase):
         min_conf: float = 0.25,
         species_predictor: SpeciesPredictorBase = None,
         file_check_poll_interval: int = 1,
+        activity_gate: dict = None,
     ):
         # README: The arguments lon, lat, species_presence_threshold and week_48, date should be moved out of the __init__ at some point, at some point perhaps?
         """
@@ -59,6 +63,7 @@ class Recording(RecordingBase):
             min_conf (float, optional): Minimal confidence to use to consider a detection valid. Defaults to 0.1.
             species_predictor: An instance of a class derived from `SpeciesPredictorBase`. Only applicable if `model` is the birdnet default model.
             file_check_poll_interval: Inteval in seconds at which the recording should check whether the file to be analyzed is still being written to. Defaults to 1
+            activity_gate (dict, optional): Keyword arguments for an ActivityGate that keeps silent or noise-only chunks from the model. Defaults to None (analyze all chunks).
         """
         self.processor = preprocessor
         self.analyzer = model
@@ -69,6 +74,21 @@ class Recording(RecordingBase):
         self.allowed_species = []
         self.file_check_poll_interval = file_check_poll_interval
 
+        # decoder shared with other recordings analyzing the same files, if any
+        self.decoder = None
+
+        # time in seconds the last call of 'analyze' spent decoding and analyzing, without waiting for the file to be written
+        self.analysis_time = 0.0
+        self.wait_time = 0.0
+
+        # buffers are reused for every file this recording analyzes
+        self.buffers = BufferPool()
+        self.processor.buffers = self.buffers
+        self.analyzer.buffers = self.buffers
+
+        self.gate = None if activity_gate is None else ActivityGate(**activity_gate)
+        self.processor.gate = self.gate
+
         # make sure that all the system components are compatible. Based on name tags. Still a bit susceptible. Fix?
 
         self._check_model_system_viability(
@@ -122,6 +142,28 @@ class Recording(RecordingBase):
     def chunks(self):
         return self.processor.chunks
 
+    @property
+    def skipped_chunks(self) -> list:
+        """
+        skipped_chunks Chunks of the last analyzed file that did not pass the activity gate.
+
+        Returns:
+            list: (start, end) tuples in seconds
+        """
+        return self.analyzer.skipped
+
+    @property
+    def decode_stats(self) -> dict:
+        """
+        decode_stats Decode throughput per file format of the decoder this recording reads files with.
+
+        Returns:
+            dict: suffix -> statistics as returned by 'AudioDecoder.stats'
+        """
+        if self.decoder is None:
+            return self.processor.decoder.stats
+        return self.decoder.decoder.stats
+
     def set_analyzer(
         self,
         model: ModelBase,
@@ -148,6 +190,12 @@ class Recording(RecordingBase):
 
         self.processor = preprocessor
 
+        # old buffers may be sized for a different model
+        self.buffers.clear()
+        self.processor.buffers = self.buffers
+        self.analyzer.buffers = self.buffers
+        self.processor.gate = self.gate
+
         if species_predictor is not None:
             self.species_predictor = species_predictor
 
@@ -188,7 +236,11 @@ class Recording(RecordingBase):
         Returns:
             list: data processed to be analyzed
         """
-        return self.processor.process_audio_data(data)
+        # the gate is evaluated anew for each file, by 'chunk_audio' or after the chunks are made
+        self.processor.activity = None
+        processed = self.processor.process_audio_data(data)
+        self.processor.apply_gate()
+        return processed
 
     def read_audio_data(self):
         """Read audio data from file and pass it on for preprocessing.
@@ -200,14 +252,78 @@ class Recording(RecordingBase):
         # README: wait until the file to be opened does not change in size anymore.
         # only working way in which we do not have to make assumptions about the
         # system that actually writes the file?
-        utils.wait_for_file_completion(
-            str(self.path), polling_interval=self.file_check_poll_interval
-        )
-
-        rawdata = self.processor.read_audio_data(self.path)
+        started = time.monotonic()
+        if self.decoder is None:
+            utils.wait_for_file_completion(
+                str(self.path), polling_interval=self.file_check_poll_interval
+            )
+            self.wait_time = time.monotonic() - started
+            rawdata = self.processor.read_audio_data(self.path)
+        else:
+            # another recording may have read this file already
+            if self.decoder.has(self.path) is False:
+                utils.wait_for_file_completion(
+                    str(self.path), polling_interval=self.file_check_poll_interval
+                )
+            self.wait_time = time.monotonic() - started
+            rawdata = self.decoder.read(self.path, self.processor)
 
         return self.process_audio_data(rawdata)
 
+    def forget_file(self):
+        """
+        forget_file Drop what is left from the last analyzed file, i.e., its chunks, the chunks the activity gate skipped, the predictions
+        and the analysis time, e.g., when the results of the next file are taken from a cache instead.
+        """
+        self.processor.chunks = []
+        self.processor.activity = None
+        self.processor.duration = 0
+        self.analyzer.results = None
+        self.analyzer.skipped = []
+        self.analysis_time = 0.0
+        self.analyzed = False
+
+    def analyze(self):
+        """
+        analyze Read, preprocess and analyze the file at 'path', and record the time spent on it in 'analysis_time'.
+        """
+        self.wait_time = 0.0
+        started = time.monotonic()
+        super().analyze()
+        self.analysis_time = time.monotonic() - started - self.wait_time
+
+    def analyze_data(
+        self, data: np.ndarray, offset: float = 0.0, num_chunks: int = None
+    ) -> list:
+        """
+        analyze_data Analyze audio data that has been decoded already, e.g., the part of a file that has been written so far.
+
+        Args:
+            data (np.ndarray): Mono audio data at the sample rate of the preprocessor
+            offset (float, optional): Time in seconds of the start of 'data' within the file, added to the times of the detections. Defaults to 0.0.
+            num_chunks (int, optional): Only analyze the first 'num_chunks' chunks. Defaults to None (analyze all chunks).
+
+        Returns:
+            list: Detections like 'detections', with times relative to the start of the file.
+        """
+        self.processor.actual_sampling_rate = self.processor.sample_rate
+        self.processor.duration = len(data) / self.processor.sample_rate
+
+        self.process_audio_data(data)
+
+        if num_chunks is not None:
+            self.processor.chunks = self.processor.chunks[:num_chunks]
+            if self.processor.activity is not None:
+                self.processor.activity = self.processor.activity[:num_chunks]
+
+        self.analyzer.analyze_recording(self)
+        self.analyzed = True
+
+        return [
+            dict(d, start=d["start"] + offset, end=d["end"] + offset)
+            for d in self.detections
+        ]
+
     @classmethod
     def from_cfg(cls, faunanet_path: str, cfg: dict):
         """
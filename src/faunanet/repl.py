@@ -1,12 +1,50 @@
 from pathlib import Path
 from platformdirs import user_config_dir, user_cache_dir
 import cmd
+import shlex
 import time
 import traceback
 
 from faunanet import Watcher
 import faunanet.faunanet_setup as sps
 from faunanet.utils import read_yaml, update_dict_leafs_recursive, get_method_docstring
+from faunanet.query import INDEX_NAME, query_detections
+from faunanet.resources import plan_resources
+
+# optional nodes of the 'Analysis' section that model default configs usually do not provide.
+# They are taken over from a custom config as a whole instead of being silently ignored.
+OPTIONAL_ANALYSIS_NODES = [
+    "Publisher",
+    "Ensemble",
+    "Cache",
+    "Cluster",
+    "Observer",
+    "Tail",
+    "Stream",
+    "Compaction",
+    "Index",
+    "Resources",
+    "Retention",
+    "Workers",
+    "Supervisor",
+    "Shedding",
+    "Scheduler",
+    "Writer",
+]
+
+# arguments of the 'query' command and how their values are converted
+QUERY_ARGUMENTS = {
+    "from": ("start", str),
+    "to": ("end", str),
+    "daily_from": ("daily_from", str),
+    "daily_to": ("daily_to", str),
+    "label": ("labels", lambda v: v.split(",")),
+    "min_confidence": ("min_confidence", float),
+    "run": ("runs", lambda v: v.split(",")),
+    "model": ("models", lambda v: v.split(",")),
+    "by": ("by", lambda v: v.split(",")),
+    "limit": ("limit", int),
+}
 
 
 def process_line_into_kwargs(line: str, keywords: list = None) -> dict:
@@ -112,6 +150,10 @@ class FaunanetCmd(cmd.Cmd):
 
         update_dict_leafs_recursive(config, custom_config)
 
+        for node in OPTIONAL_ANALYSIS_NODES:
+            if node in custom_config["Analysis"] and node not in config["Analysis"]:
+                config["Analysis"][node] = custom_config["Analysis"][node]
+
         return config
 
     def process_arguments(
@@ -222,9 +264,7 @@ class FaunanetCmd(cmd.Cmd):
         if self.watcher is not None and self.watcher.is_running:
             try:  # Try to stop the watcher
                 self.watcher.stop()
-                self.wait_for_watcher_event(
-                    lambda s: s.watcher.is_running is False, limit=20, waiting_time=3
-                )
+                self.wait_for_watcher_state(["stopped", "failed"], timeout=60)
             except Exception as e:
                 self.print_error(
                     f"Could not stop watcher: {e} caused by {e.__cause__}. Watcher process will be killed now."
@@ -257,6 +297,32 @@ class FaunanetCmd(cmd.Cmd):
                 time.sleep(waiting_time)
                 i += 1
 
+    def wait_for_watcher_state(self, states: list, timeout: float = 60) -> bool:
+        """
+        wait_for_watcher_state Block the caller until the watcher process has reached one of the given states. Unlike 'wait_for_watcher_event', this does not poll but is woken up by the watcher process itself.
+
+        Args:
+            states (list): States to wait for. See faunanet.state.WATCHER_STATES for possible values.
+            timeout (float, optional): Timeout in seconds. Defaults to 60.
+
+        Returns:
+            bool: True if one of the states has been reached, False otherwise.
+        """
+        if self.watcher is None:
+            return False
+
+        reached = self.watcher.wait_for_state(states, timeout=timeout)
+
+        if reached is False and self.watcher.state != "failed":
+            print("Error while performing watcher interaction: Timeout.", flush=True)
+        elif self.watcher.state == "failed" and "failed" not in states:
+            print(
+                "Error while performing watcher interaction: Watcher failed.",
+                flush=True,
+            )
+
+        return reached
+
     # Command definitions
 
     def do_help(self, line: str):
@@ -298,6 +364,9 @@ class FaunanetCmd(cmd.Cmd):
             print(
                 "get_setup_info: get information about the current setup of faunanet. This command is used without any further arguments"
             )
+            print(
+                "query: query the detection index. Usage: 'query --from=2024-05-01 --to=2024-05-08 --daily_from=05:00 --daily_to=07:00 --min_confidence=0.7 --by=label,hour'. See 'help query' for all options."
+            )
             print(
                 "exit: leave this shell. This command is used without any further arguments"
             )
@@ -354,13 +423,33 @@ class FaunanetCmd(cmd.Cmd):
                 pattern=cfg["Analysis"]["pattern"],
                 check_time=cfg["Analysis"]["check_time"],
                 delete_recordings=cfg["Analysis"]["delete_recordings"],
+                publisher_config=cfg["Analysis"].get("Publisher", None),
+                ensemble_config=cfg["Analysis"].get("Ensemble", None),
+                cache_config=cfg["Analysis"].get("Cache", None),
+                cluster_config=cfg["Analysis"].get("Cluster", None),
+                observer_config=cfg["Analysis"].get("Observer", None),
+                tail_config=cfg["Analysis"].get("Tail", None),
+                stream_config=cfg["Analysis"].get("Stream", None),
+                compaction_config=cfg["Analysis"].get("Compaction", None),
+                index_config=cfg["Analysis"].get("Index", None),
+                resource_config=cfg["Analysis"].get("Resources", None),
+                retention_config=cfg["Analysis"].get("Retention", None),
+                worker_config=cfg["Analysis"].get("Workers", None),
+                supervisor_config=cfg["Analysis"].get("Supervisor", None),
+                shedding_config=cfg["Analysis"].get("Shedding", None),
+                scheduler_config=cfg["Analysis"].get("Scheduler", None),
+                writer_config=cfg["Analysis"].get("Writer", None),
             )
 
         def start_watcher():
             self.watcher.start()
-            self.wait_for_watcher_event(
-                lambda s: s.watcher.is_running, limit=20, waiting_time=3
-            )
+            self.wait_for_watcher_state(["ready", "failed"], timeout=60)
+
+            if self.watcher.state == "failed":
+                print(
+                    "The watcher process failed during startup. Check the status for more information.",
+                    flush=True,
+                )
 
         # actual build and start process
         if Path(user_config_dir(), "faunanet").exists() is False:
@@ -462,9 +551,7 @@ class FaunanetCmd(cmd.Cmd):
         )
 
         if self.watcher is not None:
-            self.wait_for_watcher_event(
-                lambda s: s.watcher.is_running is False, limit=20, waiting_time=3
-            )
+            self.wait_for_watcher_state(["stopped", "failed"], timeout=60)
 
     def do_cleanup(self, line: str):
         """
@@ -598,6 +685,7 @@ class FaunanetCmd(cmd.Cmd):
             print("model name", self.watcher.model_name, flush=True)
             print("current input directory", self.watcher.input_directory, flush=True)
             print("current output directory", self.watcher.output_directory, flush=True)
+            print("state:", self.watcher.state, flush=True)
             print("is running:", self.watcher.is_running, flush=True)
             print("is sleeping:", self.watcher.is_sleeping, flush=True)
             print("may do work:", self.watcher.may_do_work.is_set(), flush=True)
@@ -607,9 +695,164 @@ class FaunanetCmd(cmd.Cmd):
                 flush=True,
             )
 
+            for suffix, stats in self.watcher.read_decode_stats().items():
+                print(
+                    f"decoding {suffix}: {stats['files']} files with {stats['backend']}, "
+                    f"{stats['realtime_factor']:.1f}x realtime, {stats['megabytes_per_second']:.1f} MB/s",
+                    flush=True,
+                )
+
+            gate_stats = self.watcher.read_gate_stats()
+            if len(gate_stats) > 0:
+                print(
+                    f"activity gate: skipped {gate_stats['skipped']} of {gate_stats['chunks']} chunks",
+                    flush=True,
+                )
+
+            for name, stats in self.watcher.read_scheduling_stats().items():
+                print(
+                    f"queue {name}: {stats['waiting']} waiting, {stats['served']} served, "
+                    f"wait {stats['mean_wait']:.1f}s mean, {stats['p95_wait']:.1f}s p95, {stats['max_wait']:.1f}s max",
+                    flush=True,
+                )
+
+            writer_stats = self.watcher.read_writer_stats()
+            if len(writer_stats) > 0:
+                print(
+                    f"result writer: {writer_stats['written']} files written, {writer_stats['pending']} pending, "
+                    f"{writer_stats['failed']} failed, durability {writer_stats['durability']}",
+                    flush=True,
+                )
+
+            shedding_stats = self.watcher.read_shedding_stats()
+            if len(shedding_stats) > 0:
+                steps = ", ".join(shedding_stats["steps"])
+                print(
+                    f"load shedding: level {shedding_stats['level']} ({steps if len(steps) > 0 else 'full quality'}), "
+                    f"{len(shedding_stats['decisions'])} decisions",
+                    flush=True,
+                )
+
+            if self.watcher.supervisor is not None:
+                supervision = self.watcher.supervisor.status()
+                print(
+                    f"supervisor: {supervision['restarts']} restarts after {supervision['crashes']} crashes, "
+                    f"last exit code {supervision['last_exitcode']}",
+                    flush=True,
+                )
+
+                if supervision["restart_in"] is not None:
+                    print(f"restarting in {supervision['restart_in']:.1f}s", flush=True)
+
+                for filename in supervision["quarantined"]:
+                    print("quarantined:", filename, flush=True)
+
+    def _index_path(self) -> Path:
+        """
+        _index_path Get the path of the detection index of the current watcher, or of the default output directory if there is no watcher.
+
+        Returns:
+            Path: Path of the index
+        """
+        if self.watcher is not None:
+            index_config = self.watcher.index_config or {}
+            return Path(index_config.get("path", self.watcher.outdir / INDEX_NAME))
+
+        folders = read_yaml(Path(user_config_dir()) / Path("faunanet") / "install.yml")[
+            "Directories"
+        ]
+        return Path(folders["output"]).expanduser() / INDEX_NAME
+
+    def do_query(self, line: str):
+        """
+        do_query Query the detection index of the output directory. Works while the watcher is running, but needs the 'Index' node in the config the results were written with.
+        Options, all optional, are given as --name=<arg>. Values with spaces must be quoted.
+            --from, --to: time range as ISO date or date and time, e.g., 2024-05-01 or 2024-05-01T05:00
+            --daily_from, --daily_to: local time of day range, e.g., 05:00 and 07:00
+            --label: comma separated parts of labels to look for, case insensitive
+            --min_confidence: minimum confidence
+            --run, --model: comma separated names of runs and ensemble models
+            --by: comma separated keys to count detections per group, out of label, model, run, recording, day, hour, hour_of_day
+            --limit: maximum number of detections to print. Defaults to 100. Ignored with --by.
+
+        Args:
+            line (str): Options of the query
+        """
+        try:
+            filters = {}
+            for part in shlex.split(line):
+                name, _, value = part.partition("=")
+                name = name.lstrip("-")
+
+                if part.startswith("--") is False or name not in QUERY_ARGUMENTS:
+                    print(
+                        f"Invalid input. Expected options of the form --name=<arg> with names {list(QUERY_ARGUMENTS.keys())}",
+                        flush=True,
+                    )
+                    return
+
+                key, convert = QUERY_ARGUMENTS[name]
+                filters[key] = convert(value)
+
+            if "by" in filters:
+                filters.pop("limit", None)
+            else:
+                filters.setdefault("limit", 100)
+
+            results = query_detections(self._index_path(), **filters)
+        except Exception as e:
+            print(f"Could not run query: {e}", flush=True)
+            return
+
+        if len(results) == 0:
+            print("No detections found", flush=True)
+
+        for result in results:
+            if "by" in filters:
+                keys = " ".join(str(result[key]) for key in filters["by"])
+                print(
+                    f"{keys}: {result['count']} detections, max confidence {result['max_confidence']:.2f}",
+                    flush=True,
+                )
+            else:
+                model = "" if result["model"] is None else f" ({result['model']})"
+                print(
+                    f"{result['time']:%Y-%m-%d %H:%M:%S} {result['label']}{model} {result['confidence']:.2f} in {result['run']}/{result['recording']}",
+                    flush=True,
+                )
+
+    def _print_resources(self):
+        """
+        _print_resources Print how the CPUs are divided between watchers, interpreter threads and decode threads, with the resource config of the current watcher if there is one.
+        """
+        resource_config = {}
+        if self.watcher is not None and self.watcher.resource_config is not None:
+            resource_config = dict(self.watcher.resource_config)
+        worker = resource_config.pop("worker", 0)
+
+        try:
+            plan = plan_resources(**resource_config)
+        except Exception as e:
+            print(f"Could not plan resources: {e}", flush=True)
+            return
+
+        quota = "none" if plan["quota"] is None else f"{plan['quota']:g}"
+        print(
+            f"cpu resources:  {plan['count']} usable cpus {plan['cpus']}, cgroup quota {quota}",
+            flush=True,
+        )
+
+        for i, share in enumerate(plan["workers"]):
+            print(
+                f"  worker {i}{' (this watcher)' if i == worker else ''}: cpus {share['cpus']}{' pinned' if plan['pin'] else ''}, "
+                f"{share['interpreter_threads']} interpreter threads, {share['decode_threads']} decode threads",
+                flush=True,
+            )
+
     def do_get_setup_info(self, line: str):
         """
         do_get_setup_info Get information about the current setup of faunanet. If no setup information is found, the cache and config directories are listed.
+        In both cases, the layout of the CPUs for the watcher, see the 'Resources' node of the config, is listed as well.
         Args:
             line (str): Empty string, no arguments expected
         """
@@ -660,6 +903,9 @@ class FaunanetCmd(cmd.Cmd):
                 flush=True,
             )
 
+        if len(line) == 0:
+            self._print_resources()
+
     def do_change_analyzer(self, line: str):
         """
         do_change_analyzer Change the analyzer of the watcher process. This will assert data consistency in the output folder of the old analyzer.
@@ -691,9 +937,7 @@ class FaunanetCmd(cmd.Cmd):
                 delete_recordings=config["Analysis"]["delete_recordings"],
             )
 
-            self.wait_for_watcher_event(
-                lambda s: s.watcher.is_running, limit=20, waiting_time=3
-            )
+            self.wait_for_watcher_state(["ready", "failed"], timeout=60)
 
         # apply the above closure to the watcher
         self.dispatch_on_watcher(
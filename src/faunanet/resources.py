@@ -0,0 +1,212 @@
+from pathlib import Path
+import math
+import os
+
+# environment variables read by the thread pools of NumPy's BLAS and other native libraries when they are loaded
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+
+def _read_first_line(path: Path) -> str:
+    """
+    _read_first_line Read the first line of a small system file.
+
+    Args:
+        path (Path): Path of the file
+
+    Returns:
+        str: First line without surrounding whitespace, or None if the file cannot be read
+    """
+    try:
+        with open(path, "r") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root: str = "/sys/fs/cgroup") -> float:
+    """
+    cgroup_cpu_limit Get the CPU quota of the cgroup the process runs in, e.g., as set with 'docker run --cpus'. Supports cgroup v2 and v1.
+
+    Args:
+        root (str, optional): Mount point of the cgroup file system. Defaults to "/sys/fs/cgroup".
+
+    Returns:
+        float: Number of CPUs the quota corresponds to, or None if there is no quota
+    """
+    root = Path(root)
+
+    # cgroup v2: '<quota> <period>' or 'max <period>'
+    line = _read_first_line(root / "cpu.max")
+    if line is not None:
+        parts = line.split()
+        if len(parts) == 2 and parts[0] != "max" and int(parts[1]) > 0:
+            return int(parts[0]) / int(parts[1])
+        return None
+
+    # cgroup v1: quota is -1 if there is none
+    for folder in ["cpu", "cpu,cpuacct"]:
+        quota = _read_first_line(root / folder / "cpu.cfs_quota_us")
+        period = _read_first_line(root / folder / "cpu.cfs_period_us")
+        if quota is not None and period is not None:
+            if int(quota) > 0 and int(period) > 0:
+                return int(quota) / int(period)
+            return None
+
+    return None
+
+
+def cpu_topology(cpus: list, root: str = "/sys/devices/system/cpu") -> dict:
+    """
+    cpu_topology Get the physical core each logical CPU belongs to, such that hyperthreads of one core can be kept together.
+
+    Args:
+        cpus (list): Ids of the logical CPUs
+        root (str, optional): Folder with the topology information of the kernel. Defaults to "/sys/devices/system/cpu".
+
+    Returns:
+        dict: cpu -> (package id, core id). CPUs without topology information are treated as separate cores of package -1.
+    """
+    topology = {}
+
+    for cpu in cpus:
+        folder = Path(root) / f"cpu{cpu}" / "topology"
+        package = _read_first_line(folder / "physical_package_id")
+        core = _read_first_line(folder / "core_id")
+
+        if package is None or core is None:
+            topology[cpu] = (-1, cpu)
+        else:
+            topology[cpu] = (int(package), int(core))
+
+    return topology
+
+
+def available_cpus(
+    cgroup_root: str = "/sys/fs/cgroup", topology_root: str = "/sys/devices/system/cpu"
+) -> dict:
+    """
+    available_cpus Get the CPUs this process may run on. These are the CPUs in its affinity mask, limited by the cgroup quota.
+    The CPUs are ordered such that the hyperthreads of a physical core are next to each other.
+
+    Args:
+        cgroup_root (str, optional): Mount point of the cgroup file system. Defaults to "/sys/fs/cgroup".
+        topology_root (str, optional): Folder with the topology information of the kernel. Defaults to "/sys/devices/system/cpu".
+
+    Returns:
+        dict: {"cpus": usable CPU ids, "quota": cgroup quota in CPUs or None, "count": number of usable CPUs}
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+
+    topology = cpu_topology(cpus, topology_root)
+    cpus = sorted(cpus, key=lambda cpu: (topology[cpu], cpu))
+
+    quota = cgroup_cpu_limit(cgroup_root)
+    count = len(cpus)
+
+    if quota is not None:
+        count = max(1, min(count, math.ceil(quota)))
+
+    return {"cpus": cpus[:count], "quota": quota, "count": count}
+
+
+def plan_resources(
+    workers: int = 1,
+    decode_threads: int = 1,
+    pin: bool = False,
+    cpus: dict = None,
+) -> dict:
+    """
+    plan_resources Divide the available CPUs between analysis workers, i.e., watcher processes that run on the same machine, and,
+    within each worker, between the threads of the model interpreters and those used for decoding and preprocessing audio.
+    Each worker gets a contiguous block of CPUs, so hyperthreads of one physical core stay with one worker. If there are more
+    workers than CPUs, the workers share the CPUs and use one thread each.
+
+    Args:
+        workers (int, optional): Number of analysis workers. Defaults to 1.
+        decode_threads (int, optional): Threads per worker for decoding and preprocessing, which limits the thread pools of NumPy and other
+                                        native libraries. The rest of a worker's CPUs is used by the model interpreters. Defaults to 1.
+        pin (bool, optional): Whether the workers are pinned to their CPUs. Defaults to False.
+        cpus (dict, optional): Available CPUs as returned by 'available_cpus'. Defaults to None (detect them).
+
+    Raises:
+        ValueError: When 'workers' or 'decode_threads' is smaller than 1.
+
+    Returns:
+        dict: {"cpus", "quota", "count" as for 'available_cpus', "pin": pin, "workers": list of {"cpus", "interpreter_threads", "decode_threads"}}
+    """
+    if workers < 1:
+        raise ValueError("'workers' must be >= 1")
+
+    if decode_threads < 1:
+        raise ValueError("'decode_threads' must be >= 1")
+
+    if cpus is None:
+        cpus = available_cpus()
+
+    plan = dict(cpus, pin=pin, workers=[])
+    count = cpus["count"]
+
+    first = 0
+    for i in range(workers):
+        if workers >= count:
+            share = [cpus["cpus"][i % count]]
+        else:
+            size = count // workers + (1 if i < count % workers else 0)
+            share = cpus["cpus"][first : first + size]
+            first += size
+
+        # a worker decodes a file before it runs the models on it, so with a single CPU both take turns on it
+        decode = min(decode_threads, max(1, len(share) - 1))
+        interpreter = max(1, len(share) - decode)
+
+        plan["workers"].append(
+            {
+                "cpus": sorted(share),
+                "interpreter_threads": interpreter,
+                "decode_threads": decode,
+            }
+        )
+
+    return plan
+
+
+def apply_plan(worker: dict, pin: bool = False) -> dict:
+    """
+    apply_plan Apply the share of a worker to the current process: limit the thread pools of NumPy's BLAS and other native libraries to
+    the worker's decode threads and, if requested, pin the process to the worker's CPUs. The interpreter threads are applied by the
+    caller through the 'num_threads' arguments of the models. The thread pools of libraries that are already loaded are limited with
+    threadpoolctl if it is installed, those of libraries that are loaded later through environment variables.
+
+    Args:
+        worker (dict): Share of one worker as found in the 'workers' list of 'plan_resources'
+        pin (bool, optional): Whether to pin the process to the worker's CPUs. Only supported on Linux. Defaults to False.
+
+    Returns:
+        dict: The applied share with an additional 'pinned' entry
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(worker["decode_threads"])
+
+    try:
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(limits=worker["decode_threads"])
+    except ImportError:
+        pass
+
+    pinned = False
+    if pin and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, worker["cpus"])
+        pinned = True
+
+    return dict(worker, pinned=pinned)
@@ -0,0 +1,400 @@
+from pathlib import Path
+import csv
+import shutil
+import threading
+import time
+import traceback
+import numpy as np
+
+from faunanet.compaction import (
+    read_manifest,
+    read_partition,
+    recording_of,
+    results_files,
+)
+from faunanet.journal import JOURNAL_NAME, read_journal
+from faunanet import utils
+
+
+def _confidence_of(results_file: str) -> float:
+    """
+    _confidence_of Get the highest confidence of the detections in a results file.
+
+    Args:
+        results_file (str): Path of the results csv file
+
+    Returns:
+        float: highest confidence of the detections, 0 for a file without detections
+
+    Raises:
+        FileNotFoundError: When the results file does not exist (anymore).
+    """
+    confidences = [0.0]
+    with open(results_file, "r") as csvfile:
+        confidences.extend(
+            float(row["confidence"])
+            for row in csv.DictReader(csvfile)
+            if row.get("confidence") not in [None, ""]
+        )
+    return max(confidences)
+
+
+def analyzed_recordings(output: str) -> dict:
+    """
+    analyzed_recordings Get the recordings a run has written results for and the highest confidence of their detections,
+    whether the results have been compacted or not.
+
+    Args:
+        output (str): Output folder of the run
+
+    Returns:
+        dict: stem of the recording -> highest confidence of its detections, 0 for recordings without detections
+    """
+    analyzed = {}
+
+    for results_file in results_files(output):
+        try:
+            analyzed[recording_of(results_file)] = _confidence_of(results_file)
+        except FileNotFoundError:  # compacted in the meantime
+            continue
+
+    for day, partition in read_manifest(output).items():
+        columns = read_partition(output, day)
+        for recording in partition["recordings"]:
+            analyzed.setdefault(recording, 0.0)
+
+        if "confidence" in columns and columns["confidence"].dtype.kind == "f":
+            for recording, confidence in zip(
+                columns["recording"], columns["confidence"]
+            ):
+                if not np.isnan(confidence):
+                    analyzed[str(recording)] = max(
+                        analyzed[str(recording)], float(confidence)
+                    )
+
+    return analyzed
+
+
+class RecordingRetention:
+    """
+    RecordingRetention Delete analyzed recordings in the background once the disk holding them fills up beyond a high-water mark
+    or they are older than an age limit, oldest first. Only recordings that the journal of a run on the same input directory has
+    recorded as completed, under their full path, are deleted, so audio that has not been analyzed yet is never lost. Recordings with a detection above a confidence threshold can be
+    kept. Files are deleted in batches with a pause in between, such that deleting does not stall the I/O of the analysis.
+
+    Methods:
+    --------
+    candidates: Get the analyzed recordings that may be deleted, oldest first.
+    collect: Delete the recordings that are due once.
+    start: Collect periodically in a background thread.
+    stop: Stop the background thread.
+    """
+
+    def __init__(
+        self,
+        indir: str,
+        outdir: str,
+        pattern=".wav",
+        high_water: float = 0.9,
+        low_water: float = None,
+        max_age: float = None,
+        keep_min_confidence: float = None,
+        interval: float = 60.0,
+        batch_size: int = 50,
+        batch_pause: float = 1.0,
+        on_error: callable = None,
+    ):
+        """
+        __init__ Create a new RecordingRetention.
+
+        Args:
+            indir (str): Input directory that holds the recordings
+            outdir (str): Output base directory that holds the folders of the runs
+            pattern (str | list, optional): File ending of the recordings, or a list of them. Defaults to ".wav".
+            high_water (float, optional): Fraction of the disk holding 'indir' that may be used before recordings are deleted. Defaults to 0.9.
+            low_water (float, optional): Fraction of the disk recordings are deleted down to once 'high_water' has been reached. Defaults to None ('high_water').
+            max_age (float, optional): Time in seconds since its last modification after which an analyzed recording is deleted regardless of the disk usage.
+                                       Defaults to None (no age limit).
+            keep_min_confidence (float, optional): Recordings with a detection of at least this confidence are never deleted. Defaults to None (delete all).
+            interval (float, optional): Time in seconds between two checks. Defaults to 60.
+            batch_size (int, optional): Number of recordings deleted at once. Defaults to 50.
+            batch_pause (float, optional): Time in seconds to wait between two batches. Defaults to 1.
+            on_error (callable, optional): Called with the exception and its traceback when a recording cannot be deleted or a check fails.
+                                           Defaults to None (print the traceback).
+
+        Raises:
+            ValueError: When an argument is out of range.
+        """
+        if not 0 < high_water <= 1:
+            raise ValueError("'high_water' must be > 0 and <= 1")
+
+        if low_water is None:
+            low_water = high_water
+
+        if not 0 < low_water <= high_water:
+            raise ValueError("'low_water' must be > 0 and <= 'high_water'")
+
+        if max_age is not None and max_age < 0:
+            raise ValueError("'max_age' must be >= 0")
+
+        if interval <= 0:
+            raise ValueError("'interval' must be > 0")
+
+        if batch_size < 1:
+            raise ValueError("'batch_size' must be >= 1")
+
+        if batch_pause < 0:
+            raise ValueError("'batch_pause' must be >= 0")
+
+        self.indir = Path(indir)
+        self.outdir = Path(outdir)
+        self.pattern = pattern
+        self.high_water = high_water
+        self.low_water = low_water
+        self.max_age = max_age
+        self.keep_min_confidence = keep_min_confidence
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.on_error = on_error
+        self.runs = (
+            {}
+        )  # name of the run folder -> state of its journal, None for runs on other inputs
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def _update_run(self, folder: Path, run: dict):
+        """
+        _update_run Read the records that have been appended to the journal of a run since the last update, and the confidences of
+        the recordings that have been completed since then.
+
+        Args:
+            folder (Path): Output folder of the run
+            run (dict): State of the run, updated in place
+        """
+        journal = folder / JOURNAL_NAME
+        try:
+            if journal.stat().st_size < run["offset"]:  # replaced, start over
+                run.update(offset=0, stems={}, completed={})
+            entries, run["offset"] = read_journal(journal, run["offset"])
+        except FileNotFoundError:
+            return
+
+        for entry in entries:
+            path = Path(entry["file"]).expanduser().resolve()
+            if entry["event"] == "completed":
+                run["stems"].setdefault(path.stem, set()).add(path)
+                run["completed"].setdefault(path, None)
+            else:
+                run["completed"].pop(path, None)
+
+        # results of recordings completed a while ago may have been compacted, which is only read when needed
+        compacted = None
+        for path, confidence in run["completed"].items():
+            if confidence is not None:
+                continue
+
+            try:
+                run["completed"][path] = _confidence_of(
+                    folder / f"results_{path.stem}.csv"
+                )
+                continue
+            except FileNotFoundError:
+                pass
+
+            if compacted is None:
+                compacted = analyzed_recordings(folder)
+            run["completed"][path] = compacted.get(path.stem, None)
+
+    def _analyzed(self) -> dict:
+        """
+        _analyzed Collect the analyzed recordings of all runs in the output base directory that read from the input directory.
+        A recording counts as analyzed if the journal of a run has recorded it as completed and the run has results for it.
+        Results files are named after the stem of the recording only, so recordings that share their stem with another one
+        completed in the same run cannot be told apart and do not count. The journals are followed incrementally, such that
+        each record and results file is only read once.
+
+        Returns:
+            dict: resolved path of the recording -> highest confidence of its detections in any run
+        """
+        analyzed = {}
+        indir = self.indir.expanduser().resolve()
+
+        if self.outdir.is_dir() is False:
+            return analyzed
+
+        folders = sorted(self.outdir.iterdir())
+        for name in set(self.runs) - {folder.name for folder in folders}:
+            del self.runs[name]
+
+        for folder in folders:
+            if folder.name not in self.runs:
+                run_input = utils.run_input(folder)
+                if run_input is None:  # not a run, or its config is not written yet
+                    continue
+                self.runs[folder.name] = (
+                    {"offset": 0, "stems": {}, "completed": {}}
+                    if run_input == indir
+                    else None
+                )
+
+            run = self.runs[folder.name]
+            if run is None:
+                continue
+
+            self._update_run(folder, run)
+
+            for path, confidence in run["completed"].items():
+                if confidence is None or len(run["stems"][path.stem]) > 1:
+                    continue
+                analyzed[path] = max(analyzed.get(path, 0.0), confidence)
+
+        return analyzed
+
+    def _forget(self, path: Path):
+        """
+        _forget Drop a recording that no longer exists from the analyzed recordings of all runs.
+
+        Args:
+            path (Path): Resolved path of the recording
+        """
+        for run in self.runs.values():
+            if run is not None:
+                run["completed"].pop(path, None)
+
+    def candidates(self) -> list:
+        """
+        candidates Get the recordings in the input directory that have been analyzed and may be deleted, i.e., that have no detection
+        of at least 'keep_min_confidence'. Only the analyzed recordings are looked at, not the whole input directory.
+
+        Returns:
+            list: (modification time, size in bytes, path) tuples, oldest first
+        """
+        indir = self.indir.expanduser().resolve()
+        candidates = []
+
+        for path, confidence in self._analyzed().items():
+            if (
+                path.is_relative_to(indir) is False
+                or utils.matches_pattern(path, self.pattern) is False
+            ):
+                continue
+
+            if (
+                self.keep_min_confidence is not None
+                and confidence >= self.keep_min_confidence
+            ):
+                continue
+
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # deleted in the meantime
+                self._forget(path)
+                continue
+
+            if path.is_file():
+                candidates.append((stat.st_mtime, stat.st_size, path))
+
+        return sorted(candidates)
+
+    def collect(self) -> dict:
+        """
+        collect Delete the analyzed recordings that are older than 'max_age', and, if the disk is used beyond 'high_water', further
+        ones, oldest first, until it is used up to 'low_water' again. Recordings that cannot be deleted are reported and skipped.
+
+        Returns:
+            dict: {"deleted": number of deleted recordings, "freed": number of freed bytes, "usage": used fraction of the disk afterwards}
+        """
+        candidates = self.candidates()
+        now = time.time()
+
+        expired = [
+            self.max_age is not None and now - modified > self.max_age
+            for modified, _, _ in candidates
+        ]
+
+        usage = shutil.disk_usage(self.indir)
+        excess = 0
+        if usage.used > self.high_water * usage.total:
+            excess = usage.used - self.low_water * usage.total
+
+        # candidates are sorted oldest first, so the expired ones come first and count towards the excess
+        due = []
+        for candidate, is_expired in zip(candidates, expired):
+            if is_expired is False and excess <= 0:
+                break
+            due.append(candidate)
+            excess -= candidate[1]
+
+        deleted = 0
+        freed = 0
+        for first in range(0, len(due), self.batch_size):
+            if first > 0 and self.stop_event.wait(self.batch_pause):
+                break
+
+            for _, size, path in due[first : first + self.batch_size]:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    self._report(e)
+                    continue
+                deleted += 1
+                freed += size
+
+        usage = shutil.disk_usage(self.indir)
+        return {"deleted": deleted, "freed": freed, "usage": usage.used / usage.total}
+
+    def _report(self, e: Exception):
+        """
+        _report Report an error of a collection.
+
+        Args:
+            e (Exception): Exception the collection failed with
+        """
+        tb = traceback.format_exc()
+        if self.on_error is None:
+            print(tb)
+        else:
+            self.on_error(e, tb)
+
+    def _collect_loop(self):
+        """
+        _collect_loop Collect every 'interval' seconds until stopped. Errors are reported and do not stop the next collections.
+        """
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.collect()
+            except Exception as e:
+                self._report(e)
+
+    def start(self):
+        """
+        start Collect periodically in a background thread.
+
+        Raises:
+            RuntimeError: When the retention is already running.
+        """
+        if self.is_running:
+            raise RuntimeError("Recording retention is already running")
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._collect_loop, name="recording_retention", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """
+        stop Stop the background thread. A batch that is being deleted is finished first.
+        """
+        self.stop_event.set()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
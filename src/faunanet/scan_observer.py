@@ -0,0 +1,370 @@
+from pathlib import Path
+from watchdog.events import FileCreatedEvent
+import json
+import os
+import threading
+import time
+
+
+class ScanObserver(threading.Thread):
+    """
+    ScanObserver Observer that finds new files by periodically scanning a directory tree instead of relying on file system
+    notifications, which are not delivered for files written by other hosts on network file systems and which need one watch
+    per directory. It can be used in place of watchdog's Observer and sends a FileCreatedEvent to the scheduled handler for each new file.
+
+    Scans are incremental: a directory is only listed again when its modification time changed. Below a directory whose subtree has not
+    changed for 'cold_after' seconds, only the most recently changed subdirectory is visited, except for a full rescan every 'cold_rescan_interval'
+    seconds. This suits date-partitioned trees, in which new files and directories appear in the newest partition. A single scan examines
+    at most 'scan_budget' directory entries before it continues where it stopped at the next interval. The state of the scan can be
+    persisted, such that files that appear while no watcher is running are reported after a restart. The state file starts with a snapshot
+    of the state, followed by one line per scan with the directories that changed. Once these outgrow the snapshot, the file is replaced
+    by a new snapshot of the directories that still exist.
+    Without a persisted state, the first full scan only records the files that exist already, like a notification based observer would.
+
+    Methods:
+    --------
+    schedule: Set the handler and the directory to observe.
+    scan: Run one scan step.
+    stop: Stop the observer thread.
+    """
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        scan_budget: int = None,
+        state_file: str = None,
+        cold_after: float = None,
+        cold_rescan_interval: float = 3600.0,
+        ignore_hidden: bool = True,
+    ):
+        """
+        __init__ Create a new ScanObserver.
+
+        Args:
+            interval (float, optional): Time in seconds between two scans. Defaults to 1.0.
+            scan_budget (int, optional): Number of directory entries after which a scan stops. Directories are always listed as a whole,
+                                        so a scan can exceed the budget by the size of one directory. Defaults to None (scan the full tree each time).
+            state_file (str, optional): File to persist the scan state in. Defaults to None (do not persist).
+            cold_after (float, optional): Time in seconds after which only the most recently changed part of a subtree without changes is visited,
+                                        except during full rescans. Defaults to None (visit all subtrees in each scan).
+            cold_rescan_interval (float, optional): Time in seconds between full rescans that include cold subtrees. Defaults to 3600.
+            ignore_hidden (bool, optional): Do not descend into directories whose names start with a '.'. Defaults to True.
+
+        Raises:
+            ValueError: When 'interval' is not positive or 'scan_budget' is smaller than 1.
+        """
+        super().__init__(daemon=True, name="scan_observer")
+
+        if interval <= 0:
+            raise ValueError("'interval' must be > 0")
+
+        if scan_budget is not None and scan_budget < 1:
+            raise ValueError("'scan_budget' must be >= 1")
+
+        self.interval = interval
+        self.scan_budget = scan_budget
+        self.state_file = None if state_file is None else Path(state_file).expanduser()
+        self.cold_after = cold_after
+        self.cold_rescan_interval = cold_rescan_interval
+        self.ignore_hidden = ignore_hidden
+
+        self.handler = None
+        self.root = None
+        self.recursive = True
+        self.stop_event = threading.Event()
+
+        # directory -> {"mtime": mtime_ns, "files": [...], "subdirs": [...], "changed": time of last change in the subtree}
+        self.dirs = {}
+        # directories still to visit in the current pass
+        self.pending = []
+        self.is_baseline = True
+        self.last_full_scan = 0.0
+        self.full_scan = True
+        self.last_scan_cost = 0
+        self.num_events = 0
+        # directories whose state changed since it was last persisted
+        self.changed_dirs = set()
+        # sizes in bytes of the snapshot and the changes appended to it, None if the next save has to write a snapshot
+        self.snapshot_size = None
+        self.changes_size = 0
+
+    def schedule(self, event_handler, path: str, recursive: bool = True):
+        """
+        schedule Set the handler that receives events for new files in 'path'. Unlike watchdog observers, only one directory can be observed.
+
+        Args:
+            event_handler (FileSystemEventHandler): Handler to dispatch events to
+            path (str): Directory to observe
+            recursive (bool, optional): Whether to observe subdirectories, too. Defaults to True.
+        """
+        self.handler = event_handler
+        self.root = os.path.abspath(path)
+        self.recursive = recursive
+
+        self._load_state()
+
+    def _cursor(self) -> dict:
+        """
+        _cursor Get the part of the scan state that is persisted with every change.
+
+        Returns:
+            dict: {"pending", "is_baseline", "last_full_scan", "full_scan"}
+        """
+        return {
+            "pending": self.pending,
+            "is_baseline": self.is_baseline,
+            "last_full_scan": self.last_full_scan,
+            "full_scan": self.full_scan,
+        }
+
+    def _load_state(self):
+        """
+        _load_state Load a persisted scan state for the observed directory if there is one, i.e., its snapshot and the changes appended
+        to it. A change that a crash left incomplete is ignored, and the next save writes a new snapshot.
+        """
+        if self.state_file is None or self.state_file.is_file() is False:
+            return
+
+        with open(self.state_file, "r") as f:
+            lines = f.readlines()
+
+        try:
+            state = json.loads(lines[0])
+        except (IndexError, json.JSONDecodeError):
+            return
+
+        if state.get("root") != self.root:
+            return
+
+        self.dirs = state["dirs"]
+        self.snapshot_size = len(lines[0])
+        self.changes_size = 0
+
+        for line in lines[1:]:
+            try:
+                change = json.loads(line)
+            except json.JSONDecodeError:
+                self.snapshot_size = None
+                break
+
+            for directory, entry in change.pop("dirs").items():
+                if entry is None:
+                    self.dirs.pop(directory, None)
+                else:
+                    self.dirs[directory] = entry
+            state.update(change)
+            self.changes_size += len(line)
+
+        # the next change would be appended to an incomplete line
+        if lines[-1].endswith("\n") is False:
+            self.snapshot_size = None
+
+        self.pending = state["pending"]
+        self.is_baseline = state["is_baseline"]
+        self.last_full_scan = state["last_full_scan"]
+        self.full_scan = state["full_scan"]
+
+    def _save_state(self):
+        """
+        _save_state Persist the changes of the scan state. They are appended to the state file, unless they have outgrown the snapshot
+        at its start, in which case the file is replaced atomically by a new snapshot.
+        """
+        if self.state_file is None:
+            return
+
+        if self.snapshot_size is None or self.changes_size > self.snapshot_size:
+            line = json.dumps({"root": self.root, "dirs": self.dirs, **self._cursor()})
+            tmp = self.state_file.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                f.write(line + "\n")
+            os.replace(tmp, self.state_file)
+            self.snapshot_size = len(line) + 1
+            self.changes_size = 0
+        else:
+            line = json.dumps(
+                {
+                    "dirs": {d: self.dirs.get(d) for d in sorted(self.changed_dirs)},
+                    **self._cursor(),
+                }
+            )
+            with open(self.state_file, "a") as f:
+                f.write(line + "\n")
+            self.changes_size += len(line) + 1
+
+        self.changed_dirs.clear()
+
+    def _mark_changed(self, directory: str, now: float):
+        """
+        _mark_changed Record a change in 'directory' for it and all its parents up to the observed directory.
+
+        Args:
+            directory (str): Directory that changed
+            now (float): Current time
+        """
+        while directory in self.dirs:
+            self.dirs[directory]["changed"] = now
+            self.changed_dirs.add(directory)
+            if directory == self.root:
+                break
+            directory = os.path.dirname(directory)
+
+    def _forget(self, directory: str):
+        """
+        _forget Drop the state of a directory that has been removed, including all of its subdirectories.
+
+        Args:
+            directory (str): Removed directory
+        """
+        entry = self.dirs.pop(directory, None)
+        if entry is not None:
+            self.changed_dirs.add(directory)
+            for sub in entry["subdirs"]:
+                self._forget(os.path.join(directory, sub))
+
+    def _is_cold(self, directory: str, now: float) -> bool:
+        """
+        _is_cold Check if most of a directory's subtree can be skipped in the current pass.
+
+        Args:
+            directory (str): Directory to check
+            now (float): Current time
+
+        Returns:
+            bool: True if the subtree has not changed for 'cold_after' seconds and this pass is not a full rescan.
+        """
+        if self.cold_after is None or self.full_scan or directory not in self.dirs:
+            return False
+        return now - self.dirs[directory]["changed"] > self.cold_after
+
+    def _visit(self, directory: str, now: float) -> int:
+        """
+        _visit Look at a single directory, dispatch events for new files in it and queue its subdirectories.
+
+        Args:
+            directory (str): Directory to visit
+            now (float): Current time
+
+        Returns:
+            int: Number of directory entries examined
+        """
+        try:
+            # stat before listing: a file created in between is seen now and the directory is listed again next time
+            mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            self._forget(directory)
+            return 1
+
+        entry = self.dirs.get(directory)
+
+        is_unchanged = entry is not None and entry["mtime"] == mtime
+
+        if is_unchanged:
+            cost = 1
+        else:
+            files = []
+            subdirs = []
+            cost = 1
+            try:
+                with os.scandir(directory) as it:
+                    for dir_entry in it:
+                        cost += 1
+                        if dir_entry.is_dir(follow_symlinks=False):
+                            subdirs.append(dir_entry.name)
+                        elif dir_entry.is_file():
+                            files.append(dir_entry.name)
+            except FileNotFoundError:
+                self._forget(directory)
+                return cost
+
+            known = set() if entry is None else set(entry["files"])
+            new_files = [f for f in files if f not in known]
+
+            if entry is not None:
+                for sub in set(entry["subdirs"]) - set(subdirs):
+                    self._forget(os.path.join(directory, sub))
+
+            self.dirs[directory] = {
+                "mtime": mtime,
+                "files": files,
+                "subdirs": subdirs,
+                "changed": now,
+            }
+            self._mark_changed(directory, now)
+
+            if self.is_baseline is False:
+                for name in sorted(new_files):
+                    self.num_events += 1
+                    self.handler.dispatch(
+                        FileCreatedEvent(os.path.join(directory, name))
+                    )
+
+        if self.recursive:
+            subdirs = [
+                os.path.join(directory, sub)
+                for sub in self.dirs[directory]["subdirs"]
+                if not (self.ignore_hidden and sub.startswith("."))
+            ]
+
+            if is_unchanged and self._is_cold(directory, now) and len(subdirs) > 0:
+                # new partitions of date-structured trees appear next to the most recently changed one,
+                # which is where they change the modification time of their parent
+                subdirs = [
+                    max(
+                        subdirs,
+                        key=lambda sub: (
+                            self.dirs.get(sub, {"changed": now})["changed"],
+                            sub,
+                        ),
+                    )
+                ]
+
+            self.pending.extend(subdirs)
+
+        return cost
+
+    def scan(self):
+        """
+        scan Run one scan step: Continue the current pass over the directory tree, or start a new one, until the pass is complete
+             or the scan budget is used up.
+        """
+        now = time.time()
+
+        if len(self.pending) == 0:
+            self.pending = [self.root]
+            self.full_scan = (
+                self.cold_after is None
+                or now - self.last_full_scan > self.cold_rescan_interval
+            )
+
+        cost = 0
+        while len(self.pending) > 0 and (
+            self.scan_budget is None or cost < self.scan_budget
+        ):
+            directory = self.pending.pop()
+            cost += self._visit(directory, now)
+
+        self.last_scan_cost = cost
+
+        if len(self.pending) == 0:
+            # a pass is complete, from now on new files are reported
+            self.is_baseline = False
+            if self.full_scan:
+                self.last_full_scan = now
+
+        # an interrupted pass always changes the cursor, a complete one only when something has been found
+        if len(self.changed_dirs) > 0 or len(self.pending) > 0:
+            self._save_state()
+
+    def run(self):
+        """
+        run Scan every 'interval' seconds until stopped.
+        """
+        while not self.stop_event.is_set():
+            self.scan()
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        """
+        stop Stop the observer thread after the current scan.
+        """
+        self.stop_event.set()
@@ -0,0 +1,241 @@
+from collections import deque
+import queue
+import threading
+import time
+
+import numpy as np
+
+# files found by the observer while they are being recorded, and files left over from earlier runs or found by sweeps
+SCHEDULING_CLASSES = ["live", "backlog"]
+
+
+class PriorityScheduler:
+    """
+    PriorityScheduler Queue of work items in several classes, from which items are taken by priority instead of in order of arrival.
+    With 'strict', an item of a class is only taken when all classes before it are empty. Otherwise, the classes share the
+    items taken in proportion to their 'weights'. Either way, an item that has waited 'max_wait' seconds is taken before all others,
+    but only every 'overdue_every'-th time, such that no class starves while the others keep most of the capacity, even when a large
+    backlog has aged. The time items wait in the queue is kept per class.
+    It is used like a queue.Queue by any number of threads.
+
+    Methods:
+    --------
+    put: Queue an item in a class.
+    get: Take the next item.
+    qsize: Number of queued items.
+    clear: Remove all queued items.
+    stats: Queue wait per class.
+    """
+
+    def __init__(
+        self,
+        classes: list = None,
+        strict: bool = True,
+        weights: dict = None,
+        max_wait: float = 600.0,
+        overdue_every: int = 4,
+        window: int = 1000,
+    ):
+        """
+        __init__ Create a new PriorityScheduler.
+
+        Args:
+            classes (list, optional): Names of the classes, from the highest to the lowest priority. Defaults to None (SCHEDULING_CLASSES).
+            strict (bool, optional): Whether to take items strictly by the priority of their class. Defaults to True.
+            weights (dict, optional): class -> weight. Without 'strict', a class with twice the weight gets twice as many items. Defaults to None (1 each).
+            max_wait (float, optional): Time in seconds after which an item is taken before all others. Defaults to 600. None disables this.
+            overdue_every (int, optional): An item that has waited 'max_wait' is taken before all others only if at least this many items have been
+                                           taken since the last such item. Defaults to 4, i.e., aged items get at least a fifth of the items taken.
+            window (int, optional): Number of most recent items per class the wait statistics are computed from. Defaults to 1000.
+
+        Raises:
+            ValueError: When a weight is given for an unknown class or an argument is out of range.
+        """
+        classes = list(SCHEDULING_CLASSES) if classes is None else list(classes)
+
+        if len(classes) == 0 or len(set(classes)) != len(classes):
+            raise ValueError("'classes' must be a non-empty list of unique names")
+
+        weights = {} if weights is None else dict(weights)
+
+        for name, weight in weights.items():
+            if name not in classes:
+                raise ValueError(
+                    f"Unknown scheduling class {name}, must be in {classes}"
+                )
+
+            if weight <= 0:
+                raise ValueError("'weights' must be > 0")
+
+        if max_wait is not None and max_wait <= 0:
+            raise ValueError("'max_wait' must be > 0")
+
+        if overdue_every < 1:
+            raise ValueError("'overdue_every' must be >= 1")
+
+        if window < 1:
+            raise ValueError("'window' must be >= 1")
+
+        self.classes = classes
+        self.strict = strict
+        self.weights = {name: weights.get(name, 1.0) for name in classes}
+        self.max_wait = max_wait
+        self.overdue_every = overdue_every
+        # items taken since the last one that had waited 'max_wait', such that the first overdue item is taken right away
+        self.since_overdue = overdue_every
+        self.queues = {name: deque() for name in classes}
+        # virtual time of each class for the weighted share, advanced by 1 / weight for each item taken
+        self.passes = {name: 0.0 for name in classes}
+        self.waits = {name: deque(maxlen=window) for name in classes}
+        self.served = {name: 0 for name in classes}
+        self.condition = threading.Condition()
+
+    def qsize(self, name: str = None) -> int:
+        """
+        qsize Number of queued items.
+
+        Args:
+            name (str, optional): Class to count the items of. Defaults to None (all classes).
+
+        Returns:
+            int: Number of items
+        """
+        with self.condition:
+            if name is None:
+                return sum(len(q) for q in self.queues.values())
+            return len(self.queues[name])
+
+    def put(self, item, name: str = None):
+        """
+        put Queue an item.
+
+        Args:
+            item: Item to queue
+            name (str, optional): Class of the item. Defaults to None (the first class).
+
+        Raises:
+            ValueError: When the class is unknown.
+        """
+        name = self.classes[0] if name is None else name
+
+        if name not in self.queues:
+            raise ValueError(
+                f"Unknown scheduling class {name}, must be in {self.classes}"
+            )
+
+        with self.condition:
+            if len(self.queues[name]) == 0:
+                # a class that was idle does not get to catch up on the share it did not use
+                active = [
+                    self.passes[c] for c in self.classes if len(self.queues[c]) > 0
+                ]
+                if len(active) > 0:
+                    self.passes[name] = max(self.passes[name], min(active))
+
+            self.queues[name].append((time.monotonic(), item))
+            self.condition.notify()
+
+    def _next_class(self) -> str:
+        """
+        _next_class Choose the class to take the next item from. Must be called with the condition held and at least one item queued.
+
+        Returns:
+            str: Name of the class
+        """
+        waiting = [name for name in self.classes if len(self.queues[name]) > 0]
+
+        if self.max_wait is not None and self.since_overdue >= self.overdue_every:
+            now = time.monotonic()
+            overdue = [
+                name
+                for name in waiting
+                if now - self.queues[name][0][0] >= self.max_wait
+            ]
+            if len(overdue) > 0:
+                return min(overdue, key=lambda name: self.queues[name][0][0])
+
+        if self.strict:
+            return waiting[0]
+
+        return min(waiting, key=lambda name: self.passes[name])
+
+    def get(self, block: bool = True, timeout: float = None):
+        """
+        get Take the next item, waiting for one if there is none.
+
+        Args:
+            block (bool, optional): Whether to wait for an item. Defaults to True.
+            timeout (float, optional): Maximum time in seconds to wait. Defaults to None (wait forever).
+
+        Raises:
+            queue.Empty: When no item is queued within the time.
+
+        Returns:
+            Item that has been taken
+        """
+        with self.condition:
+            if block is False:
+                timeout = 0.0
+
+            has_item = self.condition.wait_for(
+                lambda: any(len(q) > 0 for q in self.queues.values()), timeout=timeout
+            )
+
+            if has_item is False:
+                raise queue.Empty()
+
+            name = self._next_class()
+            queued, item = self.queues[name].popleft()
+
+            wait = time.monotonic() - queued
+            self.passes[name] += 1.0 / self.weights[name]
+            self.waits[name].append(wait)
+            self.served[name] += 1
+
+            if self.max_wait is not None and wait >= self.max_wait:
+                self.since_overdue = 0
+            else:
+                self.since_overdue += 1
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def clear(self):
+        """
+        clear Remove all queued items.
+        """
+        with self.condition:
+            for q in self.queues.values():
+                q.clear()
+
+    def stats(self) -> dict:
+        """
+        stats Time items have waited in the queue per class, over the last 'window' items taken of each class.
+
+        Returns:
+            dict: class -> {"waiting": number of queued items, "served": number of items taken, "oldest": wait of the oldest queued item,
+                  "mean_wait", "p95_wait", "max_wait"}. Times are in seconds.
+        """
+        with self.condition:
+            now = time.monotonic()
+            stats = {}
+
+            for name in self.classes:
+                waits = np.array(self.waits[name], dtype=float)
+                stats[name] = {
+                    "waiting": len(self.queues[name]),
+                    "served": self.served[name],
+                    "oldest": (
+                        now - self.queues[name][0][0]
+                        if len(self.queues[name]) > 0
+                        else 0.0
+                    ),
+                    "mean_wait": float(waits.mean()) if len(waits) > 0 else 0.0,
+                    "p95_wait": (
+                        float(np.percentile(waits, 95)) if len(waits) > 0 else 0.0
+                    ),
+                    "max_wait": float(waits.max()) if len(waits) > 0 else 0.0,
+                }
+
+            return stats
@@ -11,9 +11,7 @@ if __name__ == "__main__":
     else:
         cmd.do_start("")
 
-    cmd.wait_for_watcher_event(
-        lambda _: cmd.watcher is not None and cmd.watcher.is_running,
-    )
+    cmd.wait_for_watcher_state(["ready", "failed"], timeout=120)
 
     cmd.do_status("")
 
@@ -0,0 +1,91 @@
+import multiprocessing
+
+# states a watcher process can be in, in the order they are usually passed through
+WATCHER_STATES = [
+    "created",
+    "starting",
+    "model_loaded",
+    "ready",
+    "paused",
+    "draining",
+    "stopped",
+    "failed",
+]
+
+
+class StateChannel:
+    """
+    StateChannel Shared state of a watcher process that can be set from any process and waited on without polling.
+    The state is stored as an index into WATCHER_STATES in shared memory and guarded by a condition variable that
+    notifies all waiting processes whenever it changes.
+
+    Methods:
+    --------
+    set: Set a new state and wake up everyone waiting for a state change.
+    wake: Wake up everyone waiting without changing the state.
+    wait_for: Block until the state is one of a given set of states or a timeout expires.
+    """
+
+    def __init__(self, state: str = "created", context=None):
+        """
+        __init__ Create a new StateChannel.
+
+        Args:
+            state (str, optional): Initial state. Defaults to "created".
+            context (optional): Multiprocessing context of the processes sharing the channel. Defaults to None (the default context).
+        """
+        context = multiprocessing if context is None else context
+        self._code = context.Value("i", WATCHER_STATES.index(state))
+        self._condition = context.Condition(self._code.get_lock())
+
+    @property
+    def state(self) -> str:
+        return WATCHER_STATES[self._code.value]
+
+    def set(self, state: str):
+        """
+        set Set a new state and notify all waiting processes.
+
+        Args:
+            state (str): New state. Must be one of WATCHER_STATES.
+
+        Raises:
+            ValueError: When the given state is unknown.
+        """
+        if state not in WATCHER_STATES:
+            raise ValueError(
+                f"Unknown watcher state {state}, must be in {WATCHER_STATES}"
+            )
+
+        with self._condition:
+            self._code.value = WATCHER_STATES.index(state)
+            self._condition.notify_all()
+
+    def wake(self):
+        """
+        wake Wake up everyone waiting without changing the state, such that they check their 'abort' condition.
+        """
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait_for(
+        self, states: list, timeout: float = None, abort: callable = None
+    ) -> bool:
+        """
+        wait_for Block the caller until the state is one of 'states'.
+
+        Args:
+            states (list): States to wait for.
+            timeout (float, optional): Maximum time to wait in seconds. Defaults to None (wait forever).
+            abort (callable, optional): Checked whenever the waiting caller is woken up. Waiting ends when it returns True. Defaults to None.
+
+        Returns:
+            bool: True when one of the desired states has been reached, False if the timeout expired or waiting was aborted.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: WATCHER_STATES[self._code.value] in states
+                or (abort is not None and abort()),
+                timeout=timeout,
+            )
+            return WATCHER_STATES[self._code.value] in states
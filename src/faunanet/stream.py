@@ -0,0 +1,566 @@
+from faunanet.tail import (
+    ChunkStream,
+    WAVE_FORMAT_PCM,
+    WAVE_FORMAT_IEEE_FLOAT,
+    parse_wav_format,
+    pcm_to_float,
+)
+
+from pathlib import Path
+import os
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+import numpy as np
+import soundfile as sf
+
+# sample formats of raw PCM input: name -> (format tag, bytes per sample)
+SAMPLE_FORMATS = {
+    "uint8": (WAVE_FORMAT_PCM, 1),
+    "int16": (WAVE_FORMAT_PCM, 2),
+    "int24": (WAVE_FORMAT_PCM, 3),
+    "int32": (WAVE_FORMAT_PCM, 4),
+    "float32": (WAVE_FORMAT_IEEE_FLOAT, 4),
+}
+
+
+class RingBuffer:
+    """
+    RingBuffer Fixed size buffer of mono float32 audio between a reader thread and the analysis. When the analysis falls behind and
+    the buffer is full, the oldest samples are overwritten and counted as overruns, such that memory use stays bounded.
+
+    Methods:
+    --------
+    write: Append samples, overwriting the oldest ones if there is no room.
+    read: Take out all buffered samples.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        __init__ Create a new RingBuffer.
+
+        Args:
+            capacity (int): Maximum number of samples held
+
+        Raises:
+            ValueError: When 'capacity' is smaller than 1.
+        """
+        if capacity < 1:
+            raise ValueError("'capacity' must be >= 1")
+
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.start = 0
+        self.size = 0
+        self.overruns = 0  # number of samples overwritten before they were read
+        self.lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return len(self.data)
+
+    @property
+    def available(self) -> int:
+        return self.size
+
+    def write(self, samples: np.ndarray):
+        """
+        write Append samples. Samples that do not fit replace the oldest ones.
+
+        Args:
+            samples (np.ndarray): Mono audio data
+        """
+        with self.lock:
+            if len(samples) > self.capacity:
+                self.overruns += len(samples) - self.capacity
+                samples = samples[-self.capacity :]
+
+            dropped = max(0, self.size + len(samples) - self.capacity)
+            self.start = (self.start + dropped) % self.capacity
+            self.size -= dropped
+            self.overruns += dropped
+
+            end = (self.start + self.size) % self.capacity
+            first = min(len(samples), self.capacity - end)
+            self.data[end : end + first] = samples[:first]
+            self.data[: len(samples) - first] = samples[first:]
+            self.size += len(samples)
+
+    def read(self) -> np.ndarray:
+        """
+        read Take out all buffered samples, oldest first.
+
+        Returns:
+            np.ndarray: Copy of the buffered samples
+        """
+        with self.lock:
+            end = self.start + self.size
+
+            if end <= self.capacity:
+                samples = self.data[self.start : end].copy()
+            else:
+                samples = np.concatenate(
+                    [self.data[self.start :], self.data[: end - self.capacity]]
+                )
+
+            self.start = end % self.capacity
+            self.size = 0
+
+            return samples
+
+
+class PCMStream:
+    """
+    PCMStream Read continuous audio from a named pipe, a unix domain socket or stdin into a RingBuffer in a background thread.
+    The input is either raw interleaved little endian PCM in the configured format, or WAV-framed, i.e., starts with a RIFF header,
+    in which case the format is taken from the header. A named pipe is read again each time a new writer opens it, a socket accepts
+    one writer after another. All writers must send the same sample rate. Multichannel audio is mixed down to mono.
+
+    Methods:
+    --------
+    start: Open the source and start reading in a background daemon thread.
+    read: Take out the audio read since the last call.
+    stop: Stop reading and close the source.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        sample_rate: int = None,
+        channels: int = 1,
+        sample_format: str = "int16",
+        buffer_secs: float = 60.0,
+        block_size: int = 65536,
+        timeout: float = 0.1,
+    ):
+        """
+        __init__ Create a new PCMStream. The source is not opened yet.
+
+        Args:
+            source (str): '-' for stdin, 'unix:<path>' for a unix domain socket to create and listen on, otherwise the path of a named pipe.
+            sample_rate (int, optional): Sample rate of raw PCM input. Defaults to None (input must be WAV-framed).
+            channels (int, optional): Number of interleaved channels of raw PCM input. Defaults to 1.
+            sample_format (str, optional): Sample format of raw PCM input, one of SAMPLE_FORMATS. Defaults to "int16".
+            buffer_secs (float, optional): Seconds of audio the ring buffer holds before the oldest samples are dropped. Defaults to 60.0.
+            block_size (int, optional): Maximum number of bytes read at once. Defaults to 65536.
+            timeout (float, optional): Time in seconds after which the reader thread checks if it should stop. Defaults to 0.1.
+
+        Raises:
+            ValueError: When 'sample_format', 'channels' or 'buffer_secs' are invalid.
+        """
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(
+                "'sample_format' must be in "
+                + ", ".join(f"'{name}'" for name in SAMPLE_FORMATS)
+            )
+
+        if channels < 1:
+            raise ValueError("'channels' must be >= 1")
+
+        if buffer_secs <= 0:
+            raise ValueError("'buffer_secs' must be > 0")
+
+        self.source = source
+        self.is_socket = source.startswith("unix:")
+        self.buffer_secs = buffer_secs
+        self.block_size = block_size
+        self.timeout = timeout
+
+        format_tag, sample_width = SAMPLE_FORMATS[sample_format]
+        self.raw_format = (
+            None
+            if sample_rate is None
+            else {
+                "format_tag": format_tag,
+                "channels": channels,
+                "sample_rate": sample_rate,
+                "sample_width": sample_width,
+                "block_align": channels * sample_width,
+            }
+        )
+
+        self.format = None  # set by the first writer
+        self.buffer = None  # allocated once the sample rate is known
+        self.session_format = None
+        self.pending = b""
+        self.remaining = None
+        self.is_connected = False
+        self.is_finished = False
+        self.error = None
+        self.server = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    @property
+    def sample_rate(self) -> int:
+        return None if self.format is None else self.format["sample_rate"]
+
+    @property
+    def overruns(self) -> int:
+        return 0 if self.buffer is None else self.buffer.overruns
+
+    def start(self):
+        """
+        start Open the source and read from it in a background daemon thread.
+
+        Raises:
+            RuntimeError: When the stream is running already.
+            ValueError: When the source is neither stdin, a socket nor an existing named pipe.
+        """
+        if self.is_running:
+            raise RuntimeError("PCMStream is running already")
+
+        if self.is_socket:
+            socket_path = Path(self.source[len("unix:") :]).expanduser()
+
+            # a socket left over from a previous, killed process would make bind fail
+            if socket_path.exists():
+                socket_path.unlink()
+
+            socket_path.parent.mkdir(parents=True, exist_ok=True)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(str(socket_path))
+            self.server.listen()
+            self.server.settimeout(self.timeout)
+        elif self.source != "-" and Path(self.source).is_fifo() is False:
+            raise ValueError(f"{self.source} is not a named pipe")
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        """
+        _run Read from the source until the stream is stopped. Errors are kept and raised by 'read'.
+        """
+        try:
+            if self.is_socket:
+                self._serve()
+            else:
+                self._read_pipe()
+        except Exception as e:
+            self.error = e
+
+    def _read_pipe(self):
+        """
+        _read_pipe Read from stdin or a named pipe. The pipe is opened non-blocking, such that waiting for a writer can be interrupted.
+        """
+        if self.source == "-":
+            fd = sys.stdin.buffer.fileno()
+        else:
+            fd = os.open(self.source, os.O_RDONLY | os.O_NONBLOCK)
+
+        try:
+            while self.stop_event.is_set() is False:
+                ready, _, _ = select.select([fd], [], [], self.timeout)
+
+                if len(ready) == 0:
+                    continue
+
+                try:
+                    raw = os.read(fd, self.block_size)
+                except BlockingIOError:
+                    continue
+
+                if len(raw) > 0:
+                    self._receive(raw)
+                    continue
+
+                self._end_session()
+
+                if self.source == "-":
+                    self.is_finished = True
+                    break
+
+                # a named pipe reports the end of file until the next writer opens it
+                time.sleep(self.timeout)
+        finally:
+            if self.source != "-":
+                os.close(fd)
+
+    def _serve(self):
+        """
+        _serve Accept writers on the socket one after another and read from each until it disconnects.
+        """
+        while self.stop_event.is_set() is False:
+            try:
+                connection, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:  # closed by stop
+                break
+
+            with connection:
+                connection.settimeout(self.timeout)
+
+                while self.stop_event.is_set() is False:
+                    try:
+                        raw = connection.recv(self.block_size)
+                    except socket.timeout:
+                        continue
+
+                    if len(raw) == 0:
+                        break
+
+                    self._receive(raw)
+
+            self._end_session()
+
+    def _parse_header(self) -> dict:
+        """
+        _parse_header Determine the format of the current writer from the bytes received so far. WAV-framed input is recognized
+                      by its RIFF header, which is removed, anything else is raw PCM in the configured format.
+
+        Raises:
+            ValueError: When raw PCM arrives without a configured sample rate, or the WAV header is invalid.
+
+        Returns:
+            dict: Format as returned by 'parse_wav_format', None if more bytes are needed to tell.
+        """
+        if len(self.pending) < 4 and b"RIFF".startswith(self.pending):
+            return None
+
+        if self.pending.startswith(b"RIFF") is False:
+            if self.raw_format is None:
+                raise ValueError(
+                    f"Raw PCM input from {self.source} needs a 'sample_rate'"
+                )
+            return dict(self.raw_format)
+
+        if len(self.pending) < 12:
+            return None
+
+        if self.pending[8:12] != b"WAVE":
+            raise ValueError(f"{self.source} does not send WAV data")
+
+        fmt = None
+        position = 12
+        while True:
+            if len(self.pending) < position + 8:
+                return None
+
+            chunk_id = self.pending[position : position + 4]
+            chunk_size = struct.unpack("<I", self.pending[position + 4 : position + 8])[
+                0
+            ]
+
+            if chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(
+                        f"{self.source} has no format chunk before its data"
+                    )
+                self.pending = self.pending[position + 8 :]
+                # streaming writers do not know the size of the data in advance
+                self.remaining = None if chunk_size in [0, 0xFFFFFFFF] else chunk_size
+                return fmt
+
+            end = position + 8 + chunk_size + (chunk_size % 2)
+
+            if len(self.pending) < end:
+                return None
+
+            if chunk_id == b"fmt ":
+                fmt = parse_wav_format(
+                    self.pending[position + 8 : position + 8 + chunk_size]
+                )
+
+            position = end
+
+    def _receive(self, raw: bytes):
+        """
+        _receive Convert the complete frames among the received bytes and write them to the ring buffer. Incomplete frames are kept
+                 until the rest arrives.
+
+        Args:
+            raw (bytes): Bytes read from the source
+
+        Raises:
+            ValueError: When a writer uses a different sample rate than the first one.
+        """
+        self.is_connected = True
+
+        if self.remaining == 0:  # data after the end of a WAV file's data chunk
+            return
+
+        self.pending += raw
+
+        if self.session_format is None:
+            session_format = self._parse_header()
+
+            if session_format is None:
+                return
+
+            if self.format is None:
+                self.format = session_format
+                self.buffer = RingBuffer(
+                    int(self.buffer_secs * session_format["sample_rate"])
+                )
+            elif session_format["sample_rate"] != self.format["sample_rate"]:
+                raise ValueError(
+                    f"Sample rate of {self.source} changed from {self.format['sample_rate']} to {session_format['sample_rate']}"
+                )
+
+            self.session_format = session_format
+
+        block_align = self.session_format["block_align"]
+        usable = len(self.pending) // block_align * block_align
+
+        if self.remaining is not None:
+            usable = min(usable, self.remaining)
+            self.remaining -= usable
+
+        raw, self.pending = self.pending[:usable], self.pending[usable:]
+
+        if self.remaining == 0:
+            self.pending = b""
+
+        if len(raw) > 0:
+            self.buffer.write(
+                pcm_to_float(
+                    raw,
+                    self.session_format["format_tag"],
+                    self.session_format["sample_width"],
+                    self.session_format["channels"],
+                )
+            )
+
+    def _end_session(self):
+        """
+        _end_session Forget the state of the current writer after it has disconnected.
+        """
+        self.session_format = None
+        self.pending = b""
+        self.remaining = None
+        self.is_connected = False
+
+    def read(self) -> np.ndarray:
+        """
+        read Take out the audio read since the last call.
+
+        Raises:
+            Exception: The error that stopped the reader thread, if any.
+
+        Returns:
+            np.ndarray: Mono float32 data at the stream's sample rate. Empty if nothing has been read.
+        """
+        if self.error is not None:
+            raise self.error
+
+        if self.buffer is None:
+            return np.empty(0, dtype=np.float32)
+
+        return self.buffer.read()
+
+    def stop(self):
+        """
+        stop Stop the reader thread, close the source and remove the socket file.
+        """
+        self.stop_event.set()
+
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        if self.is_socket:
+            Path(self.source[len("unix:") :]).expanduser().unlink(missing_ok=True)
+
+
+class StreamSegment:
+    """
+    StreamSegment Analyze a continuous piece of audio with a model and its ensemble as it comes in, with one ChunkStream per model.
+    The times of the detections are relative to the start of the segment. Optionally, the audio is archived to a WAV file.
+
+    Methods:
+    --------
+    feed: Add audio and analyze all chunks that are complete.
+    """
+
+    def __init__(
+        self,
+        members: list,
+        sample_rate: int,
+        name: str,
+        archive_dir: str = None,
+        recorded: float = None,
+    ):
+        """
+        __init__ Create a new StreamSegment.
+
+        Args:
+            members (list): (model_name, Recording) tuples of the models to apply. Detections are tagged with the model name if there is more than one.
+            sample_rate (int): Sample rate of the incoming audio
+            name (str): Name of the segment, used for the results and archive files
+            archive_dir (str, optional): Directory to archive the audio to as '<name>.wav'. Defaults to None (no archive).
+            recorded (float, optional): Unix timestamp of the first sample. Defaults to None (unknown).
+        """
+        self.name = name
+        self.recorded = recorded
+        self.sample_rate = sample_rate
+        self.is_ensemble = len(members) > 1
+        self.streams = [
+            (model_name, ChunkStream(recording, sample_rate))
+            for model_name, recording in members
+        ]
+        self.num_samples = 0
+        self.results = []
+        self.archive = None
+
+        if archive_dir is not None:
+            archive_dir = Path(archive_dir).expanduser()
+            archive_dir.mkdir(parents=True, exist_ok=True)
+            self.archive = sf.SoundFile(
+                archive_dir / f"{name}.wav",
+                "w",
+                samplerate=sample_rate,
+                channels=1,
+                subtype="PCM_16",
+            )
+
+    @property
+    def duration(self) -> float:
+        return self.num_samples / self.sample_rate
+
+    @property
+    def skipped(self) -> list:
+        return self.streams[0][1].skipped
+
+    def feed(self, data: np.ndarray, last: bool = False) -> list:
+        """
+        feed Add audio and analyze all chunks that are complete. When 'last' is set, the rest is analyzed like the end of a file and the archive is closed.
+
+        Args:
+            data (np.ndarray): Mono float32 data at the segment's sample rate
+            last (bool, optional): Whether this is the end of the segment. Defaults to False.
+
+        Returns:
+            list: Detections of the newly analyzed chunks of all models
+        """
+        if self.archive is not None and len(data) > 0:
+            self.archive.write(data)
+
+        self.num_samples += len(data)
+
+        detections = []
+        for model_name, stream in self.streams:
+            new = stream.feed(data, last=last)
+            if self.is_ensemble:
+                new = [dict(d, model=model_name) for d in new]
+            detections.extend(new)
+
+        self.results.extend(detections)
+
+        if last and self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+        return detections
@@ -0,0 +1,308 @@
+from pathlib import Path
+import shutil
+import threading
+import time
+import traceback
+
+from faunanet.journal import ProcessingJournal, count_events, replay_journal
+
+
+class WorkerSupervisor:
+    """
+    WorkerSupervisor Restart the process of a watcher when it dies without having been stopped, e.g., because the interpreter crashed
+    or the process was killed for running out of memory. The files it was analyzing are charged with a failure in the journal of the
+    run and analyzed again by the restarted process, together with all other unfinished files. Files that have made the process die
+    'max_failures' times are moved to a quarantine folder, such that a single bad file cannot stop the analysis. Failures are counted
+    from the journals of all runs in the output base directory, so they add up across restarts of the owning process. Restarts are delayed
+    with exponential backoff, which is reset once a process has stayed alive for 'reset_after' seconds.
+    The supervisor runs in a thread of the process that owns the watcher.
+
+    Methods:
+    --------
+    check: Check the watcher process once and recover it if it died.
+    status: Get the restart counts and quarantined files.
+    start: Check periodically in a background thread.
+    stop: Stop the background thread.
+    """
+
+    def __init__(
+        self,
+        watcher,
+        max_failures: int = 3,
+        backoff: float = 1.0,
+        max_backoff: float = 300.0,
+        reset_after: float = 600.0,
+        max_restarts: int = None,
+        check_interval: float = 1.0,
+        quarantine_dir: str = None,
+        on_error: callable = None,
+    ):
+        """
+        __init__ Create a new WorkerSupervisor.
+
+        Args:
+            watcher (Watcher): Watcher to supervise
+            max_failures (int, optional): Number of times a file may be in flight when the process dies before it is quarantined. Defaults to 3.
+            backoff (float, optional): Delay in seconds before the first restart after a crash. It doubles with every further crash. Defaults to 1.
+            max_backoff (float, optional): Maximum delay in seconds before a restart. Defaults to 300.
+            reset_after (float, optional): Time in seconds a process must stay alive for the backoff to be reset. Defaults to 600.
+            max_restarts (int, optional): Maximum number of restarts, after which the watcher stays down. Defaults to None (no limit).
+            check_interval (float, optional): Time in seconds between two checks of the process. Defaults to 1.
+            quarantine_dir (str, optional): Folder to move quarantined files to. Defaults to None ('quarantine' in the output folder of the run in which the file failed).
+            on_error (callable, optional): Called with the exception and its traceback when recovering a crashed run or restarting the watcher fails.
+                                           Defaults to None (print the traceback).
+
+        Raises:
+            ValueError: When an argument is out of range.
+        """
+        if max_failures < 1:
+            raise ValueError("'max_failures' must be >= 1")
+
+        if backoff < 0 or max_backoff < backoff:
+            raise ValueError("'backoff' must be >= 0 and <= 'max_backoff'")
+
+        if max_restarts is not None and max_restarts < 0:
+            raise ValueError("'max_restarts' must be >= 0")
+
+        if check_interval <= 0:
+            raise ValueError("'check_interval' must be > 0")
+
+        self.watcher = watcher
+        self.max_failures = max_failures
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.reset_after = reset_after
+        self.max_restarts = max_restarts
+        self.check_interval = check_interval
+        self.quarantine_dir = None if quarantine_dir is None else Path(quarantine_dir)
+        self.on_error = on_error
+
+        self.restarts = 0
+        self.crashes = 0
+        self.consecutive_crashes = 0
+        self.last_exitcode = None
+        self.quarantined = []
+        self.restart_at = None  # time of the pending restart
+        self.started_at = None  # time the current process was started
+
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def _next_backoff(self) -> float:
+        """
+        _next_backoff Get the delay before the next restart.
+
+        Returns:
+            float: Delay in seconds
+        """
+        return min(
+            self.max_backoff, self.backoff * 2 ** max(0, self.consecutive_crashes - 1)
+        )
+
+    def _schedule_restart(self):
+        """
+        _schedule_restart Schedule the next restart after the backoff delay, unless 'max_restarts' has been reached.
+        """
+        if self.max_restarts is None or self.restarts < self.max_restarts:
+            self.restart_at = time.monotonic() + self._next_backoff()
+
+    def _recover(self, output: Path):
+        """
+        _recover Charge the files that were in flight in a crashed run with a failure and quarantine those that failed too often
+        in any run. The others are left unfinished in the journal, such that the restarted process picks them up.
+
+        Args:
+            output (Path): Output folder of the crashed run
+        """
+        path = output / self.watcher.journal_name
+
+        if path.is_file() is False:
+            return
+
+        in_flight = [
+            filename
+            for filename, state in replay_journal(path).items()
+            if state["event"] == "started"
+        ]
+
+        if len(in_flight) == 0:
+            return
+
+        journal = ProcessingJournal(path)
+        try:
+            for filename in in_flight:
+                journal.record("failed", filename)
+
+            # records are handed to the operating system right away, so the ones above are counted as well
+            failures = count_events(
+                [
+                    folder / self.watcher.journal_name
+                    for folder in Path(self.watcher.outdir).iterdir()
+                    if (folder / self.watcher.journal_name).is_file()
+                ],
+                "failed",
+            )
+
+            for filename in in_flight:
+                if failures.get(filename, 0) < self.max_failures:
+                    continue
+
+                folder = (
+                    output / "quarantine"
+                    if self.quarantine_dir is None
+                    else self.quarantine_dir
+                )
+                folder.mkdir(parents=True, exist_ok=True)
+
+                if Path(filename).is_file():
+                    shutil.move(filename, folder / Path(filename).name)
+
+                journal.record("quarantined", filename)
+                self.quarantined.append(str(filename))
+        finally:
+            journal.close()
+
+    def check(self) -> bool:
+        """
+        check Check the watcher process once. If it died without having been stopped, recover its in-flight files and schedule a restart.
+        If a scheduled restart is due, restart the watcher.
+
+        Returns:
+            bool: Whether the watcher has been restarted
+        """
+        with self.lock:
+            process = self.watcher.watcher_process
+
+            if self.restart_at is None:
+                if process is None or process.is_alive():
+                    return False
+
+                # a process that ended itself after reporting an exception through the exception queue is left to the user
+                if process.exitcode == 0:
+                    return False
+
+                # died without 'stop', which would have removed the process
+                process.join()
+                self.last_exitcode = process.exitcode
+                process.close()
+                self.watcher.watcher_process = None
+                self.watcher.state_channel.set("failed")
+                self.crashes += 1
+
+                if (
+                    self.started_at is not None
+                    and time.monotonic() - self.started_at >= self.reset_after
+                ):
+                    self.consecutive_crashes = 0
+                self.consecutive_crashes += 1
+
+                # the watcher is restarted even if its files could not be recovered
+                try:
+                    self._recover(Path(self.watcher.output))
+                except Exception as e:
+                    self._report(e)
+
+                self._schedule_restart()
+
+            if self.restart_at is None or time.monotonic() < self.restart_at:
+                return False
+
+            self.restart_at = None
+            self.restarts += 1
+
+            try:
+                self.watcher.start()
+            except Exception as e:
+                # 'start' has undone its changes, try again later
+                self._report(e)
+                self.consecutive_crashes += 1
+                self._schedule_restart()
+                return False
+
+            self.started_at = time.monotonic()
+            return True
+
+    def status(self) -> dict:
+        """
+        status Get the restart counts and quarantined files.
+
+        Returns:
+            dict: {"restarts", "crashes", "last_exitcode" (negative for the number of the signal that killed the process), "restart_in" (seconds until a
+                  pending restart or None), "quarantined": quarantined files}
+        """
+        with self.lock:
+            return {
+                "restarts": self.restarts,
+                "crashes": self.crashes,
+                "last_exitcode": self.last_exitcode,
+                "restart_in": (
+                    None
+                    if self.restart_at is None
+                    else max(0.0, self.restart_at - time.monotonic())
+                ),
+                "quarantined": list(self.quarantined),
+            }
+
+    def _report(self, e: Exception):
+        """
+        _report Report an error of a check.
+
+        Args:
+            e (Exception): Exception the check failed with
+        """
+        tb = traceback.format_exc()
+        if self.on_error is None:
+            print(tb)
+        else:
+            self.on_error(e, tb)
+
+    def _check_loop(self):
+        """
+        _check_loop Check every 'check_interval' seconds until stopped. Errors are reported and do not stop the next checks.
+        """
+        while not self.stop_event.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                self._report(e)
+
+    def start(self):
+        """
+        start Check the watcher process periodically in a background thread.
+
+        Raises:
+            RuntimeError: When the supervisor is already running.
+        """
+        if self.is_running:
+            raise RuntimeError("Worker supervisor is already running")
+
+        self.started_at = time.monotonic()
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._check_loop, name="worker_supervisor", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> bool:
+        """
+        stop Stop the background thread and cancel a pending restart. A restart that is in progress is finished first.
+
+        Returns:
+            bool: Whether a restart was pending, i.e., the watcher process had died and not been restarted yet
+        """
+        self.stop_event.set()
+
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+            self.thread = None
+
+        with self.lock:
+            is_pending = self.restart_at is not None
+            self.restart_at = None
+
+        return is_pending
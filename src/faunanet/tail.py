@@ -0,0 +1,396 @@
+from pathlib import Path
+import os
+import struct
+import time
+import numpy as np
+import soxr
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# file endings of formats that can be analyzed while they are being written
+TAIL_SUFFIXES = [".wav"]
+
+# resample types of librosa that have a streaming counterpart in soxr. Others use 'HQ'.
+SOXR_QUALITIES = {
+    "soxr_vhq": "VHQ",
+    "soxr_hq": "HQ",
+    "soxr_mq": "MQ",
+    "soxr_lq": "LQ",
+    "soxr_qq": "QQ",
+}
+
+
+def can_tail(path: str) -> bool:
+    """
+    can_tail Check if a file can be analyzed while it is being written.
+
+    Args:
+        path (str): Path of the file
+
+    Returns:
+        bool: True if the file format supports incremental reading.
+    """
+    return Path(path).suffix.lower() in TAIL_SUFFIXES
+
+
+def parse_wav_format(fmt: bytes) -> dict:
+    """
+    parse_wav_format Read the sample format from the content of a WAV 'fmt ' chunk.
+
+    Args:
+        fmt (bytes): Content of the chunk
+
+    Raises:
+        ValueError: When the sample format is not supported.
+
+    Returns:
+        dict: "format_tag", "channels", "sample_rate", "sample_width" in bytes and "block_align", the size of a frame in bytes.
+    """
+    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack(
+        "<HHIIHH", fmt[:16]
+    )
+
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        # the actual format is the first two bytes of the sub format guid
+        format_tag = struct.unpack("<H", fmt[24:26])[0]
+
+    if (format_tag, bits) not in [
+        (WAVE_FORMAT_PCM, 8),
+        (WAVE_FORMAT_PCM, 16),
+        (WAVE_FORMAT_PCM, 24),
+        (WAVE_FORMAT_PCM, 32),
+        (WAVE_FORMAT_IEEE_FLOAT, 32),
+        (WAVE_FORMAT_IEEE_FLOAT, 64),
+    ]:
+        raise ValueError(f"Unsupported sample format {format_tag} with {bits} bits")
+
+    return {
+        "format_tag": format_tag,
+        "channels": channels,
+        "sample_rate": sample_rate,
+        "sample_width": bits // 8,
+        "block_align": block_align,
+    }
+
+
+def pcm_to_float(
+    raw: bytes, format_tag: int, sample_width: int, channels: int
+) -> np.ndarray:
+    """
+    pcm_to_float Convert complete frames of little endian PCM or float samples to mono float32 data in [-1, 1].
+
+    Args:
+        raw (bytes): Complete frames
+        format_tag (int): WAVE_FORMAT_PCM or WAVE_FORMAT_IEEE_FLOAT
+        sample_width (int): Bytes per sample
+        channels (int): Number of interleaved channels
+
+    Returns:
+        np.ndarray: Mono audio data
+    """
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        data = np.frombuffer(raw, dtype=f"<f{sample_width}").astype(np.float32)
+    elif sample_width == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 3:
+        bytes_ = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = bytes_[:, 0] | (bytes_[:, 1] << 8) | (bytes_[:, 2] << 16)
+        samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples)
+        data = samples.astype(np.float32) / (1 << 23)
+    else:
+        data = np.frombuffer(raw, dtype=f"<i{sample_width}").astype(np.float32) / float(
+            1 << (8 * sample_width - 1)
+        )
+
+    if channels > 1:
+        data = data.reshape(-1, channels).mean(axis=1)
+
+    return data
+
+
+class WavTail:
+    """
+    WavTail Incremental reader for a WAV file that is still being written. Recorders write the header first, with a placeholder for
+    the size of the data, and fill in the real size when they close the file. The reader parses the header once, then returns the
+    complete frames appended since the last read. Trailing chunks after the audio data, like metadata written on close, are not read as audio.
+
+    Methods:
+    --------
+    read: Read the frames appended since the last call.
+    is_complete: Check if the writer has finalized the header and all data has been read.
+    follow: Read the file as it grows until the writer has closed it.
+    close: Close the file.
+    """
+
+    def __init__(self, path: str):
+        """
+        __init__ Create a new WavTail. The file is opened, but not read yet.
+
+        Args:
+            path (str): Path of the WAV file
+        """
+        self.path = Path(path)
+        # unbuffered, such that the size the writer updates in the header is never read from a stale buffer
+        self.file = open(self.path, "rb", buffering=0)
+        self.sample_rate = None
+        self.channels = None
+        self.sample_width = None
+        self.format_tag = None
+        self.block_align = None
+        self.data_offset = None
+        self.size_offset = None
+        self.frames_read = 0
+
+    @property
+    def has_header(self) -> bool:
+        return self.data_offset is not None
+
+    def _parse_header(self) -> bool:
+        """
+        _parse_header Parse the RIFF header up to the start of the audio data.
+
+        Raises:
+            ValueError: When the file is not a WAV file or has an unsupported sample format.
+
+        Returns:
+            bool: True if the header is complete, False if it has not been fully written yet.
+        """
+        self.file.seek(0)
+        header = self.file.read(12)
+
+        if len(header) < 12:
+            return False
+
+        if header[0:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError(f"{self.path} is not a WAV file")
+
+        position = 12
+        while True:
+            self.file.seek(position)
+            chunk = self.file.read(8)
+            if len(chunk) < 8:
+                return False
+
+            chunk_id, chunk_size = chunk[0:4], struct.unpack("<I", chunk[4:8])[0]
+
+            if chunk_id == b"fmt ":
+                fmt = self.file.read(chunk_size)
+                if len(fmt) < min(chunk_size, 16):
+                    return False
+                for name, value in parse_wav_format(fmt).items():
+                    setattr(self, name, value)
+            elif chunk_id == b"data":
+                if self.format_tag is None:
+                    raise ValueError(f"{self.path} has no format chunk before its data")
+                self.size_offset = position + 4
+                self.data_offset = position + 8
+                return True
+
+            # chunks are padded to an even number of bytes
+            position += 8 + chunk_size + (chunk_size % 2)
+
+    def _data_size(self) -> int:
+        """
+        _data_size Read the size of the audio data from the header, which the writer may have updated.
+
+        Returns:
+            int: Size in bytes, None if the header still holds a placeholder.
+        """
+        self.file.seek(self.size_offset)
+        size = struct.unpack("<I", self.file.read(4))[0]
+        return None if size in [0, 0xFFFFFFFF] else size
+
+    def _available_bytes(self) -> int:
+        """
+        _available_bytes Get the number of bytes of audio data that have been written so far.
+
+        Returns:
+            int: Number of bytes after the start of the data, restricted to the size in the header once the writer has set it.
+        """
+        available = os.fstat(self.file.fileno()).st_size - self.data_offset
+        size = self._data_size()
+        return available if size is None else min(available, size)
+
+    def read(self) -> np.ndarray:
+        """
+        read Read the complete frames appended since the last call.
+
+        Returns:
+            np.ndarray: Mono float32 data at the native sample rate of the file. Empty if the header is not complete yet or nothing has been appended.
+        """
+        if self.has_header is False and self._parse_header() is False:
+            return np.empty(0, dtype=np.float32)
+
+        num_frames = self._available_bytes() // self.block_align - self.frames_read
+
+        if num_frames <= 0:
+            return np.empty(0, dtype=np.float32)
+
+        self.file.seek(self.data_offset + self.frames_read * self.block_align)
+        raw = self.file.read(num_frames * self.block_align)
+        num_frames = len(raw) // self.block_align
+        self.frames_read += num_frames
+
+        return pcm_to_float(
+            raw[: num_frames * self.block_align],
+            self.format_tag,
+            self.sample_width,
+            self.channels,
+        )
+
+    def is_complete(self) -> bool:
+        """
+        is_complete Check if the writer has filled in the size of the data and all of it has been read.
+
+        Returns:
+            bool: True if the file is complete.
+        """
+        if self.has_header is False:
+            return False
+
+        size = self._data_size()
+        file_size = os.fstat(self.file.fileno()).st_size
+        return (
+            size is not None
+            and self.data_offset + size <= file_size
+            and self.frames_read == size // self.block_align
+        )
+
+    def follow(self, poll_interval: float = 1.0, idle_timeout: float = 10.0):
+        """
+        follow Read the file as it grows. The file is considered closed by the writer when the size in the header matches the data
+        and nothing has been appended for one poll interval, or when nothing has been appended for 'idle_timeout' seconds.
+
+        Args:
+            poll_interval (float, optional): Time in seconds between two checks for new data. Defaults to 1.0.
+            idle_timeout (float, optional): Time in seconds without new data after which the file is considered closed. Defaults to 10.0.
+
+        Raises:
+            ValueError: When the file has no complete WAV header after 'idle_timeout' seconds.
+
+        Yields:
+            np.ndarray: Newly appended mono float32 data at the native sample rate of the file. The last item is empty.
+        """
+        idle = 0.0
+
+        while True:
+            data = self.read()
+
+            if len(data) > 0:
+                idle = 0.0
+                yield data
+                continue
+
+            if (self.is_complete() and idle > 0) or idle >= idle_timeout:
+                break
+
+            time.sleep(poll_interval)
+            idle += poll_interval
+
+        if self.has_header is False:
+            raise ValueError(
+                f"{self.path} has no complete WAV header after {idle_timeout} seconds"
+            )
+
+        yield np.empty(0, dtype=np.float32)
+
+    def close(self):
+        """
+        close Close the file.
+        """
+        self.file.close()
+
+
+class ChunkStream:
+    """
+    ChunkStream Analyze the audio of a growing file with one recording, chunk by chunk. Incoming data is resampled with a streaming
+    resampler to the sample rate of the recording's preprocessor, and complete chunks are analyzed as soon as they are available.
+    The times of the detections are relative to the start of the file.
+
+    Methods:
+    --------
+    feed: Add data and analyze all chunks that are complete.
+    """
+
+    def __init__(self, recording, native_rate: int):
+        """
+        __init__ Create a new ChunkStream.
+
+        Args:
+            recording (Recording): Recording to analyze the data with
+            native_rate (int): Sample rate of the incoming data
+        """
+        processor = recording.processor
+
+        self.recording = recording
+        self.sample_rate = processor.sample_rate
+        self.chunk_length = int(processor.sample_secs * processor.sample_rate)
+        self.step = int(
+            (processor.sample_secs - processor.overlap) * processor.sample_rate
+        )
+
+        if self.step <= 0:
+            raise ValueError("'overlap' must be smaller than 'sample_secs'")
+
+        self.resampler = (
+            None
+            if native_rate == processor.sample_rate
+            else soxr.ResampleStream(
+                native_rate,
+                processor.sample_rate,
+                1,
+                dtype="float32",
+                quality=SOXR_QUALITIES.get(processor.resample_type, "HQ"),
+            )
+        )
+
+        self.pending = np.empty(0, dtype=np.float32)
+        self.consumed = 0  # samples before the start of 'pending'
+        self.detections = []
+        self.skipped = []
+
+    def feed(self, data: np.ndarray, last: bool = False) -> list:
+        """
+        feed Add data and analyze all chunks that are complete. When 'last' is set, the remaining data is analyzed like the end of a file.
+
+        Args:
+            data (np.ndarray): Mono float32 data at the native sample rate
+            last (bool, optional): Whether this is the end of the file. Defaults to False.
+
+        Returns:
+            list: Detections of the newly analyzed chunks
+        """
+        if self.resampler is not None:
+            data = self.resampler.resample_chunk(data, last=last)
+
+        self.pending = np.concatenate([self.pending, data])
+
+        if last:
+            used, num_chunks, step = len(self.pending), None, len(self.pending)
+        elif len(self.pending) < self.chunk_length:
+            return []
+        else:
+            num_chunks = (len(self.pending) - self.chunk_length) // self.step + 1
+            used = (num_chunks - 1) * self.step + self.chunk_length
+            step = num_chunks * self.step
+
+        if used == 0:
+            return []
+
+        offset = self.consumed / self.sample_rate
+
+        detections = self.recording.analyze_data(
+            self.pending[:used], offset=offset, num_chunks=num_chunks
+        )
+
+        self.skipped.extend(
+            (start + offset, end + offset)
+            for start, end in self.recording.skipped_chunks
+        )
+        self.detections.extend(detections)
+        self.pending = self.pending[step:]
+        self.consumed += step
+
+        return detections
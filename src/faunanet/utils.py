@@ -4,6 +4,9 @@ import os
 import time
 import yaml
 import inspect
+import numpy as np
+
+from faunanet.workers import preloaded_model_content
 
 
 # custom exception to have some more control over what is raised
@@ -82,13 +85,16 @@ def read_yaml(path: str):
     return base_cfg
 
 
-def load_model_from_file_tflite(path: str, num_threads: int = 1):
+def load_model_from_file_tflite(
+    path: str, num_threads: int = 1, use_xnnpack: bool = True
+):
     """
     load_model_from_file_tflite Load model from a .tflite file.
 
     Args:
         path (str): Path to a .tflite model file to load
         num_threads (int, optional): Number of threads to use. Defaults to 1.
+        use_xnnpack (bool, optional): Whether the interpreter applies its default delegates, i.e., XNNPACK. Defaults to True.
 
     Raises:
         FileNotFoundError: When the path given does not lead to an existing file
@@ -105,13 +111,158 @@ def load_model_from_file_tflite(path: str, num_threads: int = 1):
     if Path(path).exists() is False:
         raise FileNotFoundError(f"The desired model file does not exist: {path}")
 
+    options = {}
+    if use_xnnpack is False:
+        resolvers = getattr(tflite, "OpResolverType", None)
+        if resolvers is None:
+            resolvers = tflite.experimental.OpResolverType
+        options["experimental_op_resolver_type"] = (
+            resolvers.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        )
+
+    # worker processes forked from a warm server may have the file in memory already
+    content = preloaded_model_content(path)
+    if content is None:
+        options["model_path"] = str(path)
+    else:
+        options["model_content"] = content
+
     try:
-        interpreter = tflite.Interpreter(model_path=path, num_threads=num_threads)
+        interpreter = tflite.Interpreter(num_threads=num_threads, **options)
         return interpreter
     except Exception as e:
         raise TFModelException(e)
 
 
+def quantize(data: np.ndarray, scale: float, zero_point: int, dtype) -> np.ndarray:
+    """
+    quantize Map real valued data to a quantized integer representation: q = round(x / scale) + zero_point, clipped to the range of 'dtype'.
+
+    Args:
+        data (np.ndarray): real valued data
+        scale (float): quantization scale
+        zero_point (int): quantization zero point
+        dtype: integer dtype of the quantized data, e.g., np.int8
+
+    Returns:
+        np.ndarray: quantized data
+    """
+    info = np.iinfo(dtype)
+    quantized = np.round(np.asarray(data, dtype=np.float32) / scale) + zero_point
+    return np.clip(quantized, info.min, info.max).astype(dtype)
+
+
+def dequantize(data: np.ndarray, scale: float, zero_point: int) -> np.ndarray:
+    """
+    dequantize Map quantized integer data back to real values: x = (q - zero_point) * scale
+
+    Args:
+        data (np.ndarray): quantized data
+        scale (float): quantization scale
+        zero_point (int): quantization zero point
+
+    Returns:
+        np.ndarray: real valued data as float32
+    """
+    return (np.asarray(data, dtype=np.float32) - zero_point) * np.float32(scale)
+
+
+def _quantization_of(details: dict):
+    """
+    _quantization_of Extract (scale, zero_point, dtype) from tflite tensor details if the tensor is not float32, else None.
+
+    Args:
+        details (dict): Tensor details as returned by 'get_input_details' or 'get_output_details'
+
+    Returns:
+        tuple|None: (scale, zero_point, dtype) for integer tensors, (None, None, dtype) for other float types, None for float32 tensors.
+    """
+    dtype = np.dtype(details["dtype"])
+
+    if dtype == np.float32:
+        return None
+
+    if np.issubdtype(dtype, np.integer):
+        scale, zero_point = details.get("quantization", (0.0, 0))
+        if scale == 0.0:
+            # integer tensor that is not quantized, e.g., an index input
+            return None
+        return (scale, zero_point, dtype)
+
+    return (None, None, dtype)
+
+
+class QuantizedInterpreter:
+    """
+    QuantizedInterpreter Wrapper around a tflite interpreter with quantized (int8/uint8/int16) or float16 inputs or outputs.
+    'set_tensor' converts float32 data for such inputs and 'get_tensor' returns float32 data for such outputs, such that
+    code written for float models can use quantized models unchanged. All other attributes are taken from the wrapped interpreter.
+    """
+
+    def __init__(self, interpreter):
+        """
+        __init__ Create a new QuantizedInterpreter.
+
+        Args:
+            interpreter: tflite interpreter to wrap
+        """
+        self.interpreter = interpreter
+
+        self.input_quantization = {
+            d["index"]: _quantization_of(d) for d in interpreter.get_input_details()
+        }
+
+        self.output_quantization = {
+            d["index"]: _quantization_of(d) for d in interpreter.get_output_details()
+        }
+
+    @staticmethod
+    def is_quantized(interpreter) -> bool:
+        """
+        is_quantized Check if an interpreter has any input or output that is not float32.
+
+        Args:
+            interpreter: tflite interpreter
+
+        Returns:
+            bool: True if any input or output needs conversion from or to float32
+        """
+        return any(
+            _quantization_of(d) is not None
+            for d in interpreter.get_input_details() + interpreter.get_output_details()
+        )
+
+    def set_tensor(self, index: int, value: np.ndarray):
+        quantization = self.input_quantization.get(index)
+        value = np.asarray(value)
+
+        if quantization is not None and value.dtype != quantization[2]:
+            scale, zero_point, dtype = quantization
+            value = (
+                value.astype(dtype)
+                if scale is None
+                else quantize(value, scale, zero_point, dtype)
+            )
+
+        self.interpreter.set_tensor(index, value)
+
+    def get_tensor(self, index: int) -> np.ndarray:
+        value = self.interpreter.get_tensor(index)
+        quantization = self.output_quantization.get(index)
+
+        if quantization is None:
+            return value
+
+        scale, zero_point, _ = quantization
+        if scale is None:
+            return value.astype(np.float32)
+        return dequantize(value, scale, zero_point)
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the wrapper itself
+        return getattr(self.interpreter, name)
+
+
 def load_model_from_file_pb(path: str, _):
     """
     load_model_from_file_pb Load a tensorflow model saved as .pb in tensorflow's saved_model format from file. The file to be loaded must be named 'saved_model.pb'
@@ -142,6 +293,200 @@ def load_model_from_file_pb(path: str, _):
         raise TFModelException(e)
 
 
+# numpy types of the element types of onnx tensors
+ONNX_DTYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+    "tensor(int8)": np.int8,
+    "tensor(uint8)": np.uint8,
+    "tensor(int16)": np.int16,
+    "tensor(int32)": np.int32,
+    "tensor(int64)": np.int64,
+    "tensor(bool)": np.bool_,
+}
+
+
+class ONNXInterpreter:
+    """
+    ONNXInterpreter Run an ONNX Runtime session behind the same interface as a tflite interpreter, such that model code written for
+    tflite models, including TFLiteModelBase, can run 'model.onnx' files unchanged. Inputs come first in the tensor indices, followed by
+    the outputs. Dimensions of variable size, e.g., the batch size, are 1 until the input is resized.
+    """
+
+    def __init__(self, session):
+        """
+        __init__ Create a new ONNXInterpreter.
+
+        Args:
+            session (onnxruntime.InferenceSession): Session to run
+        """
+        self.session = session
+
+        self.inputs = session.get_inputs()
+
+        self.outputs = session.get_outputs()
+
+        self.shapes = {
+            i: [d if isinstance(d, int) else 1 for d in tensor.shape]
+            for i, tensor in enumerate(self.inputs)
+        }
+
+        self.buffers = {}
+
+        self.results = []
+
+    def _details(self, tensors: list, offset: int, shapes: dict) -> list:
+        return [
+            {
+                "index": offset + i,
+                "name": tensor.name,
+                "shape": np.array(shapes[i]),
+                "dtype": ONNX_DTYPES.get(tensor.type, np.float32),
+                "quantization": (0.0, 0),
+            }
+            for i, tensor in enumerate(tensors)
+        ]
+
+    def get_input_details(self) -> list:
+        return self._details(self.inputs, 0, self.shapes)
+
+    def get_output_details(self) -> list:
+        shapes = {
+            i: [d if isinstance(d, int) else 1 for d in tensor.shape]
+            for i, tensor in enumerate(self.outputs)
+        }
+        return self._details(self.outputs, len(self.inputs), shapes)
+
+    def resize_tensor_input(self, index: int, shape: list):
+        self.shapes[index] = [int(d) for d in shape]
+
+    def allocate_tensors(self):
+        self.buffers = {
+            i: np.zeros(self.shapes[i], dtype=ONNX_DTYPES.get(tensor.type, np.float32))
+            for i, tensor in enumerate(self.inputs)
+        }
+
+    def tensor(self, index: int):
+        # like tflite, a function that returns the input buffer, which is written to without a copy
+        return lambda: self.buffers[index]
+
+    def set_tensor(self, index: int, value: np.ndarray):
+        self.buffers[index] = np.asarray(
+            value, dtype=ONNX_DTYPES.get(self.inputs[index].type, np.float32)
+        )
+
+    def invoke(self):
+        self.results = self.session.run(
+            None,
+            {tensor.name: self.buffers[i] for i, tensor in enumerate(self.inputs)},
+        )
+
+    def get_tensor(self, index: int) -> np.ndarray:
+        if index < len(self.inputs):
+            return self.buffers[index].copy()
+        return self.results[index - len(self.inputs)]
+
+    def __call__(self, data: np.ndarray) -> np.ndarray:
+        """
+        __call__ Run the model on a batch of data for its first input and get its first output.
+
+        Args:
+            data (np.ndarray): Input data, including the batch dimension
+
+        Returns:
+            np.ndarray: First output of the model
+        """
+        self.set_tensor(0, data)
+        self.invoke()
+        return self.results[0]
+
+
+def load_model_from_file_onnx(path: str, num_threads: int = 1):
+    """
+    load_model_from_file_onnx Load a model from a .onnx file with the CPU execution provider of ONNX Runtime.
+
+    Args:
+        path (str): Path to a .onnx model file to load
+        num_threads (int, optional): Number of threads used within an operator. Defaults to 1.
+
+    Raises:
+        ImportError: When onnxruntime is not installed.
+        FileNotFoundError: When the path given does not lead to an existing file
+        TFModelException: When something goes wrong within ONNX Runtime when loading the model.
+
+    Returns:
+        ONNXInterpreter: The loaded model
+    """
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError(
+            "onnxruntime is needed to run 'model.onnx' files, install it with 'pip install onnxruntime'"
+        ) from e
+
+    if Path(path).exists() is False:
+        raise FileNotFoundError(f"The desired model file does not exist: {path}")
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = num_threads
+    options.inter_op_num_threads = 1
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    try:
+        content = preloaded_model_content(path)
+        session = ort.InferenceSession(
+            str(path) if content is None else content,
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        return ONNXInterpreter(session)
+    except Exception as e:
+        raise TFModelException(e)
+
+
+# model backends: name -> (name of the model file, function (path, num_threads) -> loaded model)
+MODEL_BACKENDS = {
+    "tflite": ("model.tflite", load_model_from_file_tflite),
+    "saved_model": ("saved_model.pb", load_model_from_file_pb),
+    "onnx": ("model.onnx", load_model_from_file_onnx),
+}
+
+
+def register_model_backend(name: str, filename: str, load: callable):
+    """
+    register_model_backend Make a new model backend available, or replace an existing one.
+
+    Args:
+        name (str): Name of the backend, used as 'backend' in the 'Model' node of a config
+        filename (str): Name of the model files the backend loads, e.g., 'model.onnx'
+        load (callable): Function (path, num_threads) -> loaded model
+    """
+    MODEL_BACKENDS[name] = (filename, load)
+
+
+def model_backend_of(model_path: str) -> str:
+    """
+    model_backend_of Get the backend that loads a model file, based on its name.
+
+    Args:
+        model_path (str): Path to the model file
+
+    Raises:
+        ValueError: When no backend loads files of this name.
+
+    Returns:
+        str: Name of the backend
+    """
+    model_filename = Path(model_path).name
+
+    for name, (filename, _) in MODEL_BACKENDS.items():
+        if filename == model_filename:
+            return name
+
+    raise ValueError(f"Model filename unknown: {model_filename}")
+
+
 def load_module(module_name: str, file_path: str):
     """
     load_module Load a python module from 'path' with alias 'alias'
@@ -177,6 +522,53 @@ def load_name_from_module(module_name: str, file_path: str, name: str):
     return getattr(module, name)
 
 
+def patterns_of(pattern) -> list:
+    """
+    patterns_of Get the file patterns of a watcher as a list, since a single pattern may be given as a string.
+
+    Args:
+        pattern (str | list): A single file ending like '.wav' or a list of them
+
+    Returns:
+        list: File endings, lower case
+    """
+    if isinstance(pattern, str):
+        pattern = [pattern]
+    return [p.lower() for p in pattern]
+
+
+def matches_pattern(path: str, pattern) -> bool:
+    """
+    matches_pattern Check if a file has one of the given file endings. The comparison is case insensitive.
+
+    Args:
+        path (str): Path of the file
+        pattern (str | list): A single file ending like '.wav' or a list of them
+
+    Returns:
+        bool: True if the file has one of the endings.
+    """
+    return Path(path).suffix.lower() in patterns_of(pattern)
+
+
+def run_input(output: str) -> Path:
+    """
+    run_input Get the input directory a run has analyzed from the config in its output folder.
+
+    Args:
+        output (str): Output folder of the run
+
+    Returns:
+        Path: Resolved input directory, or None when the folder has no readable config (yet), e.g., because it is not a run.
+    """
+    try:
+        with open(Path(output) / "config.yml", "r") as ymlfile:
+            config = yaml.safe_load(ymlfile)
+        return Path(config["Analysis"]["input"]).expanduser().resolve()
+    except (OSError, TypeError, KeyError, yaml.YAMLError):
+        return None
+
+
 def wait_for_file_completion(file_path: str, polling_interval=1) -> bool:
     """
     wait_for_file_completion Wait for a file to be fully written by checking when its size does no longer change.
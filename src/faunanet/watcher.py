@@ -1,33 +1,67 @@
 from faunanet import Recording
 from faunanet import SpeciesPredictorBase
+from faunanet.publisher import DetectionPublisher
+from faunanet.state import StateChannel
+from faunanet.ensemble import SharedDecoder
+from faunanet.cache import ResultsCache, hash_config, hash_shedding
+from faunanet.cluster import LeaseManager
+from faunanet.compaction import ResultsCompactor, processed_recordings
+from faunanet.retention import RecordingRetention
+from faunanet.query import DetectionIndex, INDEX_NAME
+from faunanet.resources import plan_resources, apply_plan
+from faunanet.journal import (
+    ProcessingJournal,
+    JOURNAL_NAME,
+    journal_limits,
+    unfinished_files,
+)
+from faunanet.scan_observer import ScanObserver
+from faunanet.tail import WavTail, can_tail
+from faunanet.stream import PCMStream, StreamSegment
+from faunanet.workers import warm_context, worker_context, model_files
+from faunanet.load_shedding import LoadShedder
+from faunanet.scheduler import PriorityScheduler
+from faunanet.activity_gate import ActivityGate
+from faunanet.supervisor import WorkerSupervisor
+from faunanet.writer import ResultWriter
 import faunanet.utils as utils
 
 from pathlib import Path
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
-from time import sleep
-from datetime import datetime
+from time import sleep, monotonic
+from datetime import datetime, timedelta
 from copy import deepcopy
 import yaml
 import multiprocessing
+import multiprocessing.connection
 import warnings
 import csv
 from contextlib import contextmanager
 import traceback
+import signal
+import threading
+import queue
 
 
 class AnalysisEventHandler(FileSystemEventHandler):
     """
-    AnalysisEventHandler Custom event handler that calls a function whenever
-    the a new file with a matching extension is created in the watched directory and that waits for a
-    multiprocessing.Event object to be true.
+    AnalysisEventHandler Custom event handler that queues every newly created file with a matching extension in the watched directory.
+    The queued files are analyzed one after the other in a separate analysis thread, which waits for a multiprocessing.Event object
+    to be true. New files are queued as 'live' work, files left over from earlier runs and found by sweeps as 'backlog' work, and a
+    priority scheduler decides which is analyzed next. With a load shedder, the analysis is degraded step by step while the queue grows
+    and restored once it has drained.
 
     Base:
         FileSystemEventHandler: watchdog.FilesystemEventHandler
 
     Methods:
     --------
-    on_created(event): Run the callback whenever a newly created file with a matching pattern is found.
+    on_created(event): Queue a newly created file with a matching pattern.
+    process(path): Queue a single file if it matches the pattern.
+    sweep(directory): Queue all files with a matching pattern in a directory.
+    start(): Start the analysis thread.
+    stop(): Stop the analysis thread.
     """
 
     def __init__(
@@ -39,9 +73,9 @@ class AnalysisEventHandler(FileSystemEventHandler):
 
         Args:
             callback (callable): Callback functionw hen
-            pattern (str, optional): file apttern. Defaults to ".wav".
             watcher: (Watcher): Watcher this Handler is used with
         """
+        self.watcher = watcher
         self.pattern = watcher.pattern
         self.recording = watcher._set_up_recording(
             watcher.model_name,
@@ -50,22 +84,242 @@ class AnalysisEventHandler(FileSystemEventHandler):
             watcher.model_config,
             watcher.preprocessor_config,
         )
+        self.ensemble = watcher._set_up_ensemble(
+            watcher.ensemble_config, self.recording
+        )
         self.callback = watcher.analyze
+        self.journal = watcher.journal
+        self.leases = watcher.leases
+        self.seen = set()
+        # the analysis thread and the stream share the recording, so only one file is analyzed at a time
+        self.lock = threading.Lock()
+
+        self.queue = watcher._set_up_scheduler()
+        watcher.scheduler = self.queue  # such that the watcher can write its statistics
+        self.queued = set()  # files that are queued or being analyzed
+        self.thread = None
+
+        self.shedder = watcher.shedder
+        self.fallback = None  # recording of the fallback model, built when first needed
+        self.members = [self.recording] + [
+            member for _, member in (self.ensemble or [])
+        ]
+        self.shed_gates = [None] * len(self.members)  # built when first needed
+        self.overlaps = [member.processor.overlap for member in self.members]
+
+    @property
+    def backlog(self) -> int:
+        return self.queue.qsize()
 
     def on_created(self, event):
         """
-        on_created Call the callback function of the caller object whenever a new file is created
-                    that has the desired file extension. Waits on the stored multiprocessing.event and only
-                    runs if its flag is true.
+        on_created Queue a newly created file that has the desired file extension for analysis.
 
         Args:
             event (threading.Event): Event triggering the analysis, i.e., a new audio file appears and is ready to be processessed in the watched folder
         """
-        if (
-            Path(event.src_path).is_file()
-            and Path(event.src_path).suffix == self.pattern
-        ):
-            self.callback(event.src_path, self.recording)
+        self.process(event.src_path)
+
+    def process(self, path: str, resumed: bool = False, priority: str = None):
+        """
+        process Queue the file at 'path' for analysis if it exists, has the desired file extension and is not queued already.
+                The file is recorded in the journal of the run the first time it is seen.
+
+        Args:
+            path (str): Path of the file
+            resumed (bool, optional): Whether the file is left over from an earlier run. Defaults to False.
+            priority (str, optional): Scheduling class of the file. Defaults to None ('backlog' for resumed files, else 'live').
+        """
+        if priority is None:
+            priority = "backlog" if resumed else "live"
+
+        if Path(path).is_file() and utils.matches_pattern(path, self.pattern):
+            if self.journal is not None and str(path) not in self.seen:
+                self.journal.enqueued(path, resumed=resumed)
+            self.seen.add(str(path))
+
+            if str(path) in self.queued:
+                return
+
+            self.queued.add(str(path))
+            self.queue.put((str(path), resumed), priority)
+
+    def sweep(self, directory: str):
+        """
+        sweep Queue all files with a matching pattern in 'directory' and its subdirectories, oldest first.
+              Used in cluster mode, where files written by other hosts to a shared directory do not trigger file system events
+              and files of dead hosts have to be picked up again. Files seen before are only looked at again while they are neither
+              queued nor done, e.g., because another watcher held their lease.
+
+        Args:
+            directory (str): Directory to look for files in
+        """
+        files = []
+        for path in Path(directory).rglob("*"):
+            if utils.matches_pattern(path, self.pattern) is False:
+                continue
+
+            if str(path) in self.seen and (
+                str(path) in self.queued
+                or self.leases is None
+                or self.leases.is_done(path)
+            ):
+                continue
+
+            try:
+                files.append((path.stat().st_ctime, path))
+            except FileNotFoundError:  # deleted in the meantime
+                continue
+
+        for _, path in sorted(files):
+            if self.leases is not None and self.leases.is_done(path):
+                continue
+            self.process(path, priority="backlog")
+
+    def _apply_shedding(self):
+        """
+        _apply_shedding Set up the recordings for the steps the load shedder has taken, and restore them for the steps it has reverted.
+        """
+        steps = self.shedder.active_steps
+        config = self.watcher.shedding_config
+
+        for i, (member, overlap) in enumerate(zip(self.members, self.overlaps)):
+            member.processor.overlap = (
+                min(overlap, config.get("overlap", 0.0))
+                if "overlap" in steps
+                else overlap
+            )
+
+            # a gate of the recording's own config stays in place. Each model gets its own gate, which counts its own chunks
+            if member.gate is not None and member.gate is not self.shed_gates[i]:
+                continue
+
+            if "activity_gate" in steps and self.shed_gates[i] is None:
+                self.shed_gates[i] = ActivityGate(
+                    **config.get("activity_gate", {"min_energy_db": -60.0})
+                )
+
+            gate = self.shed_gates[i] if "activity_gate" in steps else None
+            member.gate = gate
+            member.processor.gate = gate
+
+        if "fallback_model" in steps and self.fallback is None:
+            fallback = config["fallback_model"]
+            self.fallback = self.watcher._set_up_recording(
+                fallback["model_name"],
+                fallback.get("Recording", {}),
+                fallback.get("SpeciesPredictor", {}),
+                fallback.get("Model", {}),
+                fallback.get("Preprocessor", {}),
+            )
+
+    def _handle(self, filename: str, resumed: bool):
+        """
+        _handle Analyze a queued file with the recordings the load shedder allows for, or skip it if it says so, and feed the shedder.
+
+        Args:
+            filename (str): Path of the file
+            resumed (bool): Whether the file is left over from an earlier run
+        """
+        if self.shedder is not None and self.shedder.is_active("skip"):
+            self.watcher.shed_file(filename)
+            self._update_shedding()
+            return
+
+        model_name, recording, ensemble = (
+            self.watcher.model_name,
+            self.recording,
+            self.ensemble,
+        )
+        if self.shedder is not None and self.shedder.is_active("fallback_model"):
+            model_name = self.watcher.shedding_config["fallback_model"]["model_name"]
+            recording, ensemble = self.fallback, None
+
+        # tailed files take as long as they are being written
+        is_tailed = self.watcher.tail_config is not None and can_tail(filename)
+
+        # only decoding and inference count, not waiting for the file, the lock or a pause. Cached files take no time at all
+        models = [recording] + [member for _, member in (ensemble or [])]
+        with self.lock:
+            for model in models:
+                model.analysis_time = 0.0
+            self.callback(
+                filename, recording, ensemble, resumed=resumed, model_name=model_name
+            )
+            elapsed = sum(model.analysis_time for model in models)
+
+        if self.shedder is not None:
+            realtime_factor = None
+            if is_tailed is False and elapsed > 0:
+                realtime_factor = recording.processor.duration / elapsed
+            self._update_shedding(realtime_factor)
+
+    def _update_shedding(self, realtime_factor: float = None):
+        """
+        _update_shedding Feed the load shedder with the current queue depth and apply and record its decision, if any.
+
+        Args:
+            realtime_factor (float, optional): Real-time factor of the last analyzed file. Defaults to None.
+        """
+        decision = self.shedder.update(self.backlog, realtime_factor)
+
+        if decision is not None:
+            self._apply_shedding()
+            self.watcher._write_shedding(self.shedder)
+
+    def _analysis_loop(self):
+        """
+        _analysis_loop Analyze queued files until a None entry is queued. Errors of single files are reported to the main process
+        and do not stop the analysis of the next ones.
+        """
+        # without files arriving, the shedder still needs to notice that the queue has drained
+        timeout = None if self.shedder is None else max(self.shedder.hold, 1.0)
+
+        while True:
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self._update_shedding()
+                continue
+
+            if item is None:
+                break
+
+            filename, resumed = item
+
+            try:
+                self._handle(filename, resumed)
+            except Exception as e:
+                tb = traceback.format_exc()
+                self.watcher.exception_queue.put((e, tb))
+                self.watcher._end_analysis()
+            finally:
+                self.queued.discard(filename)
+
+    def start(self):
+        """
+        start Start the analysis thread.
+        """
+        self.thread = threading.Thread(
+            target=self._analysis_loop, name="analysis", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """
+        stop Stop the analysis thread after the file that is being analyzed. Files left in the queue are not analyzed.
+
+        Args:
+            timeout (float, optional): Maximum time in seconds to wait for the thread. Defaults to 30.
+        """
+        if self.thread is None:
+            return
+
+        # the thread takes the None entry before any file that is still queued
+        self.queue.clear()
+        self.queue.put(None)
+        self.thread.join(timeout=timeout)
+        self.thread = None
 
 
 def watchertask(watcher):
@@ -80,31 +334,179 @@ def watchertask(watcher):
     Raises:
         RuntimeError: When something goes wrong inside the analyzer process.
     """
+    event_handler = None
+
+    # a stop request from the main process, or a SIGTERM from elsewhere, ends the loop below such that everything is torn down properly
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop_requested.set())
 
     # build the recorder
     try:
-        observer = Observer()
+        if watcher.resource_config is not None:
+            # before the models are built, which take their thread numbers from it
+            watcher.resources = apply_plan(
+                watcher._set_up_resources(), watcher.resource_config.get("pin", False)
+            )
+
+        watcher.journal = ProcessingJournal(watcher.output / watcher.journal_name)
+
+        if watcher.publisher_config is not None:
+            watcher.publisher = DetectionPublisher(**watcher.publisher_config)
+            watcher.publisher.start()
+
+        if watcher.cluster_config is not None:
+            watcher.leases = watcher._set_up_leases(
+                watcher.cluster_config, watcher.input
+            )
+            watcher.leases.start()
+
+        if watcher.compaction_config is not None:
+            watcher.compactor = watcher._set_up_compactor()
+            watcher.compactor.start()
+
+        if watcher.retention_config is not None:
+            watcher.retention = watcher._set_up_retention()
+            watcher.retention.start()
+
+        if watcher.index_config is not None:
+            watcher.index = watcher._set_up_index(watcher.index_config, watcher.outdir)
+
+        # after everything its callbacks mark the written results in
+        watcher.writer = watcher._set_up_writer()
+        watcher.writer.start()
+
+        if watcher.cache_config is not None:
+            watcher.cache = ResultsCache(**watcher.cache_config)
+            with open(watcher.output / "config.yml", "r") as ymlfile:
+                watcher.config_hash = hash_config(yaml.safe_load(ymlfile)["Analysis"])
+
+        if watcher.stream_config is None:
+            observer = watcher._set_up_observer()
+        else:
+            observer = None
+            watcher.stream = watcher._set_up_stream()
+
+        if watcher.shedding_config is not None:
+            watcher.shedder = watcher._set_up_shedder()
 
         event_handler = AnalysisEventHandler(
             watcher,
         )
-        observer.schedule(event_handler, watcher.input, recursive=True)
-        observer.start()
+        event_handler.start()
+        watcher.state_channel.set("model_loaded")
+
+        if observer is not None:
+            observer.schedule(event_handler, watcher.input, recursive=True)
+            observer.start()
+        else:
+            watcher.stream.start()
+        watcher.state_channel.set("ready" if watcher.may_do_work.is_set() else "paused")
+
+        # files earlier runs left unfinished are analyzed while no new ones wait
+        for filename in watcher.resume_files:
+            event_handler.process(filename, resumed=True)
+
+        # the journals of earlier runs need not be replayed anymore on the next start
+        if watcher.journal is not None:
+            watcher.journal.checkpoint()
     except Exception as e:
         tb = traceback.format_exc()
         watcher.exception_queue.put((e, tb))
+        watcher.state_channel.set("failed")
+
+        if event_handler is not None:
+            event_handler.stop()
+
+        if watcher.writer is not None:
+            watcher.writer.stop()
+
+        if watcher.publisher is not None:
+            watcher.publisher.stop()
+
+        if watcher.leases is not None:
+            watcher.leases.stop()
+
+        if watcher.compactor is not None:
+            watcher.compactor.stop()
+
+        if watcher.retention is not None:
+            watcher.retention.stop()
+
+        if watcher.index is not None:
+            watcher.index.close()
+
+        if watcher.stream is not None:
+            watcher.stream.stop()
+
+        if watcher.journal is not None:
+            watcher.journal.close()
+        return
+
+    # sweeps list the whole shared input directory, so they run less often than the other checks
+    cluster_config = watcher.cluster_config or {}
+    sweep_interval = cluster_config.get("sweep_interval", 30.0)
+    prune_interval = cluster_config.get("prune_interval", 3600.0)
+    last_sweep = None
+    last_prune = monotonic()
 
     try:
-        while True:
+        # polled rather than waited for: a process killed while waiting would keep 'set' in the main process from returning
+        while watcher.stop_requested.is_set() is False:
             sleep(watcher.check_time)
+
+            if watcher.stream is not None:
+                with event_handler.lock:
+                    watcher.analyze_stream(
+                        watcher.stream, event_handler.recording, event_handler.ensemble
+                    )
+
+            if watcher.leases is not None and (
+                last_sweep is None or monotonic() - last_sweep >= sweep_interval
+            ):
+                event_handler.sweep(watcher.input)
+                last_sweep = monotonic()
+
+            if (
+                watcher.leases is not None
+                and monotonic() - last_prune >= prune_interval
+            ):
+                watcher.leases.prune()
+                last_prune = monotonic()
     except KeyboardInterrupt:
-        observer.stop()
+        pass
     except Exception as e:
-        observer.stop()
         tb = traceback.format_exc()
         watcher.exception_queue.put((e, tb))
+        watcher.state_channel.set("failed")
+
+    if observer is not None:
+        observer.stop()
+        observer.join()
+
+    # a file that waits for a paused watcher to go on stays unfinished and is resumed by the next run
+    event_handler.stop(timeout=30.0 if watcher.may_do_work.is_set() else 0.0)
+
+    if watcher.stream is not None:
+        watcher.stream.stop()
+
+    # writes what is still queued before the journal and the index are closed
+    watcher.writer.stop()
+
+    if watcher.publisher is not None:
+        watcher.publisher.stop()
+
+    if watcher.leases is not None:
+        watcher.leases.stop()
+
+    if watcher.compactor is not None:
+        watcher.compactor.stop()
 
-    observer.join()
+    if watcher.retention is not None:
+        watcher.retention.stop()
+
+    if watcher.index is not None:
+        watcher.index.close()
+
+    watcher.journal.close()
 
 
 class Watcher:
@@ -147,6 +549,54 @@ class Watcher:
             }
         }
 
+        if self.publisher_config is not None:
+            config["Analysis"]["Publisher"] = deepcopy(self.publisher_config)
+
+        if len(self.ensemble_config) > 0:
+            config["Analysis"]["Ensemble"] = deepcopy(self.ensemble_config)
+
+        if self.cache_config is not None:
+            config["Analysis"]["Cache"] = deepcopy(self.cache_config)
+
+        if self.cluster_config is not None:
+            config["Analysis"]["Cluster"] = deepcopy(self.cluster_config)
+
+        if self.observer_config is not None:
+            config["Analysis"]["Observer"] = deepcopy(self.observer_config)
+
+        if self.tail_config is not None:
+            config["Analysis"]["Tail"] = deepcopy(self.tail_config)
+
+        if self.stream_config is not None:
+            config["Analysis"]["Stream"] = deepcopy(self.stream_config)
+
+        if self.compaction_config is not None:
+            config["Analysis"]["Compaction"] = deepcopy(self.compaction_config)
+
+        if self.retention_config is not None:
+            config["Analysis"]["Retention"] = deepcopy(self.retention_config)
+
+        if self.worker_config is not None:
+            config["Analysis"]["Workers"] = deepcopy(self.worker_config)
+
+        if self.supervisor_config is not None:
+            config["Analysis"]["Supervisor"] = deepcopy(self.supervisor_config)
+
+        if self.shedding_config is not None:
+            config["Analysis"]["Shedding"] = deepcopy(self.shedding_config)
+
+        if self.scheduler_config is not None:
+            config["Analysis"]["Scheduler"] = deepcopy(self.scheduler_config)
+
+        if self.writer_config is not None:
+            config["Analysis"]["Writer"] = deepcopy(self.writer_config)
+
+        if self.index_config is not None:
+            config["Analysis"]["Index"] = deepcopy(self.index_config)
+
+        if self.resource_config is not None:
+            config["Analysis"]["Resources"] = deepcopy(self.resource_config)
+
         try:
             with open(self.output / "config.yml", "w") as ymlfile:
                 yaml.safe_dump(config, ymlfile)
@@ -179,6 +629,17 @@ class Watcher:
         """
         recording_config = deepcopy(recording_config)
 
+        if self.resources is not None:
+            # models without a 'num_threads' argument do not list it in their config
+            if "num_threads" in model_config:
+                model_config = dict(
+                    model_config, num_threads=self.resources["interpreter_threads"]
+                )
+            species_predictor_config = dict(
+                species_predictor_config,
+                num_threads=self.resources["interpreter_threads"],
+            )
+
         preprocessor = utils.load_name_from_module(
             "pp",
             self.model_dir / Path(model_name) / "preprocessor.py",
@@ -224,228 +685,1394 @@ class Watcher:
         # species predictor is applied here once and then used for all the analysis calls that may follow
         return Recording(preprocessor, model, "", **recording_config)
 
-    def _restore_old_state(self, old_state: dict):
+    def _set_up_ensemble(self, ensemble_config: list, recording: Recording) -> list:
         """
-        _restore_old_state Restore state of the watcher instance to the state it had before a change was made.
+        _set_up_ensemble Build the recordings of additional models that analyze the same files as 'recording'.
+                         All of them share one decoder, such that each file is decoded once and resampled once per sample rate.
 
         Args:
-            old_state (dict):  Dictionary containing the old state of the calling object
+            ensemble_config (list): List of dictionaries with keys 'model_name', 'Preprocessor', 'Model', 'Recording', 'SpeciesPredictor'
+            recording (Recording): Recording of the main model
+
+        Returns:
+            list: List of (model_name, Recording) tuples. Empty if no additional models are used.
         """
-        self.model_name = old_state["model_name"]
-        self.preprocessor_config = old_state["preprocessor_config"]
-        self.model_config = old_state["model_config"]
-        self.recording_config = old_state["recording_config"]
-        self.species_predictor_config = old_state["species_predictor_config"]
-        self.pattern = old_state["pattern"]
-        self.check_time = old_state["check_time"]
-        self.delete_recordings = old_state["delete_recordings"]
+        if ensemble_config is None or len(ensemble_config) == 0:
+            return []
+
+        decoder = SharedDecoder()
+        recording.decoder = decoder
+
+        ensemble = []
+        for cfg in ensemble_config:
+            member = self._set_up_recording(
+                cfg["model_name"],
+                cfg["Recording"],
+                cfg["SpeciesPredictor"],
+                cfg["Model"],
+                cfg["Preprocessor"],
+            )
+            member.decoder = decoder
+            ensemble.append((cfg["model_name"], member))
+
+        return ensemble
+
+    def _check_ensemble_config(self, ensemble_config: list) -> list:
+        """
+        _check_ensemble_config Validate the configuration of additional models and fill in missing nodes with empty configs.
+
+        Args:
+            ensemble_config (list): List of dictionaries, each of which needs at least a 'model_name'
+
+        Raises:
+            ValueError: When an entry has no 'model_name' or the model does not exist in the model directory
+
+        Returns:
+            list: Completed copy of the ensemble config
+        """
+        if ensemble_config is None:
+            return []
+
+        completed = []
+        for cfg in ensemble_config:
+            if "model_name" not in cfg:
+                raise ValueError("Each entry of 'ensemble_config' needs a 'model_name'")
+
+            if (self.model_dir / cfg["model_name"]).is_dir() is False:
+                raise ValueError(
+                    f"Model {cfg['model_name']} of the ensemble does not exist in model directory"
+                )
+
+            cfg = deepcopy(cfg)
+            for node in ["Preprocessor", "Model", "Recording", "SpeciesPredictor"]:
+                if cfg.get(node) is None:
+                    cfg[node] = {}
+            completed.append(cfg)
+
+        return completed
+
+    def _analyze_file(
+        self,
+        filename: str,
+        model_name: str,
+        recording: Recording,
+        ensemble: list = None,
+        cache: ResultsCache = None,
+        config_hash: str = None,
+    ) -> list:
+        """
+        _analyze_file Analyze a single file with the recording of the main model and, if given, with the additional models of the ensemble.
+                      When an ensemble is used, each detection is tagged with the name of the model that produced it.
+                      When a cache is given, it is consulted before the file is decoded and updated afterwards.
+
+        Args:
+            filename (str): Path of the file to analyze
+            model_name (str): Name of the main model
+            recording (Recording): Recording of the main model
+            ensemble (list, optional): (model_name, Recording) tuples of the additional models. Defaults to None.
+            cache (ResultsCache, optional): Cache of previously computed detections. Defaults to None.
+            config_hash (str, optional): Hash of the analysis config the detections are computed with. Needed when 'cache' is given. Defaults to None.
+
+        Returns:
+            list: Detections of all models
+        """
+        self.skipped_chunks = []
+
+        if cache is not None:
+            # the hash is only meaningful once the file is complete
+            utils.wait_for_file_completion(
+                str(filename), polling_interval=recording.file_check_poll_interval
+            )
+            key = cache.key(filename, model_name, config_hash)
+            results = cache.get(key)
+
+            if results is not None:
+                # nothing is analyzed, so nothing of the previous file may be reported for this one
+                for model in [recording] + [member for _, member in ensemble or []]:
+                    model.forget_file()
+                return results
+
+        results = self._run_models(filename, model_name, recording, ensemble)
+
+        if cache is not None:
+            cache.put(key, results)
+
+        return results
+
+    def _run_models(
+        self, filename: str, model_name: str, recording: Recording, ensemble: list
+    ) -> list:
+        """
+        _run_models Run the main model and all models of the ensemble on a file.
+
+        Args:
+            filename (str): Path of the file to analyze
+            model_name (str): Name of the main model
+            recording (Recording): Recording of the main model
+            ensemble (list): (model_name, Recording) tuples of the additional models. May be None.
+
+        Returns:
+            list: Detections of all models
+        """
+        recording.path = filename
+
+        recording.analyzed = False  # reactivate
+
+        try:
+            recording.analyze()
+
+            results = recording.detections
+
+            self.skipped_chunks = recording.skipped_chunks
+
+            if ensemble is None or len(ensemble) == 0:
+                return results
+
+            results = [dict(d, model=model_name) for d in results]
+
+            for member_name, member in ensemble:
+                member.path = filename
+                member.analyzed = False
+                member.analyze()
+                results.extend(dict(d, model=member_name) for d in member.detections)
+        finally:
+            # the decoded audio is not kept around when a model fails on the file
+            if recording.decoder is not None:
+                recording.decoder.release()
+
+        return results
+
+    def _set_up_observer(self):
+        """
+        _set_up_observer Build the observer that reports new files in the input directory. In 'native' mode, this is watchdog's
+                         Observer, which uses file system notifications. In 'scan' mode, a ScanObserver is used that finds new files by
+                         scanning the input directory every 'check_time' seconds unless an 'interval' is given.
+
+        Returns:
+            Observer | ScanObserver: New observer that has not been started yet.
+        """
+        if self.observer_config is None or self.observer_config["mode"] == "native":
+            return Observer()
+
+        scan_config = deepcopy(self.observer_config)
+        del scan_config["mode"]
+
+        if scan_config.get("interval") is None:
+            scan_config["interval"] = self.check_time
+
+        if "state_file" not in scan_config:
+            scan_config["state_file"] = self.outdir / ".faunanet_scan_state.json"
+
+        return ScanObserver(**scan_config)
+
+    def _set_up_compactor(self) -> ResultsCompactor:
+        """
+        _set_up_compactor Build the compactor for the results of earlier runs. The folder of the current run is left alone.
+        Errors are reported to the main process.
+
+        Returns:
+            ResultsCompactor: New compactor that has not been started yet.
+        """
+        return ResultsCompactor(
+            self.outdir,
+            exclude=self.output,
+            on_error=lambda e, tb: self.exception_queue.put((e, tb)),
+            **self.compaction_config,
+        )
+
+    def _set_up_retention(self) -> RecordingRetention:
+        """
+        _set_up_retention Build the retention that deletes analyzed recordings from the input directory. Errors are reported to
+        the main process.
+
+        Returns:
+            RecordingRetention: New retention that has not been started yet.
+        """
+        return RecordingRetention(
+            self.input,
+            self.outdir,
+            pattern=self.pattern,
+            on_error=lambda e, tb: self.exception_queue.put((e, tb)),
+            **self.retention_config,
+        )
+
+    def _set_up_scheduler(self) -> PriorityScheduler:
+        """
+        _set_up_scheduler Build the scheduler that queues the files for analysis.
+
+        Returns:
+            PriorityScheduler: New, empty scheduler.
+        """
+        config = {} if self.scheduler_config is None else self.scheduler_config
+        return PriorityScheduler(**config)
+
+    def _set_up_writer(self) -> ResultWriter:
+        """
+        _set_up_writer Build the writer that writes the results files in the background. Failed writes are reported to the main process.
+
+        Returns:
+            ResultWriter: New writer that has not been started yet.
+        """
+        config = {} if self.writer_config is None else self.writer_config
+        return ResultWriter(
+            on_error=lambda e, tb: self.exception_queue.put((e, tb)),
+            on_idle=self._signal_done,
+            **config,
+        )
+
+    def _set_up_shedder(self) -> LoadShedder:
+        """
+        _set_up_shedder Build the load shedder that decides how far to degrade the analysis while the watcher falls behind.
+
+        Raises:
+            ValueError: When the 'fallback_model' step is used without a 'fallback_model' from the model directory.
+
+        Returns:
+            LoadShedder: New load shedder at full quality.
+        """
+        config = {
+            key: value
+            for key, value in self.shedding_config.items()
+            if key not in ["overlap", "activity_gate", "fallback_model"]
+        }
+        shedder = LoadShedder(**config)
+
+        if "fallback_model" in shedder.steps:
+            fallback = self.shedding_config.get("fallback_model")
+
+            if (
+                fallback is None
+                or "model_name" not in fallback
+                or (self.model_dir / fallback["model_name"]).is_dir() is False
+            ):
+                raise ValueError(
+                    "'fallback_model' of 'shedding_config' must have the 'model_name' of a model in the model directory"
+                )
+
+        if "activity_gate" in shedder.steps:
+            ActivityGate(
+                **self.shedding_config.get("activity_gate", {"min_energy_db": -60.0})
+            )
+
+        return shedder
+
+    def _worker_context(self):
+        """
+        _worker_context Get the multiprocessing context the watcher process is started with. With a 'worker_config', this is a warm context
+        whose processes are forked from a server that has the heavy modules, and optionally the model files of this watcher, loaded already.
+
+        Raises:
+            ValueError: When 'preload' of the 'worker_config' is not a list.
+
+        Returns:
+            multiprocessing context or module: Context to create the watcher process with
+        """
+        if self.worker_config is None:
+            return multiprocessing
+
+        preload = self.worker_config.get("preload")
+
+        if preload is not None and isinstance(preload, list) is False:
+            raise ValueError(
+                "'preload' of 'worker_config' must be a list of module names"
+            )
+
+        models = []
+        if self.worker_config.get("preload_models", False):
+            models = model_files(
+                [self.model_dir / self.model_name]
+                + [self.model_dir / cfg["model_name"] for cfg in self.ensemble_config]
+            )
+
+        return warm_context(preload, models)
+
+    def _set_up_index(self, index_config: dict, outdir: str) -> DetectionIndex:
+        """
+        _set_up_index Open the detection index the results are added to.
+
+        Args:
+            index_config (dict): Index config of the run
+            outdir (str): Output base directory of the run, which holds the index by default
+
+        Returns:
+            DetectionIndex: Opened index
+        """
+        return DetectionIndex(
+            index_config.get("path", Path(outdir) / INDEX_NAME),
+            timeout=index_config.get("timeout", 30.0),
+        )
+
+    def _set_up_resources(self) -> dict:
+        """
+        _set_up_resources Plan how the CPUs of the machine are divided between the watchers running on it and get the share of this one.
+
+        Raises:
+            ValueError: When 'worker' is not the index of one of the 'workers'.
+
+        Returns:
+            dict: Share of this watcher with 'cpus', 'interpreter_threads' and 'decode_threads'
+        """
+        resource_config = deepcopy(self.resource_config)
+        worker = resource_config.pop("worker", 0)
+
+        plan = plan_resources(**resource_config)
+
+        if not 0 <= worker < len(plan["workers"]):
+            raise ValueError(
+                "'worker' of 'resource_config' must be >= 0 and < 'workers'"
+            )
+
+        return plan["workers"][worker]
+
+    def _set_up_leases(self, cluster_config: dict, input_dir: str) -> LeaseManager:
+        """
+        _set_up_leases Build the LeaseManager used to share the files of 'input_dir' with other watchers. Errors of its heartbeat
+        are reported to the main process.
+
+        Args:
+            cluster_config (dict): Keyword arguments for the LeaseManager. Without a 'lease_dir', leases are kept in '.faunanet_leases' in the input directory.
+                                   'sweep_interval' and 'prune_interval' are used by the watcher itself and left out.
+            input_dir (str): Shared input directory
+
+        Returns:
+            LeaseManager: New lease manager. Its heartbeat is not started yet.
+        """
+        cluster_config = deepcopy(cluster_config)
+        cluster_config.pop("sweep_interval", None)
+        cluster_config.pop("prune_interval", None)
+
+        if cluster_config.get("lease_dir") is None:
+            cluster_config["lease_dir"] = Path(input_dir) / ".faunanet_leases"
+
+        return LeaseManager(
+            input_dir=input_dir,
+            on_error=lambda e, tb: self.exception_queue.put((e, tb)),
+            **cluster_config,
+        )
+
+    def _restore_old_state(self, old_state: dict):
+        """
+        _restore_old_state Restore state of the watcher instance to the state it had before a change was made.
+
+        Args:
+            old_state (dict):  Dictionary containing the old state of the calling object
+        """
+        self.model_name = old_state["model_name"]
+        self.preprocessor_config = old_state["preprocessor_config"]
+        self.model_config = old_state["model_config"]
+        self.recording_config = old_state["recording_config"]
+        self.species_predictor_config = old_state["species_predictor_config"]
+        self.pattern = old_state["pattern"]
+        self.check_time = old_state["check_time"]
+        self.delete_recordings = old_state["delete_recordings"]
+
+    @contextmanager
+    def _backup_and_restore_state(self):
+        """
+        _backup_and_restore_state Helper context manager that creates a backup of the current object state and restores it in case of an error.
+
+        Raises:
+            RuntimeError When an error occurs during the restart of the watcher process.
+
+        Yields:
+            dict: Dictionary containing the old state of the calling object
+        """
+        old_state = {
+            "model_name": deepcopy(self.model_name),
+            "preprocessor_config": deepcopy(self.preprocessor_config),
+            "model_config": deepcopy(self.model_config),
+            "recording_config": deepcopy(self.recording_config),
+            "species_predictor_config": deepcopy(self.species_predictor_config),
+            "pattern": deepcopy(self.pattern),
+            "check_time": self.check_time,
+            "delete_recordings": self.delete_recordings,
+        }
+
+        try:
+            yield old_state
+        except Exception as e:
+            self._restore_old_state(old_state)
+
+            if self.is_running:
+                self.stop()
+
+            raise RuntimeError(
+                "Error when while trying to change the watcher process, any changes made have been undone. The process needs to be restarted manually. This operation may have led to data loss."
+            ) from e
+
+    def __init__(
+        self,
+        indir: str,
+        outdir: str,
+        model_dir: str,
+        model_name: str,
+        preprocessor_config: dict = None,
+        model_config: dict = None,
+        recording_config: dict = None,
+        species_predictor_config: dict = None,
+        pattern: str = ".wav",
+        check_time: int = 1,
+        delete_recordings: str = "never",
+        publisher_config: dict = None,
+        ensemble_config: list = None,
+        cache_config: dict = None,
+        cluster_config: dict = None,
+        observer_config: dict = None,
+        tail_config: dict = None,
+        stream_config: dict = None,
+        compaction_config: dict = None,
+        index_config: dict = None,
+        resource_config: dict = None,
+        retention_config: dict = None,
+        worker_config: dict = None,
+        supervisor_config: dict = None,
+        shedding_config: dict = None,
+        scheduler_config: dict = None,
+        writer_config: dict = None,
+    ):
+        """
+        __init__ Create a new Watcher object.
+
+        Args:
+            indir (str): Directory to read files from
+            outdir (str): Directory to write the analysis results to.
+                        A new directory with a timestamp for name will be
+                        created within it to store the result files in.
+            model_dir (str): Directory where downloaded models are stored
+            model_name (str): name of the model to use. Must match the directory name it is stored in, e.g., 'birdnet_default'.
+            preprocessor_config (dict, optional): Keyword arguments for the preprocessor of the model. Defaults to {}.
+            model_config (dict, optional): Keyword arguments for the model instance. Defaults to {}.
+            recording_config (dict, optional): Keyword arguments for the internal Recording. Defaults to {}.
+            species_predictor_config (dict, optional): Keyword arguments for a species presence predictor model. Defaults to {}.
+            pattern (str | list, optional): file ending to look for, or a list of them, e.g., ['.wav', '.flac']. defaults to '.wav'.
+            check_time(int, optional): Sleep time of the watcher between checks for new files in seconds. Defaults to 1.
+            delete_recordings(str, optional): Mode for data clean up. Can be one of "never" or "always".
+                                            "never" keeps recordings around indefinitely. 'always' deletes the recording
+                                            immediatelly after analysis. Defaults to 'never'.
+            publisher_config (dict, optional): Keyword arguments for a DetectionPublisher that sends the detections of each analyzed file
+                                            to local subscribers as newline-delimited JSON. Must contain 'socket_path'. Defaults to None (no publishing).
+            ensemble_config (list, optional): Additional models to apply to each file. Each entry is a dictionary with a 'model_name' and optionally
+                                            'Preprocessor', 'Model', 'Recording' and 'SpeciesPredictor' configs. Each file is decoded once
+                                            and the results of all models are written to the same file with an additional 'model' column. Defaults to None.
+            cache_config (dict, optional): Keyword arguments for a ResultsCache that stores the detections of each analyzed file by content, such that
+                                            files with identical audio are not analyzed twice with the same config. Must contain 'directory'. Defaults to None (no caching).
+            cluster_config (dict, optional): Keyword arguments for a LeaseManager that lets several watchers, possibly on different hosts, share one input directory.
+                                            Each file is only analyzed by the watcher that claimed its lease. May contain 'lease_dir', 'host_id', 'lease_timeout'
+                                            and 'heartbeat_interval', as well as 'sweep_interval', the time in seconds between two sweeps over the input directory
+                                            for files of other hosts, which defaults to 30, and 'prune_interval', the time in seconds between two removals of the
+                                            done markers of deleted files, which defaults to 3600. Defaults to None (the watcher owns the input directory alone).
+            observer_config (dict, optional): How new files are found. 'mode' is either 'native' for file system notifications or 'scan' for a ScanObserver,
+                                            in which case the other entries are passed to the ScanObserver. Defaults to None (native).
+            tail_config (dict, optional): Analyze WAV files while they are being written, chunk by chunk, instead of waiting until they are complete.
+                                            May contain 'poll_interval', the time between checks for new data, which defaults to 'check_time', and
+                                            'idle_timeout', the time without new data after which a file is considered closed. Defaults to None (no tail mode).
+            stream_config (dict, optional): Analyze continuous audio from a named pipe or unix socket instead of files in 'indir'. Must contain 'source'. 'segment_secs'
+                                            sets the length of the pieces the results are written for, 'archive_dir' a directory to archive the audio to. The other
+                                            entries are passed to a PCMStream. Defaults to None (analyze files).
+            compaction_config (dict, optional): Keyword arguments for a ResultsCompactor that merges the results files of earlier runs in 'outdir' into one compressed file
+                                            per day in the background. May contain 'interval', 'min_age' and 'remove_csv'. Defaults to None (no compaction).
+            index_config (dict, optional): Add the detections of each analyzed file to a DetectionIndex that can be queried without reading the results files. May contain 'path',
+                                            which defaults to 'detections.sqlite' in 'outdir', and 'timeout'. Defaults to None (no index).
+            resource_config (dict, optional): Divide the CPUs of the machine, respecting cgroup quotas, between 'workers' watchers running on it, of which this is number 'worker',
+                                            and set the interpreter threads of all models and the thread pools of native libraries from this watcher's share. May contain
+                                            'workers', 'worker', 'decode_threads' and 'pin' to pin the watcher process to its CPUs. Defaults to None (use the configured 'num_threads').
+            retention_config (dict, optional): Keyword arguments for a RecordingRetention that deletes analyzed recordings in the background, oldest first, once the disk fills up
+                                            beyond 'high_water' or they are older than 'max_age'. Recordings with a detection of at least 'keep_min_confidence' are kept. May also
+                                            contain 'low_water', 'interval', 'batch_size' and 'batch_pause'. Defaults to None (keep recordings as set by 'delete_recordings').
+            worker_config (dict, optional): Start the watcher process from a warm server that has imported the heavy modules once, such that 'start', 'restart' and
+                                            'change_analyzer' have a ready worker much faster. May contain 'preload', the modules to import, and 'preload_models',
+                                            whether to keep the model files of this watcher in memory, too. Defaults to None (start a fresh process each time).
+            supervisor_config (dict, optional): Keyword arguments for a WorkerSupervisor that restarts the watcher process with exponential backoff when it dies, e.g., from a
+                                            crash or an out-of-memory kill, and sets files aside after they were in flight 'max_failures' times. May also contain 'backoff',
+                                            'max_backoff', 'reset_after', 'max_restarts', 'check_interval' and 'quarantine_dir'. Defaults to None (no supervision).
+            shedding_config (dict, optional): Keyword arguments for a LoadShedder that degrades the analysis step by step while files queue up faster than they are analyzed:
+                                            lower the chunk 'overlap', use an 'activity_gate', analyze with a cheaper 'fallback_model', given like an ensemble member,
+                                            and finally skip files, which 'clean_up' analyzes later. Each step is reverted once the queue has drained. May contain 'high_water',
+                                            'low_water', 'min_realtime_factor', 'hold', 'smoothing' and 'steps'. Defaults to None (never degrade).
+            scheduler_config (dict, optional): Keyword arguments for the PriorityScheduler that decides whether new 'live' files or 'backlog' files left over from earlier
+                                            runs are analyzed next. May contain 'strict', 'weights', 'max_wait', 'overdue_every' and 'window'. Defaults to None (live files strictly first,
+                                            backlog files that have waited 10 minutes as every fifth file).
+            writer_config (dict, optional): Keyword arguments for the ResultWriter that writes the results files in a background thread, such that slow storage does not
+                                            hold up the analysis. May contain 'max_pending', 'batch_size' and 'durability', which is 'none', 'batch' (fsync once per batch
+                                            of files) or 'file' (fsync every file). Defaults to None (64 pending files, batches of 16, no fsync).
+        Raises:
+            ValueError: When the indir parameter is not an existing directory.
+            ValueError: When the outdir parameter is not an existing directory.
+            ValueError: When the model_dir parameter is not an existing directory.
+            ValueError: When the model name does not correspond to a directory in the 'model_dir' directory in which available models are stored.
+        """
+        if preprocessor_config is None:
+            preprocessor_config = {}
+
+        if model_config is None:
+            model_config = {}
+
+        if recording_config is None:
+            recording_config = {}
+
+        if species_predictor_config is None:
+            species_predictor_config = {}
+
+        # set up data to use
+        self.input = Path(indir)
+
+        if self.input.is_dir() is False:
+            raise ValueError("Input directory does not exist")
+
+        self.outdir = Path(outdir)
+
+        if self.outdir.is_dir() is False:
+            raise ValueError("Output directory does not exist")
+
+        self.output = None
+        self.old_output = None
+
+        self.model_dir = Path(model_dir)
+
+        if self.model_dir.is_dir() is False:
+            raise ValueError("Model directory does not exist")
+
+        if (self.model_dir / model_name).is_dir() is False:
+            raise ValueError("Given model name does not exist in model directory")
+
+        self.pattern = pattern
+
+        self.model_name = model_name
+
+        self.watcher_process = None
+
+        # shared with the watcher process, so they must come from the context it is started with
+        context = multiprocessing if worker_config is None else worker_context()
+
+        self.exception_queue = context.Queue()
+
+        self.may_do_work = context.Event()
+
+        self.is_done_analyzing = context.Event()
+
+        self.stop_requested = context.Event()
+
+        self.state_channel = StateChannel(context=context)
+
+        self.check_time = check_time
+
+        if delete_recordings not in ["never", "always"]:
+            raise ValueError("'delete_recordings' must be in 'never', 'always'")
+
+        self.delete_recordings = delete_recordings
+
+        self.first_analyzed = context.Value("i", 0)
+
+        self.last_analyzed = context.Value("i", 0)
+
+        self.preprocessor_config = deepcopy(preprocessor_config)
+
+        self.model_config = deepcopy(model_config)
+
+        self.recording_config = deepcopy(recording_config)
+
+        self.species_predictor_config = deepcopy(species_predictor_config)
+
+        if publisher_config is not None and "socket_path" not in publisher_config:
+            raise ValueError("'publisher_config' must contain a 'socket_path'")
+
+        self.publisher_config = deepcopy(publisher_config)
+
+        self.publisher = None  # only created inside the watcher process
+
+        self.ensemble_config = self._check_ensemble_config(ensemble_config)
+
+        if cache_config is not None and "directory" not in cache_config:
+            raise ValueError("'cache_config' must contain a 'directory'")
+
+        self.cache_config = deepcopy(cache_config)
+
+        self.cache = None  # only created inside the watcher process
+
+        self.config_hash = None
+
+        self.cluster_config = deepcopy(cluster_config)
+
+        if cluster_config is not None:
+            for key in ["sweep_interval", "prune_interval"]:
+                if cluster_config.get(key, 1.0) <= 0:
+                    raise ValueError(f"'{key}' of 'cluster_config' must be > 0")
+
+        self.leases = None  # only created inside the watcher process
+
+        if observer_config is not None and observer_config.get("mode") not in [
+            "native",
+            "scan",
+        ]:
+            raise ValueError("'mode' of 'observer_config' must be in 'native', 'scan'")
+
+        self.observer_config = deepcopy(observer_config)
+
+        if tail_config is not None and tail_config.get("idle_timeout", 10.0) <= 0:
+            raise ValueError("'idle_timeout' of 'tail_config' must be > 0")
+
+        self.tail_config = deepcopy(tail_config)
+
+        if stream_config is not None:
+            self._check_stream_config(stream_config)
+
+        self.stream_config = deepcopy(stream_config)
+
+        self.stream = None  # only created inside the watcher process
+
+        self.segment = None  # part of the stream that is currently analyzed
+
+        self.dropped_samples = 0
+
+        self.compaction_config = deepcopy(compaction_config)
+
+        if compaction_config is not None:
+            # checks the arguments, the compactor itself only runs inside the watcher process
+            self._set_up_compactor()
+
+        self.compactor = None  # only created inside the watcher process
+
+        self.retention_config = deepcopy(retention_config)
+
+        if retention_config is not None:
+            # checks the arguments, the retention itself only runs inside the watcher process
+            self._set_up_retention()
+
+        self.retention = None  # only created inside the watcher process
+
+        self.shedding_config = deepcopy(shedding_config)
+
+        if shedding_config is not None:
+            # checks the arguments, the shedder itself only runs inside the watcher process
+            self._set_up_shedder()
+
+        self.shedder = None  # only created inside the watcher process
+
+        self.scheduler_config = deepcopy(scheduler_config)
+
+        if scheduler_config is not None:
+            # checks the arguments, the scheduler itself only runs inside the watcher process
+            self._set_up_scheduler()
+
+        self.scheduler = None  # only created inside the watcher process
+
+        self.writer_config = deepcopy(writer_config)
+
+        if writer_config is not None:
+            # checks the arguments, the writer itself only runs inside the watcher process
+            self._set_up_writer()
+
+        self.writer = None  # only created inside the watcher process
+
+        self.is_analyzing = False
+
+        self.work_lock = threading.Lock()
+
+        self.worker_config = deepcopy(worker_config)
+
+        if worker_config is not None:
+            # checks the arguments and starts loading the modules in the background, such that the first start is fast, too
+            self._worker_context()
+
+        self.supervisor_config = deepcopy(supervisor_config)
+
+        # runs in the process that owns the watcher, not in the watcher process
+        self.supervisor = (
+            None
+            if supervisor_config is None
+            else WorkerSupervisor(
+                self,
+                on_error=lambda e, tb: self.exception_queue.put((e, tb)),
+                **supervisor_config,
+            )
+        )
+
+        self.index_config = deepcopy(index_config)
+
+        self.index = None  # only created inside the watcher process
+
+        self.resource_config = deepcopy(resource_config)
+
+        if resource_config is not None:
+            # checks the arguments, the plan is only applied inside the watcher process
+            self._set_up_resources()
+
+        self.resources = None  # share of the CPUs applied inside the watcher process
+
+        self.journal = None  # only created inside the watcher process
+
+        self.journal_name = JOURNAL_NAME
+
+        self.resume_files = []
+
+        self.batchfile_name = "batch_info.yml"
+
+        self.decode_stats_name = "decoding.yml"
+
+        self.decode_stats_interval = 60.0
+
+        self.last_decode_stats = None
+
+        self.gate_stats_name = "activity_gate.yml"
+
+        self.shedding_stats_name = "load_shedding.yml"
+
+        self.scheduling_stats_name = "scheduling.yml"
+
+        self.writer_stats_name = "writer.yml"
+
+        self.shed_files_name = "shed_files.txt"
+
+        self.skipped_name = "skipped_chunks.csv"
+
+        self.skipped_chunks = (
+            []
+        )  # chunks of the last analyzed file kept from the model by the activity gate
+
+    def __getstate__(self):
+        # the supervisor with its thread stays in the process that owns the watcher, and locks cannot be pickled
+        state = self.__dict__.copy()
+        state["supervisor"] = None
+        state["work_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.work_lock = threading.Lock()
+
+    @property
+    def output_directory(self):
+        return str(self.output)
+
+    @property
+    def input_directory(self):
+        return str(self.input)
+
+    @property
+    def is_running(self):
+        if self.watcher_process is not None:
+            return self.watcher_process.is_alive()
+        else:
+            return False
+
+    @property
+    def is_sleeping(self):
+        if self.watcher_process is not None:
+            return self.may_do_work.is_set() is False
+        else:
+            return False
+
+    @property
+    def has_crashed(self):
+        # a process that died from a signal, e.g., a segfault or an out-of-memory kill, cannot report it itself
+        process = self.watcher_process
+        return process is not None and process.exitcode not in [None, 0]
+
+    @property
+    def state(self):
+        return "failed" if self.has_crashed else self.state_channel.state
+
+    def wait_for_state(self, states: list, timeout: float = None) -> bool:
+        """
+        wait_for_state Block the caller until the watcher process has reached one of the given states. Waiting ends as well when the process dies,
+        which counts as the state "failed" if it did not exit cleanly. See faunanet.state.WATCHER_STATES for possible states.
+
+        Args:
+            states (list): States to wait for, e.g., ["ready", "failed"]
+            timeout (float, optional): Maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            bool: True if one of the states has been reached, False if the timeout expired or the process died in another state.
+        """
+        process = self.watcher_process
+
+        if process is None:
+            return self.state_channel.wait_for(states, timeout=timeout)
+
+        # wakes the waiting caller when the process dies, or ends once waiting is over
+        done_reader, done_writer = multiprocessing.Pipe(duplex=False)
+
+        def wake_on_exit():
+            ready = multiprocessing.connection.wait([process.sentinel, done_reader])
+            if process.sentinel in ready:
+                # the sentinel may be ready before the exit code can be collected
+                process.join()
+                self.state_channel.wake()
+
+        thread = threading.Thread(target=wake_on_exit, daemon=True)
+        thread.start()
+
+        try:
+            self.state_channel.wait_for(
+                states, timeout=timeout, abort=lambda: process.exitcode is not None
+            )
+        finally:
+            done_writer.send(None)
+            thread.join()
+            done_writer.close()
+            done_reader.close()
+
+        return self.state in states
+
+    def _begin_analysis(self):
+        """
+        _begin_analysis Make the main process wait with pausing or stopping until the analysis that begins now has finished and its results are written.
+        """
+        with self.work_lock:
+            self.is_analyzing = True
+            self.is_done_analyzing.clear()
+
+    def _end_analysis(self):
+        """
+        _end_analysis Mark the current analysis as finished. The main process may go on once the writer has written all results.
+        """
+        with self.work_lock:
+            self.is_analyzing = False
+
+        self._signal_done()
+
+    def _signal_done(self):
+        """
+        _signal_done Give the good-to-go to the main process if no file is being analyzed and no results are waiting to be written.
+        Called by the analysis thread and by the writer thread whenever it has caught up.
+        """
+        with self.work_lock:
+            if self.is_analyzing is False and (
+                self.writer is None or self.writer.pending == 0
+            ):
+                self.is_done_analyzing.set()
+
+    def _persist(self, write: callable, done: callable):
+        """
+        _persist Write results in the background if the writer is running, else right away.
+
+        Args:
+            write (callable): Writes the results files and returns their paths
+            done (callable): Marks the results as written, e.g., in the journal and the index
+        """
+        if self.writer is None:
+            write()
+            done()
+        else:
+            self.writer.submit(write, done)
+
+    def analyze(
+        self,
+        filename: str,
+        recording: Recording,
+        ensemble: list = None,
+        resumed: bool = False,
+        model_name: str = None,
+    ):
+        """
+        analyze Analyze a file pointed to by 'filename' and save the results as csv file to 'output'.
+
+        Args:
+            filename (str): path to the file to analyze.
+            recording (Recording): recording object to use
+            ensemble (list, optional): (model_name, Recording) tuples of additional models to apply to the file. Defaults to None.
+            resumed (bool, optional): Whether the file is left over from an earlier run. Such files do not count towards the time window of this run. Defaults to False.
+            model_name (str, optional): Name of the model of 'recording', e.g., the fallback model of the load shedding. Defaults to None (the watcher's model).
+        """
+        if model_name is None:
+            model_name = self.model_name
+
+        self.may_do_work.wait()  # wait until parent process allows the worker to pick up work
+
+        # in cluster mode, only analyze files nobody else is working on or has done already
+        if self.leases is not None and self.leases.claim(filename) is False:
+            if self.journal is not None:
+                self.journal.record("skipped", filename)
+            return
+
+        if self.journal is not None:
+            self.journal.started(filename)
+
+        # make the main process wait on the finish signal to make sure no
+        # corrupt files are produced
+        self._begin_analysis()
+
+        if resumed is False:
+            self.last_analyzed.value = int(Path(filename).stat().st_ctime)
+
+            if self.first_analyzed.value == 0:
+                self.first_analyzed.value = self.last_analyzed.value
+
+        is_tailed = self.tail_config is not None and can_tail(filename)
+
+        config_hash = self.config_hash
+        if (
+            config_hash is not None
+            and self.shedder is not None
+            and len(self.shedder.active_steps) > 0
+        ):
+            config_hash = hash_shedding(
+                config_hash,
+                {
+                    step: self.shedding_config.get(step, None)
+                    for step in self.shedder.active_steps
+                },
+            )
+
+        try:
+            if is_tailed:
+                results = self._tail_file(filename, model_name, recording, ensemble)
+            else:
+                results = self._analyze_file(
+                    filename,
+                    model_name,
+                    recording,
+                    ensemble,
+                    cache=self.cache,
+                    config_hash=config_hash,
+                )
+        except Exception:
+            if self.leases is not None:
+                self.leases.release(filename)
+            raise
+
+        # the recording may be deleted by the retention as soon as its results are written
+        recorded = Path(filename).stat().st_ctime
+        output = self.output
+        # the next file's analysis replaces the list
+        skipped = list(self.skipped_chunks)
+
+        def write():
+            return self.save_results(
+                output,
+                results,
+                suffix=Path(filename).stem,
+                skipped=skipped,
+            )
+
+        def done():
+            if self.index is not None:
+                self.index.add(
+                    output.name,
+                    Path(filename).stem,
+                    recorded,
+                    results,
+                )
+
+            if self.leases is not None:
+                self.leases.complete(filename)
+
+            if self.journal is not None:
+                self.journal.completed(filename)
+
+            if self.delete_recordings == "always":
+                Path(filename).unlink(missing_ok=True)
+
+        self._persist(write, done)
+
+        # tailed files have been published piece by piece already
+        if self.publisher is not None and is_tailed is False:
+            self.publisher.publish(filename, results)
+
+        self._write_stats(recording)
+
+        self._end_analysis()  # give good-to-go for main process once the results are written
+
+    def _tail_file(
+        self, filename: str, model_name: str, recording: Recording, ensemble: list
+    ) -> list:
+        """
+        _tail_file Analyze a WAV file while it is being written. Complete chunks are analyzed as soon as they have been appended, their detections are
+                   appended to a partial results file in the output folder and published right away. The partial results file is removed once the writer
+                   has closed the file and its end has been analyzed, and the caller writes the final results file.
+
+        Args:
+            filename (str): Path of the file to analyze
+            model_name (str): Name of the main model
+            recording (Recording): Recording of the main model
+            ensemble (list): (model_name, Recording) tuples of the additional models. May be None.
+
+        Returns:
+            list: Detections of all models
+        """
+        poll_interval = self.tail_config.get("poll_interval", self.check_time)
+        idle_timeout = self.tail_config.get("idle_timeout", 10.0)
+
+        members = [(model_name, recording)] + (ensemble if ensemble is not None else [])
+
+        partial = self.output / f"results_{Path(filename).stem}.part.csv"
+        tail = WavTail(filename)
+        segment = None
+
+        try:
+            for data in tail.follow(
+                poll_interval=poll_interval, idle_timeout=idle_timeout
+            ):
+                if segment is None:
+                    segment = StreamSegment(
+                        members, tail.sample_rate, Path(filename).stem
+                    )
+
+                detections = segment.feed(data, last=len(data) == 0)
+
+                if len(detections) == 0:
+                    continue
+
+                self._append_partial_results(partial, detections)
+
+                if self.publisher is not None:
+                    self.publisher.publish(filename, detections)
+        finally:
+            tail.close()
+
+        self.skipped_chunks = [] if segment is None else segment.skipped
+
+        partial.unlink(missing_ok=True)
+
+        return [] if segment is None else segment.results
+
+    def _check_stream_config(self, stream_config: dict):
+        """
+        _check_stream_config Check the stream config before the watcher process is started.
+
+        Args:
+            stream_config (dict): Stream config as passed to the constructor
+
+        Raises:
+            ValueError: When 'source' is missing or stdin, 'segment_secs' is not positive or the PCMStream arguments are invalid.
+        """
+        if "source" not in stream_config:
+            raise ValueError("'stream_config' must contain a 'source'")
 
-    @contextmanager
-    def _backup_and_restore_state(self):
+        # multiprocessing connects the stdin of child processes to /dev/null
+        if stream_config["source"] == "-":
+            raise ValueError(
+                "'source' of 'stream_config' cannot be stdin, use a named pipe instead"
+            )
+
+        if stream_config.get("segment_secs", 3600) < 1:
+            raise ValueError("'segment_secs' of 'stream_config' must be >= 1")
+
+        # the stream is only opened in the watcher process, this just checks the arguments
+        PCMStream(**self._stream_arguments(stream_config))
+
+    def _stream_arguments(self, stream_config: dict) -> dict:
         """
-        _backup_and_restore_state Helper context manager that creates a backup of the current object state and restores it in case of an error.
+        _stream_arguments Get the keyword arguments for the PCMStream from the stream config.
 
-        Raises:
-            RuntimeError When an error occurs during the restart of the watcher process.
+        Args:
+            stream_config (dict): Stream config
 
-        Yields:
-            dict: Dictionary containing the old state of the calling object
+        Returns:
+            dict: Stream config without the entries the watcher handles itself
         """
-        old_state = {
-            "model_name": deepcopy(self.model_name),
-            "preprocessor_config": deepcopy(self.preprocessor_config),
-            "model_config": deepcopy(self.model_config),
-            "recording_config": deepcopy(self.recording_config),
-            "species_predictor_config": deepcopy(self.species_predictor_config),
-            "pattern": deepcopy(self.pattern),
-            "check_time": self.check_time,
-            "delete_recordings": self.delete_recordings,
+        return {
+            key: value
+            for key, value in stream_config.items()
+            if key not in ["segment_secs", "archive_dir"]
         }
 
-        try:
-            yield old_state
-        except Exception as e:
-            self._restore_old_state(old_state)
-
-            if self.is_running:
-                self.stop()
+    def _set_up_stream(self) -> PCMStream:
+        """
+        _set_up_stream Build the stream to analyze instead of files.
 
-            raise RuntimeError(
-                "Error when while trying to change the watcher process, any changes made have been undone. The process needs to be restarted manually. This operation may have led to data loss."
-            ) from e
+        Returns:
+            PCMStream: New stream that has not been started yet.
+        """
+        return PCMStream(**self._stream_arguments(self.stream_config))
 
-    def __init__(
-        self,
-        indir: str,
-        outdir: str,
-        model_dir: str,
-        model_name: str,
-        preprocessor_config: dict = None,
-        model_config: dict = None,
-        recording_config: dict = None,
-        species_predictor_config: dict = None,
-        pattern: str = ".wav",
-        check_time: int = 1,
-        delete_recordings: str = "never",
+    def analyze_stream(
+        self, stream: PCMStream, recording: Recording, ensemble: list = None
     ):
         """
-        __init__ Create a new Watcher object.
+        analyze_stream Analyze the audio that has arrived from the stream since the last call. The audio is cut into segments of 'segment_secs' seconds.
+                       Detections are appended to a partial results file of the current segment and published right away. When a segment is full or
+                       the writer has disconnected, its end is analyzed, its results file 'results_stream_<start time>.csv' is written and the partial file removed.
 
         Args:
-            indir (str): Directory to read files from
-            outdir (str): Directory to write the analysis results to.
-                        A new directory with a timestamp for name will be
-                        created within it to store the result files in.
-            model_dir (str): Directory where downloaded models are stored
-            model_name (str): name of the model to use. Must match the directory name it is stored in, e.g., 'birdnet_default'.
-            preprocessor_config (dict, optional): Keyword arguments for the preprocessor of the model. Defaults to {}.
-            model_config (dict, optional): Keyword arguments for the model instance. Defaults to {}.
-            recording_config (dict, optional): Keyword arguments for the internal Recording. Defaults to {}.
-            species_predictor_config (dict, optional): Keyword arguments for a species presence predictor model. Defaults to {}.
-            pattern (str, optional): filename pattern to look for. defaults to '.wav'.
-            check_time(int, optional): Sleep time of the watcher between checks for new files in seconds. Defaults to 1.
-            delete_recordings(str, optional): Mode for data clean up. Can be one of "never" or "always".
-                                            "never" keeps recordings around indefinitely. 'always' deletes the recording
-                                            immediatelly after analysis. Defaults to 'never'.
-        Raises:
-            ValueError: When the indir parameter is not an existing directory.
-            ValueError: When the outdir parameter is not an existing directory.
-            ValueError: When the model_dir parameter is not an existing directory.
-            ValueError: When the model name does not correspond to a directory in the 'model_dir' directory in which available models are stored.
+            stream (PCMStream): Running stream
+            recording (Recording): recording object to use
+            ensemble (list, optional): (model_name, Recording) tuples of additional models to apply. Defaults to None.
         """
-        if preprocessor_config is None:
-            preprocessor_config = {}
+        self.may_do_work.wait()  # wait until parent process allows the worker to pick up work
 
-        if model_config is None:
-            model_config = {}
+        data = stream.read()
 
-        if recording_config is None:
-            recording_config = {}
+        if stream.overruns > self.dropped_samples:
+            warnings.warn(
+                f"analysis could not keep up with the stream, dropped {stream.overruns - self.dropped_samples} samples"
+            )
+            self.dropped_samples = stream.overruns
 
-        if species_predictor_config is None:
-            species_predictor_config = {}
+        if len(data) == 0 and (self.segment is None or stream.is_connected):
+            return
 
-        # set up data to use
-        self.input = Path(indir)
+        self._begin_analysis()
 
-        if self.input.is_dir() is False:
-            raise ValueError("Input directory does not exist")
+        segment_length = int(
+            self.stream_config.get("segment_secs", 3600) * stream.sample_rate
+        )
 
-        self.outdir = Path(outdir)
+        # the writer has disconnected, so the rest of the segment is analyzed
+        if len(data) == 0:
+            self._feed_segment(data, last=True)
 
-        if self.outdir.is_dir() is False:
-            raise ValueError("Output directory does not exist")
+        while len(data) > 0:
+            if self.segment is None:
+                members = [(self.model_name, recording)] + (
+                    ensemble if ensemble is not None else []
+                )
+                # named after the time its first sample was recorded, which is unique as segments are at least a second long
+                recorded = datetime.now() - timedelta(
+                    seconds=len(data) / stream.sample_rate
+                )
+                self.segment = StreamSegment(
+                    members,
+                    stream.sample_rate,
+                    recorded.strftime("stream_%y%m%d_%H%M%S"),
+                    archive_dir=self.stream_config.get("archive_dir", None),
+                    recorded=recorded.timestamp(),
+                )
 
-        self.output = None
-        self.old_output = None
+            room = segment_length - self.segment.num_samples
+            part, data = data[:room], data[room:]
+            self._feed_segment(part, last=len(part) == room)
 
-        self.model_dir = Path(model_dir)
+        self._write_stats(recording)
 
-        if self.model_dir.is_dir() is False:
-            raise ValueError("Model directory does not exist")
+        self._end_analysis()  # give good-to-go for main process once the results are written
 
-        if (self.model_dir / model_name).is_dir() is False:
-            raise ValueError("Given model name does not exist in model directory")
+    def _feed_segment(self, data, last: bool):
+        """
+        _feed_segment Analyze audio of the current stream segment and write out its detections.
 
-        self.pattern = pattern
+        Args:
+            data (np.ndarray): Mono float32 data at the sample rate of the stream
+            last (bool): Whether this is the end of the segment
+        """
+        detections = self.segment.feed(data, last=last)
+        partial = self.output / f"results_{self.segment.name}.part.csv"
 
-        self.model_name = model_name
+        if len(detections) > 0:
+            self._append_partial_results(partial, detections)
 
-        self.watcher_process = None
+            if self.publisher is not None:
+                self.publisher.publish(self.segment.name, detections)
 
-        self.exception_queue = multiprocessing.Queue()
+        if last:
+            segment = self.segment
+            output = self.output
 
-        self.may_do_work = multiprocessing.Event()
+            def write():
+                return self.save_results(
+                    output,
+                    segment.results,
+                    suffix=segment.name,
+                    skipped=segment.skipped,
+                )
 
-        self.is_done_analyzing = multiprocessing.Event()
+            def done():
+                if self.index is not None:
+                    self.index.add(
+                        output.name,
+                        segment.name,
+                        segment.recorded,
+                        segment.results,
+                    )
 
-        self.check_time = check_time
+                partial.unlink(missing_ok=True)
 
-        if delete_recordings not in ["never", "always"]:
-            raise ValueError("'delete_recordings' must be in 'never', 'always'")
+            self._persist(write, done)
+            self.segment = None
 
-        self.delete_recordings = delete_recordings
+    def _append_partial_results(self, partial: Path, detections: list):
+        """
+        _append_partial_results Append detections to the partial results file of a file that is still being written.
 
-        self.first_analyzed = multiprocessing.Value("i", 0)
+        Args:
+            partial (Path): Partial results file
+            detections (list): New detections
+        """
+        is_new = partial.is_file() is False
 
-        self.last_analyzed = multiprocessing.Value("i", 0)
+        with open(partial, "a") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=detections[0].keys())
+            if is_new:
+                writer.writeheader()
+            writer.writerows(detections)
 
-        self.preprocessor_config = deepcopy(preprocessor_config)
+    def _write_stats(self, recording: Recording):
+        """
+        _write_stats Write the decode throughput per file format to 'decoding.yml' in the output folder, if an activity gate is used,
+                     how often it fired to 'activity_gate.yml', the queue wait of each scheduling class to 'scheduling.yml' and how many results files
+                     the background writer has written to 'writer.yml'.
+                     This is done at most every 'decode_stats_interval' seconds.
 
-        self.model_config = deepcopy(model_config)
+        Args:
+            recording (Recording): Recording of the main model, which shares its decoder with the ensemble if there is one.
+        """
+        if (
+            self.last_decode_stats is not None
+            and monotonic() - self.last_decode_stats < self.decode_stats_interval
+        ):
+            return
 
-        self.recording_config = deepcopy(recording_config)
+        self.last_decode_stats = monotonic()
 
-        self.species_predictor_config = deepcopy(species_predictor_config)
+        with open(self.output / self.decode_stats_name, "w") as ymlfile:
+            yaml.safe_dump(recording.decode_stats, ymlfile)
 
-        self.batchfile_name = "batch_info.yml"
+        if recording.gate is not None:
+            with open(self.output / self.gate_stats_name, "w") as ymlfile:
+                yaml.safe_dump(recording.gate.stats, ymlfile)
 
-    @property
-    def output_directory(self):
-        return str(self.output)
+        if self.scheduler is not None:
+            with open(self.output / self.scheduling_stats_name, "w") as ymlfile:
+                yaml.safe_dump(self.scheduler.stats(), ymlfile, sort_keys=False)
 
-    @property
-    def input_directory(self):
-        return str(self.input)
+        if self.writer is not None:
+            with open(self.output / self.writer_stats_name, "w") as ymlfile:
+                yaml.safe_dump(self.writer.stats(), ymlfile, sort_keys=False)
 
-    @property
-    def is_running(self):
-        if self.watcher_process is not None:
-            return self.watcher_process.is_alive()
-        else:
-            return False
+    def _read_stats(self, name: str) -> dict:
+        """
+        _read_stats Read a statistics file of the current run.
 
-    @property
-    def is_sleeping(self):
-        if self.watcher_process is not None:
-            return self.may_do_work.is_set() is False
-        else:
-            return False
+        Args:
+            name (str): Name of the file in the output folder
 
-    def analyze(self, filename: str, recording: Recording):
+        Returns:
+            dict: Content of the file, empty if it has not been written yet.
         """
-        analyze Analyze a file pointed to by 'filename' and save the results as csv file to 'output'.
+        if self.output is None or (self.output / name).is_file() is False:
+            return {}
 
-        Args:
-            filename (str): path to the file to analyze.
-            recording (Recording): recording object to use
+        with open(self.output / name, "r") as ymlfile:
+            stats = yaml.safe_load(ymlfile)
+
+        return {} if stats is None else stats
+
+    def read_decode_stats(self) -> dict:
         """
-        self.may_do_work.wait()  # wait until parent process allows the worker to pick up work
+        read_decode_stats Read the decode throughput per file format of the current run.
 
-        recording.path = filename
+        Returns:
+            dict: suffix -> statistics as returned by 'AudioDecoder.stats', empty if nothing has been decoded yet.
+        """
+        return self._read_stats(self.decode_stats_name)
 
-        recording.analyzed = False  # reactivate
+    def read_gate_stats(self) -> dict:
+        """
+        read_gate_stats Read how often the activity gate fired in the current run.
 
-        # make the main process wait on the finish signal to make sure no
-        # corrupt files are produced
-        self.is_done_analyzing.clear()
+        Returns:
+            dict: Statistics as returned by 'ActivityGate.stats', empty if no gate is used or nothing has been analyzed yet.
+        """
+        return self._read_stats(self.gate_stats_name)
+
+    def read_scheduling_stats(self) -> dict:
+        """
+        read_scheduling_stats Read how long files of each scheduling class waited in the queue in the current run.
+
+        Returns:
+            dict: class -> statistics as returned by 'PriorityScheduler.stats', empty if nothing has been analyzed yet.
+        """
+        return self._read_stats(self.scheduling_stats_name)
+
+    def read_writer_stats(self) -> dict:
+        """
+        read_writer_stats Read how many results files the background writer has written in the current run.
+
+        Returns:
+            dict: Statistics as returned by 'ResultWriter.stats', empty if nothing has been analyzed yet.
+        """
+        return self._read_stats(self.writer_stats_name)
+
+    def read_shedding_stats(self) -> dict:
+        """
+        read_shedding_stats Read the decisions of the load shedding in the current run.
+
+        Returns:
+            dict: {"level", "steps": steps taken, "decisions": list of decisions as returned by 'LoadShedder.update'}, empty if no step has been taken yet.
+        """
+        return self._read_stats(self.shedding_stats_name)
+
+    def _write_shedding(self, shedder: LoadShedder):
+        """
+        _write_shedding Write the current level and all decisions of the load shedding to 'load_shedding.yml' in the output folder.
+
+        Args:
+            shedder (LoadShedder): Load shedder of the run
+        """
+        with open(self.output / self.shedding_stats_name, "w") as ymlfile:
+            yaml.safe_dump(
+                {
+                    "level": shedder.level,
+                    "steps": shedder.active_steps,
+                    "decisions": shedder.decisions,
+                },
+                ymlfile,
+                sort_keys=False,
+            )
 
-        self.last_analyzed.value = int(Path(filename).stat().st_ctime)
+    def shed_file(self, filename: str):
+        """
+        shed_file Skip a file because the watcher is too far behind. It is listed in 'shed_files.txt' in the output folder, from which
+        'clean_up' analyzes it later.
 
-        if self.first_analyzed.value == 0:
-            self.first_analyzed.value = self.last_analyzed.value
+        Args:
+            filename (str): Path of the file
+        """
+        if self.journal is not None:
+            self.journal.record("skipped", filename)
 
-        recording.analyze()
+        with open(self.output / self.shed_files_name, "a") as shed:
+            shed.write(f"{filename}\n")
 
-        results = recording.detections
+    def _read_shed_files(self, output: str) -> list:
+        """
+        _read_shed_files Read the files the load shedding of a run has skipped.
 
-        self.save_results(self.output, results, suffix=Path(filename).stem)
+        Args:
+            output (str): Output folder of the run
 
-        self.is_done_analyzing.set()  # give good-to-go for main process
+        Returns:
+            list: Paths of the skipped files
+        """
+        if Path(output, self.shed_files_name).is_file() is False:
+            return []
 
-        if self.delete_recordings == "always":
-            Path(filename).unlink()
+        with open(Path(output, self.shed_files_name), "r") as shed:
+            return [Path(line.strip()) for line in shed if len(line.strip()) > 0]
 
-    def save_results(self, outfolder: str, results: list, suffix=""):
+    def save_results(
+        self, outfolder: str, results: list, suffix="", skipped: list = None
+    ) -> list:
         """
-        save_results Save results to csv file.
+        save_results Save results to csv file. The file is written under a temporary name and renamed when complete, such that
+        no reader ever sees a partial results file.
 
         Args:
             outfolder (str): folder to save the results in
             suffix (str, optional): _description_. Defaults to "".
+            skipped (list, optional): (start, end) of chunks the activity gate kept from the model. They are appended to 'skipped_chunks.csv'. Defaults to None.
+
+        Returns:
+            list: Paths of the files that have been written
         """
+        written = []
+
+        if skipped is not None and len(skipped) > 0:
+            skipped_file = Path(outfolder) / self.skipped_name
+            is_new = skipped_file.is_file() is False
+
+            with open(skipped_file, "a") as csvfile:
+                writer = csv.writer(csvfile)
+                if is_new:
+                    writer.writerow(["recording", "start", "end"])
+                writer.writerows([suffix, start, end] for start, end in skipped)
 
-        with open(Path(outfolder) / Path(f"results_{suffix}.csv"), "w") as csvfile:
+            written.append(skipped_file)
+
+        results_file = Path(outfolder) / Path(f"results_{suffix}.csv")
+        tmp_file = results_file.with_name(results_file.name + ".tmp")
+
+        with open(tmp_file, "w") as csvfile:
             if len(results) == 0:
                 writer = csv.writer(csvfile)
                 writer.writerow([])
@@ -455,36 +2082,51 @@ class Watcher:
                 writer.writeheader()
                 writer.writerows(results)
 
+        tmp_file.replace(results_file)
+        written.append(results_file)
+
+        return written
+
     def start(self):
         """
         start Watch the directory the caller has been created with and analyze all newly created files matching a certain file ending. \
             Creates a new daemon process in which the analysis function runs.
 
         Raises:
-            RuntimeError: When the watcher process is running already.
+            RuntimeError: When the watcher process is running already, or when it cannot be started.
         """
         if self.is_running:
             raise RuntimeError("watcher process still running, stop first.")
 
         self.old_output = self.output
         self.output = Path(self.outdir) / Path(datetime.now().strftime("%y%m%d_%H%M%S"))
-        self.output.mkdir(exist_ok=True, parents=True)
         self.first_analyzed.value = 0
         self.last_analyzed.value = 0
 
-        self._write_config()
-
         try:
+            self.output.mkdir(exist_ok=True, parents=True)
+
+            self._write_config()
+
+            self.resume_files = self._get_unfinished_files()
+
             print("start the watcher process")
+            self.state_channel.set("starting")
             # create a background watchertask such that the command is handed back to the parent process
-            self.watcher_process = multiprocessing.Process(
+            self.watcher_process = self._worker_context().Process(
                 target=watchertask, args=(self,)
             )
             self.watcher_process.daemon = True
             self.watcher_process.name = "watcher_process"
-            self.watcher_process.start()
             self.may_do_work.set()
-            self.is_done_analyzing.clear()
+            self.stop_requested.clear()
+            # nothing is being analyzed yet, which the process changes once it begins
+            self.is_done_analyzing.set()
+            self.watcher_process.start()
+
+            # a restart by the supervisor runs in its own thread, which is running already
+            if self.supervisor is not None and self.supervisor.is_running is False:
+                self.supervisor.start()
 
         except Exception as e:
 
@@ -496,6 +2138,7 @@ class Watcher:
             self.may_do_work.clear()
             self.is_done_analyzing.clear()
             self.watcher_process = None
+            self.state_channel.set("failed")
 
             raise RuntimeError(
                 "Something went wrong when starting the watcher process, undoing changes and returning"
@@ -527,6 +2170,7 @@ class Watcher:
                 )
 
             self.may_do_work.clear()
+            self.state_channel.set("paused")
         else:
             raise RuntimeError("Cannot pause watcher process, is not alive anymore.")
 
@@ -540,31 +2184,47 @@ class Watcher:
         if self.watcher_process is not None and self.watcher_process.is_alive():
             print("continue the watcher process")
             self.may_do_work.set()
+            self.state_channel.set("ready")
         else:
             raise RuntimeError("Cannot continue watcher process, is not alive anymore.")
 
-    def stop(self):
+    def stop(self, timeout: float = 60.0):
         """
-        stop Stop the watcher process if it is still running.
+        stop Stop the watcher process if it is still running. The process finishes the file it is analyzing, writes all pending results,
+        closes its journal and index and ends by itself. Only if it does not end within 'timeout' seconds, it is killed.
+        A watcher process that died and is waiting for its restart by the supervisor counts as running, its restart is cancelled.
+
+        Args:
+            timeout (float, optional): Maximum time in seconds to wait for the watcher process to end. Defaults to 60.
 
         Raises:
             RuntimeError: When the watcher process is not running anymore
         """
+        # such that the process is not restarted while or after it is stopped
+        is_restart_pending = False
+        if self.supervisor is not None:
+            is_restart_pending = self.supervisor.stop()
+
         if self.watcher_process is not None and self.watcher_process.is_alive():
             print("trying to stop the watcher process")
-            flag_set = self.is_done_analyzing.wait(timeout=30)
-
-            if flag_set is False:
-                warnings.warn("stop timeout expired, terminating watcher process now.")
+            self.state_channel.set("draining")
 
             try:
-                self.watcher_process.terminate()
-                self.watcher_process.join()
+                self.stop_requested.set()
+                self.watcher_process.join(timeout=timeout)
+
+                if self.watcher_process.is_alive():
+                    warnings.warn("stop timeout expired, killing watcher process now.")
+                    self.watcher_process.kill()
+                    self.watcher_process.join()
+
                 self.watcher_process.close()
                 self.watcher_process = None
                 self.may_do_work.clear()
                 self.is_done_analyzing.set()
+                self.state_channel.set("stopped")
             except Exception as e:
+                self.state_channel.set("failed")
                 raise RuntimeError(
                     "Something went wrong when trying to stop the watcher process"
                 ) from e
@@ -577,6 +2237,11 @@ class Watcher:
                     },
                     batch_info,
                 )
+        elif is_restart_pending:
+            # the process died and its restart has been cancelled, which leaves it stopped
+            self.may_do_work.clear()
+            self.is_done_analyzing.set()
+            self.state_channel.set("stopped")
         else:
             raise RuntimeError("Cannot stop watcher process, is not alive anymore.")
 
@@ -606,7 +2271,7 @@ class Watcher:
             recording_config (dict, optional): Parameters for the underlyin Recording object. If empty, default parameters of the recording will be used. Defaults to {}.
             species_predictor_config (dict, optional): _description_. If empty, default parameters of the species predictor will be used. Defaults to {}.
             Make sure the model you use is compatible with a species predictor before supplying these.
-            pattern (str, optional): filename pattern to look for. defaults to '.wav'.
+            pattern (str | list, optional): file ending to look for, or a list of them, e.g., ['.wav', '.flac']. defaults to '.wav'.
             check_time(int, optional): Sleep time of the watcher between checks for new files in seconds. Defaults to 1.
             delete_recordings(str, optional): Mode for data clean up. Can be one of "never" or "always".
                                             "never" keeps recordings around indefinitely. 'always' deletes the recording
@@ -681,6 +2346,51 @@ class Watcher:
                     f"Error when cleaning up data after analyzer change, watcher is {status}. The cause was {cause}. This error may have lead to corrupt data in newly created analysis files."
                 ) from e
 
+    def _get_unfinished_files(self) -> list:
+        """
+        _get_unfinished_files Replay the journals of earlier runs on the same input directory in the output base directory to find the files
+                              that have been found or started, but never completed, e.g., because the watcher process crashed or was terminated.
+                              Runs whose unfinished files have been carried over into the journal of a later run are not replayed.
+
+        Returns:
+            list: Paths of unfinished files that still exist, in the order in which they were found.
+        """
+        indir = Path(self.input).expanduser().resolve()
+
+        journals = sorted(
+            [
+                folder / self.journal_name
+                for folder in self.outdir.iterdir()
+                if folder.is_dir()
+                and folder != self.output
+                and (folder / self.journal_name).is_file()
+                and utils.run_input(folder) == indir
+            ],
+            key=lambda x: x.parent.stat().st_ctime,
+        )
+
+        return [f for f in unfinished_files(journals) if Path(f).is_file()]
+
+    def _read_batch_info(self, output: str) -> dict:
+        """
+        _read_batch_info Read the first and last analyzed creation times of a run. If the run did not end normally and has no batch info file,
+                         they are recovered from its journal.
+
+        Args:
+            output (str): Output folder of the run
+
+        Returns:
+            dict: {"first": ..., "last": ...} or None when neither a batch info file nor a journal exists.
+        """
+        if Path(output / self.batchfile_name).is_file():
+            with open(output / self.batchfile_name, "r") as batch_info:
+                return yaml.safe_load(batch_info)
+
+        if Path(output / self.journal_name).is_file():
+            return journal_limits(output / self.journal_name)
+
+        return None
+
     def _get_clean_up_limits(self, older_output: str, newer_output: str) -> tuple:
         """
         _get_clean_up_limits Determine the lower and upper time limit for the clean up of the older output directory.
@@ -690,20 +2400,29 @@ class Watcher:
             newer_output (str): Newer output folder that is used to determine the upper time limit for the clean up.
 
         Raises:
-            RuntimeError: When the newer output directory is not the currently worked on, but also has no batch info file.
+            RuntimeError: When the older output directory has neither a batch info file nor a journal.
+            RuntimeError: When the newer output directory is not the currently worked on, but also has no batch info file or journal.
 
         Returns:
             tuple: (lower time limit, upper time limit) pair of timestamps to use for the clean up.
         """
-        with open(older_output / self.batchfile_name, "r") as batch_info:
-            lower_limit = yaml.safe_load(batch_info)["last"]
+        older_info = self._read_batch_info(older_output)
+
+        if older_info is None:
+            raise RuntimeError(
+                f"{older_output} has neither a batchinfo.yml file nor a journal."
+            )
+
+        lower_limit = older_info["last"]
 
         if newer_output is None:
             upper_limit = int(datetime.now().timestamp())
 
-        elif Path(newer_output / self.batchfile_name).is_file():
-            with open(newer_output / self.batchfile_name, "r") as batch_info:
-                upper_limit = yaml.safe_load(batch_info)["first"]
+        elif newer_output == self.output and self.is_running:
+            upper_limit = self.first_analyzed.value
+
+        elif self._read_batch_info(newer_output) is not None:
+            upper_limit = self._read_batch_info(newer_output)["first"]
 
         elif newer_output != self.output:
             raise RuntimeError(
@@ -740,15 +2459,40 @@ class Watcher:
         input_folder = Path(cfg["Analysis"]["input"])
         outputfolder = cfg["Analysis"]["output"]
 
+        # includes recordings whose results have been compacted already
+        processed = processed_recordings(outputfolder)
+
         audiofiles = [
             f
             for f in input_folder.iterdir()
-            if f.suffix == cfg["Analysis"]["pattern"]
-            and not Path(outputfolder, f"results_{f.stem}.csv").is_file()
+            if utils.matches_pattern(f, cfg["Analysis"]["pattern"])
+            and f.stem not in processed
             and lower_limit < f.stat().st_ctime < upper_limit
         ]
 
+        # files skipped by the load shedding lie within the time window of the run itself
+        audiofiles.extend(
+            f
+            for f in self._read_shed_files(older_output)
+            if f.is_file() and f.stem not in processed and f not in audiofiles
+        )
+
+        leases = None
+        if cfg["Analysis"].get("Cluster") is not None:
+            leases = self._set_up_leases(cfg["Analysis"]["Cluster"], input_folder)
+            audiofiles = [f for f in audiofiles if leases.is_done(f) is False]
+
         if len(audiofiles) > 0:
+            cache = None
+            if cfg["Analysis"].get("Cache") is not None:
+                cache = ResultsCache(**cfg["Analysis"]["Cache"])
+
+            index = None
+            if cfg["Analysis"].get("Index") is not None:
+                index = self._set_up_index(
+                    cfg["Analysis"]["Index"], Path(older_output).parent
+                )
+
             recording = self._set_up_recording(
                 cfg["Analysis"]["model_name"],
                 cfg["Analysis"]["Recording"],
@@ -757,20 +2501,67 @@ class Watcher:
                 cfg["Analysis"]["Preprocessor"],
             )
 
-            for audiofile in audiofiles:
-                recording.path = audiofile
-                recording.analyzed = False
-                recording.analyze()
-                results = recording.detections
-                self.save_results(outputfolder, results, suffix=str(audiofile.stem))
+            ensemble = self._set_up_ensemble(
+                self._check_ensemble_config(cfg["Analysis"].get("Ensemble")), recording
+            )
 
-                if cfg["Analysis"]["delete_recordings"] == "always":
-                    audiofile.unlink()
+            # files finished here are recorded in the journal of the run they belong to, such that they are not resumed again
+            journal = ProcessingJournal(Path(older_output) / self.journal_name)
 
-            with open(older_output / "missings.txt", "w") as missing:
+            analyzed = []
+            try:
                 for audiofile in audiofiles:
+                    if leases is not None and leases.claim(audiofile) is False:
+                        journal.record("skipped", audiofile)
+                        continue
+
+                    journal.started(audiofile)
+                    results = self._analyze_file(
+                        audiofile,
+                        cfg["Analysis"]["model_name"],
+                        recording,
+                        ensemble,
+                        cache=cache,
+                        config_hash=hash_config(cfg["Analysis"]),
+                    )
+                    self.save_results(
+                        outputfolder,
+                        results,
+                        suffix=str(audiofile.stem),
+                        skipped=self.skipped_chunks,
+                    )
+                    analyzed.append(audiofile)
+
+                    if index is not None:
+                        index.add(
+                            Path(outputfolder).name,
+                            audiofile.stem,
+                            audiofile.stat().st_ctime,
+                            results,
+                        )
+
+                    # left behind if the watcher stopped while the file was being written
+                    Path(outputfolder, f"results_{audiofile.stem}.part.csv").unlink(
+                        missing_ok=True
+                    )
+
+                    if leases is not None:
+                        leases.complete(audiofile)
+
+                    journal.completed(audiofile)
+
+                    if cfg["Analysis"]["delete_recordings"] == "always":
+                        audiofile.unlink()
+            finally:
+                journal.close()
+
+            with open(older_output / "missings.txt", "w") as missing:
+                for audiofile in analyzed:
                     missing.write(f"{audiofile}\n")
 
+            if index is not None:
+                index.close()
+
     def clean_up(self):
         """
         clean_up Run cleanup on the all the output directories of the watcher process that reside in the current output base directory.
@@ -0,0 +1,184 @@
+from pathlib import Path
+import importlib.util
+import multiprocessing
+import os
+import warnings
+
+# environment variable through which the forkserver learns which model files to read when it imports this module
+PRELOAD_MODELS_ENV = "FAUNANET_PRELOAD_MODELS"
+
+# file endings of model files that can be loaded from memory
+PRELOAD_MODEL_SUFFIXES = [".tflite", ".onnx"]
+
+# (modification time, size, content) of preloaded model files by resolved path. Worker processes forked from the forkserver share it with it.
+_MODEL_CONTENT = {}
+
+# (process id, resolved paths of the model files) of the forkserver this process has started, if any
+_SERVER_MODELS = (None, set())
+
+
+def default_preload() -> list:
+    """
+    default_preload Get the modules a worker needs before it can analyze the first file: faunanet with librosa and the other
+    audio libraries it imports, and the interpreter for tflite models.
+
+    Returns:
+        list: Names of the modules
+    """
+    modules = ["faunanet", "faunanet.workers", "librosa"]
+
+    if importlib.util.find_spec("tflite_runtime") is not None:
+        modules.append("tflite_runtime.interpreter")
+    else:
+        modules.append("tensorflow")
+
+    return modules
+
+
+def preload_model_files(paths: list) -> int:
+    """
+    preload_model_files Read model files into memory, such that models can be built from them without reading the files again.
+
+    Args:
+        paths (list): Paths of model files. Files that do not exist are ignored.
+
+    Returns:
+        int: Number of preloaded files
+    """
+    for path in paths:
+        path = Path(path).expanduser().resolve()
+        if path.is_file() and preloaded_model_content(path) is None:
+            stat = path.stat()
+            _MODEL_CONTENT[str(path)] = (
+                stat.st_mtime_ns,
+                stat.st_size,
+                path.read_bytes(),
+            )
+
+    return len(_MODEL_CONTENT)
+
+
+def preloaded_model_content(path: str) -> bytes:
+    """
+    preloaded_model_content Get the preloaded content of a model file. Content of a file that has been modified or removed since it was
+    preloaded, e.g., by reinstalling the model, is dropped.
+
+    Args:
+        path (str): Path of the model file
+
+    Returns:
+        bytes: Content of the file, or None if it has not been preloaded or is out of date
+    """
+    path = Path(path).expanduser().resolve()
+    entry = _MODEL_CONTENT.get(str(path))
+
+    if entry is None:
+        return None
+
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        stat = None
+
+    if stat is None or (stat.st_mtime_ns, stat.st_size) != entry[:2]:
+        del _MODEL_CONTENT[str(path)]
+        return None
+
+    return entry[2]
+
+
+def model_files(model_dirs: list) -> list:
+    """
+    model_files Get the model files in the given model folders that can be preloaded.
+
+    Args:
+        model_dirs (list): Folders of models, e.g., 'models/birdnet_default'
+
+    Returns:
+        list: Paths of the model files
+    """
+    return sorted(
+        path
+        for folder in model_dirs
+        if Path(folder).is_dir()
+        for path in Path(folder).iterdir()
+        if path.suffix in PRELOAD_MODEL_SUFFIXES
+    )
+
+
+def worker_context():
+    """
+    worker_context Get the multiprocessing context of 'warm_context' without starting its server, e.g., to create the queues,
+    events and shared values the worker processes use, which must come from the same context as the processes.
+
+    Returns:
+        multiprocessing.context.BaseContext: forkserver context, or the spawn context on platforms without forkserver
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+
+    return multiprocessing.get_context("forkserver")
+
+
+def warm_context(preload: list = None, models: list = None):
+    """
+    warm_context Get a multiprocessing context whose processes are forked from a server that has imported 'preload' and read the
+    model files in 'models' once, such that a new worker process is ready in a fraction of the time a spawned one needs.
+    The server is started in the background on the first call and reused afterwards. Its modules and model files are fixed when it starts,
+    so model files that are asked for later, e.g., by another watcher or after changing the model, are not preloaded but read by each worker,
+    which is warned about. On platforms without forkserver, the spawn context is returned.
+
+    Args:
+        preload (list, optional): Modules to import in the server. Defaults to None ('default_preload()').
+        models (list, optional): Model files to read in the server. Defaults to None (none).
+
+    Returns:
+        multiprocessing.context.BaseContext: Context to create worker processes with
+    """
+    context = worker_context()
+
+    if context.get_start_method() != "forkserver":
+        return context
+
+    from multiprocessing import forkserver
+
+    global _SERVER_MODELS
+    models = [str(Path(m).expanduser().resolve()) for m in models or []]
+
+    server_pid = getattr(forkserver._forkserver, "_forkserver_pid", None)
+    if server_pid is not None:
+        preloaded = _SERVER_MODELS[1] if server_pid == _SERVER_MODELS[0] else set()
+        missing = [m for m in models if m not in preloaded]
+        if len(missing) > 0:
+            warnings.warn(
+                f"The worker server runs already, so the model files {missing} are not preloaded and each worker reads them instead"
+            )
+
+    # the server reads the model files when it imports this module
+    preload = default_preload() if preload is None else list(preload)
+    if "faunanet.workers" not in preload:
+        preload.append("faunanet.workers")
+
+    old_env = os.environ.get(PRELOAD_MODELS_ENV)
+    os.environ[PRELOAD_MODELS_ENV] = os.pathsep.join(models)
+
+    try:
+        context.set_forkserver_preload(preload)
+        forkserver.ensure_running()
+    finally:
+        if old_env is None:
+            del os.environ[PRELOAD_MODELS_ENV]
+        else:
+            os.environ[PRELOAD_MODELS_ENV] = old_env
+
+    if server_pid is None:
+        _SERVER_MODELS = (
+            getattr(forkserver._forkserver, "_forkserver_pid", None),
+            set(models),
+        )
+
+    return context
+
+
+if os.environ.get(PRELOAD_MODELS_ENV):
+    preload_model_files(os.environ[PRELOAD_MODELS_ENV].split(os.pathsep))
@@ -0,0 +1,271 @@
+from pathlib import Path
+import os
+import queue
+import threading
+import traceback
+
+# 'none' leaves it to the operating system when results reach the disk, 'batch' forces them to disk once per batch of files
+# and 'file' after every file
+DURABILITY_MODES = ["none", "batch", "file"]
+
+
+def sync_paths(paths: list):
+    """
+    sync_paths Force files and the directories holding them to disk, such that the files, and renames of them, survive a crash of the host.
+
+    Args:
+        paths (list): Paths of the files
+    """
+    folders = []
+    for path in paths:
+        folder = Path(path).parent
+        if folder not in folders:
+            folders.append(folder)
+
+    for path in list(paths) + folders:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class ResultWriter:
+    """
+    ResultWriter Write results files in a background thread, such that the analysis does not wait for slow storage like SD cards or
+    network mounts. Write jobs are queued, up to 'max_pending' of them, beyond which submitting blocks until the writer has caught up.
+    The jobs that have queued up while the last batch was written are written as the next batch. Once the files of a job are on disk as
+    demanded by 'durability', its 'done' callback is called, e.g., to mark the file as completed in the journal.
+
+    Methods:
+    --------
+    submit: Queue a write job.
+    flush: Wait until all queued jobs are done.
+    start: Start the writer thread.
+    stop: Write all queued jobs and stop the writer thread.
+    stats: Number of pending and written jobs.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = 64,
+        batch_size: int = 16,
+        durability: str = "none",
+        on_error: callable = None,
+        on_idle: callable = None,
+    ):
+        """
+        __init__ Create a new ResultWriter.
+
+        Args:
+            max_pending (int, optional): Maximum number of queued jobs. Defaults to 64.
+            batch_size (int, optional): Maximum number of jobs written as one batch. Defaults to 16.
+            durability (str, optional): One of DURABILITY_MODES. Defaults to "none".
+            on_error (callable, optional): Called with the exception and its traceback when a job fails, whose 'done' callback is then not called.
+                                           Defaults to None (print the traceback).
+            on_idle (callable, optional): Called without arguments whenever all queued jobs are done. Defaults to None.
+
+        Raises:
+            ValueError: When an argument is out of range or the durability mode is unknown.
+        """
+        if max_pending < 1:
+            raise ValueError("'max_pending' must be >= 1")
+
+        if batch_size < 1:
+            raise ValueError("'batch_size' must be >= 1")
+
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"'durability' must be in {DURABILITY_MODES}")
+
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.durability = durability
+        self.on_error = on_error
+        self.on_idle = on_idle
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.condition = threading.Condition()
+        self.num_pending = 0  # submitted jobs that are not done yet
+        self.num_batches = 0
+        self.num_written = 0
+        self.num_failed = 0
+        self.thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    @property
+    def pending(self) -> int:
+        with self.condition:
+            return self.num_pending
+
+    def submit(self, write: callable, done: callable = None):
+        """
+        submit Queue a write job. Blocks while 'max_pending' jobs are queued.
+
+        Args:
+            write (callable): Called without arguments in the writer thread. Writes the files and returns their paths.
+            done (callable, optional): Called without arguments in the writer thread once the files are on disk. Defaults to None.
+
+        Raises:
+            RuntimeError: When the writer is not running.
+        """
+        if self.is_running is False:
+            raise RuntimeError("Result writer is not running")
+
+        with self.condition:
+            self.num_pending += 1
+
+        self.queue.put((write, done))
+
+    def _report(self, e: Exception):
+        """
+        _report Report a failed job.
+
+        Args:
+            e (Exception): Exception the job failed with
+        """
+        tb = traceback.format_exc()
+        if self.on_error is None:
+            print(tb)
+        else:
+            self.on_error(e, tb)
+
+    def _write_batch(self, jobs: list):
+        """
+        _write_batch Write the files of a batch of jobs, force them to disk as demanded by the durability mode and call the 'done'
+        callbacks of the jobs that succeeded.
+
+        Args:
+            jobs (list): (write, done) tuples
+        """
+        succeeded = []
+        paths = []
+
+        for write, done in jobs:
+            try:
+                written = write()
+                if self.durability == "file":
+                    sync_paths(written)
+                paths.extend(written)
+                succeeded.append(done)
+            except Exception as e:
+                self.num_failed += 1
+                self._report(e)
+
+        try:
+            if self.durability == "batch" and len(paths) > 0:
+                sync_paths(paths)
+        except Exception as e:
+            self.num_failed += len(succeeded)
+            self._report(e)
+            succeeded = []
+
+        for done in succeeded:
+            if done is None:
+                continue
+
+            try:
+                done()
+            except Exception as e:
+                self._report(e)
+
+        self.num_batches += 1
+        self.num_written += len(succeeded)
+
+    def _write_loop(self):
+        """
+        _write_loop Write batches of queued jobs until a None entry is taken.
+        """
+        is_stopped = False
+
+        while is_stopped is False:
+            jobs = [self.queue.get()]
+
+            # jobs that queued up while the last batch was written are written together
+            while len(jobs) < self.batch_size:
+                try:
+                    jobs.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in jobs:
+                is_stopped = True
+                jobs = [job for job in jobs if job is not None]
+
+                if len(jobs) == 0:
+                    break
+
+            self._write_batch(jobs)
+
+            with self.condition:
+                self.num_pending -= len(jobs)
+                is_idle = self.num_pending == 0
+                self.condition.notify_all()
+
+            if is_idle and self.on_idle is not None:
+                self.on_idle()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        flush Wait until all queued jobs are done.
+
+        Args:
+            timeout (float, optional): Maximum time in seconds to wait. Defaults to None (wait forever).
+
+        Returns:
+            bool: Whether all jobs are done
+        """
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.num_pending == 0, timeout=timeout
+            )
+
+    def start(self):
+        """
+        start Start the writer thread.
+
+        Raises:
+            RuntimeError: When the writer is already running.
+        """
+        if self.is_running:
+            raise RuntimeError("Result writer is already running")
+
+        self.thread = threading.Thread(
+            target=self._write_loop, name="result_writer", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """
+        stop Write all queued jobs and stop the writer thread.
+        """
+        if self.thread is None:
+            return
+
+        # behind all queued jobs, such that they are written first
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def stats(self) -> dict:
+        """
+        stats Number of pending and written jobs.
+
+        Returns:
+            dict: {"durability", "pending": submitted jobs that are not done, "written": jobs done, "failed": jobs whose files could not be written,
+                  "batches": number of batches, "batch_size": mean number of jobs per batch}
+        """
+        with self.condition:
+            return {
+                "durability": self.durability,
+                "pending": self.num_pending,
+                "written": self.num_written,
+                "failed": self.num_failed,
+                "batches": self.num_batches,
+                "batch_size": (
+                    (self.num_written + self.num_failed) / self.num_batches
+                    if self.num_batches > 0
+                    else 0.0
+                ),
+            }
@@ -0,0 +1,130 @@
+import pytest
+import numpy as np
+
+from faunanet.activity_gate import ActivityGate
+
+RATE = 16000
+
+
+def make_chunks():
+    rng = np.random.default_rng(42)
+    time = np.arange(0, 3 * RATE) / RATE
+    silence = 1e-5 * rng.standard_normal(len(time))
+    tone = 0.1 * np.sin(2 * np.pi * 3000 * time)
+    noise = 0.1 * rng.standard_normal(len(time))
+    rumble = 0.3 * np.sin(2 * np.pi * 50 * time)
+    return np.stack([silence, tone, noise, rumble]).astype(np.float32)
+
+
+def test_activity_gate_construction():
+    with pytest.raises(
+        ValueError,
+        match="At least one of 'min_energy_db' and 'max_flatness' must be given",
+    ):
+        ActivityGate()
+
+    with pytest.raises(ValueError, match=r"'max_flatness' must be in \[0, 1\]"):
+        ActivityGate(max_flatness=1.5)
+
+    with pytest.raises(ValueError, match="'band' must be"):
+        ActivityGate(min_energy_db=-60, band=[5000, 1000])
+
+    with pytest.raises(ValueError, match="'block_size' must be >= 1"):
+        ActivityGate(min_energy_db=-60, block_size=0)
+
+    gate = ActivityGate(min_energy_db=-60)
+    assert gate.needs_spectrum is False
+    assert gate.stats == {"chunks": 0, "skipped": 0, "skip_ratio": 0.0}
+
+
+def test_activity_gate_energy():
+    chunks = make_chunks()
+
+    gate = ActivityGate(min_energy_db=-60)
+    assert gate.evaluate(chunks, RATE).tolist() == [False, True, True, True]
+
+    # the spectral computation of the energy agrees with the time domain one
+    spectral = ActivityGate(min_energy_db=-60, band=[0, RATE / 2], block_size=3)
+    assert spectral.needs_spectrum is True
+    assert spectral.evaluate(chunks, RATE).tolist() == [False, True, True, True]
+    energy, _ = spectral._spectral_features(chunks, RATE)
+    assert energy == pytest.approx(
+        np.mean(np.square(chunks, dtype=float), axis=1), rel=1e-2
+    )
+
+    # low frequency rumble is outside of the band
+    band = ActivityGate(min_energy_db=-40, band=[1000, 8000])
+    assert band.evaluate(chunks, RATE).tolist() == [False, True, True, False]
+
+    assert gate.stats == {"chunks": 4, "skipped": 1, "skip_ratio": 0.25}
+    gate.evaluate(chunks[:2], RATE)
+    assert gate.stats == {"chunks": 6, "skipped": 2, "skip_ratio": pytest.approx(1 / 3)}
+
+    gate.reset()
+    assert gate.stats == {"chunks": 0, "skipped": 0, "skip_ratio": 0.0}
+
+
+def test_activity_gate_flatness():
+    chunks = make_chunks()
+
+    gate = ActivityGate(max_flatness=0.5)
+    _, flatness = gate._spectral_features(chunks, RATE)
+    assert flatness[1] < 0.01  # tone
+    assert flatness[2] > 0.5  # white noise
+
+    # noise fails the flatness test, silence fails the energy test
+    gate = ActivityGate(min_energy_db=-60, max_flatness=0.5, band=[1000, 8000])
+    assert gate.evaluate(chunks, RATE).tolist() == [False, True, False, False]
+
+    assert ActivityGate(max_flatness=0.5).evaluate(chunks[:0], RATE).tolist() == []
+
+
+def test_preprocessor_chunk_audio_with_gate():
+    from faunanet.preprocessor_base import PreprocessorBase
+
+    class Preprocessor(PreprocessorBase):
+        def process_audio_data(self, rawdata):
+            self.chunks = self.chunk_audio(rawdata)
+            return self.chunks
+
+    preprocessor = Preprocessor("test", sample_rate=RATE, sample_secs=3.0)
+    data = make_chunks().reshape(-1)
+
+    preprocessor.process_audio_data(data)
+    assert preprocessor.activity is None
+
+    preprocessor.gate = ActivityGate(min_energy_db=-60)
+    preprocessor.process_audio_data(data)
+    assert preprocessor.activity.tolist() == [False, True, True, True]
+
+
+def test_preprocessor_apply_gate():
+    from faunanet.preprocessor_base import PreprocessorBase
+
+    # like the hub plugins, which chunk the audio without 'chunk_audio'
+    class Preprocessor(PreprocessorBase):
+        def process_audio_data(self, rawdata):
+            self.chunks = list(rawdata.reshape(-1, int(self.sample_secs * RATE)))
+            return self.chunks
+
+    preprocessor = Preprocessor("test", sample_rate=RATE, sample_secs=3.0)
+    preprocessor.process_audio_data(make_chunks().reshape(-1))
+    preprocessor.apply_gate()
+    assert preprocessor.activity is None
+
+    preprocessor.gate = ActivityGate(min_energy_db=-60)
+    preprocessor.apply_gate()
+    assert preprocessor.activity.tolist() == [False, True, True, True]
+    assert preprocessor.gate.stats["skipped"] == 1
+
+    # an evaluation by 'chunk_audio' is kept
+    preprocessor.activity = np.ones(4, dtype=bool)
+    preprocessor.apply_gate()
+    assert preprocessor.activity.tolist() == [True] * 4
+
+    # chunks that are not raw audio are analyzed in full
+    preprocessor.activity = None
+    preprocessor.chunks = [np.zeros((2, 2), dtype=np.float32)]
+    with pytest.warns(UserWarning, match="activity gate cannot be applied"):
+        preprocessor.apply_gate()
+    assert preprocessor.activity is None
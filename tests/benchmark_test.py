@@ -0,0 +1,124 @@
+import pytest
+import threading
+import time
+import numpy as np
+
+from faunanet.benchmark import time_inference, compare_models, time_to_first_result
+
+
+class ScaledModel:
+    # minimal stand-in for a ModelBase that returns its input, scaled and shifted
+    def __init__(self, scale=1.0, shift=0.0):
+        self.scale = scale
+        self.shift = shift
+
+    def predict(self, data):
+        return [np.asarray(data) * self.scale + self.shift]
+
+
+def make_chunks():
+    return [
+        np.array([0.1, 0.9, 0.3]),
+        np.array([0.6, 0.2, 0.5]),
+        np.array([0.2, 0.1, 0.7]),
+    ]
+
+
+def test_time_inference():
+    result = time_inference(ScaledModel(), make_chunks(), repeats=2)
+
+    assert result["scores"].shape == (3, 3)
+    assert result["total_time"] >= 0
+    assert result["time_per_chunk"] == pytest.approx(result["total_time"] / 6)
+    assert result["chunks_per_second"] > 0
+
+    with pytest.raises(ValueError, match="Need at least one chunk to benchmark"):
+        time_inference(ScaledModel(), [])
+
+
+def test_compare_models():
+    chunks = make_chunks()
+
+    same = compare_models(ScaledModel(), ScaledModel(), chunks)
+    assert same["max_abs_difference"] == pytest.approx(0.0)
+    assert same["top1_agreement"] == pytest.approx(1.0)
+    assert same["detection_jaccard"] == pytest.approx(1.0)
+    assert same["speedup"] > 0
+
+    shifted = compare_models(ScaledModel(), ScaledModel(shift=-0.1), chunks)
+    assert shifted["max_abs_difference"] == pytest.approx(0.1)
+    assert shifted["mean_abs_difference"] == pytest.approx(0.1)
+    assert shifted["top1_agreement"] == pytest.approx(1.0)
+    # 0.3 drops below the threshold of 0.25, the other 4 detections remain
+    assert shifted["detection_jaccard"] == pytest.approx(4 / 5)
+
+    class WrongShape(ScaledModel):
+        def predict(self, data):
+            return [np.zeros(5)]
+
+    with pytest.raises(ValueError, match="Models produce scores of different shape"):
+        compare_models(ScaledModel(), WrongShape(), chunks)
+
+
+class FakeWatcher:
+    # stands in for a Watcher: gets ready after a delay and writes empty results for every new recording
+    def __init__(self, tmp_path, delay=0.05, fail=False):
+        self.input = tmp_path / "input"
+        self.output = tmp_path / "output"
+        self.input.mkdir()
+        self.output.mkdir()
+        self.delay = delay
+        self.fail = fail
+        self.state = "stopped"
+        self.is_running = False
+        self.starts = []
+
+    def _run(self):
+        time.sleep(self.delay)
+        self.state = "failed" if self.fail else "ready"
+        while self.is_running and self.fail is False:
+            for path in self.input.iterdir():
+                (self.output / f"results_{path.stem}.csv").touch()
+            time.sleep(0.01)
+
+    def start(self):
+        self.starts.append("start")
+        self.is_running = True
+        self.state = "starting"
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def restart(self):
+        self.starts.append("restart")
+        self.is_running = False
+        time.sleep(0.02)
+        self.start()
+
+    def wait_for_state(self, states, timeout=None):
+        deadline = time.time() + timeout
+        while self.state not in states and time.time() < deadline:
+            time.sleep(0.005)
+        return self.state in states
+
+
+def test_time_to_first_result(tmp_path):
+    recording = tmp_path / "soundscape.wav"
+    recording.write_bytes(b"RIFF")
+
+    watcher = FakeWatcher(tmp_path)
+    result = time_to_first_result(watcher, recording, timeout=10)
+    assert result["ready_time"] >= 0.05
+    assert result["first_result_time"] >= result["ready_time"]
+    assert (watcher.output / "results_soundscape.csv").is_file()
+
+    # a running watcher is restarted
+    (watcher.output / "results_soundscape.csv").unlink()
+    time_to_first_result(watcher, recording, timeout=10)
+    assert watcher.starts == ["start", "restart", "start"]
+    watcher.is_running = False
+
+    (tmp_path / "failing").mkdir()
+    failing = FakeWatcher(tmp_path / "failing", fail=True)
+    with pytest.raises(
+        RuntimeError, match="Watcher did not get ready, its state is failed"
+    ):
+        time_to_first_result(failing, recording)
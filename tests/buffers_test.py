@@ -0,0 +1,67 @@
+import pytest
+import numpy as np
+
+from faunanet.buffers import BufferPool
+
+
+def test_buffer_pool_construction():
+    pool = BufferPool()
+
+    assert pool.growth_factor == pytest.approx(1.25)
+    assert pool.buffers == {}
+    assert pool.num_allocations == 0
+    assert pool.nbytes == 0
+
+    with pytest.raises(ValueError, match="'growth_factor' must be >= 1.0"):
+        BufferPool(growth_factor=0.5)
+
+
+def test_buffer_pool_grow_only():
+    pool = BufferPool(growth_factor=1.0)
+
+    audio = pool.audio(1000)
+    assert audio.shape == (1000,)
+    assert audio.dtype == np.float32
+    assert pool.num_allocations == 1
+
+    # smaller and equal requests reuse the existing memory
+    smaller = pool.audio(500)
+    assert smaller.shape == (500,)
+    assert np.shares_memory(audio, smaller)
+    assert pool.audio(1000).base is audio.base
+    assert pool.num_allocations == 1
+
+    # larger requests grow the buffer
+    larger = pool.audio(2000)
+    assert larger.shape == (2000,)
+    assert pool.num_allocations == 2
+    assert pool.nbytes == 2000 * 4
+
+    # steady state processing of same-sized data does not allocate
+    for _ in range(10):
+        pool.audio(2000)
+        pool.chunks(20, 100)
+        pool.scores(20, 50)
+
+    assert pool.num_allocations == 4
+
+
+def test_buffer_pool_names_and_dtypes():
+    pool = BufferPool()
+
+    chunks = pool.chunks(4, 10)
+    scores = pool.scores(4, 3, dtype=np.float64)
+
+    assert chunks.shape == (4, 10)
+    assert scores.shape == (4, 3)
+    assert scores.dtype == np.float64
+    assert np.shares_memory(chunks, scores) is False
+
+    # different dtypes of the same name are different buffers
+    scores32 = pool.scores(4, 3)
+    assert scores32.dtype == np.float32
+    assert np.shares_memory(scores, scores32) is False
+    assert len(pool.buffers) == 3
+
+    pool.clear()
+    assert pool.buffers == {}
@@ -0,0 +1,164 @@
+import pytest
+import numpy as np
+import json
+import os
+import time
+
+from faunanet.cache import ResultsCache, hash_config, hash_file, hash_shedding
+
+
+def make_detections():
+    return [
+        {
+            "start": 0.0,
+            "end": 3.0,
+            "label": "Turdus merula",
+            "confidence": np.float32(0.8123),
+        },
+        {
+            "start": 3.0,
+            "end": 6.0,
+            "label": "Parus major",
+            "confidence": np.float32(0.31),
+        },
+    ]
+
+
+def make_config(**kwargs):
+    cfg = {
+        "input": "/data/input",
+        "output": "/data/output/240101_120000",
+        "model_name": "birdnet_default",
+        "Preprocessor": {"sample_rate": 48000},
+        "Model": {"num_threads": 1},
+        "Recording": {"min_conf": 0.25},
+        "SpeciesPredictor": {},
+    }
+    cfg.update(kwargs)
+    return cfg
+
+
+def test_hash_file(tmp_path):
+    first = tmp_path / "first.wav"
+    second = tmp_path / "second.wav"
+    first.write_bytes(b"abc" * 1000)
+    second.write_bytes(b"abc" * 1000)
+
+    assert hash_file(first) == hash_file(second)
+    assert hash_file(first, chunk_size=7) == hash_file(first)
+
+    second.write_bytes(b"abd" * 1000)
+    assert hash_file(first) != hash_file(second)
+
+
+def test_hash_config():
+    # input and output do not change the detections
+    assert hash_config(make_config()) == hash_config(
+        make_config(input="/other", output="/other/out")
+    )
+    assert hash_config(make_config()) != hash_config(
+        make_config(Recording={"min_conf": 0.5})
+    )
+    assert hash_config(make_config()) != hash_config(
+        make_config(model_name="birdnet_custom")
+    )
+    assert hash_config(make_config()) != hash_config(
+        make_config(Ensemble=[{"model_name": "birdnet_custom"}])
+    )
+    assert hash_config(make_config(Recording={"date": "today"})) != hash_config(
+        make_config(Recording={"date": "01/01/2020"})
+    )
+
+
+def test_hash_shedding():
+    config_hash = hash_config(make_config())
+
+    # detections of a degraded analysis get a key of their own, which depends on how far it was degraded
+    degraded = hash_shedding(config_hash, {"overlap": 0.0})
+    assert degraded != config_hash
+    assert degraded == hash_shedding(config_hash, {"overlap": 0.0})
+    assert degraded != hash_shedding(config_hash, {"overlap": 0.5})
+    assert degraded != hash_shedding(
+        config_hash, {"overlap": 0.0, "activity_gate": None}
+    )
+    assert degraded != hash_shedding(
+        hash_config(make_config(Recording={"min_conf": 0.5})), {"overlap": 0.0}
+    )
+
+
+def test_results_cache_get_put(tmp_path):
+    audio = tmp_path / "example.wav"
+    audio.write_bytes(b"\x00\x01" * 512)
+    copy = tmp_path / "copy_of_example.wav"
+    copy.write_bytes(b"\x00\x01" * 512)
+
+    cache = ResultsCache(tmp_path / "cache")
+    config_hash = hash_config(make_config())
+
+    key = cache.key(audio, "birdnet_default", config_hash)
+    assert key == cache.key(copy, "birdnet_default", config_hash)
+    assert key != cache.key(audio, "birdnet_custom", config_hash)
+
+    assert cache.get(key) is None
+    assert cache.misses == 1
+
+    cache.put(key, make_detections())
+    assert cache.num_entries == 1
+
+    results = cache.get(key)
+    assert cache.hits == 1
+    assert [d["label"] for d in results] == ["Turdus merula", "Parus major"]
+    # same representation as the numpy value, so csv files look the same
+    assert str(results[0]["confidence"]) == str(np.float32(0.8123))
+
+    # entries are visible to other instances using the same directory
+    other = ResultsCache(tmp_path / "cache")
+    assert other.num_entries == 1
+    assert other.get(key) == results
+
+    other.clear()
+    assert other.num_entries == 0
+    assert list((tmp_path / "cache").iterdir()) == []
+
+    with pytest.raises(ValueError, match="'max_size_mb' must be > 0"):
+        ResultsCache(tmp_path / "cache", max_size_mb=0)
+
+
+def test_results_cache_eviction(tmp_path):
+    entry_size = len(json.dumps(make_detections(), default=float))
+    cache = ResultsCache(tmp_path / "cache", max_size_mb=2.5 * entry_size / 1024**2)
+
+    for i in range(2):
+        cache.put(f"key_{i}", make_detections())
+        # make the order of use unambiguous regardless of file system time resolution
+        os.utime(
+            cache.directory / f"key_{i}.json",
+            (time.time() - 100 + i, time.time() - 100 + i),
+        )
+
+    # using key_0 makes key_1 the least recently used one
+    assert cache.get("key_0") is not None
+
+    cache.put("key_2", make_detections())
+
+    assert cache.num_entries == 2
+    assert cache.size <= cache.max_size
+    assert cache.get("key_1") is None
+    assert cache.get("key_0") is not None
+    assert cache.get("key_2") is not None
+
+    # the running total matches the entries on disk
+    def on_disk():
+        return sum(f.stat().st_size for f in cache.directory.glob("*.json"))
+
+    assert cache.size == on_disk()
+
+    (cache.directory / "key_0.json").unlink()
+    assert cache.get("key_0") is None
+    assert cache.size == on_disk()
+
+    assert ResultsCache(cache.directory).size == on_disk()
+
+    cache.clear()
+    assert cache.size == 0
+    assert cache.num_entries == 0
@@ -0,0 +1,217 @@
+import pytest
+import multiprocessing
+import json
+import os
+import time
+
+from faunanet.cluster import LeaseManager
+
+
+def work_through(lease_dir, input_dir, names, result_file, host_id):
+    # one watcher on one "host": claim, do the work, mark as done
+    leases = LeaseManager(lease_dir, input_dir, host_id=host_id, lease_timeout=10)
+    done = []
+    for name in names:
+        if leases.claim(name):
+            time.sleep(0.001)
+            done.append(name)
+            assert leases.complete(name) is True
+    with open(result_file, "w") as f:
+        json.dump(done, f)
+
+
+def test_lease_manager_claim_complete(tmp_path):
+    first = LeaseManager(tmp_path / "leases", tmp_path, host_id="first")
+    second = LeaseManager(tmp_path / "leases", tmp_path, host_id="second")
+
+    assert first.name_of(tmp_path / "sub" / "example.wav") == "sub/example.wav"
+    assert first.name_of("sub/example.wav") == "sub/example.wav"
+
+    assert first.claim(tmp_path / "example.wav") is True
+    # claiming twice is fine for the holder, but not for anyone else
+    assert first.claim(tmp_path / "example.wav") is True
+    assert second.claim("example.wav") is False
+
+    # giving up a lease makes the file available again
+    first.release("example.wav")
+    assert first.held == set()
+    assert second.claim("example.wav") is True
+    assert first.complete("example.wav") is False
+
+    assert second.complete("example.wav") is True
+    assert second.is_done("example.wav") is True
+    assert first.is_done("example.wav") is True
+    assert first.claim("example.wav") is False
+
+    with pytest.raises(ValueError, match="'lease_timeout' must be > 0"):
+        LeaseManager(tmp_path / "leases", tmp_path, lease_timeout=0)
+
+    with pytest.raises(
+        ValueError, match="'heartbeat_interval' must be > 0 and < 'lease_timeout'"
+    ):
+        LeaseManager(
+            tmp_path / "leases", tmp_path, lease_timeout=1, heartbeat_interval=2
+        )
+
+
+def test_lease_manager_reclaim(tmp_path):
+    dead = LeaseManager(
+        tmp_path / "leases", tmp_path, host_id="dead", lease_timeout=0.5
+    )
+    alive = LeaseManager(
+        tmp_path / "leases", tmp_path, host_id="alive", lease_timeout=0.5
+    )
+
+    assert dead.claim("example.wav") is True
+    assert alive.claim("example.wav") is False
+
+    # a renewed lease stays valid
+    time.sleep(0.3)
+    assert dead.heartbeat() == []
+    time.sleep(0.3)
+    assert alive.claim("example.wav") is False
+
+    # without renewal, the lease expires and can be taken over
+    time.sleep(0.6)
+    assert alive.claim("example.wav") is True
+
+    # the old holder finds out on its next heartbeat and cannot complete the file
+    assert dead.heartbeat() == ["example.wav"]
+    assert dead.held == set()
+    assert dead.complete("example.wav") is False
+    assert alive.complete("example.wav") is True
+
+    # only stale leases are left behind, nothing else
+    assert [p.suffix for p in (tmp_path / "leases").iterdir()] == [".done"]
+
+
+def test_lease_manager_prune(tmp_path):
+    leases = LeaseManager(tmp_path / "leases", tmp_path / "input")
+    other = LeaseManager(tmp_path / "leases", tmp_path / "input")
+    (tmp_path / "input" / "sub").mkdir(parents=True)
+    for name in ["kept.wav", "sub/deleted.wav"]:
+        (tmp_path / "input" / name).touch()
+        assert leases.claim(name) is True
+        assert leases.complete(name) is True
+
+    # markers without the name of their file are left alone
+    (tmp_path / "leases" / "legacy-0123456789abcdef.done").touch()
+
+    # nothing is pruned while the input directory is missing
+    (tmp_path / "input").rename(tmp_path / "unmounted")
+    assert other.prune() == 0
+    (tmp_path / "unmounted").rename(tmp_path / "input")
+
+    (tmp_path / "input" / "sub" / "deleted.wav").unlink()
+    assert other.prune() == 1
+    assert len(list((tmp_path / "leases").glob("*.done"))) == 2
+    assert other.prune() == 0
+
+    assert leases.prune() == 0
+    assert leases.is_done("kept.wav") is True
+    assert leases.completed == {"kept.wav", "sub/deleted.wav"}
+
+    # a file that appears again under the same name is analyzed again
+    other.completed.clear()
+    (tmp_path / "input" / "sub" / "deleted.wav").touch()
+    assert other.claim("sub/deleted.wav") is True
+
+
+def test_lease_manager_heartbeat_errors(tmp_path, monkeypatch):
+    errors = []
+    leases = LeaseManager(
+        tmp_path / "leases",
+        tmp_path,
+        lease_timeout=0.5,
+        heartbeat_interval=0.05,
+        on_error=lambda e, tb: errors.append((e, tb)),
+    )
+    assert leases.claim("moved.wav") is True
+    assert leases.claim("flaky.wav") is True
+
+    # another watcher moves the expired lease away between the owner check and the renewal,
+    # and the shared file system is briefly unavailable for the other one
+    utime = os.utime
+
+    def racing_utime(path, *args, **kwargs):
+        if "moved" in str(path):
+            raise FileNotFoundError(path)
+        if "flaky" in str(path):
+            raise OSError("Stale file handle")
+        return utime(path, *args, **kwargs)
+
+    monkeypatch.setattr("faunanet.cluster.os.utime", racing_utime)
+    assert leases.heartbeat() == ["moved.wav"]
+    assert leases.held == {"flaky.wav"}
+    assert len(errors) == 1
+    assert "Stale file handle" in errors[0][1]
+
+    # an error of a whole heartbeat does not stop the thread
+    def broken_heartbeat():
+        raise OSError("Input/output error")
+
+    monkeypatch.setattr(leases, "heartbeat", broken_heartbeat)
+    leases.start()
+    deadline = time.time() + 5
+    while len(errors) < 3:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    assert leases.is_running
+    monkeypatch.undo()
+    leases.stop()
+
+
+def test_lease_manager_heartbeat_thread(tmp_path):
+    leases = LeaseManager(
+        tmp_path / "leases", tmp_path, lease_timeout=0.5, heartbeat_interval=0.1
+    )
+    other = LeaseManager(tmp_path / "leases", tmp_path, lease_timeout=0.5)
+
+    leases.start()
+    assert leases.is_running is True
+
+    with pytest.raises(RuntimeError, match="Lease heartbeat is already running"):
+        leases.start()
+
+    assert leases.claim("example.wav") is True
+    time.sleep(1.0)
+    assert other.claim("example.wav") is False
+
+    # stopping releases all held leases
+    leases.stop()
+    assert leases.is_running is False
+    assert other.claim("example.wav") is True
+
+
+def test_lease_manager_multiple_processes(tmp_path):
+    names = [f"recording_{i}.wav" for i in range(200)]
+
+    processes = [
+        multiprocessing.Process(
+            target=work_through,
+            args=(
+                tmp_path / "leases",
+                tmp_path,
+                names,
+                tmp_path / f"done_{i}.json",
+                f"host_{i}",
+            ),
+        )
+        for i in range(4)
+    ]
+
+    for p in processes:
+        p.start()
+
+    for p in processes:
+        p.join()
+        assert p.exitcode == 0
+
+    done = []
+    for i in range(4):
+        with open(tmp_path / f"done_{i}.json", "r") as f:
+            done.extend(json.load(f))
+
+    # every file has been processed exactly once
+    assert sorted(done) == sorted(names)
+    assert len(os.listdir(tmp_path / "leases")) == len(names)
@@ -0,0 +1,196 @@
+import pytest
+import csv
+import os
+import time
+from datetime import datetime
+import numpy as np
+
+import faunanet.compaction
+from faunanet.compaction import (
+    ResultsCompactor,
+    compact_run,
+    processed_recordings,
+    read_manifest,
+    read_partition,
+)
+
+DAY = 24 * 3600
+
+
+def write_results(folder, recording, detections, modified=None):
+    path = folder / f"results_{recording}.csv"
+    with open(path, "w") as csvfile:
+        if len(detections) == 0:
+            csv.writer(csvfile).writerow([])
+        else:
+            writer = csv.DictWriter(csvfile, fieldnames=detections[0].keys())
+            writer.writeheader()
+            writer.writerows(detections)
+    if modified is not None:
+        os.utime(path, (modified, modified))
+    return path
+
+
+def detection(name, start, confidence):
+    return {
+        "common_name": name,
+        "start_time": start,
+        "end_time": start + 3.0,
+        "confidence": confidence,
+    }
+
+
+def day_of(timestamp):
+    return datetime.fromtimestamp(timestamp).date().isoformat()
+
+
+def make_run(tmp_path, name="run"):
+    folder = tmp_path / name
+    folder.mkdir()
+    (folder / "config.yml").touch()
+    return folder
+
+
+def test_compact_run(tmp_path):
+    run = make_run(tmp_path)
+    yesterday = time.time() - DAY
+    today = time.time()
+
+    write_results(
+        run, "a", [detection("Owl", 0.0, 0.9), detection("Jay", 3.0, 0.5)], yesterday
+    )
+    write_results(run, "b", [], yesterday)
+    write_results(run, "c", [detection("Owl", 6.0, 0.7)], today)
+    (run / "results_d.part.csv").touch()
+    (run / "skipped_chunks.csv").touch()
+
+    assert compact_run(run) == 3
+    assert sorted(f.name for f in run.glob("*.csv")) == [
+        "results_d.part.csv",
+        "skipped_chunks.csv",
+    ]
+
+    manifest = read_manifest(run)
+    assert manifest[day_of(yesterday)]["recordings"] == ["a", "b"]
+    assert manifest[day_of(yesterday)]["rows"] == 2
+    assert manifest[day_of(today)]["recordings"] == ["c"]
+    assert processed_recordings(run) == {"a", "b", "c"}
+
+    columns = read_partition(run, day_of(yesterday))
+    assert list(columns.keys()) == [
+        "recording",
+        "common_name",
+        "start_time",
+        "end_time",
+        "confidence",
+    ]
+    assert columns["recording"].tolist() == ["a", "a"]
+    assert columns["common_name"].tolist() == ["Owl", "Jay"]
+    assert columns["confidence"].dtype == np.float64
+    assert columns["confidence"].tolist() == [0.9, 0.5]
+
+    with pytest.raises(KeyError):
+        read_partition(run, "1999-01-01")
+
+    assert compact_run(run) == 0
+
+
+def test_compact_run_merge(tmp_path):
+    run = make_run(tmp_path)
+    yesterday = time.time() - DAY
+
+    write_results(run, "a", [detection("Owl", 0.0, 0.9)], yesterday)
+    compact_run(run)
+
+    # results added later, e.g., by a clean up, are merged into the partition of their day
+    ensemble = dict(detection("Jay", 0.0, 0.4), model="other")
+    write_results(run, "b", [ensemble], yesterday)
+    assert compact_run(run, remove_csv=False) == 1
+
+    columns = read_partition(run, day_of(yesterday))
+    assert columns["recording"].tolist() == ["b", "a"]
+    assert columns["model"].tolist() == ["other", ""]
+    assert read_manifest(run)[day_of(yesterday)]["recordings"] == ["a", "b"]
+
+    # repeating an interrupted compaction does not duplicate rows
+    assert compact_run(run) == 1
+    assert read_manifest(run)[day_of(yesterday)]["rows"] == 2
+    assert len(read_partition(run, day_of(yesterday))["recording"]) == 2
+
+    # recent results are left alone
+    write_results(run, "c", [detection("Owl", 0.0, 0.9)])
+    assert compact_run(run, min_age=60) == 0
+    assert processed_recordings(run) == {"a", "b", "c"}
+
+
+def test_results_compactor(tmp_path):
+    with pytest.raises(ValueError, match="'interval' must be > 0"):
+        ResultsCompactor(tmp_path, interval=0)
+
+    with pytest.raises(ValueError, match="'min_age' must be >= 0"):
+        ResultsCompactor(tmp_path, min_age=-1)
+
+    old = make_run(tmp_path, "old")
+    current = make_run(tmp_path, "current")
+    (tmp_path / "not_a_run").mkdir()
+    write_results(old, "a", [detection("Owl", 0.0, 0.9)])
+    write_results(current, "b", [detection("Owl", 0.0, 0.9)])
+    write_results(tmp_path / "not_a_run", "c", [detection("Owl", 0.0, 0.9)])
+
+    compactor = ResultsCompactor(tmp_path, exclude=current, min_age=0)
+    assert compactor.compact() == {str(old): 1}
+    assert (current / "results_b.csv").is_file()
+    assert (tmp_path / "not_a_run" / "results_c.csv").is_file()
+
+    write_results(old, "d", [detection("Owl", 0.0, 0.9)])
+    compactor = ResultsCompactor(tmp_path, exclude=current, interval=0.05, min_age=0)
+    compactor.start()
+    assert compactor.is_running
+
+    with pytest.raises(RuntimeError, match="Results compactor is already running"):
+        compactor.start()
+
+    start = time.time()
+    while (old / "results_d.csv").is_file():
+        assert time.time() - start < 5.0
+        time.sleep(0.01)
+
+    compactor.stop()
+    assert compactor.is_running is False
+    assert processed_recordings(old) == {"a", "d"}
+
+
+def test_results_compactor_errors(tmp_path, monkeypatch):
+    broken = make_run(tmp_path, "broken")
+    fine = make_run(tmp_path, "fine")
+    write_results(broken, "a", [detection("Owl", 0.0, 0.9)])
+    write_results(fine, "b", [detection("Owl", 0.0, 0.9)])
+
+    # e.g., a corrupt results file or a full disk
+    def failing_compact_run(folder, **kwargs):
+        if folder == broken:
+            raise OSError("No space left on device")
+        return compact_run(folder, **kwargs)
+
+    monkeypatch.setattr(faunanet.compaction, "compact_run", failing_compact_run)
+
+    errors = []
+    compactor = ResultsCompactor(
+        tmp_path, min_age=0, on_error=lambda e, tb: errors.append((e, tb))
+    )
+
+    # the broken run is reported, the others are compacted anyway
+    assert compactor.compact() == {str(fine): 1}
+    assert len(errors) == 1
+    assert isinstance(errors[0][0], OSError)
+    assert "No space left on device" in errors[0][1]
+
+    # and the background thread keeps going
+    compactor.interval = 0.05
+    compactor.start()
+    start = time.time()
+    while len(errors) < 3:
+        assert time.time() - start < 5.0
+        time.sleep(0.01)
+    assert compactor.is_running
+    compactor.stop()
@@ -13,6 +13,7 @@ from faunanet.faunanet_setup import download_example_data, download_model_files
 from .fixtures.recording_fixtures import RecordingFixture
 from .fixtures.model_fixtures import ModelFixture
 from .fixtures.watcher_fixtures import WatchFixture
+from .fixtures.stub_fixtures import StubFixture
 
 multiprocessing.set_start_method("spawn", True)
 
@@ -243,3 +244,36 @@ def watch_fx(install):
         directories["output"],
         directories["models"],
     )
+
+
+# watcher setup with a stub model that needs no downloads
+@pytest.fixture
+def stub_fx(tmp_path):
+    yield StubFixture(tmp_path)
+
+
+# writes an onnx model with a variable batch size that maps 4 inputs to 2 outputs, y = x @ ONNX_WEIGHTS
+ONNX_WEIGHTS = [[1.0, 0.0], [0.0, 1.0], [1.0, 0.0], [0.0, 1.0]]
+
+
+@pytest.fixture
+def make_onnx_model():
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    import numpy as np
+    from onnx import helper, TensorProto, numpy_helper
+
+    def make(path):
+        graph = helper.make_graph(
+            [helper.make_node("MatMul", ["x", "w"], ["y"])],
+            "sum_model",
+            [helper.make_tensor_value_info("x", TensorProto.FLOAT, ["batch", 4])],
+            [helper.make_tensor_value_info("y", TensorProto.FLOAT, ["batch", 2])],
+            [numpy_helper.from_array(np.array(ONNX_WEIGHTS, dtype=np.float32), "w")],
+        )
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+        model.ir_version = 8
+        onnx.save(model, str(path))
+        return path
+
+    yield make
@@ -0,0 +1,90 @@
+import pytest
+import importlib.util
+import subprocess
+import numpy as np
+
+import faunanet.conversion as conversion
+from faunanet.conversion import convert_to_onnx, validate_conversion
+
+
+class ScaledModel:
+    # minimal stand-in for a ModelBase that returns its input, scaled and shifted
+    def __init__(self, scale=1.0, shift=0.0):
+        self.scale = scale
+        self.shift = shift
+
+    def predict(self, data):
+        return [np.asarray(data) * self.scale + self.shift]
+
+
+def test_validate_conversion():
+    chunks = [np.array([0.1, 0.9, 0.3]), np.array([0.6, 0.2, 0.5])]
+
+    report = validate_conversion(ScaledModel(), ScaledModel(shift=1e-4), chunks)
+    assert report["agrees"] is True
+    assert report["max_abs_difference"] == pytest.approx(1e-4, rel=1e-3)
+
+    report = validate_conversion(
+        ScaledModel(), ScaledModel(shift=1e-4), chunks, atol=1e-5
+    )
+    assert report["agrees"] is False
+
+    # scores close to the threshold that end up on different sides of it
+    report = validate_conversion(
+        ScaledModel(), ScaledModel(shift=-2e-4), chunks, min_conf=0.3
+    )
+    assert report["detection_jaccard"] < 1.0
+    assert report["agrees"] is False
+
+
+def test_convert_to_onnx(tmp_path, monkeypatch):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(
+        importlib.util,
+        "find_spec",
+        lambda name: None if name == "tf2onnx" else find_spec(name),
+    )
+    with pytest.raises(ImportError, match="tf2onnx is needed"):
+        convert_to_onnx(tmp_path / "model.tflite")
+    monkeypatch.undo()
+
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: object())
+
+    with pytest.raises(ValueError, match="Model filename unknown: model.pt"):
+        convert_to_onnx(tmp_path / "model.pt")
+
+    calls = []
+
+    def run(command, **kwargs):
+        calls.append(command)
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+    monkeypatch.setattr(conversion.subprocess, "run", run)
+
+    assert convert_to_onnx(tmp_path / "model.tflite") == tmp_path / "model.onnx"
+    assert calls[-1][1:] == [
+        "-m",
+        "tf2onnx.convert",
+        "--tflite",
+        str(tmp_path / "model.tflite"),
+        "--output",
+        str(tmp_path / "model.onnx"),
+        "--opset",
+        "13",
+    ]
+
+    out = convert_to_onnx(
+        tmp_path / "saved_model.pb", tmp_path / "perch.onnx", opset=17
+    )
+    assert out == tmp_path / "perch.onnx"
+    assert calls[-1][3:5] == ["--saved-model", str(tmp_path)]
+
+    monkeypatch.setattr(
+        conversion.subprocess,
+        "run",
+        lambda command, **kwargs: subprocess.CompletedProcess(
+            command, 1, "", "unsupported op\n"
+        ),
+    )
+    with pytest.raises(RuntimeError, match="to ONNX failed: unsupported op"):
+        convert_to_onnx(tmp_path / "model.tflite")
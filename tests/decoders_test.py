@@ -0,0 +1,118 @@
+import pytest
+import numpy as np
+import soundfile as sf
+from numpy.testing import assert_array_almost_equal
+
+from faunanet.buffers import BufferPool
+from faunanet import decoders
+from faunanet.decoders import AudioDecoder, decode_soundfile, register_backend
+
+
+def sine(seconds, rate, channels=1):
+    time = np.arange(0, int(seconds * rate)) / rate
+    data = 0.5 * np.sin(2 * np.pi * 440 * time).astype(np.float32)
+    if channels == 1:
+        return data
+    return np.stack([data * (c + 1) / channels for c in range(channels)], axis=1)
+
+
+@pytest.mark.parametrize("suffix", [".wav", ".flac", ".ogg"])
+def test_decode_soundfile(tmp_path, suffix):
+    data = sine(2.0, 48000)
+    sf.write(tmp_path / f"example{suffix}", data, 48000)
+
+    decoded, rate = decode_soundfile(tmp_path / f"example{suffix}")
+    assert rate == 48000
+    assert decoded.dtype == np.float32
+    assert len(decoded) == len(data)
+
+    if suffix != ".ogg":  # lossy
+        assert_array_almost_equal(decoded, data, decimal=4)
+
+    # decoding into pooled memory only allocates once
+    pool = BufferPool()
+    for _ in range(3):
+        pooled, _ = decode_soundfile(tmp_path / f"example{suffix}", buffers=pool)
+    assert pool.num_allocations == 1
+    assert_array_almost_equal(pooled, decoded)
+
+
+def test_decode_soundfile_multichannel(tmp_path):
+    data = sine(1.5, 16000, channels=2)
+    sf.write(tmp_path / "stereo.flac", data, 16000)
+
+    # blocks smaller than the file exercise the block-wise mixdown
+    decoded, rate = decode_soundfile(tmp_path / "stereo.flac", block_frames=1000)
+    assert rate == 16000
+    assert decoded.shape == (len(data),)
+    assert_array_almost_equal(decoded, data.mean(axis=1), decimal=4)
+
+
+def test_audio_decoder_backends(tmp_path):
+    decoder = AudioDecoder()
+    assert decoder.backends_for("a.wav") == ["soundfile", "librosa"]
+    assert decoder.backends_for("a.FLAC") == ["soundfile", "librosa"]
+    assert decoder.backends_for("a.m4a") == ["librosa"]
+
+    decoder = AudioDecoder(backends={".wav": ["librosa"]})
+    assert decoder.backends_for("a.wav") == ["librosa"]
+
+    with pytest.raises(ValueError, match="Unknown decoder backend ffmpeg"):
+        AudioDecoder(backends={".wav": ["ffmpeg"]})
+
+
+def test_audio_decoder_decode(tmp_path, monkeypatch):
+    sf.write(tmp_path / "example.wav", sine(2.0, 32000), 32000)
+    sf.write(tmp_path / "example.flac", sine(1.0, 48000), 48000)
+
+    decoder = AudioDecoder()
+    data, rate = decoder.decode(tmp_path / "example.wav")
+    assert rate == 32000
+    assert len(data) == 64000
+    decoder.decode(tmp_path / "example.wav")
+    decoder.decode(tmp_path / "example.flac")
+
+    stats = decoder.stats
+    assert set(stats.keys()) == {".wav", ".flac"}
+    assert stats[".wav"]["files"] == 2
+    assert stats[".wav"]["backend"] == "soundfile"
+    assert stats[".wav"]["audio_seconds"] == pytest.approx(4.0)
+    assert stats[".flac"]["audio_seconds"] == pytest.approx(1.0)
+    assert stats[".wav"]["megabytes"] > stats[".flac"]["megabytes"] > 0
+    assert stats[".wav"]["realtime_factor"] > 0
+    assert stats[".wav"]["megabytes_per_second"] > 0
+
+    with pytest.raises(FileNotFoundError):
+        decoder.decode(tmp_path / "missing.wav")
+
+    # a failing backend falls back to the next one for the format
+    def broken(path, buffers=None):
+        raise RuntimeError("broken backend")
+
+    monkeypatch.setitem(decoders.BACKENDS, "broken", broken)
+    monkeypatch.setitem(decoders.FORMAT_BACKENDS, ".wav", ["broken", "soundfile"])
+
+    decoder = AudioDecoder()
+    data, rate = decoder.decode(tmp_path / "example.wav")
+    assert len(data) == 64000
+    assert decoder.stats[".wav"]["backend"] == "soundfile"
+
+    # the error of the last backend is raised when all of them fail
+    decoder = AudioDecoder(backends={".wav": ["broken"]})
+    with pytest.raises(RuntimeError, match="broken backend"):
+        decoder.decode(tmp_path / "example.wav")
+
+
+def test_register_backend(monkeypatch):
+    monkeypatch.setattr(decoders, "BACKENDS", dict(decoders.BACKENDS))
+    monkeypatch.setattr(decoders, "FORMAT_BACKENDS", dict(decoders.FORMAT_BACKENDS))
+
+    def custom(path, buffers=None):
+        return np.zeros(10, dtype=np.float32), 10
+
+    register_backend("custom", custom, [".m4a", ".WAV"])
+    assert AudioDecoder().backends_for("a.m4a") == ["custom", "librosa"]
+    assert AudioDecoder().backends_for("a.wav") == ["custom", "soundfile", "librosa"]
+
+    register_backend("custom", custom, [".wav"], first=False)
+    assert AudioDecoder().backends_for("a.wav") == ["soundfile", "librosa", "custom"]
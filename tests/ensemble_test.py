@@ -0,0 +1,99 @@
+import pytest
+from types import SimpleNamespace
+import numpy as np
+import soundfile as sf
+
+from faunanet.ensemble import SharedDecoder
+from faunanet.preprocessor_base import AudioFormatError
+
+
+def make_processor(sample_rate, resample_type="kaiser_fast"):
+    return SimpleNamespace(
+        sample_rate=sample_rate,
+        resample_type=resample_type,
+        actual_sampling_rate=None,
+        duration=None,
+    )
+
+
+@pytest.fixture()
+def audiofile(tmp_path):
+    path = tmp_path / "example.wav"
+    time = np.arange(0, 2 * 48000) / 48000
+    sf.write(path, 0.5 * np.sin(2 * np.pi * 440 * time), 48000)
+    return path
+
+
+def test_shared_decoder_read(audiofile):
+    decoder = SharedDecoder()
+    assert decoder.has(audiofile) is False
+
+    native = make_processor(48000)
+    low = make_processor(16000)
+    low_again = make_processor(16000)
+
+    data_native = decoder.read(str(audiofile), native)
+    assert decoder.has(audiofile) is True
+    assert len(data_native) == 2 * 48000
+    assert native.actual_sampling_rate == 48000
+    assert native.duration == pytest.approx(2.0)
+
+    data_low = decoder.read(str(audiofile), low)
+    data_low_again = decoder.read(str(audiofile), low_again)
+
+    assert len(data_low) == 2 * 16000
+    assert data_low is data_low_again
+    assert low_again.actual_sampling_rate == 16000
+    assert low_again.duration == pytest.approx(2.0)
+
+    # decoded once, resampled once for the one rate that differs from the native one
+    assert decoder.num_decodes == 1
+    assert decoder.num_resamples == 1
+
+    # a different resample type needs its own resampling
+    decoder.read(str(audiofile), make_processor(16000, resample_type="soxr_hq"))
+    assert decoder.num_resamples == 2
+
+
+def test_shared_decoder_release(audiofile, tmp_path):
+    decoder = SharedDecoder()
+    decoder.read(audiofile, make_processor(48000))
+    decoder.release()
+
+    assert decoder.has(audiofile) is False
+    assert decoder.resampled == {}
+
+    decoder.read(audiofile, make_processor(48000))
+    assert decoder.num_decodes == 2
+
+    other = tmp_path / "other.wav"
+    sf.write(other, np.zeros(4800), 48000)
+    decoder.read(other, make_processor(48000))
+    assert decoder.has(other) is True
+    assert decoder.has(audiofile) is False
+    assert decoder.num_decodes == 3
+
+    broken = tmp_path / "broken.wav"
+    broken.write_text("this is not audio")
+    with pytest.raises(AudioFormatError):
+        decoder.read(broken, make_processor(48000))
+
+    with pytest.raises(FileNotFoundError):
+        decoder.read(tmp_path / "missing.wav", make_processor(48000))
+
+
+def test_shared_decoder_modified_file(audiofile):
+    decoder = SharedDecoder()
+    decoder.read(audiofile, make_processor(48000))
+    assert decoder.has(audiofile) is True
+
+    # a recording written again under the same name is decoded again
+    sf.write(audiofile, np.zeros(4800), 48000)
+    assert decoder.has(audiofile) is False
+
+    data = decoder.read(audiofile, make_processor(48000))
+    assert len(data) == 4800
+    assert decoder.num_decodes == 2
+
+    audiofile.unlink()
+    assert decoder.has(audiofile) is False
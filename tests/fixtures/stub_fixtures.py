@@ -0,0 +1,30 @@
+from pathlib import Path
+import shutil
+import numpy as np
+import soundfile as sf
+from faunanet import Watcher
+
+
+class StubFixture:
+    # a watcher setup with the stub model of 'stub_model', which runs without downloaded models or example data
+
+    def __init__(self, home: Path):
+        self.home = Path(home)
+        self.input = self.home / "input"
+        self.output = self.home / "output"
+        self.models = self.home / "models"
+        self.input.mkdir(parents=True, exist_ok=True)
+        self.output.mkdir(parents=True, exist_ok=True)
+        shutil.copytree(Path(__file__).parent / "stub_model", self.models / "stub")
+
+    def write_wav(self, path: Path, secs: float = 2.0, amplitude: float = 0.8) -> Path:
+        # written elsewhere and moved in, such that the watcher sees complete files only
+        path = Path(path)
+        tmp = self.home / path.name
+        sf.write(tmp, amplitude * np.ones(int(secs * 8000), dtype=np.float32), 8000)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(tmp, path)
+        return path
+
+    def make_watcher(self, **kwargs) -> Watcher:
+        return Watcher(self.input, self.output, self.models, "stub", **kwargs)
@@ -0,0 +1,28 @@
+from pathlib import Path
+import time
+import numpy as np
+from faunanet.model_base import ModelBase
+
+
+class Model(ModelBase):
+    # stands in for a downloaded model: scores each chunk by its peak amplitude, without loading a model file
+    def __init__(
+        self, model_path: str, fail: bool = False, delay: float = 0.0, **kwargs
+    ):
+        self.fail = fail
+        self.delay = delay
+        super().__init__(
+            "stub",
+            model_path=str(Path(model_path) / "model.stub"),
+            labels_path=str(Path(model_path) / "labels.txt"),
+            **kwargs,
+        )
+
+    def load_model(self):
+        self.model = None
+
+    def predict(self, data: np.array) -> list:
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("Stub model failed")
+        return [np.array([float(np.abs(data).max()), 0.5])]
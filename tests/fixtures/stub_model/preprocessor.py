@@ -0,0 +1,19 @@
+from faunanet.preprocessor_base import PreprocessorBase
+
+
+class Preprocessor(PreprocessorBase):
+    # cuts the audio into one second chunks at a low sample rate
+    def __init__(
+        self,
+        sample_rate: int = 8000,
+        sample_secs: float = 1.0,
+        overlap: float = 0.0,
+        **kwargs,
+    ):
+        super().__init__(
+            "stub", sample_rate=sample_rate, sample_secs=sample_secs, overlap=overlap
+        )
+
+    def process_audio_data(self, rawdata):
+        self.chunks = self.chunk_audio(rawdata)
+        return self.chunks
@@ -0,0 +1,252 @@
+import pytest
+import json
+import os
+import time
+
+from faunanet.journal import (
+    ProcessingJournal,
+    count_events,
+    has_checkpoint,
+    read_journal,
+    replay_journal,
+    journal_limits,
+    unfinished_files,
+)
+
+
+def make_files(tmp_path, number):
+    files = []
+    for i in range(number):
+        f = tmp_path / f"example_{i}.wav"
+        f.write_bytes(b"\x00" * 16)
+        files.append(str(f))
+    return files
+
+
+def test_journal_record(tmp_path, mocker):
+    fsync = mocker.spy(os, "fsync")
+    files = make_files(tmp_path, 2)
+
+    journal = ProcessingJournal(
+        tmp_path / "journal.log", sync_every=3, sync_interval=100
+    )
+    assert journal.is_open is True
+
+    journal.enqueued(files[0])
+    journal.started(files[0])
+    assert fsync.call_count == 0
+
+    # synced in batches
+    journal.completed(files[0])
+    assert fsync.call_count == 1
+
+    journal.enqueued(files[1])
+    journal.close()
+    assert fsync.call_count == 2
+    assert journal.is_open is False
+
+    with open(tmp_path / "journal.log", "r") as f:
+        entries = [json.loads(line) for line in f]
+
+    assert [e["event"] for e in entries] == [
+        "enqueued",
+        "started",
+        "completed",
+        "enqueued",
+    ]
+    assert entries[0]["ctime"] == pytest.approx(os.stat(files[0]).st_ctime)
+
+    with pytest.raises(RuntimeError, match="Journal has been closed"):
+        journal.started(files[1])
+
+    with pytest.raises(ValueError, match="Unknown journal event"):
+        ProcessingJournal(tmp_path / "other.log").record("finished", files[0])
+
+    with pytest.raises(ValueError, match="'sync_every' must be >= 1"):
+        ProcessingJournal(tmp_path / "other.log", sync_every=0)
+
+    with pytest.raises(ValueError, match="'sync_interval' must be > 0"):
+        ProcessingJournal(tmp_path / "other.log", sync_interval=0)
+
+
+def test_journal_sync_interval(tmp_path, mocker):
+    fsync = mocker.spy(os, "fsync")
+    files = make_files(tmp_path, 1)
+
+    journal = ProcessingJournal(
+        tmp_path / "journal.log", sync_every=100, sync_interval=0.1
+    )
+
+    # the last record is synced although no further records follow
+    journal.enqueued(files[0])
+    journal.started(files[0])
+    assert fsync.call_count == 0
+
+    deadline = time.time() + 5
+    while fsync.call_count == 0:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+    assert fsync.call_count == 1
+    assert journal.unsynced == 0
+    assert journal.timer is None
+
+    # nothing left to sync
+    journal.close()
+    assert fsync.call_count == 1
+
+
+def test_journal_replay(tmp_path):
+    files = make_files(tmp_path, 4)
+
+    journal = ProcessingJournal(tmp_path / "journal.log")
+    for f in files:
+        journal.enqueued(f)
+    journal.started(files[0])
+    journal.completed(files[0])
+    journal.started(files[1])
+    journal.record("skipped", files[3])
+    journal.close()
+
+    # simulate a crash in the middle of writing a record
+    with open(tmp_path / "journal.log", "a") as f:
+        f.write('{"event": "completed", "fi')
+
+    replayed = replay_journal(tmp_path / "journal.log")
+    assert list(replayed.keys()) == files
+    assert [s["event"] for s in replayed.values()] == [
+        "completed",
+        "started",
+        "enqueued",
+        "skipped",
+    ]
+
+    assert unfinished_files([tmp_path / "journal.log"]) == files[1:3]
+
+    # a continued journal appends
+    journal = ProcessingJournal(tmp_path / "journal.log")
+    journal.completed(files[1])
+    journal.close()
+    assert unfinished_files([tmp_path / "journal.log"]) == files[2:3]
+
+
+def test_read_journal(tmp_path):
+    files = make_files(tmp_path, 2)
+    path = tmp_path / "journal.log"
+
+    journal = ProcessingJournal(path)
+    journal.started(files[0])
+    journal.completed(files[0])
+    journal.sync()
+
+    entries, offset = read_journal(path)
+    assert [(e["event"], e["file"]) for e in entries] == [
+        ("started", files[0]),
+        ("completed", files[0]),
+    ]
+    assert offset == path.stat().st_size
+    assert read_journal(path, offset) == ([], offset)
+
+    # a partially written record is read once it is complete
+    with open(path, "a") as f:
+        f.write('{"event": "started", ')
+    assert read_journal(path, offset) == ([], offset)
+
+    with open(path, "a") as f:
+        f.write(f'"file": "{files[1]}"}}\n')
+    entries, offset = read_journal(path, offset)
+    assert [(e["event"], e["file"]) for e in entries] == [("started", files[1])]
+    assert offset == path.stat().st_size
+    journal.close()
+
+
+def test_journal_across_runs(tmp_path):
+    files = make_files(tmp_path, 3)
+
+    first = ProcessingJournal(tmp_path / "first.log")
+    for f in files:
+        first.enqueued(f)
+    first.started(files[0])
+    first.completed(files[0])
+    first.started(files[1])
+    first.close()
+
+    # the next run resumes the unfinished files
+    second = ProcessingJournal(tmp_path / "second.log")
+    second.enqueued(files[1], resumed=True)
+    second.started(files[1])
+    second.completed(files[1])
+    second.close()
+
+    journals = [tmp_path / "first.log", tmp_path / "second.log"]
+    assert unfinished_files(journals) == files[2:]
+
+    limits = journal_limits(tmp_path / "first.log")
+    assert limits["first"] == int(os.stat(files[0]).st_ctime)
+    assert limits["last"] == int(os.stat(files[0]).st_ctime)
+
+    # resumed files do not count towards the time window of a run
+    assert journal_limits(tmp_path / "second.log") == {"first": 0, "last": 0}
+
+
+def test_journal_checkpoint(tmp_path):
+    files = make_files(tmp_path, 3)
+
+    first = ProcessingJournal(tmp_path / "first.log")
+    for f in files[:2]:
+        first.enqueued(f)
+    first.close()
+
+    second = ProcessingJournal(tmp_path / "second.log")
+    second.enqueued(files[1], resumed=True)
+    assert has_checkpoint(tmp_path / "second.log") is False
+
+    # files of earlier journals that have not been carried over are no longer unfinished
+    second.checkpoint()
+    second.enqueued(files[2])
+    second.close()
+    assert has_checkpoint(tmp_path / "second.log") is True
+
+    journals = [tmp_path / "first.log", tmp_path / "second.log"]
+    assert unfinished_files(journals) == files[1:]
+    assert list(replay_journal(tmp_path / "second.log").keys()) == files[1:]
+
+    with pytest.raises(RuntimeError, match="Journal has been closed"):
+        second.checkpoint()
+
+
+def test_failed_and_quarantined_files(tmp_path):
+    files = make_files(tmp_path, 2)
+
+    journal = ProcessingJournal(tmp_path / "journal.log")
+    for f in files:
+        journal.enqueued(f)
+        journal.started(f)
+    journal.record("failed", files[0])
+    journal.record("failed", files[1])
+    journal.record("quarantined", files[1])
+    journal.close()
+
+    # failed files are analyzed again, quarantined ones are not
+    assert unfinished_files([tmp_path / "journal.log"]) == files[:1]
+
+    # failures add up over the journals of several runs
+    other = ProcessingJournal(tmp_path / "other.log")
+    other.started(files[0])
+    other.record("failed", files[0])
+    other.close()
+
+    # neither incomplete lines nor lines that are no records count
+    with open(tmp_path / "other.log", "a") as f:
+        f.write('{"time": 1.0}\n[1, 2]\n{"event": "fail')
+
+    assert replay_journal(tmp_path / "other.log") == {
+        files[0]: {"event": "failed", "ctime": None, "resumed": False}
+    }
+
+    assert count_events(
+        [tmp_path / "journal.log", tmp_path / "other.log"], "failed"
+    ) == {
+        files[0]: 2,
+        files[1]: 1,
+    }
@@ -0,0 +1,88 @@
+import pytest
+import time
+
+from faunanet.load_shedding import LoadShedder, SHEDDING_STEPS
+
+
+def test_load_shedder_exceptions():
+    with pytest.raises(ValueError, match="'low_water' must be >= 0 and < 'high_water'"):
+        LoadShedder(high_water=2, low_water=2)
+
+    with pytest.raises(ValueError, match="'min_realtime_factor' must be > 0"):
+        LoadShedder(min_realtime_factor=0)
+
+    with pytest.raises(ValueError, match="'hold' must be >= 0"):
+        LoadShedder(hold=-1)
+
+    with pytest.raises(ValueError, match="'smoothing' must be > 0 and <= 1"):
+        LoadShedder(smoothing=0)
+
+    with pytest.raises(ValueError, match="Unknown shedding step faster"):
+        LoadShedder(steps=["overlap", "faster"])
+
+    with pytest.raises(ValueError, match="Shedding steps must not repeat"):
+        LoadShedder(steps=["overlap", "overlap"])
+
+
+def test_load_shedder_queue_depth():
+    shedder = LoadShedder(high_water=5, low_water=1, hold=0)
+    assert shedder.steps == SHEDDING_STEPS
+
+    # steps are taken one at a time while the queue stays long
+    assert shedder.update(4) is None
+    levels = [shedder.update(depth)["level"] for depth in [5, 8, 6, 7]]
+    assert levels == [1, 2, 3, 4]
+    assert shedder.active_steps == SHEDDING_STEPS
+    assert shedder.update(9) is None
+
+    # between the marks, nothing changes
+    assert shedder.update(3) is None
+    assert shedder.is_active("skip")
+
+    # and they are reverted in reverse order once it has drained
+    decision = shedder.update(1)
+    assert decision["action"] == "revert"
+    assert decision["step"] == "skip"
+    assert decision["queue_depth"] == 1
+    assert shedder.is_active("skip") is False
+    assert shedder.is_active("fallback_model")
+
+    for _ in range(3):
+        shedder.update(0)
+    assert shedder.level == 0
+    assert shedder.update(0) is None
+
+    assert [d["action"] for d in shedder.decisions] == ["degrade"] * 4 + ["revert"] * 4
+
+
+def test_load_shedder_realtime_factor():
+    shedder = LoadShedder(
+        high_water=10,
+        low_water=1,
+        min_realtime_factor=2.0,
+        smoothing=0.5,
+        hold=0,
+        steps=["overlap", "activity_gate"],
+    )
+
+    # slow analysis only counts while files are waiting
+    assert shedder.update(1, realtime_factor=1.0) is None
+    decision = shedder.update(2, realtime_factor=1.0)
+    assert decision["step"] == "overlap"
+    assert decision["realtime_factor"] == 1.0
+
+    # the factor is smoothed
+    assert shedder.update(2, realtime_factor=5.0) is None
+    assert shedder.realtime_factor == 3.0
+    assert shedder.level == 1
+
+
+def test_load_shedder_hold():
+    shedder = LoadShedder(high_water=2, low_water=0, hold=0.2)
+
+    assert shedder.update(3)["level"] == 1
+    assert shedder.update(3) is None
+    assert shedder.update(0) is None
+
+    time.sleep(0.25)
+    assert shedder.update(3)["level"] == 2
@@ -4,6 +4,14 @@ import operator
 from birdnetlib.analyzer import AnalyzerConfigurationError
 from pathlib import Path
 from pandas.testing import assert_frame_equal
+from types import SimpleNamespace
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+import sys
+import faunanet.utils
+from faunanet.model_base import ModelBase, TFLiteModelBase
+from faunanet.buffers import BufferPool
 
 pd.set_option("display.max_columns", None)
 
@@ -183,3 +191,289 @@ def test_google_model_predict(model_fx):
         check_exact=False,
         atol=1e-2,
     )
+
+
+class DummyModel(ModelBase):
+    # model that does not need a model file to be loaded and returns fixed scores
+    def load_model(self):
+        self.model = None
+
+    def predict(self, data):
+        return np.array([[0.1, 0.9, 0.5, 0.9]], dtype=np.float32) * data[0]
+
+
+def test_model_analyze_recording_with_buffers(tmp_path):
+    (tmp_path / "model.tflite").touch()
+    with open(tmp_path / "labels.txt", "w") as lfile:
+        lfile.write("a\nb\nc\nd\n")
+
+    model = DummyModel("dummy", tmp_path / "model.tflite", tmp_path / "labels.txt")
+
+    assert model.buffers is None
+    assert model._filter_predictions(np.array([0.1, 0.9, 0.5, 0.9]), 0.3) == [
+        ("b", pytest.approx(0.9)),
+        ("d", pytest.approx(0.9)),
+        ("c", pytest.approx(0.5)),
+    ]
+
+    recording = SimpleNamespace(
+        processor=SimpleNamespace(
+            sample_secs=3.0, overlap=0.0, chunks=np.ones((2, 10), dtype=np.float32)
+        ),
+        minimum_confidence=0.4,
+    )
+
+    model.buffers = BufferPool()
+
+    for _ in range(3):
+        model.analyze_recording(recording)
+
+    assert model.buffers.num_allocations == 1
+    assert list(model.results.keys()) == [(0, 3.0), (3.0, 6.0)]
+    assert [label for label, _ in model.results[(0, 3.0)]] == ["b", "d", "c"]
+
+
+def test_model_analyze_recording_with_activity(tmp_path):
+    (tmp_path / "model.tflite").touch()
+    with open(tmp_path / "labels.txt", "w") as lfile:
+        lfile.write("a\nb\nc\nd\n")
+
+    model = DummyModel("dummy", tmp_path / "model.tflite", tmp_path / "labels.txt")
+    assert model.skipped == []
+
+    calls = []
+    predict = model.predict
+    model.predict = lambda data: calls.append(data) or predict(data)
+
+    recording = SimpleNamespace(
+        processor=SimpleNamespace(
+            sample_secs=3.0,
+            overlap=0.0,
+            chunks=np.ones((3, 10), dtype=np.float32),
+            activity=np.array([True, False, True]),
+        ),
+        minimum_confidence=0.4,
+    )
+
+    model.analyze_recording(recording)
+
+    # the inactive chunk is not run through the model
+    assert len(calls) == 2
+    assert list(model.results.keys()) == [(0, 3.0), (3.0, 6.0), (6.0, 9.0)]
+    assert model.results[(3.0, 6.0)] == []
+    assert [label for label, _ in model.results[(6.0, 9.0)]] == ["b", "d", "c"]
+    assert model.skipped == [(3.0, 6.0)]
+
+
+class FakeTFLiteInterpreter:
+    # stands in for a tflite interpreter whose model outputs the sum and the maximum of each input row
+    def __init__(self, dtype=np.float32, quantization=(0.0, 0)):
+        self.dtype = dtype
+        self.quantization = quantization
+        self.shape = [1, 4]
+        self.allocations = 0
+        self.invocations = 0
+        self.input = None
+        self.output = None
+
+    def get_input_details(self):
+        return [
+            {
+                "index": 3,
+                "shape": np.array(self.shape),
+                "dtype": self.dtype,
+                "quantization": self.quantization,
+            }
+        ]
+
+    def get_output_details(self):
+        return [{"index": 7, "dtype": np.float32, "quantization": (0.0, 0)}]
+
+    def resize_tensor_input(self, index, shape):
+        assert index == 3
+        self.shape = list(shape)
+
+    def allocate_tensors(self):
+        self.allocations += 1
+        self.input = np.zeros(self.shape, dtype=self.dtype)
+
+    def tensor(self, index):
+        assert index == 3
+        return lambda: self.input
+
+    def invoke(self):
+        # like tflite, refuse to run while a view of the input buffer is held
+        if sys.getrefcount(self.input) > 2:
+            raise RuntimeError("There is at least 1 reference to internal data")
+        self.invocations += 1
+        data = self.input.astype(np.float32)
+        self.output = np.stack([data.sum(axis=1), data.max(axis=1)], axis=1)
+
+    def get_tensor(self, index):
+        assert index == 7
+        return self.output.copy()
+
+
+class SumModel(TFLiteModelBase):
+    def postprocess(self, output):
+        return output / 10.0
+
+
+def make_tflite_model(tmp_path, monkeypatch, interpreter, **kwargs):
+    (tmp_path / "model.tflite").touch()
+    with open(tmp_path / "labels.txt", "w") as lfile:
+        lfile.write("sum\nmax\n")
+
+    options = []
+    monkeypatch.setattr(
+        faunanet.utils,
+        "load_model_from_file_tflite",
+        lambda path, num_threads, use_xnnpack: options.append(
+            (num_threads, use_xnnpack)
+        )
+        or interpreter,
+    )
+    model = SumModel(
+        "sum", tmp_path / "model.tflite", tmp_path / "labels.txt", **kwargs
+    )
+    return model, options
+
+
+def test_tflite_model_predict(tmp_path, monkeypatch):
+    with pytest.raises(ValueError, match="'batch_size' must be >= 1"):
+        make_tflite_model(tmp_path, monkeypatch, FakeTFLiteInterpreter(), batch_size=0)
+
+    interpreter = FakeTFLiteInterpreter()
+    model, options = make_tflite_model(
+        tmp_path, monkeypatch, interpreter, num_threads=3, use_xnnpack=False
+    )
+    assert options == [(3, False)]
+    assert model.input_layer_index == 3
+    assert model.output_layer_index == 7
+    assert model.input_shape == [1, 4]
+    assert model.is_quantized is False
+    assert interpreter.allocations == 1
+
+    chunk = np.array([1.0, 2.0, 3.0, 4.0])
+    assert_array_almost_equal(model.predict(chunk), [[1.0, 0.4]])
+    assert interpreter.allocations == 1
+
+    # a batch resizes the input once
+    batch = np.stack([chunk, 2 * chunk, 3 * chunk])
+    assert_array_almost_equal(
+        model.predict(batch), [[1.0, 0.4], [2.0, 0.8], [3.0, 1.2]]
+    )
+    assert_array_almost_equal(model.predict(list(batch)), model.predict(batch))
+    assert interpreter.allocations == 2
+    assert interpreter.shape == [3, 4]
+
+
+def test_tflite_model_analyze_recording(tmp_path, monkeypatch):
+    interpreter = FakeTFLiteInterpreter()
+    model, _ = make_tflite_model(tmp_path, monkeypatch, interpreter, batch_size=2)
+
+    chunks = np.arange(20, dtype=np.float32).reshape(5, 4) / 20.0
+    recording = SimpleNamespace(
+        processor=SimpleNamespace(
+            sample_secs=3.0,
+            overlap=0.0,
+            chunks=chunks,
+            activity=np.array([True, True, False, True, True]),
+        ),
+        minimum_confidence=0.02,
+    )
+
+    for _ in range(2):
+        model.analyze_recording(recording)
+
+    # four active chunks in two batches per recording, and a single resize
+    assert interpreter.invocations == 4
+    assert interpreter.allocations == 2
+    assert interpreter.shape == [2, 4]
+    assert model.skipped == [(6.0, 9.0)]
+    assert model.results[(6.0, 9.0)] == []
+    assert model.results[(0, 3.0)] == [("sum", pytest.approx(0.03))]
+    assert [label for label, _ in model.results[(12.0, 15.0)]] == ["sum", "max"]
+    assert model.results[(12.0, 15.0)][0][1] == pytest.approx(chunks[4].sum() / 10)
+
+
+def test_tflite_model_quantized_input(tmp_path, monkeypatch):
+    interpreter = FakeTFLiteInterpreter(dtype=np.int8, quantization=(0.5, 0))
+    model, _ = make_tflite_model(tmp_path, monkeypatch, interpreter)
+
+    assert model.is_quantized is True
+    assert model.input_quantization == (0.5, 0, np.int8)
+
+    scores = model.predict(np.array([1.0, 2.0, 0.5, 100.0]))
+    assert interpreter.input.tolist() == [[2, 4, 1, 127]]
+    assert_array_almost_equal(scores, [[13.4, 12.7]])
+
+
+class CallModel(ModelBase):
+    def predict(self, data):
+        return self.model(np.array([data], dtype=np.float32))
+
+
+def test_model_backend(tmp_path, make_onnx_model):
+    (tmp_path / "model.tflite").touch()
+    make_onnx_model(tmp_path / "model.onnx")
+    with open(tmp_path / "labels.txt", "w") as lfile:
+        lfile.write("sum\nmax\n")
+
+    with pytest.raises(ValueError, match="Unknown model backend torch"):
+        DummyModel(
+            "dummy", tmp_path / "model.tflite", tmp_path / "labels.txt", backend="torch"
+        )
+
+    # the backend is found from the model file
+    model = CallModel("call", tmp_path / "model.onnx", tmp_path / "labels.txt")
+    assert model.backend == "onnx"
+    assert_array_almost_equal(model.predict(np.ones(4)), [[2.0, 2.0]])
+
+    # or selected in the config, which uses the model file of the backend
+    model = CallModel(
+        "call", tmp_path / "model.tflite", tmp_path / "labels.txt", backend="onnx"
+    )
+    assert model.model_path == str(tmp_path / "model.onnx")
+    assert model.backend == "onnx"
+
+
+def test_tflite_model_onnx_backend(tmp_path, make_onnx_model):
+    (tmp_path / "model.tflite").touch()
+    make_onnx_model(tmp_path / "model.onnx")
+    with open(tmp_path / "labels.txt", "w") as lfile:
+        lfile.write("sum\nmax\n")
+
+    with pytest.raises(ValueError, match="must be in 'tflite', 'onnx'"):
+        SumModel(
+            "sum",
+            tmp_path / "model.tflite",
+            tmp_path / "labels.txt",
+            backend="saved_model",
+        )
+
+    model = SumModel(
+        "sum",
+        tmp_path / "model.tflite",
+        tmp_path / "labels.txt",
+        backend="onnx",
+        batch_size=2,
+    )
+    assert model.input_shape == [1, 4]
+
+    chunks = np.arange(12, dtype=np.float32).reshape(3, 4)
+    assert_array_almost_equal(
+        model.predict(chunks), [[0.2, 0.4], [1.0, 1.2], [1.8, 2.0]]
+    )
+
+    recording = SimpleNamespace(
+        processor=SimpleNamespace(sample_secs=3.0, overlap=0.0, chunks=chunks),
+        minimum_confidence=1.1,
+    )
+    model.analyze_recording(recording)
+    assert model.results[(0, 3.0)] == []
+    assert model.results[(3.0, 6.0)] == [("max", pytest.approx(1.2))]
+    assert model.results[(6.0, 9.0)] == [
+        ("max", pytest.approx(2.0)),
+        ("sum", pytest.approx(1.8)),
+    ]
@@ -108,3 +108,76 @@ def test_preprocessor_processing_google(preprocessor_fx):
 
 
 # README: no exception test because every OS throws a different exception...
+
+
+def test_preprocessor_chunk_audio():
+    from faunanet.preprocessor_base import PreprocessorBase
+    from faunanet.buffers import BufferPool
+
+    class Preprocessor(PreprocessorBase):
+        def process_audio_data(self, rawdata):
+            self.chunks = self.chunk_audio(rawdata)
+            return self.chunks
+
+    preprocessor = Preprocessor("test", sample_rate=10, sample_secs=3.0, overlap=1.0)
+
+    data = np.arange(1, 75, dtype=np.float32)  # 7.4 seconds
+
+    chunks = preprocessor.process_audio_data(data)
+
+    # chunks start every 2 seconds, the remaining 1.4 seconds are dropped
+    assert chunks.shape == (3, 30)
+    assert_array_almost_equal(chunks[0], data[0:30])
+    assert_array_almost_equal(chunks[1], data[20:50])
+    assert_array_almost_equal(chunks[2], data[40:70])
+
+    chunks = preprocessor.chunk_audio(data, pad=False)
+    assert chunks.shape == (3, 30)
+
+    chunks = preprocessor.chunk_audio(data[:65])
+    assert chunks.shape == (3, 30)
+    assert_array_almost_equal(chunks[2, :25], data[40:65])
+    assert_array_almost_equal(chunks[2, 25:], np.zeros(5))
+
+    # with a buffer pool, consecutive calls reuse the same memory
+    preprocessor.buffers = BufferPool()
+    first = preprocessor.chunk_audio(data)
+    second = preprocessor.chunk_audio(data)
+    assert np.shares_memory(first, second)
+    assert preprocessor.buffers.num_allocations == 1
+
+    preprocessor.overlap = 3.0
+    with pytest.raises(
+        ValueError, match="'overlap' must be smaller than 'sample_secs'"
+    ):
+        preprocessor.chunk_audio(data)
+
+
+def test_preprocessor_read_into_buffer(tmp_path):
+    import soundfile as sf
+    from faunanet.preprocessor_base import PreprocessorBase
+    from faunanet.buffers import BufferPool
+
+    class Preprocessor(PreprocessorBase):
+        def process_audio_data(self, rawdata):
+            return self.chunk_audio(rawdata)
+
+    data = np.sin(np.linspace(0, 100, 48000 * 2)).astype(np.float32)
+    sf.write(tmp_path / "native.wav", data, 48000, subtype="FLOAT")
+
+    preprocessor = Preprocessor("test", sample_rate=48000)
+    reference = preprocessor.read_audio_data(tmp_path / "native.wav")
+
+    preprocessor.buffers = BufferPool()
+    for _ in range(3):
+        pooled = preprocessor.read_audio_data(tmp_path / "native.wav")
+
+    assert preprocessor.buffers.num_allocations == 1
+    assert preprocessor.duration == pytest.approx(2.0)
+    assert_array_almost_equal(pooled, reference)
+
+    # files with a different sample rate still go through librosa's resampling
+    preprocessor.sample_rate = 32000
+    resampled = preprocessor.read_audio_data(tmp_path / "native.wav")
+    assert len(resampled) == 64000
+    assert np.shares_memory(resampled, pooled) is False
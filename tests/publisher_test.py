@@ -0,0 +1,130 @@
+import pytest
+from pathlib import Path
+import threading
+import socket
+import tempfile
+import shutil
+import time
+
+from faunanet.publisher import DetectionPublisher, subscribe
+
+
+@pytest.fixture()
+def socket_dir():
+    # unix socket paths are limited in length, so don't use pytest's tmpdir
+    path = Path(tempfile.mkdtemp())
+    yield path
+    shutil.rmtree(path)
+
+
+def make_detections():
+    return [
+        {"start": 0, "end": 3, "label": "Turdus merula", "confidence": 0.9},
+        {"start": 0, "end": 3, "label": "Parus major", "confidence": 0.4},
+        {"start": 3, "end": 6, "label": "Turdus merula", "confidence": 0.3},
+    ]
+
+
+def collect(socket_path, received, **kwargs):
+    for message in subscribe(socket_path, timeout=2, **kwargs):
+        received.append(message)
+
+
+def wait_for_subscribers(publisher, number):
+    for _ in range(50):
+        if publisher.num_subscribers == number:
+            return
+        time.sleep(0.05)
+
+
+def test_publisher_construction(socket_dir):
+    publisher = DetectionPublisher(
+        socket_dir / "detections.sock", labels=["Turdus merula"], min_confidence=0.5
+    )
+
+    assert publisher.socket_path == socket_dir / "detections.sock"
+    assert publisher.labels == {"Turdus merula"}
+    assert publisher.min_confidence == pytest.approx(0.5)
+    assert publisher.is_running is False
+    assert publisher.num_subscribers == 0
+
+    publisher.start()
+    assert publisher.is_running is True
+    assert publisher.socket_path.exists()
+
+    with pytest.raises(RuntimeError, match="Publisher is already running"):
+        publisher.start()
+
+    publisher.stop()
+    assert publisher.is_running is False
+    assert publisher.socket_path.exists() is False
+
+
+def test_publisher_filtering(socket_dir):
+    publisher = DetectionPublisher(socket_dir / "detections.sock", min_confidence=0.35)
+    publisher.start()
+
+    everything = []
+    blackbirds = []
+
+    threads = [
+        threading.Thread(
+            target=collect, args=(publisher.socket_path, everything), daemon=True
+        ),
+        threading.Thread(
+            target=collect,
+            args=(publisher.socket_path, blackbirds),
+            kwargs={"labels": ["Turdus merula"], "min_confidence": 0.8},
+            daemon=True,
+        ),
+    ]
+
+    for t in threads:
+        t.start()
+
+    wait_for_subscribers(publisher, 2)
+    assert publisher.num_subscribers == 2
+
+    publisher.publish("example_0.wav", make_detections())
+    publisher.publish("example_1.wav", make_detections()[1:])
+    publisher.stop()
+
+    for t in threads:
+        t.join()
+
+    assert [m["file"] for m in everything] == ["example_0.wav", "example_1.wav"]
+    assert [d["label"] for d in everything[0]["detections"]] == [
+        "Turdus merula",
+        "Parus major",
+    ]
+    assert [d["label"] for d in everything[1]["detections"]] == ["Parus major"]
+
+    # nothing in the second file passes the subscriber's filter
+    assert len(blackbirds) == 1
+    assert blackbirds[0]["file"] == "example_0.wav"
+    assert blackbirds[0]["detections"] == [
+        {"start": 0.0, "end": 3.0, "label": "Turdus merula", "confidence": 0.9}
+    ]
+
+
+def test_publisher_drops_dead_subscribers(socket_dir):
+    publisher = DetectionPublisher(socket_dir / "detections.sock")
+
+    # publishing without a running server is a no-op
+    publisher.publish("example_0.wav", make_detections())
+
+    publisher.start()
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(str(publisher.socket_path))
+    connection.sendall(b"\n")
+    wait_for_subscribers(publisher, 1)
+    assert publisher.num_subscribers == 1
+    connection.close()
+
+    # the first write after the peer closed may still succeed, the next ones fail
+    for _ in range(3):
+        publisher.publish("example_0.wav", make_detections())
+
+    assert publisher.num_subscribers == 0
+    publisher.stop()
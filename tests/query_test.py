@@ -0,0 +1,135 @@
+import pytest
+from datetime import datetime, timedelta
+
+from faunanet.query import DetectionIndex, query_detections, INDEX_NAME
+
+
+def detection(label, start, confidence, model=None):
+    result = {
+        "start": start,
+        "end": start + 3.0,
+        "label": label,
+        "confidence": confidence,
+    }
+    if model is not None:
+        result["model"] = model
+    return result
+
+
+@pytest.fixture()
+def index(tmp_path):
+    index = DetectionIndex(tmp_path / INDEX_NAME)
+
+    day = datetime(2024, 5, 1)
+    # one recording every hour from 04:00 to 08:00, with detections after 0 and 30 minutes
+    for hour in range(4, 9):
+        recorded = (day + timedelta(hours=hour)).timestamp()
+        index.add(
+            "run_1",
+            f"rec_{hour:02d}",
+            recorded,
+            [
+                detection("Turdus merula_Eurasian Blackbird", 0.0, 0.5 + hour / 20),
+                detection("Parus major_Great Tit", 1800.0, 0.6),
+            ],
+        )
+
+    index.add(
+        "run_2",
+        "rec_late",
+        (day + timedelta(days=1, hours=23)).timestamp(),
+        [detection("Strix aluco_Tawny Owl", 7200.0, 0.9, model="other")],
+    )
+    index.add("run_2", "rec_empty", day.timestamp(), [])
+
+    yield index
+    index.close()
+
+
+def test_detection_index_add(index):
+    assert len(index.recordings()) == 7
+    assert ("run_2", "rec_empty") in index.recordings(run="run_2")
+
+    # adding a recording again replaces its detections
+    index.add(
+        "run_1",
+        "rec_04",
+        datetime(2024, 5, 1, 4).timestamp(),
+        [detection("Parus major_Great Tit", 0.0, 0.3)],
+    )
+    assert len(index.query(runs=["run_1"])) == 9
+    assert [
+        d["label"] for d in index.query(runs=["run_1"], end="2024-05-01T04:30")
+    ] == ["Parus major_Great Tit"]
+
+
+def test_detection_index_query(index):
+    # which species were detected between 05:00 and 07:00 above 0.7
+    detections = index.query(
+        start="2024-05-01",
+        end=datetime(2024, 5, 8),
+        daily_from="05:00",
+        daily_to="07:00",
+        min_confidence=0.7,
+    )
+    assert [(d["time"].hour, d["label"]) for d in detections] == [
+        (5, "Turdus merula_Eurasian Blackbird"),
+        (6, "Turdus merula_Eurasian Blackbird"),
+    ]
+    assert detections[0]["run"] == "run_1"
+    assert detections[0]["recording"] == "rec_05"
+    assert detections[0]["time"] == datetime(2024, 5, 1, 5)
+
+    assert len(index.query(labels=["great tit"])) == 5
+    assert len(index.query(labels=["tit", "owl"])) == 6
+    assert len(index.query(models=["other"])) == 1
+    assert len(index.query(limit=3)) == 3
+
+    # a time of day window can span midnight
+    night = index.query(daily_from="22:00", daily_to="04:15")
+    assert [d["label"] for d in night] == [
+        "Turdus merula_Eurasian Blackbird",
+        "Strix aluco_Tawny Owl",
+    ]
+
+    with pytest.raises(ValueError, match="Invalid time of day"):
+        index.query(daily_from="5:00:00:00")
+
+
+def test_detection_index_aggregate(index):
+    counts = index.aggregate(by=["label"], runs=["run_1"])
+    assert counts == [
+        {"label": "Parus major_Great Tit", "count": 5, "max_confidence": 0.6},
+        {
+            "label": "Turdus merula_Eurasian Blackbird",
+            "count": 5,
+            "max_confidence": pytest.approx(0.9),
+        },
+    ]
+
+    hourly = index.aggregate(
+        by=["label", "hour"], labels=["tit"], start="2024-05-01T06:00"
+    )
+    assert [(g["hour"], g["count"]) for g in hourly] == [
+        ("2024-05-01 06:00", 1),
+        ("2024-05-01 07:00", 1),
+        ("2024-05-01 08:00", 1),
+    ]
+
+    assert index.aggregate(
+        by=["hour_of_day"], daily_from="05:00", daily_to="06:00"
+    ) == [{"hour_of_day": "05", "count": 2, "max_confidence": pytest.approx(0.75)}]
+
+    with pytest.raises(ValueError, match="Unknown aggregation key species"):
+        index.aggregate(by=["species"])
+
+
+def test_query_detections(index, tmp_path):
+    assert len(query_detections(tmp_path, min_confidence=0.86)) == 2
+    assert query_detections(tmp_path / INDEX_NAME, by=["run"]) == [
+        {"run": "run_1", "count": 10, "max_confidence": pytest.approx(0.9)},
+        {"run": "run_2", "count": 1, "max_confidence": 0.9},
+    ]
+
+    with pytest.raises(FileNotFoundError, match="No detection index found"):
+        query_detections(tmp_path / "missing")
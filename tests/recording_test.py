@@ -156,6 +156,37 @@ def test_analysis_default(recording_fx):
     )
 
 
+def test_analyze_data(recording_fx):
+
+    recording = spc.Recording(
+        recording_fx.default_preprocessor,
+        recording_fx.default_model,
+        recording_fx.good_file,
+        min_conf=0.25,
+    )
+
+    recording.analyze()
+    expected = recording.detections
+
+    # analyzing the audio in two parts gives the same detections at the same times
+    data = recording.processor.read_audio_data(recording_fx.good_file)
+    chunk_length = int(
+        recording.processor.sample_secs * recording.processor.sample_rate
+    )
+    num_chunks = len(data) // chunk_length // 2
+    split = num_chunks * chunk_length
+
+    first = recording.analyze_data(data[:split], num_chunks=num_chunks)
+    second = recording.analyze_data(
+        data[split:], offset=split / recording.processor.sample_rate
+    )
+
+    assert recording.analyzed is True
+    assert [(d["start"], d["label"]) for d in first + second] == [
+        (d["start"], d["label"]) for d in expected
+    ]
+
+
 def test_analysis_google(recording_fx):
 
     recording = spc.Recording(
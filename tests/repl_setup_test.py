@@ -139,6 +139,9 @@ def test_do_get_setup_info(patch_functions, capsys, clean_up_test_installation):
     for key in cfg["Directories"]:
         assert key in out
 
+    assert "cpu resources:  " in out
+    assert "worker 0 (this watcher): cpus [" in out
+
     shutil.rmtree(dummy_path)
 
 
@@ -745,6 +745,7 @@ def test_do_status(make_mock_install, capsys):
     capsys.readouterr()
     faunanet_cmd.do_status("")
     out, _ = capsys.readouterr()
+    assert "state: ready\n" in out
     assert "is running: True\nis sleeping: False\nmay do work: True\n" in out
     assert faunanet_cmd.watcher.is_running is True
     assert faunanet_cmd.watcher.is_sleeping is False
@@ -804,6 +805,68 @@ def test_do_cleanup_watcher_failure(mocker, capsys, make_mock_install):
     faunanet_cmd.watcher.stop()
 
 
+def test_do_query(mocker, capsys, tmp_path):
+    from datetime import datetime
+    from faunanet.query import DetectionIndex
+
+    index = DetectionIndex(tmp_path / "detections.sqlite")
+    recorded = datetime(2024, 5, 1, 5, 30).timestamp()
+    index.add(
+        "run_1",
+        "rec",
+        recorded,
+        [
+            {
+                "start": 0.0,
+                "end": 3.0,
+                "label": "Parus major_Great Tit",
+                "confidence": 0.8,
+            },
+            {
+                "start": 3.0,
+                "end": 6.0,
+                "label": "Strix aluco_Tawny Owl",
+                "confidence": 0.4,
+            },
+        ],
+    )
+    index.close()
+
+    faunanet_cmd = repl.FaunanetCmd()
+    faunanet_cmd.watcher = mocker.Mock()
+    faunanet_cmd.watcher.index_config = None
+    faunanet_cmd.watcher.outdir = tmp_path
+
+    capsys.readouterr()
+    faunanet_cmd.do_query("--daily_from=05:00 --daily_to=07:00 --min_confidence=0.7")
+    out, _ = capsys.readouterr()
+    assert out == "2024-05-01 05:30:00 Parus major_Great Tit 0.80 in run_1/rec\n"
+
+    faunanet_cmd.do_query('--label="tawny owl,tit" --by=label')
+    out, _ = capsys.readouterr()
+    assert out == (
+        "Parus major_Great Tit: 1 detections, max confidence 0.80\n"
+        "Strix aluco_Tawny Owl: 1 detections, max confidence 0.40\n"
+    )
+
+    faunanet_cmd.do_query("--from=2024-05-02")
+    out, _ = capsys.readouterr()
+    assert out == "No detections found\n"
+
+    faunanet_cmd.do_query("--species=owl")
+    out, _ = capsys.readouterr()
+    assert "Invalid input. Expected options of the form --name=<arg>" in out
+
+    faunanet_cmd.do_query("--by=species")
+    out, _ = capsys.readouterr()
+    assert "Could not run query: Unknown aggregation key species" in out
+
+    faunanet_cmd.watcher.index_config = {"path": str(tmp_path / "missing.sqlite")}
+    faunanet_cmd.do_query("")
+    out, _ = capsys.readouterr()
+    assert "Could not run query: No detection index found" in out
+
+
 def test_cmdloop_keyboard_interrupt(mocker, capsys):
     faunanet_cmd = repl.FaunanetCmd()
     assert faunanet_cmd.running
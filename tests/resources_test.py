@@ -0,0 +1,122 @@
+import pytest
+import os
+
+from faunanet.resources import (
+    THREAD_ENV_VARS,
+    apply_plan,
+    available_cpus,
+    cgroup_cpu_limit,
+    cpu_topology,
+    plan_resources,
+)
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def make_topology(root, cores):
+    # cores: cpu -> (package, core)
+    for cpu, (package, core) in cores.items():
+        write(root / f"cpu{cpu}" / "topology" / "physical_package_id", f"{package}\n")
+        write(root / f"cpu{cpu}" / "topology" / "core_id", f"{core}\n")
+
+
+def test_cgroup_cpu_limit(tmp_path):
+    assert cgroup_cpu_limit(tmp_path / "missing") is None
+
+    v2 = tmp_path / "v2"
+    write(v2 / "cpu.max", "max 100000\n")
+    assert cgroup_cpu_limit(v2) is None
+
+    write(v2 / "cpu.max", "250000 100000\n")
+    assert cgroup_cpu_limit(v2) == 2.5
+
+    v1 = tmp_path / "v1"
+    write(v1 / "cpu,cpuacct" / "cpu.cfs_quota_us", "-1\n")
+    write(v1 / "cpu,cpuacct" / "cpu.cfs_period_us", "100000\n")
+    assert cgroup_cpu_limit(v1) is None
+
+    write(v1 / "cpu,cpuacct" / "cpu.cfs_quota_us", "150000\n")
+    assert cgroup_cpu_limit(v1) == 1.5
+
+
+def test_cpu_topology(tmp_path):
+    make_topology(tmp_path, {0: (0, 0), 1: (0, 1)})
+    assert cpu_topology([0, 1, 2], tmp_path) == {0: (0, 0), 1: (0, 1), 2: (-1, 2)}
+
+
+def test_available_cpus(tmp_path):
+    affinity = sorted(os.sched_getaffinity(0))
+    # hyperthreads of core 0 are the first and the last cpu
+    make_topology(
+        tmp_path / "cpu",
+        {
+            cpu: (0, 0 if cpu in [affinity[0], affinity[-1]] else cpu)
+            for cpu in affinity
+        },
+    )
+
+    cpus = available_cpus(tmp_path / "cgroup", tmp_path / "cpu")
+    assert cpus["quota"] is None
+    assert cpus["count"] == len(affinity)
+    assert sorted(cpus["cpus"]) == affinity
+    if len(affinity) > 1:
+        assert cpus["cpus"][:2] == [affinity[0], affinity[-1]]
+
+    write(tmp_path / "cgroup" / "cpu.max", "50000 100000\n")
+    cpus = available_cpus(tmp_path / "cgroup", tmp_path / "cpu")
+    assert cpus["quota"] == 0.5
+    assert cpus["count"] == 1
+    assert cpus["cpus"] == [affinity[0]]
+
+
+def test_plan_resources():
+    with pytest.raises(ValueError, match="'workers' must be >= 1"):
+        plan_resources(workers=0)
+
+    with pytest.raises(ValueError, match="'decode_threads' must be >= 1"):
+        plan_resources(decode_threads=0)
+
+    cpus = {"cpus": [0, 4, 1, 5, 2, 6, 3], "quota": 7.0, "count": 7}
+
+    plan = plan_resources(workers=2, cpus=cpus, pin=True)
+    assert plan["count"] == 7
+    assert plan["pin"] is True
+    assert plan["workers"] == [
+        {"cpus": [0, 1, 4, 5], "interpreter_threads": 3, "decode_threads": 1},
+        {"cpus": [2, 3, 6], "interpreter_threads": 2, "decode_threads": 1},
+    ]
+
+    plan = plan_resources(workers=1, decode_threads=3, cpus=cpus)
+    assert plan["workers"][0]["interpreter_threads"] == 4
+    assert plan["workers"][0]["decode_threads"] == 3
+
+    # more workers than cpus share them
+    plan = plan_resources(workers=3, decode_threads=2, cpus=cpus | {"count": 2})
+    assert plan["workers"] == [
+        {"cpus": [0], "interpreter_threads": 1, "decode_threads": 1},
+        {"cpus": [4], "interpreter_threads": 1, "decode_threads": 1},
+        {"cpus": [0], "interpreter_threads": 1, "decode_threads": 1},
+    ]
+
+
+def test_apply_plan(monkeypatch):
+    for name in THREAD_ENV_VARS:
+        monkeypatch.delenv(name, raising=False)
+
+    affinity = os.sched_getaffinity(0)
+    worker = {"cpus": [min(affinity)], "interpreter_threads": 1, "decode_threads": 2}
+
+    try:
+        applied = apply_plan(worker)
+        assert applied["pinned"] is False
+        assert os.sched_getaffinity(0) == affinity
+        assert all(os.environ[name] == "2" for name in THREAD_ENV_VARS)
+
+        applied = apply_plan(worker, pin=True)
+        assert applied["pinned"] is True
+        assert os.sched_getaffinity(0) == {min(affinity)}
+    finally:
+        os.sched_setaffinity(0, affinity)
@@ -0,0 +1,320 @@
+import pytest
+import csv
+import os
+import shutil
+import time
+import yaml
+from pathlib import Path
+
+import faunanet.retention
+from faunanet.compaction import compact_run
+from faunanet.journal import JOURNAL_NAME, ProcessingJournal
+from faunanet.retention import RecordingRetention, analyzed_recordings
+
+DAY = 24 * 3600
+
+
+def write_results(folder, recording, confidences):
+    with open(folder / f"results_{recording}.csv", "w") as csvfile:
+        if len(confidences) == 0:
+            csv.writer(csvfile).writerow([])
+        else:
+            writer = csv.DictWriter(csvfile, fieldnames=["label", "confidence"])
+            writer.writeheader()
+            writer.writerows({"label": "Owl", "confidence": c} for c in confidences)
+
+
+def make_run(outdir, name, indir):
+    folder = outdir / name
+    folder.mkdir(parents=True)
+    with open(folder / "config.yml", "w") as ymlfile:
+        yaml.safe_dump({"Analysis": {"input": str(indir)}}, ymlfile)
+    return folder
+
+
+def complete(folder, *paths):
+    journal = ProcessingJournal(folder / JOURNAL_NAME)
+    for path in paths:
+        journal.started(path)
+        journal.completed(path)
+    journal.close()
+
+
+def make_recording(indir, name, age, size=1000):
+    path = indir / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"0" * size)
+    modified = time.time() - age
+    os.utime(path, (modified, modified))
+    return path
+
+
+@pytest.fixture()
+def recordings(tmp_path):
+    indir = tmp_path / "input"
+    outdir = tmp_path / "output"
+
+    # a to e are analyzed, from oldest to newest, f is not
+    run = make_run(outdir, "run_1", indir)
+    for i, name in enumerate(["a", "b", "c", "d", "e", "f"]):
+        make_recording(indir, f"2024/{name}.wav", (6 - i) * DAY)
+    make_recording(indir, "2024/a.txt", 10 * DAY)
+
+    write_results(run, "a", [0.2, 0.4])
+    write_results(run, "b", [])
+    write_results(run, "c", [0.9])
+    write_results(run, "d", [0.1])
+    complete(run, *[indir / "2024" / f"{name}.wav" for name in "abcd"])
+
+    # results of runs on other input directories do not count
+    other = make_run(outdir, "run_2", tmp_path / "other")
+    write_results(other, "f", [])
+    complete(other, indir / "2024" / "f.wav")
+
+    # neither do folders that are not runs
+    (outdir / "run_3").mkdir()
+    write_results(outdir / "run_3", "f", [])
+    complete(outdir / "run_3", indir / "2024" / "f.wav")
+
+    newer = make_run(outdir, "run_4", indir)
+    write_results(newer, "e", [0.3])
+    complete(newer, indir / "2024" / "e.wav")
+
+    return indir, outdir
+
+
+def disk_usage(indir, total=10000):
+    # pretend the recordings are all that is on the disk
+    def usage(_):
+        used = sum(f.stat().st_size for f in indir.rglob("*.wav"))
+        return shutil._ntuple_diskusage(total, used, total - used)
+
+    return usage
+
+
+def test_analyzed_recordings(tmp_path):
+    run = make_run(tmp_path, "run", tmp_path / "input")
+    write_results(run, "a", [0.2, 0.7])
+    write_results(run, "b", [])
+    compact_run(run)
+    write_results(run, "c", [0.5])
+    (run / "results_d.part.csv").touch()
+
+    assert analyzed_recordings(run) == {"a": 0.7, "b": 0.0, "c": 0.5}
+
+
+def test_recording_retention_exceptions(tmp_path):
+    with pytest.raises(ValueError, match="'high_water' must be > 0 and <= 1"):
+        RecordingRetention(tmp_path, tmp_path, high_water=1.5)
+
+    with pytest.raises(ValueError, match="'low_water' must be > 0 and <= 'high_water'"):
+        RecordingRetention(tmp_path, tmp_path, high_water=0.5, low_water=0.6)
+
+    with pytest.raises(ValueError, match="'max_age' must be >= 0"):
+        RecordingRetention(tmp_path, tmp_path, max_age=-1)
+
+    with pytest.raises(ValueError, match="'interval' must be > 0"):
+        RecordingRetention(tmp_path, tmp_path, interval=0)
+
+    with pytest.raises(ValueError, match="'batch_size' must be >= 1"):
+        RecordingRetention(tmp_path, tmp_path, batch_size=0)
+
+
+def test_recording_retention_candidates(recordings):
+    indir, outdir = recordings
+
+    retention = RecordingRetention(indir, outdir)
+    assert [p.name for _, _, p in retention.candidates()] == [
+        "a.wav",
+        "b.wav",
+        "c.wav",
+        "d.wav",
+        "e.wav",
+    ]
+
+    retention = RecordingRetention(indir, outdir, keep_min_confidence=0.4)
+    assert [p.name for _, _, p in retention.candidates()] == [
+        "b.wav",
+        "d.wav",
+        "e.wav",
+    ]
+
+
+def test_recording_retention_exact_paths(tmp_path):
+    indir = tmp_path / "input"
+    outdir = tmp_path / "output"
+    run = make_run(outdir, "run", indir)
+
+    analyzed = make_recording(indir, "night1/a.wav", DAY)
+    make_recording(indir, "night2/a.wav", DAY)
+    make_recording(indir, "night1/a.flac", DAY)
+    write_results(run, "a", [])
+    complete(run, analyzed)
+
+    # only the recording the journal has completed, not others with the same stem
+    retention = RecordingRetention(indir, outdir, pattern=[".wav", ".flac"])
+    assert [p for _, _, p in retention.candidates()] == [analyzed]
+
+    # results without a journal entry do not count
+    write_results(run, "b", [])
+    make_recording(indir, "b.wav", DAY)
+    assert [p for _, _, p in retention.candidates()] == [analyzed]
+
+    # two recordings with the same stem completed in one run share a results file, so neither can be deleted
+    complete(run, indir / "night2" / "a.wav")
+    assert retention.candidates() == []
+
+
+def test_recording_retention_incremental(recordings, monkeypatch):
+    indir, outdir = recordings
+    retention = RecordingRetention(indir, outdir)
+    assert [p.name for _, _, p in retention.candidates()] == [
+        "a.wav",
+        "b.wav",
+        "c.wav",
+        "d.wav",
+        "e.wav",
+    ]
+    assert retention.runs["run_2"] is None
+
+    # results that have been read once are not read again, nor are the journal records before the last offset
+    read = []
+    confidence_of = faunanet.retention._confidence_of
+
+    def counting_confidence_of(results_file):
+        read.append(Path(results_file).name)
+        return confidence_of(results_file)
+
+    monkeypatch.setattr("faunanet.retention._confidence_of", counting_confidence_of)
+    offset = retention.runs["run_1"]["offset"]
+    assert len(retention.candidates()) == 5
+    assert read == []
+    assert retention.runs["run_1"]["offset"] == offset
+
+    # newly completed recordings are picked up, a partially written record waits for the next check
+    run = outdir / "run_1"
+    make_recording(indir, "2024/g.wav", 0)
+    write_results(run, "g", [0.6])
+    complete(run, indir / "2024" / "g.wav")
+    with open(run / JOURNAL_NAME, "a") as journal:
+        journal.write('{"event": "completed", "fi')
+
+    assert len(retention.candidates()) == 6
+    assert read == ["results_g.csv"]
+
+    # deleted recordings are forgotten, compacted results are still found
+    (indir / "2024" / "a.wav").unlink()
+    assert len(retention.candidates()) == 5
+    assert indir / "2024" / "a.wav" not in retention.runs["run_1"]["completed"]
+
+    compact_run(outdir / "run_4")
+    retention = RecordingRetention(indir, outdir, keep_min_confidence=0.5)
+    assert [p.name for _, _, p in retention.candidates()] == [
+        "b.wav",
+        "d.wav",
+        "e.wav",
+    ]
+
+    # runs that have been removed are dropped
+    shutil.rmtree(outdir / "run_4")
+    assert [p.name for _, _, p in retention.candidates()] == ["b.wav", "d.wav"]
+    assert "run_4" not in retention.runs
+
+
+def test_recording_retention_collect(recordings, monkeypatch):
+    indir, outdir = recordings
+    monkeypatch.setattr("faunanet.retention.shutil.disk_usage", disk_usage(indir))
+
+    def remaining():
+        return sorted(p.name for p in indir.rglob("*.wav"))
+
+    # 6000 of 10000 bytes are used, below the high-water mark nothing but expired recordings is deleted
+    retention = RecordingRetention(indir, outdir, high_water=0.7, max_age=5.5 * DAY)
+    assert retention.collect() == {"deleted": 1, "freed": 1000, "usage": 0.5}
+    assert remaining() == ["b.wav", "c.wav", "d.wav", "e.wav", "f.wav"]
+
+    # beyond it, the oldest analyzed recordings are deleted down to the low-water mark, unanalyzed ones are kept
+    make_recording(indir, "new.wav", 0, size=2000)
+    retention = RecordingRetention(
+        indir,
+        outdir,
+        high_water=0.6,
+        low_water=0.5,
+        keep_min_confidence=0.5,
+        batch_size=1,
+        batch_pause=0.0,
+    )
+    assert retention.collect() == {"deleted": 2, "freed": 2000, "usage": 0.5}
+    assert remaining() == ["c.wav", "e.wav", "f.wav", "new.wav"]
+
+    assert retention.collect()["deleted"] == 0
+
+    # recordings with detections above the threshold are kept even if the disk stays full
+    make_recording(indir, "newer.wav", 0, size=2000)
+    assert retention.collect() == {"deleted": 1, "freed": 1000, "usage": 0.6}
+    assert remaining() == ["c.wav", "f.wav", "new.wav", "newer.wav"]
+
+
+def test_recording_retention_start_stop(recordings, monkeypatch):
+    indir, outdir = recordings
+    monkeypatch.setattr(
+        "faunanet.retention.shutil.disk_usage", disk_usage(indir, total=1000)
+    )
+
+    retention = RecordingRetention(indir, outdir, interval=0.1, batch_pause=0.0)
+    retention.start()
+    assert retention.is_running
+
+    with pytest.raises(RuntimeError, match="Recording retention is already running"):
+        retention.start()
+
+    deadline = time.time() + 10
+    while len(list(indir.rglob("*.wav"))) > 1 and time.time() < deadline:
+        time.sleep(0.1)
+
+    retention.stop()
+    assert retention.is_running is False
+    assert [p.name for p in indir.rglob("*.wav")] == ["f.wav"]
+
+
+def test_recording_retention_errors(recordings, monkeypatch):
+    indir, outdir = recordings
+    monkeypatch.setattr(
+        "faunanet.retention.shutil.disk_usage", disk_usage(indir, total=1000)
+    )
+
+    # e.g., a recording on a read-only mount
+    unlink = Path.unlink
+
+    def failing_unlink(path, *args, **kwargs):
+        if path.name == "a.wav":
+            raise PermissionError("Read-only file system")
+        return unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "unlink", failing_unlink)
+
+    errors = []
+    retention = RecordingRetention(
+        indir, outdir, batch_pause=0.0, on_error=lambda e, tb: errors.append((e, tb))
+    )
+
+    # the other recordings are deleted anyway
+    assert retention.collect()["deleted"] == 4
+    assert sorted(p.name for p in indir.rglob("*.wav")) == ["a.wav", "f.wav"]
+    assert len(errors) == 1
+    assert isinstance(errors[0][0], PermissionError)
+    assert "Read-only file system" in errors[0][1]
+
+    # a failing check does not end the background thread
+    def broken_usage(_):
+        raise OSError("Input directory unavailable")
+
+    monkeypatch.setattr("faunanet.retention.shutil.disk_usage", broken_usage)
+    retention.interval = 0.05
+    retention.start()
+    deadline = time.time() + 5
+    while len(errors) < 3:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    assert retention.is_running
+    retention.stop()
@@ -0,0 +1,217 @@
+import pytest
+from pathlib import Path
+from watchdog.events import FileSystemEventHandler
+import json
+import shutil
+import time
+
+from faunanet.scan_observer import ScanObserver
+
+
+class CollectingHandler(FileSystemEventHandler):
+    def __init__(self):
+        self.created = []
+
+    def on_created(self, event):
+        self.created.append(Path(event.src_path))
+
+
+def make_tree(root, days, files_per_day):
+    for day in days:
+        folder = root / "2024" / "05" / day
+        folder.mkdir(parents=True, exist_ok=True)
+        for i in range(files_per_day):
+            (folder / f"rec_{i}.wav").write_bytes(b"\x00")
+
+
+def test_scan_observer_incremental(tmp_path):
+    make_tree(tmp_path, ["01", "02"], 3)
+
+    handler = CollectingHandler()
+    observer = ScanObserver()
+    observer.schedule(handler, tmp_path)
+
+    # files that exist already are not reported
+    observer.scan()
+    assert handler.created == []
+    full_cost = observer.last_scan_cost
+
+    # nothing changed, so no directory is listed again
+    observer.scan()
+    assert handler.created == []
+    assert observer.last_scan_cost < full_cost
+
+    (tmp_path / "2024" / "05" / "02" / "rec_3.wav").write_bytes(b"\x00")
+    make_tree(tmp_path, ["03"], 2)
+    (tmp_path / ".faunanet_leases").mkdir()
+    (tmp_path / ".faunanet_leases" / "hidden.wav").write_bytes(b"\x00")
+
+    observer.scan()
+    assert sorted(handler.created) == sorted(
+        [
+            tmp_path / "2024" / "05" / "02" / "rec_3.wav",
+            tmp_path / "2024" / "05" / "03" / "rec_0.wav",
+            tmp_path / "2024" / "05" / "03" / "rec_1.wav",
+        ]
+    )
+
+    # removed directories are forgotten
+    for f in (tmp_path / "2024" / "05" / "01").iterdir():
+        f.unlink()
+    (tmp_path / "2024" / "05" / "01").rmdir()
+    observer.scan()
+    assert str(tmp_path / "2024" / "05" / "01") not in observer.dirs
+    assert len(handler.created) == 3
+
+    with pytest.raises(ValueError, match="'interval' must be > 0"):
+        ScanObserver(interval=0)
+
+    with pytest.raises(ValueError, match="'scan_budget' must be >= 1"):
+        ScanObserver(scan_budget=0)
+
+
+def test_scan_observer_budget(tmp_path):
+    make_tree(tmp_path, ["01"], 1)
+
+    handler = CollectingHandler()
+    observer = ScanObserver(scan_budget=4)
+    observer.schedule(handler, tmp_path)
+
+    while True:
+        observer.scan()
+        if len(observer.pending) == 0:
+            break
+
+    days = [f"{i:02d}" for i in range(2, 12)]
+    make_tree(tmp_path, days, 2)
+
+    num_scans = 0
+    while True:
+        observer.scan()
+        num_scans += 1
+        # a directory is always listed as a whole, '05' has 11 entries
+        assert observer.last_scan_cost <= 4 + 12
+        if len(observer.pending) == 0:
+            break
+
+    # the pass is spread over several scans, but every file is reported exactly once
+    assert num_scans > 1
+    assert len(handler.created) == len(set(handler.created)) == 20
+
+
+def test_scan_observer_persisted_state(tmp_path):
+    root = tmp_path / "input"
+    make_tree(root, ["01"], 2)
+
+    observer = ScanObserver(state_file=tmp_path / "state.json")
+    observer.schedule(CollectingHandler(), root)
+    observer.scan()
+    assert (tmp_path / "state.json").is_file()
+
+    # files that appear while no observer is running are reported after a restart
+    make_tree(root, ["02"], 2)
+
+    handler = CollectingHandler()
+    restarted = ScanObserver(state_file=tmp_path / "state.json")
+    restarted.schedule(handler, root)
+    restarted.scan()
+
+    assert sorted(handler.created) == [
+        root / "2024" / "05" / "02" / "rec_0.wav",
+        root / "2024" / "05" / "02" / "rec_1.wav",
+    ]
+
+    # a state for another directory is not used
+    other = ScanObserver(state_file=tmp_path / "state.json")
+    other.schedule(CollectingHandler(), tmp_path)
+    assert other.dirs == {}
+
+
+def test_scan_observer_state_changes(tmp_path):
+    root = tmp_path / "input"
+    state_file = tmp_path / "state.json"
+    make_tree(root, [f"{day:02d}" for day in range(1, 11)], 20)
+
+    observer = ScanObserver(state_file=state_file)
+    observer.schedule(CollectingHandler(), root)
+    observer.scan()
+    snapshot = state_file.read_text()
+    assert len(snapshot.splitlines()) == 1
+
+    # a new file only appends the directories that changed, not the whole tree
+    (root / "2024" / "05" / "03" / "new.wav").write_bytes(b"\x00")
+    observer.scan()
+    lines = state_file.read_text().splitlines()
+    assert len(lines) == 2
+    assert len(lines[1]) < len(snapshot) / 2
+    assert str(root / "2024" / "05" / "03") in json.loads(lines[1])["dirs"]
+    assert str(root / "2024" / "05" / "01") not in json.loads(lines[1])["dirs"]
+
+    # removed directories are dropped, and once the changes outgrow the snapshot it is replaced
+    shutil.rmtree(root / "2024" / "05" / "01")
+    for i in range(20):
+        (root / "2024" / "05" / "02" / f"new_{i}.wav").write_bytes(b"\x00")
+        observer.scan()
+    lines = state_file.read_text().splitlines()
+    assert len(lines) < 20
+    assert str(root / "2024" / "05" / "01") not in json.loads(lines[0])["dirs"]
+
+    # a change that a crash left incomplete is ignored
+    with open(state_file, "a") as f:
+        f.write('{"dirs": {')
+
+    handler = CollectingHandler()
+    restarted = ScanObserver(state_file=state_file)
+    restarted.schedule(handler, root)
+    assert restarted.dirs == observer.dirs
+    assert restarted.snapshot_size is None
+
+    (root / "2024" / "05" / "03" / "newer.wav").write_bytes(b"\x00")
+    restarted.scan()
+    assert handler.created == [root / "2024" / "05" / "03" / "newer.wav"]
+    assert len(state_file.read_text().splitlines()) == 1
+
+
+def test_scan_observer_cold_subtrees(tmp_path):
+    make_tree(tmp_path, ["01", "02"], 1)
+
+    handler = CollectingHandler()
+    observer = ScanObserver(cold_after=0.2, cold_rescan_interval=1000)
+    observer.schedule(handler, tmp_path)
+    observer.scan()
+
+    time.sleep(0.3)
+    make_tree(tmp_path, ["03"], 1)
+    observer.scan()
+    assert handler.created == [tmp_path / "2024" / "05" / "03" / "rec_0.wav"]
+
+    # a file in a subtree that has not changed for a while is only found by the next full rescan
+    time.sleep(0.3)
+    (tmp_path / "2024" / "05" / "01" / "late.wav").write_bytes(b"\x00")
+    observer.scan()
+    assert len(handler.created) == 1
+
+    observer.last_full_scan = 0.0
+    observer.scan()
+    assert handler.created[-1] == tmp_path / "2024" / "05" / "01" / "late.wav"
+
+
+def test_scan_observer_thread(tmp_path):
+    handler = CollectingHandler()
+    observer = ScanObserver(interval=0.05)
+    observer.schedule(handler, tmp_path)
+    observer.start()
+
+    time.sleep(0.2)
+    (tmp_path / "example.wav").write_bytes(b"\x00")
+
+    for _ in range(40):
+        if len(handler.created) > 0:
+            break
+        time.sleep(0.05)
+
+    observer.stop()
+    observer.join()
+
+    assert handler.created == [tmp_path / "example.wav"]
+    assert observer.is_alive() is False
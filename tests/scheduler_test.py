@@ -0,0 +1,138 @@
+import pytest
+import queue
+import threading
+import time
+
+from faunanet.scheduler import PriorityScheduler
+
+
+def drain(scheduler):
+    items = []
+    while scheduler.qsize() > 0:
+        items.append(scheduler.get_nowait())
+    return items
+
+
+def test_scheduler_exceptions():
+    with pytest.raises(ValueError, match="'classes' must be a non-empty list"):
+        PriorityScheduler(classes=["live", "live"])
+
+    with pytest.raises(ValueError, match="Unknown scheduling class old"):
+        PriorityScheduler(weights={"old": 1})
+
+    with pytest.raises(ValueError, match="'weights' must be > 0"):
+        PriorityScheduler(weights={"live": 0})
+
+    with pytest.raises(ValueError, match="'max_wait' must be > 0"):
+        PriorityScheduler(max_wait=0)
+
+    with pytest.raises(ValueError, match="'overdue_every' must be >= 1"):
+        PriorityScheduler(overdue_every=0)
+
+    with pytest.raises(ValueError, match="'window' must be >= 1"):
+        PriorityScheduler(window=0)
+
+    with pytest.raises(ValueError, match="Unknown scheduling class old"):
+        PriorityScheduler().put("a", "old")
+
+    with pytest.raises(queue.Empty):
+        PriorityScheduler().get(timeout=0.01)
+
+
+def test_scheduler_strict():
+    scheduler = PriorityScheduler()
+
+    for i in range(3):
+        scheduler.put(f"b{i}", "backlog")
+    scheduler.put("l0", "live")
+    scheduler.put("l1")
+
+    assert scheduler.qsize() == 5
+    assert scheduler.qsize("backlog") == 3
+    assert drain(scheduler) == ["l0", "l1", "b0", "b1", "b2"]
+
+    stats = scheduler.stats()
+    assert stats["live"]["served"] == 2
+    assert stats["backlog"]["served"] == 3
+    assert stats["backlog"]["waiting"] == 0
+    assert stats["backlog"]["max_wait"] >= stats["backlog"]["mean_wait"] > 0
+
+
+def test_scheduler_weights():
+    scheduler = PriorityScheduler(strict=False, weights={"live": 3})
+
+    for i in range(6):
+        scheduler.put(f"b{i}", "backlog")
+        scheduler.put(f"l{i}", "live")
+
+    # three live files for every backlog file while both are waiting
+    assert drain(scheduler)[:8] == ["l0", "b0", "l1", "l2", "l3", "b1", "l4", "l5"]
+
+    # a class that was idle does not get a burst to catch up, ties go to the class with the higher priority
+    scheduler = PriorityScheduler(strict=False)
+    for i in range(4):
+        scheduler.put(f"b{i}", "backlog")
+    assert drain(scheduler) == ["b0", "b1", "b2", "b3"]
+    scheduler.put("b4", "backlog")
+    scheduler.put("b5", "backlog")
+    scheduler.put("l0", "live")
+    scheduler.put("l1", "live")
+    assert drain(scheduler) == ["l0", "b4", "l1", "b5"]
+
+
+def test_scheduler_starvation():
+    scheduler = PriorityScheduler(max_wait=0.1)
+    scheduler.put("b0", "backlog")
+    scheduler.put("l0", "live")
+    assert scheduler.get() == "l0"
+
+    time.sleep(0.15)
+    scheduler.put("l1", "live")
+
+    # the backlog file has waited too long
+    assert scheduler.stats()["backlog"]["oldest"] >= 0.1
+    assert drain(scheduler) == ["b0", "l1"]
+
+
+def test_scheduler_aged_backlog():
+    scheduler = PriorityScheduler(max_wait=0.2, overdue_every=4)
+
+    # a large backlog found at start-up has aged by the time new files arrive
+    for i in range(100):
+        scheduler.put(f"b{i}", "backlog")
+    time.sleep(0.25)
+    for i in range(20):
+        scheduler.put(f"l{i}", "live")
+
+    # live files keep most of the capacity, while the backlog still moves on
+    taken = [scheduler.get_nowait() for _ in range(25)]
+    assert [item[0] for item in taken] == list("bllll" * 5)
+    assert [item for item in taken if item[0] == "l"] == [f"l{i}" for i in range(20)]
+
+
+def test_scheduler_threads():
+    scheduler = PriorityScheduler()
+    taken = []
+
+    def consume():
+        while True:
+            item = scheduler.get()
+            if item is None:
+                break
+            taken.append(item)
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+
+    for i in range(100):
+        scheduler.put(i, "live" if i % 2 == 0 else "backlog")
+
+    deadline = time.time() + 10
+    while len(taken) < 100 and time.time() < deadline:
+        time.sleep(0.01)
+
+    scheduler.clear()
+    scheduler.put(None)
+    thread.join(timeout=10)
+
+    assert sorted(taken) == list(range(100))
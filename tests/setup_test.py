@@ -1,8 +1,14 @@
 import faunanet.faunanet_setup as sps
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
 from pathlib import Path
+import hashlib
+import os
 import pytest
 import shutil
 import tempfile
+import threading
+import time
 
 tflite_file = "model.tflite"
 
@@ -63,6 +69,245 @@ def clean_up_test_installation():
         shutil.rmtree(Path(sps.user_cache_dir()) / "faunanet_tests", ignore_errors=True)
 
 
+def etag_of(data):
+    return '"' + hashlib.sha256(data).hexdigest()[:16] + '"'
+
+
+class HubHandler(SimpleHTTPRequestHandler):
+    # stands in for the model hub: serves files from a folder, supports range requests and logs the requests it gets
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get("Range")))
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+
+        try:
+            time.sleep(server.delay)
+            path = Path(self.translate_path(self.path))
+            if path.is_file() is False:
+                self.send_error(404)
+                return
+
+            data = path.read_bytes()
+            etag = etag_of(data)
+            offset = 0
+            # a range of another version of the file is answered with the whole file
+            if self.headers.get("Range") is not None and self.headers.get(
+                "If-Range"
+            ) in [None, etag]:
+                offset = int(self.headers["Range"].split("=")[1].rstrip("-"))
+                if offset >= len(data):
+                    self.send_error(416)
+                    return
+
+            self.send_response(200 if offset == 0 else 206)
+            self.send_header("Content-Length", str(len(data) - offset))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(data[offset:])
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def hub(tmp_path):
+    folder = tmp_path / "hub"
+    files = {
+        "model_a/model.tflite": os.urandom(4096),
+        "model_a/labels.txt": b"a\nb\n",
+        "model_b/model.tflite": os.urandom(8192),
+        "model_b/labels.txt": b"c\n",
+    }
+    for name, data in files.items():
+        (folder / name).parent.mkdir(parents=True, exist_ok=True)
+        (folder / name).write_bytes(data)
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(HubHandler, directory=str(folder))
+    )
+    server.lock = threading.Lock()
+    server.requests = []
+    server.active = 0
+    server.peak = 0
+    server.delay = 0.0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    registry = {
+        name: "sha256:" + hashlib.sha256(data).hexdigest()
+        for name, data in files.items()
+    }
+    registry["model_b/labels.txt"] = None
+
+    yield f"http://127.0.0.1:{server.server_address[1]}", registry, files, server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_files(hub, tmp_path):
+    url, registry, data, server = hub
+    server.delay = 0.2
+    cache = tmp_path / "cache"
+    target = tmp_path / "models"
+
+    installed = sps.fetch_files(
+        url,
+        registry,
+        {
+            "model_a/model.tflite": ["a/model.tflite", "a_copy/model.tflite"],
+            "model_a/labels.txt": "a/labels.txt",
+            "model_b/model.tflite": "b/model.tflite",
+            "model_b/labels.txt": "b/labels.txt",
+        },
+        target,
+        cache=cache,
+        max_workers=2,
+        link_min_size=4096,
+    )
+
+    # each file is downloaded once, two at a time
+    assert len(server.requests) == 4
+    assert server.peak == 2
+
+    assert installed == {
+        target / "a" / "model.tflite": "linked",
+        target / "a_copy" / "model.tflite": "linked",
+        target / "a" / "labels.txt": "copied",
+        target / "b" / "model.tflite": "linked",
+        target / "b" / "labels.txt": "copied",
+    }
+    assert (target / "a_copy" / "model.tflite").read_bytes() == data[
+        "model_a/model.tflite"
+    ]
+    assert (target / "b" / "labels.txt").read_bytes() == data["model_b/labels.txt"]
+
+    # large files share the data of the cache, small ones do not
+    assert (target / "b" / "model.tflite").stat().st_ino == (
+        cache / "model_b" / "model.tflite"
+    ).stat().st_ino
+    assert (target / "a" / "labels.txt").stat().st_ino != (
+        cache / "model_a" / "labels.txt"
+    ).stat().st_ino
+
+    with pytest.raises(ValueError, match="'max_workers' must be >= 1"):
+        sps.fetch_files(url, registry, {}, target, cache=cache, max_workers=0)
+
+    with pytest.raises(ValueError, match="File missing.txt is not in the registry"):
+        sps.fetch_files(url, registry, {"missing.txt": "missing.txt"}, target)
+
+
+def test_fetch_files_checksum(hub, tmp_path):
+    url, registry, _, _ = hub
+    registry["model_a/labels.txt"] = "sha256:" + "0" * 64
+
+    with pytest.raises(ValueError, match="SHA256 hash of downloaded file"):
+        sps.fetch_files(
+            url,
+            registry,
+            {"model_a/labels.txt": "labels.txt"},
+            tmp_path / "models",
+            cache=tmp_path / "cache",
+        )
+
+    assert (tmp_path / "models" / "labels.txt").exists() is False
+
+
+def test_fetch_files_resume_validator(hub, tmp_path):
+    url, registry, data, server = hub
+    cache = tmp_path / "cache"
+    target = tmp_path / "models"
+    files = {"model_a/model.tflite": "a.tflite", "model_b/model.tflite": "b.tflite"}
+    (cache / "model_a").mkdir(parents=True)
+    (cache / "model_b").mkdir(parents=True)
+
+    # the file has changed on the server since the first half was downloaded
+    (cache / "model_a" / "model.tflite.part").write_bytes(b"old" * 1000)
+    (cache / "model_a" / "model.tflite.part.validator").write_text('"outdated"')
+
+    # nothing tells which version the first half belongs to
+    (cache / "model_b" / "model.tflite.part").write_bytes(b"old" * 1000)
+
+    sps.fetch_files(url, registry, files, target, cache=cache, resume=True)
+
+    assert sorted(server.requests) == [
+        ("/model_a/model.tflite", "bytes=3000-"),
+        ("/model_b/model.tflite", None),
+    ]
+    assert (target / "a.tflite").read_bytes() == data["model_a/model.tflite"]
+    assert (target / "b.tflite").read_bytes() == data["model_b/model.tflite"]
+    assert list(cache.rglob("*.part*")) == []
+
+    # the validator of an interrupted download is kept next to its data
+    response = type("Response", (), {})()
+    downloader = sps.ResumableDownloader()
+    for headers, expected in [
+        ({"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024"}, '"abc"'),
+        ({"ETag": 'W/"abc"', "Last-Modified": "Mon, 01 Jan 2024"}, "Mon, 01 Jan 2024"),
+        ({}, None),
+    ]:
+        response.headers = headers
+        downloader._save_validator(response, tmp_path / "validator")
+        if expected is None:
+            assert (tmp_path / "validator").exists() is False
+        else:
+            assert (tmp_path / "validator").read_text() == expected
+
+
+def test_fetch_files_resume(hub, tmp_path):
+    url, registry, data, server = hub
+    cache = tmp_path / "cache"
+    target = tmp_path / "models"
+    files = {name: name for name in registry}
+
+    # an interrupted installation left the first half of a download and one installed file
+    (cache / "model_b").mkdir(parents=True)
+    (cache / "model_b" / "model.tflite.part").write_bytes(
+        data["model_b/model.tflite"][:4096]
+    )
+    (cache / "model_b" / "model.tflite.part.validator").write_text(
+        etag_of(data["model_b/model.tflite"])
+    )
+    (target / "model_a").mkdir(parents=True)
+    (target / "model_a" / "labels.txt").write_bytes(data["model_a/labels.txt"])
+
+    installed = sps.fetch_files(url, registry, files, target, cache=cache, resume=True)
+
+    assert installed[target / "model_a" / "labels.txt"] == "present"
+    assert sorted(server.requests) == [
+        ("/model_a/model.tflite", None),
+        ("/model_b/labels.txt", None),
+        ("/model_b/model.tflite", "bytes=4096-"),
+    ]
+    for name in registry:
+        assert (target / name).read_bytes() == data[name]
+    assert (cache / "model_b" / "model.tflite.part").exists() is False
+    assert (cache / "model_b" / "model.tflite.part.validator").exists() is False
+
+    # a corrupted installed file is installed again, everything else is kept
+    (target / "model_a" / "model.tflite").write_bytes(b"broken")
+    installed = sps.fetch_files(url, registry, files, target, cache=cache, resume=True)
+    assert list(installed.values()).count("present") == 3
+    assert (target / "model_a" / "model.tflite").read_bytes() == data[
+        "model_a/model.tflite"
+    ]
+    assert len(server.requests) == 3
+
+    # without resume, partial downloads are discarded
+    (cache / "model_b" / "labels.txt").unlink()
+    (cache / "model_b" / "labels.txt.part").write_bytes(b"x")
+    sps.fetch_files(
+        url, registry, {"model_b/labels.txt": "labels.txt"}, target, cache=cache
+    )
+    assert server.requests[-1] == ("/model_b/labels.txt", None)
+    assert (target / "labels.txt").read_bytes() == data["model_b/labels.txt"]
+
+
 def test_make_directories(temp_dir, cleanup_after_test):
     base_cfg_dirs = {
         "home": str(Path(temp_dir, "test_home")),
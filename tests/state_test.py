@@ -0,0 +1,69 @@
+import pytest
+import multiprocessing
+import time
+
+from faunanet.state import StateChannel, WATCHER_STATES
+
+
+def go_through_states(channel, states, delay):
+    for state in states:
+        time.sleep(delay)
+        channel.set(state)
+
+
+def test_state_channel_construction():
+    channel = StateChannel()
+    assert channel.state == "created"
+
+    channel = StateChannel("stopped")
+    assert channel.state == "stopped"
+
+    for state in WATCHER_STATES:
+        channel.set(state)
+        assert channel.state == state
+
+    with pytest.raises(ValueError, match="Unknown watcher state running"):
+        channel.set("running")
+
+
+def test_state_channel_wait_for():
+    channel = StateChannel()
+
+    # already in the desired state
+    assert channel.wait_for(["created", "failed"], timeout=0.1) is True
+
+    # nothing happens
+    start = time.time()
+    assert channel.wait_for(["ready"], timeout=0.2) is False
+    assert time.time() - start >= 0.2
+
+
+def test_state_channel_across_processes():
+    channel = StateChannel()
+
+    process = multiprocessing.Process(
+        target=go_through_states,
+        args=(channel, ["starting", "model_loaded", "ready"], 0.2),
+    )
+    process.start()
+
+    start = time.time()
+    assert channel.wait_for(["ready", "failed"], timeout=30) is True
+    assert channel.state == "ready"
+
+    # woken up by the state change, not by polling in fixed intervals
+    assert time.time() - start < 5
+    process.join()
+
+
+def test_state_channel_context():
+    # shared with processes of a context other than the default one
+    context = multiprocessing.get_context("spawn")
+    channel = StateChannel(context=context)
+
+    process = context.Process(
+        target=go_through_states, args=(channel, ["starting", "ready"], 0.0)
+    )
+    process.start()
+    assert channel.wait_for(["ready"], timeout=30) is True
+    process.join()
@@ -0,0 +1,250 @@
+import pytest
+import io
+import os
+import socket
+import struct
+import threading
+import time
+from types import SimpleNamespace
+import numpy as np
+import soundfile as sf
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+
+from faunanet.stream import RingBuffer, PCMStream, StreamSegment
+
+
+def read_until(stream, num_samples, timeout=5.0):
+    parts = []
+    start = time.time()
+    while sum(len(p) for p in parts) < num_samples and time.time() - start < timeout:
+        parts.append(stream.read())
+        time.sleep(0.01)
+    return np.concatenate(parts)
+
+
+def wav_bytes(data, rate, subtype="PCM_16"):
+    buffer = io.BytesIO()
+    sf.write(buffer, data, rate, format="WAV", subtype=subtype)
+    return buffer.getvalue()
+
+
+def write_fifo(path, payloads, pause=0.0):
+    # each payload is written by a new writer that opens and closes the pipe
+    def write():
+        for payload in payloads:
+            with open(path, "wb") as fifo:
+                # blocks that do not end on whole frames
+                for start in range(0, len(payload), 999):
+                    fifo.write(payload[start : start + 999])
+                    fifo.flush()
+            time.sleep(pause)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    return writer
+
+
+def test_ring_buffer():
+    with pytest.raises(ValueError, match="'capacity' must be >= 1"):
+        RingBuffer(0)
+
+    buffer = RingBuffer(10)
+    buffer.write(np.arange(4, dtype=np.float32))
+    assert buffer.available == 4
+    assert_array_equal(buffer.read(), np.arange(4))
+    assert buffer.available == 0
+    assert len(buffer.read()) == 0
+
+    # wraps around the end of the memory
+    buffer.write(np.arange(8, dtype=np.float32))
+    assert_array_equal(buffer.read(), np.arange(8))
+    assert buffer.overruns == 0
+
+    # the oldest samples are overwritten when the reader falls behind
+    buffer.write(np.arange(6, dtype=np.float32))
+    buffer.write(np.arange(6, 12, dtype=np.float32))
+    assert buffer.overruns == 2
+    assert_array_equal(buffer.read(), np.arange(2, 12))
+
+    buffer.write(np.arange(15, dtype=np.float32))
+    assert buffer.overruns == 7
+    assert_array_equal(buffer.read(), np.arange(5, 15))
+
+
+def test_pcm_stream_construction(tmp_path):
+    with pytest.raises(ValueError, match="'sample_format' must be in 'uint8'"):
+        PCMStream("pipe", sample_format="int8")
+
+    with pytest.raises(ValueError, match="'channels' must be >= 1"):
+        PCMStream("pipe", channels=0)
+
+    with pytest.raises(ValueError, match="'buffer_secs' must be > 0"):
+        PCMStream("pipe", buffer_secs=0)
+
+    (tmp_path / "file").touch()
+    with pytest.raises(ValueError, match="is not a named pipe"):
+        PCMStream(str(tmp_path / "file")).start()
+
+    stream = PCMStream("pipe", sample_rate=8000)
+    assert stream.sample_rate is None
+    assert stream.overruns == 0
+    assert len(stream.read()) == 0
+
+
+def test_pcm_stream_fifo_raw(tmp_path):
+    path = tmp_path / "audio.fifo"
+    os.mkfifo(path)
+
+    samples = (np.sin(np.linspace(0, 100, 8000)) * 20000).astype("<i2")
+    stereo = np.stack([samples, samples // 2], axis=1)
+
+    stream = PCMStream(str(path), sample_rate=8000, channels=2, timeout=0.01)
+    stream.start()
+    assert stream.is_running
+
+    writer = write_fifo(path, [stereo.tobytes()])
+    data = read_until(stream, len(samples))
+    writer.join()
+
+    assert stream.sample_rate == 8000
+    assert len(data) == len(samples)
+    assert_array_almost_equal(
+        data[:4000], stereo[:4000].mean(axis=1).astype(np.float32) / 32768
+    )
+
+    stream.stop()
+    assert stream.is_running is False
+
+
+def test_pcm_stream_fifo_wav(tmp_path):
+    path = tmp_path / "audio.fifo"
+    os.mkfifo(path)
+
+    data = 0.5 * np.sin(np.linspace(0, 100, 4000))
+
+    # written by a streaming recorder, which does not know the size of the data
+    raw = (data * 32767).astype("<i2").tobytes()
+    fmt = struct.pack("<HHIIHH", 1, 1, 16000, 32000, 2, 16)
+    streamed = (
+        b"RIFF"
+        + struct.pack("<I", 0xFFFFFFFF)
+        + b"WAVEfmt "
+        + struct.pack("<I", len(fmt))
+        + fmt
+        + b"data"
+        + struct.pack("<I", 0xFFFFFFFF)
+        + raw
+    )
+
+    # a complete file is read up to the end of its data chunk only
+    complete = wav_bytes(data, 16000, subtype="FLOAT") + b"LIST" + bytes(20)
+
+    stream = PCMStream(str(path), timeout=0.01)
+    stream.start()
+    # two writers one after another, the reader must see the first one close
+    writer = write_fifo(path, [streamed, complete], pause=0.2)
+    decoded = read_until(stream, 2 * len(data))
+    writer.join()
+
+    assert stream.sample_rate == 16000
+    assert len(decoded) == 2 * len(data)
+    assert_array_almost_equal(decoded[: len(data)], data, decimal=3)
+    assert_array_almost_equal(decoded[len(data) :], data, decimal=5)
+    stream.stop()
+
+    # raw input needs a sample rate
+    stream = PCMStream(str(path), timeout=0.01)
+    stream.start()
+    with open(path, "wb") as fifo:
+        fifo.write(raw)  # at once, the reader stops at the first bytes
+    time.sleep(0.2)
+    with pytest.raises(ValueError, match="needs a 'sample_rate'"):
+        stream.read()
+    stream.stop()
+
+
+def test_pcm_stream_socket(tmp_path):
+    socket_path = tmp_path / "audio.sock"
+    stream = PCMStream(f"unix:{socket_path}", sample_rate=8000, timeout=0.01)
+    stream.start()
+    assert socket_path.exists()
+
+    samples = np.arange(0, 3000, dtype="<i2")
+
+    for _ in range(2):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(str(socket_path))
+            connection.sendall(samples.tobytes())
+
+    data = read_until(stream, 2 * len(samples))
+    assert_array_almost_equal(
+        data, np.concatenate([samples, samples]).astype(np.float32) / 32768
+    )
+
+    # all writers must use the same sample rate
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(str(socket_path))
+        connection.sendall(wav_bytes(np.zeros(100), 16000))
+
+    time.sleep(0.2)
+    with pytest.raises(ValueError, match="changed from 8000 to 16000"):
+        stream.read()
+
+    stream.stop()
+    assert socket_path.exists() is False
+
+
+class StubRecording:
+    # stands in for a Recording and reports one detection per analyzed chunk
+    def __init__(self, sample_rate, sample_secs):
+        self.processor = SimpleNamespace(
+            sample_rate=sample_rate,
+            sample_secs=sample_secs,
+            overlap=0.0,
+            resample_type="soxr_hq",
+        )
+        self.skipped_chunks = []
+
+    def analyze_data(self, data, offset=0.0, num_chunks=None):
+        if num_chunks is None:
+            num_chunks = int(
+                np.ceil(
+                    len(data) / self.processor.sample_rate / self.processor.sample_secs
+                )
+            )
+        return [
+            {
+                "start": offset + i * self.processor.sample_secs,
+                "end": offset + (i + 1) * self.processor.sample_secs,
+            }
+            for i in range(num_chunks)
+        ]
+
+
+def test_stream_segment(tmp_path):
+    members = [("first", StubRecording(100, 1.0)), ("second", StubRecording(100, 2.0))]
+    segment = StreamSegment(members, 100, "stream_1", archive_dir=tmp_path / "archive")
+
+    detections = segment.feed(np.zeros(250, dtype=np.float32))
+    assert [(d["model"], d["start"]) for d in detections] == [
+        ("first", 0.0),
+        ("first", 1.0),
+        ("second", 0.0),
+    ]
+    assert segment.duration == 2.5
+
+    detections = segment.feed(np.zeros(50, dtype=np.float32), last=True)
+    assert [(d["model"], d["start"]) for d in detections] == [
+        ("first", 2.0),
+        ("second", 2.0),
+    ]
+    assert len(segment.results) == 5
+    assert segment.skipped == []
+
+    archived, rate = sf.read(tmp_path / "archive" / "stream_1.wav")
+    assert rate == 100
+    assert len(archived) == 300
+
+    # a single model does not tag its detections
+    segment = StreamSegment(members[:1], 100, "stream_2")
+    assert "model" not in segment.feed(np.zeros(100, dtype=np.float32))[0]
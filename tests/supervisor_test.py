@@ -0,0 +1,243 @@
+import pytest
+import multiprocessing
+import os
+import signal
+import time
+
+from faunanet.journal import ProcessingJournal, replay_journal, unfinished_files
+from faunanet.state import StateChannel
+from faunanet.supervisor import WorkerSupervisor
+
+
+def crash(filename, journal_path):
+    # runs in the fake watcher process: dies like from an out-of-memory kill while analyzing a file
+    journal = ProcessingJournal(journal_path)
+    journal.started(filename)
+    journal.close()
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def idle():
+    time.sleep(60)
+
+
+class FakeWatcher:
+    def __init__(self, tmp_path, recording, bad=True):
+        self.outdir = tmp_path / "output"
+        self.outdir.mkdir()
+        self.recording = recording
+        self.bad = bad
+        self.journal_name = "journal.log"
+        self.state_channel = StateChannel()
+        self.watcher_process = None
+        self.output = None
+        self.runs = 0
+
+    def start(self):
+        self.runs += 1
+        self.output = self.outdir / f"run_{self.runs}"
+        self.output.mkdir()
+
+        journal = ProcessingJournal(self.output / self.journal_name)
+        journal.enqueued(self.recording, resumed=self.runs > 1)
+        journal.close()
+
+        if self.bad:
+            args = (self.recording, self.output / self.journal_name)
+            self.watcher_process = multiprocessing.Process(target=crash, args=args)
+        else:
+            self.watcher_process = multiprocessing.Process(target=idle)
+        self.watcher_process.start()
+
+    def wait_for_exit(self):
+        self.watcher_process.join(timeout=30)
+
+
+@pytest.fixture()
+def recording(tmp_path):
+    path = tmp_path / "input" / "bad.wav"
+    path.parent.mkdir()
+    path.write_bytes(b"\x00" * 16)
+    return path
+
+
+def test_supervisor_exceptions(tmp_path):
+    with pytest.raises(ValueError, match="'max_failures' must be >= 1"):
+        WorkerSupervisor(None, max_failures=0)
+
+    with pytest.raises(ValueError, match="'backoff' must be >= 0 and <= 'max_backoff'"):
+        WorkerSupervisor(None, backoff=10, max_backoff=5)
+
+    with pytest.raises(ValueError, match="'max_restarts' must be >= 0"):
+        WorkerSupervisor(None, max_restarts=-1)
+
+    with pytest.raises(ValueError, match="'check_interval' must be > 0"):
+        WorkerSupervisor(None, check_interval=0)
+
+
+def test_supervisor_backoff():
+    supervisor = WorkerSupervisor(None, backoff=1.0, max_backoff=5.0)
+
+    delays = []
+    for crashes in range(1, 6):
+        supervisor.consecutive_crashes = crashes
+        delays.append(supervisor._next_backoff())
+
+    assert delays == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+
+def test_supervisor_restart_and_quarantine(tmp_path, recording):
+    watcher = FakeWatcher(tmp_path, str(recording))
+    supervisor = WorkerSupervisor(watcher, max_failures=2, backoff=0.0)
+
+    # nothing to do while there is no process
+    assert supervisor.check() is False
+
+    watcher.start()
+    watcher.wait_for_exit()
+    first = watcher.output
+
+    # the crash is noticed and the file is charged with a failure, the restart resumes it
+    assert supervisor.check() is True
+    assert watcher.runs == 2
+    assert replay_journal(first / "journal.log")[str(recording)]["event"] == "failed"
+    assert unfinished_files([first / "journal.log"]) == [str(recording)]
+    assert recording.is_file()
+
+    # the second failure sets the file aside, which the next run does not resume
+    watcher.wait_for_exit()
+    assert supervisor.check() is True
+    second = watcher.output.parent / "run_2"
+    assert replay_journal(second / "journal.log")[str(recording)]["event"] == (
+        "quarantined"
+    )
+    assert recording.is_file() is False
+    assert (second / "quarantine" / "bad.wav").is_file()
+
+    status = supervisor.status()
+    assert status["restarts"] == 2
+    assert status["crashes"] == 2
+    assert status["last_exitcode"] == -signal.SIGKILL
+    assert status["restart_in"] is None
+    assert status["quarantined"] == [str(recording)]
+
+
+def test_supervisor_failures_from_journals(tmp_path, recording):
+    watcher = FakeWatcher(tmp_path, str(recording))
+
+    watcher.start()
+    watcher.wait_for_exit()
+    assert WorkerSupervisor(watcher, max_failures=2, backoff=0.0).check() is True
+    assert recording.is_file()
+
+    # the failure of the earlier run counts for a supervisor of a restarted owner process
+    watcher.wait_for_exit()
+    supervisor = WorkerSupervisor(watcher, max_failures=2, backoff=0.0)
+    assert supervisor.check() is True
+    assert recording.is_file() is False
+    assert supervisor.status()["quarantined"] == [str(recording)]
+
+
+def test_supervisor_errors(tmp_path, recording, monkeypatch):
+    watcher = FakeWatcher(tmp_path, str(recording))
+    errors = []
+    supervisor = WorkerSupervisor(
+        watcher, backoff=0.0, on_error=lambda e, tb: errors.append((e, tb))
+    )
+
+    watcher.start()
+    watcher.wait_for_exit()
+
+    # the crashed run cannot be recovered and the first restart fails, e.g., because the disk is full
+    def broken_recover(output):
+        raise OSError("No space left on device")
+
+    start = watcher.start
+
+    def broken_start():
+        watcher.start = start
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(supervisor, "_recover", broken_recover)
+    watcher.start = broken_start
+
+    assert supervisor.check() is False
+    assert len(errors) == 2
+    assert supervisor.status()["restart_in"] is not None
+
+    # the restart is tried again
+    assert supervisor.check() is True
+    assert watcher.runs == 2
+    watcher.wait_for_exit()
+
+    # an error of a whole check does not stop the thread
+    def broken_check():
+        raise KeyError("event")
+
+    monkeypatch.setattr(supervisor, "check", broken_check)
+    supervisor.check_interval = 0.05
+    supervisor.start()
+    deadline = time.time() + 5
+    while len(errors) < 4:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    assert supervisor.is_running
+    supervisor.stop()
+
+
+def test_supervisor_max_restarts(tmp_path, recording):
+    watcher = FakeWatcher(tmp_path, str(recording))
+    supervisor = WorkerSupervisor(
+        watcher,
+        backoff=0.0,
+        max_restarts=1,
+        quarantine_dir=tmp_path / "quarantine",
+    )
+
+    watcher.start()
+    watcher.wait_for_exit()
+    assert supervisor.check() is True
+
+    # the watcher stays down once the restarts are used up
+    watcher.wait_for_exit()
+    assert supervisor.check() is False
+    assert supervisor.check() is False
+    assert watcher.runs == 2
+    assert watcher.watcher_process is None
+    assert watcher.state_channel.state == "failed"
+    assert supervisor.status()["crashes"] == 2
+
+    # a file is set aside only after 'max_failures'
+    assert recording.is_file()
+    assert (tmp_path / "quarantine").exists() is False
+
+
+def test_supervisor_start_stop(tmp_path, recording):
+    watcher = FakeWatcher(tmp_path, str(recording), bad=False)
+    supervisor = WorkerSupervisor(watcher, backoff=30.0, check_interval=0.05)
+
+    watcher.start()
+    supervisor.start()
+    assert supervisor.is_running
+
+    with pytest.raises(RuntimeError, match="Worker supervisor is already running"):
+        supervisor.start()
+
+    os.kill(watcher.watcher_process.pid, signal.SIGKILL)
+
+    deadline = time.time() + 10
+    while supervisor.status()["crashes"] == 0 and time.time() < deadline:
+        time.sleep(0.05)
+
+    # the restart waits for the backoff, stopping the supervisor cancels it
+    status = supervisor.status()
+    assert status["crashes"] == 1
+    assert status["restarts"] == 0
+    assert 0 < status["restart_in"] <= 30
+
+    # stopping tells that the watcher was waiting for its restart
+    assert supervisor.stop() is True
+    assert supervisor.is_running is False
+    assert supervisor.status()["restart_in"] is None
+    assert watcher.runs == 1
+    assert supervisor.stop() is False
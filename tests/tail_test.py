@@ -0,0 +1,225 @@
+import pytest
+import struct
+import threading
+import time
+from types import SimpleNamespace
+import numpy as np
+import soundfile as sf
+from numpy.testing import assert_array_almost_equal
+
+from faunanet.tail import WavTail, ChunkStream, can_tail
+
+
+def wav_header(rate, channels, bits, fmt_tag=1, data_size=0):
+    block_align = channels * bits // 8
+    fmt = struct.pack(
+        "<HHIIHH", fmt_tag, channels, rate, rate * block_align, block_align, bits
+    )
+    return (
+        b"RIFF"
+        + struct.pack("<I", 0)
+        + b"WAVE"
+        + b"fmt "
+        + struct.pack("<I", len(fmt))
+        + fmt
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
+
+
+def finalize(path, data_size):
+    with open(path, "r+b") as f:
+        f.seek(40)
+        f.write(struct.pack("<I", data_size))
+
+
+def test_can_tail():
+    assert can_tail("a/b.wav")
+    assert can_tail("b.WAV")
+    assert can_tail("b.flac") is False
+
+
+def test_wav_tail_read(tmp_path):
+    path = tmp_path / "growing.wav"
+    samples = (np.sin(np.linspace(0, 50, 3000)) * 20000).astype("<i2")
+
+    with open(path, "wb") as f:
+        f.write(wav_header(8000, 1, 16)[:20])  # incomplete header
+
+    tail = WavTail(path)
+    assert len(tail.read()) == 0
+    assert tail.has_header is False
+
+    with open(path, "wb") as f:
+        f.write(wav_header(8000, 1, 16))
+        f.write(samples[:1000].tobytes())
+        f.write(samples[1000:1001].tobytes()[:1])  # half a frame
+
+    first = tail.read()
+    assert tail.sample_rate == 8000
+    assert len(first) == 1000
+    assert tail.is_complete() is False
+
+    with open(path, "ab") as f:
+        f.write(samples[1000:1001].tobytes()[1:])
+        f.write(samples[1001:].tobytes())
+        f.write(b"LIST" + struct.pack("<I", 4) + b"INFO")  # metadata after the data
+
+    # once the writer has set the size, trailing chunks are not read as audio
+    finalize(path, 2 * len(samples))
+    second = tail.read()
+    assert len(second) == 2000
+    assert tail.is_complete() is True
+    assert len(tail.read()) == 0
+
+    assert_array_almost_equal(
+        np.concatenate([first, second]), samples.astype(np.float32) / 32768
+    )
+    tail.close()
+
+
+@pytest.mark.parametrize("subtype", ["PCM_U8", "PCM_16", "PCM_24", "PCM_32", "FLOAT"])
+def test_wav_tail_formats(tmp_path, subtype):
+    path = tmp_path / "example.wav"
+    data = 0.5 * np.sin(np.linspace(0, 50, 2000)).reshape(-1, 2)
+    sf.write(path, data, 16000, subtype=subtype)
+
+    tail = WavTail(path)
+    decoded = tail.read()
+    reference, _ = sf.read(path, dtype="float32")
+
+    assert tail.channels == 2
+    assert tail.is_complete() is True
+    assert_array_almost_equal(decoded, reference.mean(axis=1), decimal=2)
+    tail.close()
+
+
+def test_wav_tail_not_a_wav(tmp_path):
+    path = tmp_path / "example.wav"
+    with open(path, "wb") as f:
+        f.write(b"fLaC" + bytes(100))
+
+    with pytest.raises(ValueError, match="is not a WAV file"):
+        WavTail(path).read()
+
+    sf.write(path, np.zeros(100), 8000, subtype="ULAW")
+    with pytest.raises(ValueError, match="Unsupported sample format 7 with 8 bits"):
+        WavTail(path).read()
+
+
+def test_wav_tail_follow(tmp_path):
+    path = tmp_path / "growing.wav"
+    samples = np.arange(0, 4000, dtype="<i2")
+
+    with open(path, "wb") as f:
+        f.write(wav_header(8000, 1, 16))
+
+    def write():
+        for block in np.split(samples, 4):
+            time.sleep(0.05)
+            with open(path, "ab") as f:
+                f.write(block.tobytes())
+        finalize(path, 2 * len(samples))
+
+    writer = threading.Thread(target=write)
+    writer.start()
+
+    tail = WavTail(path)
+    start = time.time()
+    parts = list(tail.follow(poll_interval=0.01, idle_timeout=5.0))
+    writer.join()
+
+    # the finalized header ends the file long before the idle timeout
+    assert time.time() - start < 2.0
+    assert len(parts[-1]) == 0
+    assert len(parts) > 2
+    assert_array_almost_equal(np.concatenate(parts), samples.astype(np.float32) / 32768)
+
+    # without a size in the header, the file is closed after the idle timeout
+    with open(path, "r+b") as f:
+        f.seek(40)
+        f.write(struct.pack("<I", 0))
+
+    tail = WavTail(path)
+    start = time.time()
+    parts = list(tail.follow(poll_interval=0.01, idle_timeout=0.2))
+    assert time.time() - start >= 0.2
+    assert sum(len(p) for p in parts) == len(samples)
+
+    with open(path, "wb") as f:
+        f.write(b"RIFF")
+
+    with pytest.raises(ValueError, match="has no complete WAV header"):
+        list(WavTail(path).follow(poll_interval=0.01, idle_timeout=0.05))
+
+
+class StubRecording:
+    # stands in for a Recording and reports one detection per analyzed chunk
+    def __init__(self, sample_rate, sample_secs, overlap=0.0):
+        self.processor = SimpleNamespace(
+            sample_rate=sample_rate,
+            sample_secs=sample_secs,
+            overlap=overlap,
+            resample_type="soxr_hq",
+        )
+        self.skipped_chunks = []
+        self.calls = []
+
+    def analyze_data(self, data, offset=0.0, num_chunks=None):
+        self.calls.append((len(data), offset, num_chunks))
+        step = self.processor.sample_secs - self.processor.overlap
+        if num_chunks is None:
+            num_chunks = int(np.ceil(len(data) / self.processor.sample_rate / step))
+        return [
+            {"start": offset + i * step, "end": offset + i * step + 3.0}
+            for i in range(num_chunks)
+        ]
+
+
+def test_chunk_stream():
+    recording = StubRecording(100, 3.0)
+    stream = ChunkStream(recording, 100)
+    assert stream.resampler is None
+
+    assert stream.feed(np.zeros(250, dtype=np.float32)) == []
+    assert recording.calls == []
+
+    detections = stream.feed(np.zeros(400, dtype=np.float32))
+    assert recording.calls == [(600, 0.0, 2)]
+    assert [d["start"] for d in detections] == [0.0, 3.0]
+    assert len(stream.pending) == 50
+
+    detections = stream.feed(np.zeros(300, dtype=np.float32))
+    assert recording.calls[-1] == (300, 6.0, 1)
+    assert [d["start"] for d in detections] == [6.0]
+
+    # the rest is analyzed like the end of a file
+    detections = stream.feed(np.zeros(0, dtype=np.float32), last=True)
+    assert recording.calls[-1] == (50, 9.0, None)
+    assert [d["start"] for d in stream.detections] == [0.0, 3.0, 6.0, 9.0]
+
+
+def test_chunk_stream_overlap_and_resampling():
+    recording = StubRecording(1000, 3.0, overlap=1.0)
+    stream = ChunkStream(recording, 2000)
+    assert stream.resampler is not None
+
+    for _ in range(10):
+        stream.feed(np.random.rand(1400).astype(np.float32))
+
+    # chunks are analyzed while data comes in, and start every 2 seconds
+    assert len(recording.calls) > 0
+    assert all(num_chunks is not None for _, _, num_chunks in recording.calls)
+
+    stream.feed(np.zeros(0, dtype=np.float32), last=True)
+    assert recording.calls[-1][2] is None
+
+    offsets = [offset for _, offset, _ in recording.calls]
+    assert offsets == sorted(offsets)
+    assert all(offset % 2.0 == pytest.approx(0.0) for offset in offsets)
+
+    # the resampler delivers all samples in the end
+    assert stream.consumed == pytest.approx(10 * 1400 / 2, abs=2)
+
+    with pytest.raises(ValueError, match="'overlap' must be smaller"):
+        ChunkStream(StubRecording(100, 3.0, overlap=3.0), 100)
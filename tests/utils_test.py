@@ -1,7 +1,25 @@
 import pytest
-from faunanet.utils import update_dict_leafs_recursive, read_yaml
+import os
+from faunanet.utils import (
+    update_dict_leafs_recursive,
+    read_yaml,
+    quantize,
+    dequantize,
+    QuantizedInterpreter,
+    ONNXInterpreter,
+    TFModelException,
+    MODEL_BACKENDS,
+    load_model_from_file_onnx,
+    model_backend_of,
+    register_model_backend,
+    matches_pattern,
+    patterns_of,
+)
 from pathlib import Path
+import faunanet.workers
 import yaml
+import numpy as np
+from numpy.testing import assert_array_almost_equal
 
 
 def test_update_dict_leafs_recursive():
@@ -16,6 +34,17 @@ def test_update_dict_leafs_recursive():
     assert base == {"a": 1, "b": {"c": 2, "d": 3}}
 
 
+def test_matches_pattern():
+    assert patterns_of(".wav") == [".wav"]
+    assert patterns_of([".WAV", ".flac"]) == [".wav", ".flac"]
+
+    assert matches_pattern("a/b/example.wav", ".wav")
+    assert matches_pattern("example.WAV", ".wav")
+    assert matches_pattern("example.flac", [".wav", ".flac"])
+    assert matches_pattern("example.mp3", [".wav", ".flac"]) is False
+    assert matches_pattern("example", ".wav") is False
+
+
 def test_read_yaml(tmpdir):
     # Create a temporary yaml file
     p = Path(tmpdir) / "test.yaml"
@@ -30,3 +59,129 @@ def test_read_yaml(tmpdir):
     # Test FileNotFoundError
     with pytest.raises(FileNotFoundError):
         read_yaml("/non/existent/path.yaml")
+
+
+class FakeInterpreter:
+    # stands in for a tflite interpreter with an int8 input and a uint8 output
+    def __init__(self):
+        self.tensors = {}
+
+    def get_input_details(self):
+        return [{"index": 0, "dtype": np.int8, "quantization": (0.5, -3)}]
+
+    def get_output_details(self):
+        return [
+            {"index": 5, "dtype": np.uint8, "quantization": (0.25, 10)},
+            {"index": 6, "dtype": np.float32, "quantization": (0.0, 0)},
+        ]
+
+    def set_tensor(self, index, value):
+        self.tensors[index] = value
+
+    def get_tensor(self, index):
+        return self.tensors[index]
+
+    def invoke(self):
+        self.tensors[5] = np.array([10, 14, 255], dtype=np.uint8)
+        self.tensors[6] = np.array([0.5], dtype=np.float32)
+
+
+def test_quantize_dequantize():
+    data = np.array([-100.0, -1.0, 0.0, 0.26, 1.0, 100.0])
+
+    quantized = quantize(data, 0.5, -3, np.int8)
+    assert quantized.dtype == np.int8
+    assert quantized.tolist() == [-128, -5, -3, -2, -1, 127]
+
+    assert_array_almost_equal(
+        dequantize(quantized[1:5], 0.5, -3), np.array([-1.0, 0.0, 0.5, 1.0])
+    )
+
+
+def test_quantized_interpreter():
+    interpreter = FakeInterpreter()
+    assert QuantizedInterpreter.is_quantized(interpreter) is True
+
+    wrapped = QuantizedInterpreter(interpreter)
+    assert wrapped.input_quantization == {0: (0.5, -3, np.int8)}
+    assert wrapped.output_quantization == {5: (0.25, 10, np.uint8), 6: None}
+
+    wrapped.set_tensor(0, np.array([[1.0, -1.0]], dtype=np.float32))
+    assert interpreter.tensors[0].dtype == np.int8
+    assert interpreter.tensors[0].tolist() == [[-1, -5]]
+
+    # already quantized input is passed on unchanged
+    wrapped.set_tensor(0, np.array([[7]], dtype=np.int8))
+    assert interpreter.tensors[0].tolist() == [[7]]
+
+    # attributes of the interpreter are passed through
+    wrapped.invoke()
+    assert_array_almost_equal(wrapped.get_tensor(5), np.array([0.0, 1.0, 61.25]))
+    assert wrapped.get_tensor(6).tolist() == [0.5]
+    assert wrapped.get_input_details() == interpreter.get_input_details()
+
+
+def test_model_backends(tmp_path):
+    assert model_backend_of(tmp_path / "model.tflite") == "tflite"
+    assert model_backend_of(tmp_path / "saved_model.pb") == "saved_model"
+    assert model_backend_of(tmp_path / "model.onnx") == "onnx"
+
+    with pytest.raises(ValueError, match="Model filename unknown: model.pt"):
+        model_backend_of(tmp_path / "model.pt")
+
+    register_model_backend("torch", "model.pt", lambda path, num_threads: None)
+    try:
+        assert model_backend_of(tmp_path / "model.pt") == "torch"
+    finally:
+        del MODEL_BACKENDS["torch"]
+
+
+def test_load_model_from_file_onnx(tmp_path, make_onnx_model):
+    with pytest.raises(FileNotFoundError, match="does not exist"):
+        load_model_from_file_onnx(tmp_path / "model.onnx")
+
+    (tmp_path / "broken.onnx").write_bytes(b"not a model")
+    with pytest.raises(TFModelException):
+        load_model_from_file_onnx(tmp_path / "broken.onnx")
+
+    interpreter = load_model_from_file_onnx(
+        make_onnx_model(tmp_path / "model.onnx"), num_threads=2
+    )
+    assert isinstance(interpreter, ONNXInterpreter)
+    assert QuantizedInterpreter.is_quantized(interpreter) is False
+
+    details = interpreter.get_input_details()
+    assert details[0]["index"] == 0
+    assert details[0]["shape"].tolist() == [1, 4]
+    assert details[0]["dtype"] == np.float32
+    assert interpreter.get_output_details()[0]["index"] == 1
+
+    # tflite style with a resized input that is written to in place
+    interpreter.resize_tensor_input(0, [3, 4])
+    interpreter.allocate_tensors()
+    interpreter.tensor(0)()[:] = np.arange(12).reshape(3, 4)
+    interpreter.invoke()
+    assert_array_almost_equal(
+        interpreter.get_tensor(1), [[2.0, 4.0], [10.0, 12.0], [18.0, 20.0]]
+    )
+
+    interpreter.set_tensor(0, [[1.0, 1.0, 1.0, 0.0]])
+    interpreter.invoke()
+    assert_array_almost_equal(interpreter.get_tensor(1), [[2.0, 1.0]])
+
+    assert_array_almost_equal(interpreter(np.ones((2, 4))), [[2.0, 2.0], [2.0, 2.0]])
+
+
+def test_load_model_from_file_onnx_preloaded(tmp_path, make_onnx_model, monkeypatch):
+    path = make_onnx_model(tmp_path / "model.onnx")
+    monkeypatch.setattr(faunanet.workers, "_MODEL_CONTENT", {})
+    faunanet.workers.preload_model_files([path])
+
+    # the model is built from memory, not from the file, as long as the file looks unchanged
+    stat = path.stat()
+    path.write_bytes(b"x" * stat.st_size)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    interpreter = load_model_from_file_onnx(path)
+    interpreter.set_tensor(0, [[1.0, 1.0, 1.0, 0.0]])
+    interpreter.invoke()
+    assert_array_almost_equal(interpreter.get_tensor(1), [[2.0, 1.0]])
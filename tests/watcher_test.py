@@ -10,6 +10,18 @@ import multiprocessing
 import time
 from datetime import datetime
 import shutil
+from faunanet.cache import ResultsCache, hash_config
+from faunanet.journal import ProcessingJournal, replay_journal
+from faunanet.scan_observer import ScanObserver
+from faunanet.activity_gate import ActivityGate
+import csv
+from types import SimpleNamespace
+import soundfile as sf
+import numpy as np
+import threading
+import os
+import signal
+from watchdog.observers import Observer
 
 
 def test_watcher_construction(watch_fx, mocker):
@@ -291,10 +303,7 @@ def test_watcher_exceptions(watch_fx, mocker):
     ):
         watcher.start()
 
-    with pytest.warns(
-        UserWarning, match="stop timeout expired, terminating watcher process now."
-    ):
-        watcher.stop()
+    watcher.stop()
 
     with pytest.raises(
         RuntimeError, match="Cannot continue watcher process, is not alive anymore."
@@ -312,7 +321,7 @@ def test_watcher_exceptions(watch_fx, mocker):
         watcher.pause()
 
     mocker.patch(
-        "multiprocessing.Process.terminate",
+        "multiprocessing.Process.close",
         side_effect=ValueError("Simulated error occurred"),
     )
 
@@ -860,6 +869,10 @@ def test_cleanup_simple(
 
     assert len(missing_files) > 0
 
+    # files finished by the clean up are recorded in the journal of their run, such that they are not resumed again
+    journal = replay_journal(old_output / watcher.journal_name)
+    assert all(journal[f]["event"] == "completed" for f in missing_files)
+
     reference = wfx.read_csv(old_output / "results_example_0.csv")
 
     for m in missing_files:
@@ -1077,3 +1090,1213 @@ def test_cleanup_exceptions(watch_fx, mocker):
     recorder_process.close()
 
     watcher.stop()
+
+
+def test_watcher_publisher_config(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher(
+        publisher_config={"socket_path": str(wfx.output / "detections.sock")}
+    )
+
+    assert watcher.publisher_config == {
+        "socket_path": str(wfx.output / "detections.sock")
+    }
+    assert watcher.publisher is None
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+
+    cfg = read_yaml(watcher.output / "config.yml")
+    assert cfg["Analysis"]["Publisher"] == watcher.publisher_config
+
+    with pytest.raises(
+        ValueError, match="'publisher_config' must contain a 'socket_path'"
+    ):
+        wfx.make_watcher(publisher_config={"min_confidence": 0.5})
+
+
+def test_watcher_ensemble_config(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher(
+        ensemble_config=[
+            {"model_name": "birdnet_default", "Model": {"num_threads": 1}},
+        ]
+    )
+
+    assert watcher.ensemble_config == [
+        {
+            "model_name": "birdnet_default",
+            "Model": {"num_threads": 1},
+            "Preprocessor": {},
+            "Recording": {},
+            "SpeciesPredictor": {},
+        }
+    ]
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+
+    cfg = read_yaml(watcher.output / "config.yml")
+    assert cfg["Analysis"]["Ensemble"] == watcher.ensemble_config
+
+    with pytest.raises(
+        ValueError, match="Each entry of 'ensemble_config' needs a 'model_name'"
+    ):
+        wfx.make_watcher(ensemble_config=[{"Model": {}}])
+
+    with pytest.raises(
+        ValueError,
+        match="Model not_there of the ensemble does not exist in model directory",
+    ):
+        wfx.make_watcher(ensemble_config=[{"model_name": "not_there"}])
+
+
+class CountingRecording:
+    # stands in for a Recording to count how often a file is actually analyzed
+    def __init__(self):
+        self.path = None
+        self.analyzed = False
+        self.num_analyzed = 0
+        self.file_check_poll_interval = 0.1
+        self.decoder = None
+        self.gate = None
+        self.skipped_chunks = []
+
+    def analyze(self):
+        self.num_analyzed += 1
+        self.analyzed = True
+
+    @property
+    def detections(self):
+        return [{"start": 0.0, "end": 3.0, "label": "Turdus merula", "confidence": 0.9}]
+
+
+def test_watcher_cache(watch_fx):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="'cache_config' must contain a 'directory'"):
+        wfx.make_watcher(cache_config={"max_size_mb": 10})
+
+    watcher = wfx.make_watcher(cache_config={"directory": str(wfx.output / "cache")})
+    assert watcher.cache is None
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+
+    cfg = read_yaml(watcher.output / "config.yml")
+    assert cfg["Analysis"]["Cache"] == {"directory": str(wfx.output / "cache")}
+
+    cache = ResultsCache(**cfg["Analysis"]["Cache"])
+    config_hash = hash_config(cfg["Analysis"])
+    recording = CountingRecording()
+
+    files = wfx.get_folder_content(wfx.data, ".wav")
+    duplicate = wfx.output / "duplicate.wav"
+    shutil.copy(files[0], duplicate)
+
+    for filename in [files[0], duplicate, files[0]]:
+        results = watcher._analyze_file(
+            filename,
+            "birdnet_default",
+            recording,
+            cache=cache,
+            config_hash=config_hash,
+        )
+        assert results == recording.detections
+
+    # identical audio is only analyzed once
+    assert recording.num_analyzed == 1
+    assert cache.hits == 2
+
+    # a different config needs a new analysis
+    watcher._analyze_file(
+        files[0],
+        "birdnet_default",
+        recording,
+        cache=cache,
+        config_hash=hash_config(dict(cfg["Analysis"], Model={"num_threads": 4})),
+    )
+    assert recording.num_analyzed == 2
+
+
+def test_watcher_decode_stats(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher(pattern=[".wav", ".flac"])
+    assert watcher.read_decode_stats() == {}
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+
+    recording = CountingRecording()
+    recording.decode_stats = {".wav": {"files": 1, "backend": "soundfile"}}
+
+    watcher._write_stats(recording)
+    assert watcher.read_decode_stats() == recording.decode_stats
+
+    # within the interval, the file is not rewritten
+    recording.decode_stats = {".wav": {"files": 2, "backend": "soundfile"}}
+    watcher._write_stats(recording)
+    assert watcher.read_decode_stats()[".wav"]["files"] == 1
+
+    watcher.decode_stats_interval = 0.0
+    watcher._write_stats(recording)
+    assert watcher.read_decode_stats()[".wav"]["files"] == 2
+    assert watcher.read_gate_stats() == {}
+
+    # with an activity gate, its statistics and the skipped chunks are written, too
+    recording.gate = ActivityGate(min_energy_db=-60)
+    recording.gate.num_chunks = 4
+    recording.gate.num_skipped = 1
+    watcher._write_stats(recording)
+    assert watcher.read_gate_stats() == {"chunks": 4, "skipped": 1, "skip_ratio": 0.25}
+
+    watcher.save_results(watcher.output, [], suffix="quiet", skipped=[(0.0, 3.0)])
+    watcher.save_results(
+        watcher.output, [], suffix="quieter", skipped=[(0.0, 3.0), (3.0, 6.0)]
+    )
+    watcher.save_results(watcher.output, [], suffix="loud", skipped=[])
+
+    with open(watcher.output / "skipped_chunks.csv", "r") as csvfile:
+        rows = list(csv.reader(csvfile))
+
+    assert rows == [
+        ["recording", "start", "end"],
+        ["quiet", "0.0", "3.0"],
+        ["quieter", "0.0", "3.0"],
+        ["quieter", "3.0", "6.0"],
+    ]
+
+
+class TailRecording:
+    # stands in for a Recording in tail mode and reports one detection per analyzed chunk
+    def __init__(self):
+        self.processor = SimpleNamespace(
+            sample_rate=8000, sample_secs=1.0, overlap=0.0, resample_type="soxr_hq"
+        )
+        self.skipped_chunks = []
+        self.decode_stats = {}
+        self.gate = None
+
+    def analyze_data(self, data, offset=0.0, num_chunks=None):
+        if num_chunks is None:
+            num_chunks = int(np.ceil(len(data) / 8000))
+        return [
+            {
+                "start": offset + i,
+                "end": offset + i + 1.0,
+                "label": "a",
+                "confidence": 0.9,
+            }
+            for i in range(num_chunks)
+        ]
+
+
+def test_watcher_tail(watch_fx):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="'idle_timeout' of 'tail_config' must be > 0"):
+        wfx.make_watcher(tail_config={"idle_timeout": 0})
+
+    watcher = wfx.make_watcher(tail_config={"poll_interval": 0.01, "idle_timeout": 5})
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Tail"] == {
+        "poll_interval": 0.01,
+        "idle_timeout": 5,
+    }
+
+    path = wfx.output / "growing.wav"
+    samples = np.zeros(8000 * 4, dtype=np.int16)
+    partial = watcher.output / "results_growing.part.csv"
+    seen_partial = []
+
+    recorder = sf.SoundFile(path, "w", samplerate=8000, channels=1, subtype="PCM_16")
+    recorder.write(samples[:8000])
+    recorder.flush()
+
+    def write_rest():
+        for block in np.split(samples[8000:], 3):
+            time.sleep(0.1)
+            seen_partial.append(partial.is_file())
+            recorder.write(block)
+            recorder.flush()
+        recorder.close()  # sets the size in the header
+
+    writer = threading.Thread(target=write_rest)
+    writer.start()
+    start = time.time()
+    results = watcher._tail_file(path, "birdnet_default", TailRecording(), None)
+    writer.join()
+
+    # the closed file is finalized long before the idle timeout
+    assert time.time() - start < 4.0
+
+    # detections of complete chunks are written before the file is closed
+    assert any(seen_partial)
+    assert partial.is_file() is False
+    assert [d["start"] for d in results] == [0.0, 1.0, 2.0, 3.0]
+    assert watcher.skipped_chunks == []
+
+
+def test_watcher_stream(watch_fx, tmp_path):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="'stream_config' must contain a 'source'"):
+        wfx.make_watcher(stream_config={"sample_rate": 8000})
+
+    with pytest.raises(ValueError, match="cannot be stdin"):
+        wfx.make_watcher(stream_config={"source": "-"})
+
+    with pytest.raises(
+        ValueError, match="'segment_secs' of 'stream_config' must be >= 1"
+    ):
+        wfx.make_watcher(stream_config={"source": "audio.fifo", "segment_secs": 0})
+
+    with pytest.raises(ValueError, match="'sample_format' must be in"):
+        wfx.make_watcher(stream_config={"source": "audio.fifo", "sample_format": "x"})
+
+    fifo = tmp_path / "audio.fifo"
+    os.mkfifo(fifo)
+    stream_config = {
+        "source": str(fifo),
+        "sample_rate": 8000,
+        "segment_secs": 3,
+        "archive_dir": str(tmp_path / "archive"),
+        "timeout": 0.01,
+    }
+    watcher = wfx.make_watcher(stream_config=stream_config)
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Stream"] == (
+        stream_config
+    )
+
+    stream = watcher._set_up_stream()
+    stream.start()
+    watcher.may_do_work.set()
+    recording = TailRecording()
+
+    # nothing has arrived yet
+    watcher.analyze_stream(stream, recording)
+    assert watcher.segment is None
+
+    samples = (np.random.rand(8000 * 4) * 2000).astype("<i2")
+    with open(fifo, "wb") as writer:
+        writer.write(samples.tobytes())
+
+        start = time.time()
+        while stream.buffer is None or stream.buffer.available < len(samples):
+            assert time.time() - start < 5.0
+            time.sleep(0.01)
+
+        # the first segment is full after 3 seconds, the rest goes into the next one
+        watcher.analyze_stream(stream, recording)
+        names = [f.name for f in watcher.output.iterdir()]
+        assert len([n for n in names if n.endswith(".part.csv")]) == 1
+        assert watcher.segment is not None
+        assert watcher.segment.duration == 1.0
+
+    # the writer closed the pipe, so the second segment is finished as well
+    time.sleep(0.2)
+    watcher.analyze_stream(stream, recording)
+    stream.stop()
+
+    assert watcher.segment is None
+    results = sorted(watcher.output.glob("results_stream_*.csv"))
+    assert len(list(watcher.output.glob("*.part.csv"))) == 0
+    assert len(results) == 2
+
+    starts = []
+    for path in results:
+        with open(path, "r") as csvfile:
+            starts.extend(float(row["start"]) for row in csv.DictReader(csvfile))
+    assert sorted(starts) == [0.0, 0.0, 1.0, 2.0]
+
+    archived = sorted((tmp_path / "archive").glob("stream_*.wav"))
+    assert sum(sf.info(path).frames for path in archived) == len(samples)
+
+
+def test_watcher_compaction_config(watch_fx):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="'interval' must be > 0"):
+        wfx.make_watcher(compaction_config={"interval": 0})
+
+    watcher = wfx.make_watcher(compaction_config={"interval": 60, "min_age": 10})
+    assert watcher.compactor is None
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Compaction"] == {
+        "interval": 60,
+        "min_age": 10,
+    }
+
+    compactor = watcher._set_up_compactor()
+    assert compactor.outdir == watcher.outdir
+    assert compactor.exclude == watcher.output
+    assert compactor.interval == 60
+    assert compactor.min_age == 10
+    assert compactor.remove_csv is True
+
+
+def test_watcher_retention_config(watch_fx):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="'high_water' must be > 0 and <= 1"):
+        wfx.make_watcher(retention_config={"high_water": 0})
+
+    watcher = wfx.make_watcher(
+        retention_config={"high_water": 0.8, "keep_min_confidence": 0.7}
+    )
+    assert watcher.retention is None
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Retention"] == {
+        "high_water": 0.8,
+        "keep_min_confidence": 0.7,
+    }
+
+    retention = watcher._set_up_retention()
+    assert retention.indir == Path(watcher.input)
+    assert retention.outdir == Path(watcher.outdir)
+    assert retention.pattern == watcher.pattern
+    assert retention.high_water == 0.8
+    assert retention.low_water == 0.8
+    assert retention.keep_min_confidence == 0.7
+
+
+def test_watcher_worker_config(watch_fx):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="'preload' of 'worker_config' must be a list"):
+        wfx.make_watcher(worker_config={"preload": "faunanet"})
+
+    watcher = wfx.make_watcher()
+    assert watcher._worker_context() is multiprocessing
+
+    watcher = wfx.make_watcher(
+        worker_config={"preload": ["faunanet.buffers"], "preload_models": True}
+    )
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Workers"] == {
+        "preload": ["faunanet.buffers"],
+        "preload_models": True,
+    }
+
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        assert watcher._worker_context().get_start_method() == "forkserver"
+
+
+def test_watcher_supervisor_config(watch_fx):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="'max_failures' must be >= 1"):
+        wfx.make_watcher(supervisor_config={"max_failures": 0})
+
+    watcher = wfx.make_watcher()
+    assert watcher.supervisor is None
+
+    watcher = wfx.make_watcher(supervisor_config={"max_failures": 2, "backoff": 5})
+    assert watcher.supervisor.watcher is watcher
+    assert watcher.supervisor.max_failures == 2
+    assert watcher.supervisor.backoff == 5
+    assert watcher.supervisor.is_running is False
+
+    # the watcher process gets the watcher without the supervisor
+    assert watcher.__getstate__()["supervisor"] is None
+    assert watcher.supervisor is not None
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Supervisor"] == {
+        "max_failures": 2,
+        "backoff": 5,
+    }
+
+
+def test_watcher_shedding_config(watch_fx):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="'low_water' must be >= 0 and < 'high_water'"):
+        wfx.make_watcher(shedding_config={"high_water": 1, "low_water": 1})
+
+    with pytest.raises(ValueError, match="'fallback_model' of 'shedding_config' must"):
+        wfx.make_watcher(shedding_config={"fallback_model": {"model_name": "none"}})
+
+    # without the fallback step, no fallback model is needed
+    watcher = wfx.make_watcher(
+        shedding_config={
+            "high_water": 4,
+            "steps": ["overlap", "skip"],
+            "overlap": 0.0,
+        }
+    )
+    assert watcher.shedder is None
+    assert watcher._set_up_shedder().steps == ["overlap", "skip"]
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Shedding"] == {
+        "high_water": 4,
+        "steps": ["overlap", "skip"],
+        "overlap": 0.0,
+    }
+
+    # decisions and skipped files are kept in the output folder
+    assert watcher.read_shedding_stats() == {}
+    shedder = watcher._set_up_shedder()
+    shedder.update(5)
+    watcher._write_shedding(shedder)
+    stats = watcher.read_shedding_stats()
+    assert stats["level"] == 1
+    assert stats["steps"] == ["overlap"]
+    assert stats["decisions"] == shedder.decisions
+
+    watcher.shed_file(wfx.data / "a.wav")
+    watcher.shed_file(wfx.data / "b.wav")
+    assert watcher._read_shed_files(watcher.output) == [
+        wfx.data / "a.wav",
+        wfx.data / "b.wav",
+    ]
+
+
+def test_event_handler_shedding(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher(
+        shedding_config={
+            "high_water": 2,
+            "low_water": 0,
+            "hold": 0,
+            "overlap": 0.5,
+            "activity_gate": {"min_energy_db": -50.0},
+            "steps": ["overlap", "activity_gate", "skip"],
+        },
+        preprocessor_config=dict(wfx.preprocessor_cfg, overlap=1.0),
+    )
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher.shedder = watcher._set_up_shedder()
+
+    event_handler = AnalysisEventHandler(watcher)
+    recording = event_handler.recording
+
+    # files are queued, not analyzed right away
+    event_handler.process(wfx.home / "example" / "soundscape.wav")
+    event_handler.process(wfx.home / "example" / "soundscape.wav")
+    event_handler.process(wfx.home / "example" / "soundscape.wav", resumed=True)
+    assert event_handler.backlog == 1
+    event_handler.queue.put(("other.wav", False))
+
+    event_handler._update_shedding()
+    assert recording.processor.overlap == 0.5
+
+    event_handler._update_shedding()
+    assert recording.gate.min_energy_db == -50.0
+    assert recording.processor.gate is recording.gate
+
+    # while skipping, files are only listed for the clean up
+    event_handler._update_shedding()
+    event_handler._handle(str(wfx.home / "example" / "soundscape.wav"), False)
+    assert watcher._read_shed_files(watcher.output) == [
+        wfx.home / "example" / "soundscape.wav"
+    ]
+    assert list(watcher.output.glob("results_*.csv")) == []
+
+    # once the queue has drained, the recording is restored step by step
+    while event_handler.backlog > 0:
+        event_handler.queue.get()
+
+    for _ in range(3):
+        event_handler._update_shedding()
+
+    assert recording.gate is None
+    assert recording.processor.gate is None
+    assert recording.processor.overlap == 1.0
+    assert [d["action"] for d in watcher.read_shedding_stats()["decisions"]] == [
+        "degrade"
+    ] * 3 + ["revert"] * 3
+
+
+def test_watcher_scheduler_config(watch_fx):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="Unknown scheduling class old"):
+        wfx.make_watcher(scheduler_config={"weights": {"old": 2}})
+
+    watcher = wfx.make_watcher()
+    assert watcher.scheduler is None
+    assert watcher._set_up_scheduler().strict is True
+
+    watcher = wfx.make_watcher(
+        scheduler_config={"strict": False, "weights": {"live": 4}, "max_wait": 60}
+    )
+    scheduler = watcher._set_up_scheduler()
+    assert scheduler.strict is False
+    assert scheduler.weights == {"live": 4, "backlog": 1.0}
+    assert scheduler.max_wait == 60
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Scheduler"] == {
+        "strict": False,
+        "weights": {"live": 4},
+        "max_wait": 60,
+    }
+    assert watcher.read_scheduling_stats() == {}
+
+
+def test_event_handler_priority(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher()
+    event_handler = AnalysisEventHandler(watcher)
+    assert watcher.scheduler is event_handler.queue
+
+    shutil.copy(wfx.home / "example" / "soundscape.wav", wfx.data / "old.wav")
+    shutil.copy(wfx.home / "example" / "soundscape.wav", wfx.data / "new.wav")
+
+    # files left over from earlier runs wait while new ones arrive
+    event_handler.process(wfx.data / "old.wav", resumed=True)
+    event_handler.process(wfx.data / "new.wav")
+    assert event_handler.queue.qsize("backlog") == 1
+    assert event_handler.queue.qsize("live") == 1
+
+    assert event_handler.queue.get() == (str(wfx.data / "new.wav"), False)
+    assert event_handler.queue.get() == (str(wfx.data / "old.wav"), True)
+
+    stats = event_handler.queue.stats()
+    assert stats["live"]["served"] == 1
+    assert stats["backlog"]["served"] == 1
+
+
+def test_watcher_state_process_death(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher()
+    watcher.state_channel.set("ready")
+    watcher.watcher_process = multiprocessing.Process(target=time.sleep, args=(30,))
+    watcher.watcher_process.start()
+    assert watcher.state == "ready"
+
+    # killed without a chance to report it, like by the out-of-memory killer
+    threading.Timer(
+        0.5, os.kill, args=(watcher.watcher_process.pid, signal.SIGKILL)
+    ).start()
+
+    start = time.time()
+    assert watcher.wait_for_state(["paused"], timeout=30) is False
+    assert time.time() - start < 10
+    assert watcher.state == "failed"
+    assert watcher.wait_for_state(["ready", "failed"], timeout=1)
+
+    watcher.watcher_process = None
+    assert watcher.state == "ready"
+
+
+def test_watcher_writer_config(watch_fx):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="'durability' must be in"):
+        wfx.make_watcher(writer_config={"durability": "always"})
+
+    watcher = wfx.make_watcher()
+    assert watcher.writer is None
+    assert watcher._set_up_writer().durability == "none"
+
+    watcher = wfx.make_watcher(
+        writer_config={"max_pending": 4, "batch_size": 2, "durability": "file"}
+    )
+    writer = watcher._set_up_writer()
+    assert writer.max_pending == 4
+    assert writer.batch_size == 2
+    assert writer.durability == "file"
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Writer"] == {
+        "max_pending": 4,
+        "batch_size": 2,
+        "durability": "file",
+    }
+    assert watcher.read_writer_stats() == {}
+    assert watcher.__getstate__()["work_lock"] is None
+
+
+def test_watcher_writer_done_signal(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher()
+    watcher.output = Path(watcher.outdir) / "run"
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher.writer = watcher._set_up_writer()
+    watcher.writer.start()
+
+    may_write = threading.Event()
+    written = []
+
+    def write():
+        may_write.wait(timeout=10)
+        return watcher.save_results(watcher.output, [], suffix="slow")
+
+    # the analysis is done, but the main process must wait until its results are written
+    watcher._begin_analysis()
+    watcher._persist(write, lambda: written.append("slow"))
+    watcher._end_analysis()
+    assert watcher.is_done_analyzing.is_set() is False
+
+    may_write.set()
+    assert watcher.is_done_analyzing.wait(timeout=10)
+    assert written == ["slow"]
+    assert (watcher.output / "results_slow.csv").is_file()
+    assert list(watcher.output.glob("*.tmp")) == []
+
+    # a file that is being analyzed keeps the main process waiting, too
+    watcher._begin_analysis()
+    watcher._persist(
+        lambda: watcher.save_results(watcher.output, [], suffix="fast"), None
+    )
+    assert watcher.writer.flush(timeout=10)
+    assert watcher.is_done_analyzing.is_set() is False
+    watcher._end_analysis()
+    assert watcher.is_done_analyzing.is_set()
+
+    watcher.writer.stop()
+
+
+def test_watcher_index_config(watch_fx, tmp_path):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher(index_config={"timeout": 5})
+    assert watcher.index is None
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Index"] == {
+        "timeout": 5
+    }
+
+    index = watcher._set_up_index(watcher.index_config, watcher.outdir)
+    assert index.path == Path(watcher.outdir) / "detections.sqlite"
+    index.close()
+
+    index = watcher._set_up_index(
+        {"path": str(tmp_path / "index.sqlite")}, watcher.outdir
+    )
+    assert index.path == tmp_path / "index.sqlite"
+    assert index.path.is_file()
+    index.close()
+
+
+def test_watcher_resource_config(watch_fx):
+    _, wfx = watch_fx
+
+    with pytest.raises(ValueError, match="'workers' must be >= 1"):
+        wfx.make_watcher(resource_config={"workers": 0})
+
+    with pytest.raises(ValueError, match="'worker' of 'resource_config' must be"):
+        wfx.make_watcher(resource_config={"workers": 2, "worker": 2})
+
+    watcher = wfx.make_watcher(
+        resource_config={"workers": 2, "worker": 1, "decode_threads": 1}
+    )
+    assert watcher.resources is None
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+    assert read_yaml(watcher.output / "config.yml")["Analysis"]["Resources"] == {
+        "workers": 2,
+        "worker": 1,
+        "decode_threads": 1,
+    }
+
+    share = watcher._set_up_resources()
+    assert len(share["cpus"]) >= 1
+    assert share["decode_threads"] == 1
+    assert share["interpreter_threads"] >= 1
+
+
+def test_watcher_cluster_config(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher(cluster_config={"host_id": "first", "lease_timeout": 5})
+    assert watcher.leases is None
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+
+    cfg = read_yaml(watcher.output / "config.yml")
+    assert cfg["Analysis"]["Cluster"] == {"host_id": "first", "lease_timeout": 5}
+
+    leases = watcher._set_up_leases(watcher.cluster_config, watcher.input)
+    assert leases.lease_dir == watcher.input / ".faunanet_leases"
+    assert leases.host_id == "first"
+    assert leases.lease_timeout == 5
+
+    # intervals of the watcher itself are not passed on to the lease manager
+    leases = watcher._set_up_leases(
+        {"host_id": "first", "sweep_interval": 5, "prune_interval": 60},
+        watcher.input,
+    )
+    assert leases.host_id == "first"
+
+    with pytest.raises(
+        ValueError, match="'sweep_interval' of 'cluster_config' must be > 0"
+    ):
+        wfx.make_watcher(cluster_config={"sweep_interval": 0})
+
+    # files completed by another host are not analyzed again
+    other = watcher._set_up_leases(
+        {"host_id": "second", "lease_timeout": 5}, watcher.input
+    )
+    files = wfx.get_folder_content(wfx.data, ".wav")
+    assert other.claim(files[0]) is True
+    assert other.complete(files[0]) is True
+    assert leases.claim(files[0]) is False
+    assert leases.claim(files[1]) is True
+
+
+def test_watcher_journal_recovery(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher()
+    files = [str(f) for f in wfx.get_folder_content(wfx.data, ".wav")]
+
+    # a run that crashed: no batch info, two files finished, one in progress
+    crashed = wfx.output / "240101_120000"
+    crashed.mkdir(parents=True)
+    with open(crashed / "config.yml", "w") as ymlfile:
+        yaml.safe_dump({"Analysis": {"input": str(watcher.input)}}, ymlfile)
+    journal = ProcessingJournal(crashed / watcher.journal_name)
+    for f in files[:4]:
+        journal.enqueued(f)
+    for f in files[:2]:
+        journal.started(f)
+        journal.completed(f)
+    journal.started(files[2])
+    journal.close()
+
+    assert watcher._get_unfinished_files() == files[2:4]
+
+    assert watcher._read_batch_info(crashed) == {
+        "first": int(Path(files[0]).stat().st_ctime),
+        "last": int(Path(files[1]).stat().st_ctime),
+    }
+
+    # a later run resumed one of them and ended normally
+    resumed = wfx.output / "240101_130000"
+    resumed.mkdir(parents=True)
+    shutil.copy(crashed / "config.yml", resumed / "config.yml")
+    journal = ProcessingJournal(resumed / watcher.journal_name)
+    journal.enqueued(files[2], resumed=True)
+    journal.started(files[2])
+    journal.completed(files[2])
+    journal.close()
+
+    with open(resumed / watcher.batchfile_name, "w") as batch_info:
+        yaml.safe_dump({"first": 42, "last": 43}, batch_info)
+
+    assert watcher._get_unfinished_files() == files[3:4]
+
+    lower, upper = watcher._get_clean_up_limits(crashed, resumed)
+    assert lower == int(Path(files[1]).stat().st_ctime)
+    assert upper == 42
+
+    empty = wfx.output / "240101_140000"
+    empty.mkdir(parents=True)
+    with pytest.raises(
+        RuntimeError, match="has neither a batchinfo.yml file nor a journal"
+    ):
+        watcher._get_clean_up_limits(empty, None)
+
+
+def test_watcher_observer_config(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher()
+    assert isinstance(watcher._set_up_observer(), type(Observer()))
+
+    watcher = wfx.make_watcher(observer_config={"mode": "scan", "scan_budget": 1000})
+    observer = watcher._set_up_observer()
+    assert isinstance(observer, ScanObserver)
+    assert observer.interval == watcher.check_time
+    assert observer.scan_budget == 1000
+    assert observer.state_file == watcher.outdir / ".faunanet_scan_state.json"
+
+    watcher.output = Path(watcher.outdir) / Path(
+        datetime.now().strftime("%y%m%d_%H%M%S")
+    )
+    watcher.output.mkdir(parents=True, exist_ok=True)
+    watcher._write_config()
+
+    cfg = read_yaml(watcher.output / "config.yml")
+    assert cfg["Analysis"]["Observer"] == {"mode": "scan", "scan_budget": 1000}
+
+    with pytest.raises(
+        ValueError, match="'mode' of 'observer_config' must be in 'native', 'scan'"
+    ):
+        wfx.make_watcher(observer_config={"scan_budget": 1000})
+
+
+def test_watcher_states(watch_fx):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher()
+    assert watcher.state == "created"
+
+    watcher.start()
+    assert watcher.wait_for_state(["ready", "failed"], timeout=60) is True
+    assert watcher.state == "ready"
+
+    watcher.is_done_analyzing.set()
+    watcher.pause()
+    assert watcher.state == "paused"
+
+    watcher.go_on()
+    assert watcher.state == "ready"
+
+    watcher.is_done_analyzing.set()
+    watcher.stop()
+    assert watcher.state == "stopped"
+    assert watcher.wait_for_state(["stopped"], timeout=0) is True
+
+
+def test_watcher_state_failed(watch_fx, mocker):
+    _, wfx = watch_fx
+
+    watcher = wfx.make_watcher()
+
+    mocker.patch(
+        "multiprocessing.Process.start",
+        side_effect=ValueError("Simulated error occurred"),
+    )
+
+    with pytest.raises(RuntimeError):
+        watcher.start()
+
+    assert watcher.state == "failed"
+
+
+def test_watcher_stop_pending_restart(stub_fx):
+    watcher = stub_fx.make_watcher(
+        supervisor_config={"backoff": 30.0, "max_backoff": 60.0, "check_interval": 0.05}
+    )
+    watcher.start()
+    assert watcher.wait_for_state(["ready"], timeout=60)
+
+    # dies and waits for its restart
+    os.kill(watcher.watcher_process.pid, signal.SIGKILL)
+    deadline = time.time() + 10
+    while watcher.supervisor.status()["crashes"] == 0:
+        assert time.time() < deadline
+        time.sleep(0.05)
+    assert watcher.watcher_process is None
+
+    # which stopping cancels, such that it can be restarted right away
+    watcher.stop()
+    assert watcher.state == "stopped"
+    assert watcher.supervisor.status()["restart_in"] is None
+
+    watcher.start()
+    assert watcher.wait_for_state(["ready"], timeout=60)
+    watcher.stop()
+    assert watcher.state == "stopped"
+
+    with pytest.raises(RuntimeError, match="Cannot stop watcher process"):
+        watcher.stop()
+
+
+def test_watcher_start_failure(stub_fx, monkeypatch):
+    watcher = stub_fx.make_watcher()
+
+    def broken_write_config():
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(watcher, "_write_config", broken_write_config)
+
+    # setup steps are undone and reported like a failed start of the process
+    with pytest.raises(RuntimeError, match="Something went wrong when starting"):
+        watcher.start()
+
+    assert watcher.watcher_process is None
+    assert watcher.state == "failed"
+    assert list(stub_fx.output.iterdir()) == []
+
+
+def test_watcher_ensemble_member_failure(stub_fx):
+    watcher = stub_fx.make_watcher(
+        ensemble_config=[{"model_name": "stub", "Model": {"fail": True}}]
+    )
+    recording = watcher._set_up_recording(
+        "stub",
+        watcher.recording_config,
+        watcher.species_predictor_config,
+        watcher.model_config,
+        watcher.preprocessor_config,
+    )
+    ensemble = watcher._set_up_ensemble(watcher.ensemble_config, recording)
+    path = stub_fx.write_wav(stub_fx.input / "a.wav")
+
+    # the decoded audio is released even though a member fails
+    with pytest.raises(RuntimeError, match="Stub model failed"):
+        watcher._run_models(str(path), "stub", recording, ensemble)
+    assert recording.decoder.path is None
+    assert recording.decoder.has(path) is False
+
+    # with a working ensemble, the file is decoded once for all models
+    working = watcher._set_up_ensemble(
+        [dict(watcher.ensemble_config[0], Model={})], recording
+    )
+    results = watcher._run_models(str(path), "stub", recording, working)
+    assert [d["model"] for d in results] == ["stub"] * 4
+    assert recording.decoder.num_decodes == 1
+
+
+def test_watcher_unfinished_files(stub_fx):
+    watcher = stub_fx.make_watcher()
+    files = [str(stub_fx.write_wav(stub_fx.input / f"{i}.wav")) for i in range(4)]
+
+    def make_run(name, indir):
+        folder = stub_fx.output / name
+        folder.mkdir()
+        with open(folder / "config.yml", "w") as ymlfile:
+            yaml.safe_dump({"Analysis": {"input": str(indir)}}, ymlfile)
+        time.sleep(0.05)  # runs are ordered by the creation time of their folders
+        return ProcessingJournal(folder / watcher.journal_name)
+
+    journal = make_run("240101_120000", stub_fx.input)
+    for f in files[:3]:
+        journal.enqueued(f)
+    journal.close()
+
+    # runs on other input directories are not resumed
+    journal = make_run("240101_121000", stub_fx.home / "other")
+    journal.enqueued(files[3])
+    journal.close()
+
+    assert watcher._get_unfinished_files() == files[:3]
+
+    # a run that has carried the unfinished files over replaces the earlier ones, only until it has done so completely
+    journal = make_run("240101_130000", stub_fx.input)
+    journal.enqueued(files[1], resumed=True)
+    assert watcher._get_unfinished_files() == files[:3]
+
+    journal.checkpoint()
+    journal.enqueued(files[3])
+    journal.close()
+    assert watcher._get_unfinished_files() == [files[1], files[3]]
+
+
+def test_event_handler_shedding_ensemble(stub_fx):
+    watcher = stub_fx.make_watcher(
+        model_config={"delay": 0.05},
+        ensemble_config=[{"model_name": "stub", "Model": {"delay": 0.05}}],
+        shedding_config={
+            "high_water": 1,
+            "low_water": 0,
+            "hold": 0,
+            "steps": ["activity_gate"],
+        },
+    )
+    watcher.output = stub_fx.output / "run"
+    watcher.output.mkdir()
+    watcher.shedder = watcher._set_up_shedder()
+    watcher.may_do_work.set()
+
+    event_handler = AnalysisEventHandler(watcher)
+    recording, (_, member) = event_handler.recording, event_handler.ensemble[0]
+
+    # the members of the ensemble are gated as well, each with its own gate
+    event_handler.queue.put(("other.wav", False))
+    event_handler._update_shedding()
+    assert recording.gate is not None
+    assert member.gate is not None
+    assert member.gate is not recording.gate
+    assert member.processor.gate is member.gate
+
+    while event_handler.backlog > 0:
+        event_handler.queue.get()
+
+    # waiting for the lock does not count towards the real-time factor, only decoding and inference of all models do
+    factors = []
+    update = watcher.shedder.update
+
+    def recording_update(backlog, realtime_factor=None):
+        factors.append(realtime_factor)
+        return update(backlog, realtime_factor)
+
+    watcher.shedder.update = recording_update
+    path = stub_fx.write_wav(stub_fx.input / "a.wav", secs=2.0)
+
+    event_handler.lock.acquire()
+    threading.Timer(1.0, event_handler.lock.release).start()
+    event_handler._handle(str(path), False)
+
+    # 2 seconds of audio, at least 50 ms of inference per model
+    assert recording.analysis_time >= 0.05
+    assert member.analysis_time >= 0.05
+    assert 3.0 < factors[-1] <= 20.0
+    assert recording.gate is None
+    assert member.gate is None
+
+
+def test_watcher_graceful_stop(stub_fx):
+    watcher = stub_fx.make_watcher(
+        model_config={"delay": 1.0}, writer_config={"max_pending": 4}
+    )
+    watcher.start()
+    assert watcher.wait_for_state(["ready"], timeout=60)
+
+    # stopping an idle watcher does not wait for an analysis
+    started = time.time()
+    watcher.stop()
+    assert time.time() - started < 10
+    assert watcher.state == "stopped"
+
+    # a file that is being analyzed is finished, its results are written and the journal records it
+    watcher.start()
+    assert watcher.wait_for_state(["ready"], timeout=60)
+    path = stub_fx.write_wav(stub_fx.input / "a.wav")
+    deadline = time.time() + 30
+    while str(path) not in replay_journal(watcher.output / watcher.journal_name):
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+    watcher.stop()
+    assert (watcher.output / "results_a.csv").is_file()
+    assert (
+        replay_journal(watcher.output / watcher.journal_name)[str(path)]["event"]
+        == "completed"
+    )
+    assert watcher._get_unfinished_files() == []
+
+    # a process that does not end in time is killed
+    watcher.start()
+    assert watcher.wait_for_state(["ready"], timeout=60)
+    os.kill(watcher.watcher_process.pid, signal.SIGSTOP)
+    with pytest.warns(UserWarning, match="stop timeout expired, killing"):
+        watcher.stop(timeout=1.0)
+    assert watcher.state == "stopped"
+    assert watcher.watcher_process is None
+
+
+def test_watcher_cache_hit_state(stub_fx):
+    watcher = stub_fx.make_watcher(
+        recording_config={"activity_gate": {"min_energy_db": -20.0}}
+    )
+    recording = watcher._set_up_recording(
+        "stub",
+        watcher.recording_config,
+        watcher.species_predictor_config,
+        watcher.model_config,
+        watcher.preprocessor_config,
+    )
+    cache = ResultsCache(stub_fx.home / "cache")
+    quiet = stub_fx.write_wav(stub_fx.input / "quiet.wav", amplitude=0.001)
+    copy = stub_fx.input / "copy.wav"
+    shutil.copy(quiet, copy)
+
+    # the gate skips chunks of the quiet file
+    watcher._analyze_file(str(quiet), "stub", recording, cache=cache, config_hash="x")
+    assert len(watcher.skipped_chunks) > 0
+    assert recording.skipped_chunks == watcher.skipped_chunks
+
+    # its copy is served from the cache, which leaves nothing of the quiet file behind
+    watcher._analyze_file(str(copy), "stub", recording, cache=cache, config_hash="x")
+    assert cache.hits == 1
+    assert watcher.skipped_chunks == []
+    assert recording.skipped_chunks == []
+    assert recording.analysis_time == 0.0
+
+
+def test_watcher_crash_recovery(stub_fx):
+    watcher = stub_fx.make_watcher(
+        model_config={"delay": 2.0},
+        supervisor_config={"backoff": 0.1, "check_interval": 0.05},
+    )
+    watcher.start()
+    assert watcher.wait_for_state(["ready"], timeout=60)
+    crashed = watcher.output
+
+    # the process dies while it analyzes a file
+    path = stub_fx.write_wav(stub_fx.input / "a.wav")
+    deadline = time.time() + 30
+    while (
+        replay_journal(crashed / watcher.journal_name).get(str(path), {}).get("event")
+        != "started"
+    ):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    os.kill(watcher.watcher_process.pid, signal.SIGKILL)
+
+    # the file is marked as failed in the crashed run and analyzed by the restarted process
+    deadline = time.time() + 60
+    while watcher.output == crashed or not (watcher.output / "results_a.csv").is_file():
+        assert time.time() < deadline
+        time.sleep(0.1)
+
+    assert (
+        replay_journal(crashed / watcher.journal_name)[str(path)]["event"] == "failed"
+    )
+    assert watcher.supervisor.status()["restarts"] == 1
+    watcher.stop()
+    assert (
+        replay_journal(watcher.output / watcher.journal_name)[str(path)]["event"]
+        == "completed"
+    )
@@ -0,0 +1,123 @@
+import pytest
+import multiprocessing
+import os
+import sys
+import warnings
+
+from faunanet import workers
+
+
+def report(queue, modules, model):
+    # runs in a worker process
+    queue.put(
+        (
+            [name in sys.modules for name in modules],
+            workers.preloaded_model_content(model),
+        )
+    )
+
+
+@pytest.fixture()
+def fresh_forkserver():
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        pytest.skip("forkserver is not available on this platform")
+
+    from multiprocessing import forkserver
+
+    # the forkserver is shared by the whole process and its preloads are fixed once it runs
+    forkserver._forkserver._stop()
+    yield
+    forkserver._forkserver._stop()
+
+
+def test_preload_model_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(workers, "_MODEL_CONTENT", {})
+
+    for name in ["model.tflite", "model.onnx", "labels.txt"]:
+        (tmp_path / "model_a" / name).parent.mkdir(exist_ok=True)
+        (tmp_path / "model_a" / name).write_bytes(name.encode())
+    (tmp_path / "model_b").mkdir()
+    (tmp_path / "model_b" / "species_presence_model.tflite").write_bytes(b"species")
+
+    files = workers.model_files(
+        [tmp_path / "model_a", tmp_path / "model_b", tmp_path / "missing"]
+    )
+    assert files == [
+        tmp_path / "model_a" / "model.onnx",
+        tmp_path / "model_a" / "model.tflite",
+        tmp_path / "model_b" / "species_presence_model.tflite",
+    ]
+
+    assert workers.preloaded_model_content(files[0]) is None
+    assert workers.preload_model_files(files + [tmp_path / "missing.tflite"]) == 3
+    assert workers.preloaded_model_content(files[1]) == b"model.tflite"
+    assert (
+        workers.preloaded_model_content(
+            tmp_path / "model_b" / ".." / "model_a" / "model.onnx"
+        )
+        == b"model.onnx"
+    )
+
+    # a reinstalled model is read anew
+    files[1].write_bytes(b"new model.tflite")
+    assert workers.preloaded_model_content(files[1]) is None
+    assert workers.preload_model_files([files[1]]) == 3
+    assert workers.preloaded_model_content(files[1]) == b"new model.tflite"
+
+    files[0].unlink()
+    assert workers.preloaded_model_content(files[0]) is None
+    assert len(workers._MODEL_CONTENT) == 2
+
+
+def test_worker_context():
+    context = workers.worker_context()
+    assert context.get_start_method() in ["forkserver", "spawn"]
+
+
+def test_default_preload():
+    preload = workers.default_preload()
+    assert preload[:3] == ["faunanet", "faunanet.workers", "librosa"]
+    assert preload[3] in ["tflite_runtime.interpreter", "tensorflow"]
+
+
+def test_warm_context(tmp_path, fresh_forkserver):
+    model = tmp_path / "model.tflite"
+    model.write_bytes(b"weights")
+
+    context = workers.warm_context(preload=["faunanet.buffers"], models=[model])
+    assert context.get_start_method() == "forkserver"
+    assert workers.PRELOAD_MODELS_ENV not in os.environ
+
+    # modules and models are loaded in the server, not in each worker
+    for _ in range(2):
+        queue = context.Queue()
+        process = context.Process(
+            target=report,
+            args=(queue, ["faunanet.buffers", "faunanet.workers"], str(model)),
+        )
+        process.start()
+        assert queue.get(timeout=60) == ([True, True], b"weights")
+        process.join()
+
+
+def test_warm_context_later_models(tmp_path, fresh_forkserver):
+    model = tmp_path / "model.tflite"
+    model.write_bytes(b"weights")
+    other = tmp_path / "other.onnx"
+    other.write_bytes(b"other weights")
+
+    workers.warm_context(preload=["faunanet.buffers"], models=[model])
+
+    # the server keeps the models it has been started with
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        workers.warm_context(preload=["faunanet.buffers"], models=[model])
+
+    with pytest.warns(UserWarning, match="other.onnx'] are not preloaded"):
+        context = workers.warm_context(preload=["faunanet.buffers"], models=[other])
+
+    queue = context.Queue()
+    process = context.Process(target=report, args=(queue, [], str(other)))
+    process.start()
+    assert queue.get(timeout=60) == ([], None)
+    process.join()
@@ -0,0 +1,158 @@
+import pytest
+import threading
+import time
+import os
+
+from faunanet.writer import ResultWriter
+
+
+def write_file(path, content="a,b\n"):
+    def write():
+        with open(path, "w") as f:
+            f.write(content)
+        return [path]
+
+    return write
+
+
+def hold_up(may_write):
+    # holds up the writer until 'may_write' is set, such that the next jobs queue up
+    taken = threading.Event()
+
+    def write():
+        taken.set()
+        may_write.wait(timeout=10)
+        return []
+
+    return write, taken
+
+
+@pytest.fixture
+def count_fsyncs(mocker):
+    return mocker.patch("faunanet.writer.os.fsync")
+
+
+def test_writer_exceptions():
+    with pytest.raises(ValueError, match="'max_pending' must be >= 1"):
+        ResultWriter(max_pending=0)
+
+    with pytest.raises(ValueError, match="'batch_size' must be >= 1"):
+        ResultWriter(batch_size=0)
+
+    with pytest.raises(ValueError, match="'durability' must be in"):
+        ResultWriter(durability="always")
+
+    with pytest.raises(RuntimeError, match="Result writer is not running"):
+        ResultWriter().submit(lambda: [])
+
+    writer = ResultWriter()
+    writer.start()
+    with pytest.raises(RuntimeError, match="Result writer is already running"):
+        writer.start()
+    writer.stop()
+    assert writer.is_running is False
+
+
+def test_writer_batches(tmp_path, count_fsyncs):
+    writer = ResultWriter(batch_size=3, durability="none")
+    done = []
+    may_write = threading.Event()
+
+    writer.start()
+    write, taken = hold_up(may_write)
+    writer.submit(write, lambda: done.append(0))
+    assert taken.wait(timeout=10)
+    for i in range(1, 6):
+        writer.submit(
+            write_file(tmp_path / f"results_{i}.csv"), lambda i=i: done.append(i)
+        )
+    assert writer.pending == 6
+
+    may_write.set()
+    assert writer.flush(timeout=10)
+    writer.stop()
+
+    assert done == list(range(6))
+    assert (tmp_path / "results_5.csv").read_text() == "a,b\n"
+
+    stats = writer.stats()
+    assert stats["written"] == 6
+    assert stats["pending"] == 0
+    assert stats["batches"] == 3
+    assert stats["batch_size"] == 2.0
+    count_fsyncs.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "durability, fsyncs",
+    [("none", 0), ("batch", 4 + 1), ("file", 4 * 2)],
+)
+def test_writer_durability(tmp_path, count_fsyncs, durability, fsyncs):
+    writer = ResultWriter(batch_size=4, durability=durability)
+    may_write = threading.Event()
+
+    writer.start()
+    write, taken = hold_up(may_write)
+    writer.submit(write)
+    assert taken.wait(timeout=10)
+    for i in range(4):
+        writer.submit(write_file(tmp_path / f"results_{i}.csv"))
+    may_write.set()
+    writer.stop()
+
+    # the files and, once per batch or file, their folder
+    assert writer.num_batches == 2
+    assert count_fsyncs.call_count == fsyncs
+
+
+def test_writer_errors(tmp_path):
+    errors = []
+    done = []
+    writer = ResultWriter(on_error=lambda e, tb: errors.append(e))
+    writer.start()
+
+    writer.submit(
+        write_file(tmp_path / "missing" / "results.csv"), lambda: done.append(0)
+    )
+    writer.submit(write_file(tmp_path / "results.csv"), lambda: done.append(1))
+    writer.stop()
+
+    # a failed job is not marked as done and does not stop the next ones
+    assert len(errors) == 1
+    assert isinstance(errors[0], FileNotFoundError)
+    assert done == [1]
+    assert writer.stats()["failed"] == 1
+
+
+def test_writer_backpressure_and_stop(tmp_path):
+    writer = ResultWriter(max_pending=1, batch_size=1)
+    idle = []
+    writer.on_idle = lambda: idle.append(writer.pending)
+    may_write = threading.Event()
+
+    writer.start()
+    write, taken = hold_up(may_write)
+    writer.submit(write)
+    assert taken.wait(timeout=10)
+    writer.submit(write_file(tmp_path / "results_0.csv"))
+
+    # the queue is full, so the next job has to wait for the writer
+    submitted = threading.Event()
+
+    def submit():
+        writer.submit(write_file(tmp_path / "results_1.csv"))
+        submitted.set()
+
+    thread = threading.Thread(target=submit)
+    thread.start()
+    assert submitted.wait(timeout=0.2) is False
+
+    may_write.set()
+    thread.join(timeout=10)
+    assert submitted.is_set()
+
+    # stopping writes everything that is still queued
+    writer.stop()
+    assert (tmp_path / "results_1.csv").is_file()
+    assert writer.pending == 0
+    assert idle[-1] == 0